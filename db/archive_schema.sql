@@ -0,0 +1,26 @@
+-- Archive tier (health_bot.archive.sqlite3): daily values older than the
+-- retention horizon, compacted by health_bot.archive / scripts/archive_history.py.
+-- Shard connections ATTACH it as `archive`; stats and streaks read it together
+-- with the hot daily_values. No foreign keys: users/habits live in other files.
+
+-- One row per user, month and habit. Bit d-1 of a mask is day d of the month.
+CREATE TABLE IF NOT EXISTS archive_months (
+  user_id INTEGER NOT NULL,    -- dir.users(id)
+  month TEXT NOT NULL,         -- YYYY-MM
+  habit_id INTEGER NOT NULL,   -- dir.habits(id)
+  tracked INTEGER NOT NULL,    -- days with a value
+  done INTEGER NOT NULL DEFAULT 0,  -- boolean habits: days marked ✅
+  moods TEXT,                  -- choice habits: one code per day ('+' 😊, '0' 😐, '-' 😞, '.' none)
+  PRIMARY KEY (user_id, month, habit_id)
+) WITHOUT ROWID;
+
+-- Day numbers 1..31, to expand masks back into rows in SQL
+CREATE TABLE IF NOT EXISTS days (day INTEGER PRIMARY KEY);
+INSERT OR IGNORE INTO days (day)
+  WITH RECURSIVE n(d) AS (SELECT 1 UNION ALL SELECT d + 1 FROM n WHERE d < 31)
+  SELECT d FROM n;
+
+CREATE TABLE IF NOT EXISTS archive_state (
+  key TEXT PRIMARY KEY,        -- archived_before: dates before it may be archived
+  value TEXT NOT NULL
+);
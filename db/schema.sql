@@ -3,6 +3,7 @@ PRAGMA foreign_keys = ON;
 CREATE TABLE IF NOT EXISTS households (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   name TEXT NOT NULL,
+  owner_telegram_user_id INTEGER,  -- who created it on /start (NULL for the legacy shared household)
   created_at TEXT NOT NULL DEFAULT (datetime('now'))
 );
 
@@ -19,6 +20,8 @@ CREATE TABLE IF NOT EXISTS users (
   created_at TEXT NOT NULL DEFAULT (datetime('now'))
 );
 
+CREATE INDEX IF NOT EXISTS idx_users_household ON users (household_id);
+
 CREATE TABLE IF NOT EXISTS habits (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   household_id INTEGER NOT NULL REFERENCES households(id) ON DELETE CASCADE,
@@ -30,6 +33,8 @@ CREATE TABLE IF NOT EXISTS habits (
   created_at TEXT NOT NULL DEFAULT (datetime('now'))
 );
 
+CREATE INDEX IF NOT EXISTS idx_habits_household ON habits (household_id, sort_order);
+
 CREATE TABLE IF NOT EXISTS daily_entries (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
@@ -44,6 +49,7 @@ CREATE TABLE IF NOT EXISTS daily_values (
   daily_entry_id INTEGER NOT NULL REFERENCES daily_entries(id) ON DELETE CASCADE,
   habit_id INTEGER NOT NULL REFERENCES habits(id) ON DELETE CASCADE,
   value TEXT,                  -- store as text; parse by habit.kind
+  value_num REAL,              -- typed copy for SQL aggregates (see db.VALUE_NUM_SQL)
   created_at TEXT NOT NULL DEFAULT (datetime('now')),
   updated_at TEXT NOT NULL DEFAULT (datetime('now')),
   UNIQUE(daily_entry_id, habit_id)
@@ -61,6 +67,51 @@ CREATE TABLE IF NOT EXISTS weekly_entries (
   UNIQUE(user_id, week_start_date)
 );
 
+-- Precomputed weekly coach reports (derived data, see health_bot/coach.py)
+CREATE TABLE IF NOT EXISTS weekly_reports (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  week_start_date TEXT NOT NULL,  -- YYYY-MM-DD (Monday)
+  report TEXT NOT NULL,           -- JSON
+  created_at TEXT NOT NULL DEFAULT (datetime('now')),
+  UNIQUE(user_id, week_start_date)
+);
+
+-- Per-user data version, bumped on every daily value write (cache key for derived data)
+CREATE TABLE IF NOT EXISTS user_data_versions (
+  user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+  version INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS dv_version_ins AFTER INSERT ON daily_values
+BEGIN
+  INSERT INTO user_data_versions (user_id, version)
+  SELECT user_id, 1 FROM daily_entries WHERE id = NEW.daily_entry_id
+  ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dv_version_upd AFTER UPDATE OF value ON daily_values
+BEGIN
+  INSERT INTO user_data_versions (user_id, version)
+  SELECT user_id, 1 FROM daily_entries WHERE id = NEW.daily_entry_id
+  ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dv_version_del AFTER DELETE ON daily_values
+BEGIN
+  INSERT INTO user_data_versions (user_id, version)
+  SELECT user_id, 1 FROM daily_entries WHERE id = OLD.daily_entry_id
+  ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+END;
+
+-- Cached insights (derived data, see health_bot/insights.py)
+CREATE TABLE IF NOT EXISTS user_insights (
+  user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+  data_key TEXT NOT NULL,         -- recompute when this no longer matches
+  insights TEXT NOT NULL,         -- JSON
+  computed_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+
 CREATE TABLE IF NOT EXISTS household_invites (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   household_id INTEGER NOT NULL REFERENCES households(id) ON DELETE CASCADE,
@@ -68,4 +119,39 @@ CREATE TABLE IF NOT EXISTS household_invites (
   created_at TEXT NOT NULL DEFAULT (datetime('now')),
   used_at TEXT,
   used_by_user_id INTEGER REFERENCES users(id) ON DELETE SET NULL
-);
\ No newline at end of file
+);
+
+-- household_id -> shard file holding its daily data (see health_bot.db; no row = shard 0, this file)
+CREATE TABLE IF NOT EXISTS shard_map (
+  household_id INTEGER PRIMARY KEY REFERENCES households(id) ON DELETE CASCADE,
+  shard INTEGER NOT NULL
+);
+
+-- Reminder schedule (see health_bot/scheduler.py). It survives restarts, so
+-- reminders that came due while the bot was down are caught up.
+CREATE TABLE IF NOT EXISTS reminder_jobs (
+  user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  kind TEXT NOT NULL,             -- daily | weekly
+  spec TEXT NOT NULL,             -- days|HH:MM|timezone; next_run_at is recomputed when it changes
+  next_run_at REAL NOT NULL,      -- unix time
+  PRIMARY KEY (user_id, kind)
+);
+
+CREATE INDEX IF NOT EXISTS idx_reminder_jobs_due ON reminder_jobs (next_run_at);
+
+-- Only the lease holder runs scheduled jobs when several bot processes share the DB
+CREATE TABLE IF NOT EXISTS scheduler_leases (
+  name TEXT PRIMARY KEY,
+  holder TEXT NOT NULL,           -- host:pid of the process
+  expires_at REAL NOT NULL        -- unix time
+);
+
+-- Append-only change log (filled by triggers, see health_bot/changelog.py)
+CREATE TABLE IF NOT EXISTS change_log (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ts TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),  -- UTC
+  tbl TEXT NOT NULL,
+  op TEXT NOT NULL,               -- I | U | D
+  row_id INTEGER NOT NULL,
+  data TEXT                       -- JSON of the new row (NULL for deletes)
+);
@@ -0,0 +1,116 @@
+-- PostgreSQL schema for STORAGE_BACKEND=postgres (see health_bot/storage_pg.py).
+-- Same tables as schema.sql minus the SQLite-only derived data (insights,
+-- coach reports, change_log, shard_map). Apply with:
+--   psql "$DATABASE_URL" -f db/schema_pg.sql
+
+CREATE TABLE IF NOT EXISTS households (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  name TEXT NOT NULL,
+  owner_telegram_user_id BIGINT UNIQUE,  -- who created it on /start (NULL for the legacy shared household)
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS users (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  telegram_user_id BIGINT NOT NULL UNIQUE,
+  chat_id BIGINT NOT NULL,
+  household_id BIGINT REFERENCES households(id) ON DELETE SET NULL,
+  timezone TEXT NOT NULL,
+  first_name TEXT,
+  username TEXT,
+  reminders_enabled BOOLEAN NOT NULL DEFAULT TRUE,
+  reminder_time TEXT,            -- HH:MM in the user's timezone
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_users_household ON users (household_id);
+
+CREATE TABLE IF NOT EXISTS habits (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  household_id BIGINT NOT NULL REFERENCES households(id) ON DELETE CASCADE,
+  title TEXT NOT NULL,
+  kind TEXT NOT NULL,            -- boolean | number | choice | text
+  target TEXT,                   -- optional (e.g. "10000")
+  enabled BOOLEAN NOT NULL DEFAULT TRUE,
+  sort_order INTEGER NOT NULL DEFAULT 0,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_habits_household ON habits (household_id, sort_order);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_habits_household_title ON habits (household_id, title);
+
+CREATE TABLE IF NOT EXISTS daily_entries (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  user_id BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  date DATE NOT NULL,            -- user timezone
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  UNIQUE (user_id, date)
+);
+
+CREATE TABLE IF NOT EXISTS daily_values (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  daily_entry_id BIGINT NOT NULL REFERENCES daily_entries(id) ON DELETE CASCADE,
+  habit_id BIGINT NOT NULL REFERENCES habits(id) ON DELETE CASCADE,
+  value TEXT,
+  value_num DOUBLE PRECISION,    -- value_num(kind, value), for SQL aggregates
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  UNIQUE (daily_entry_id, habit_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_daily_values_entry_num ON daily_values (daily_entry_id, habit_id) INCLUDE (value_num);
+CREATE INDEX IF NOT EXISTS idx_daily_values_habit ON daily_values (habit_id, daily_entry_id);
+
+CREATE TABLE IF NOT EXISTS weekly_entries (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  user_id BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  week_start_date DATE NOT NULL,  -- Monday
+  weight_kg REAL,
+  week_rating INTEGER,            -- 1..10
+  note TEXT,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  UNIQUE (user_id, week_start_date)
+);
+
+CREATE TABLE IF NOT EXISTS household_invites (
+  id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  household_id BIGINT NOT NULL REFERENCES households(id) ON DELETE CASCADE,
+  code TEXT NOT NULL UNIQUE,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  used_at TIMESTAMPTZ,
+  used_by_user_id BIGINT REFERENCES users(id) ON DELETE SET NULL
+);
+
+-- Reminder schedule and scheduler lease (see health_bot/scheduler.py)
+CREATE TABLE IF NOT EXISTS reminder_jobs (
+  user_id BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  kind TEXT NOT NULL,             -- daily | weekly
+  spec TEXT NOT NULL,             -- days|HH:MM|timezone
+  next_run_at DOUBLE PRECISION NOT NULL,  -- unix time
+  PRIMARY KEY (user_id, kind)
+);
+
+CREATE INDEX IF NOT EXISTS idx_reminder_jobs_due ON reminder_jobs (next_run_at);
+
+CREATE TABLE IF NOT EXISTS scheduler_leases (
+  name TEXT PRIMARY KEY,
+  holder TEXT NOT NULL,
+  expires_at DOUBLE PRECISION NOT NULL  -- unix time
+);
+
+-- Numeric projection of a stored value by habit kind (health_bot.db.VALUE_NUM_SQL):
+--   boolean -> 1 / 0, number -> the number, choice (mood) -> 1 / 0 / -1, text -> NULL
+CREATE OR REPLACE FUNCTION value_num(kind TEXT, value TEXT) RETURNS DOUBLE PRECISION
+LANGUAGE plpgsql IMMUTABLE AS $$
+BEGIN
+  RETURN CASE kind
+    WHEN 'boolean' THEN CASE value WHEN '1' THEN 1 WHEN '0' THEN 0 END
+    WHEN 'number' THEN value::DOUBLE PRECISION
+    WHEN 'choice' THEN CASE value WHEN '😊' THEN 1 WHEN '😐' THEN 0 WHEN '😞' THEN -1 END
+  END;
+EXCEPTION WHEN invalid_text_representation THEN
+  RETURN NULL;
+END
+$$;
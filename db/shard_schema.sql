@@ -0,0 +1,63 @@
+-- Shard files (health_bot.shard<N>.sqlite3) hold daily data only; everything
+-- else lives in the directory DB (schema.sql), which is ATTACHed as `dir`.
+-- No foreign keys to users/habits: SQLite can't enforce them across files.
+PRAGMA foreign_keys = ON;
+
+CREATE TABLE IF NOT EXISTS daily_entries (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id INTEGER NOT NULL,    -- dir.users(id)
+  date TEXT NOT NULL,          -- YYYY-MM-DD (user timezone)
+  created_at TEXT NOT NULL DEFAULT (datetime('now')),
+  updated_at TEXT NOT NULL DEFAULT (datetime('now')),
+  UNIQUE(user_id, date)
+);
+
+CREATE TABLE IF NOT EXISTS daily_values (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  daily_entry_id INTEGER NOT NULL REFERENCES daily_entries(id) ON DELETE CASCADE,
+  habit_id INTEGER NOT NULL,   -- dir.habits(id)
+  value TEXT,
+  value_num REAL,
+  created_at TEXT NOT NULL DEFAULT (datetime('now')),
+  updated_at TEXT NOT NULL DEFAULT (datetime('now')),
+  UNIQUE(daily_entry_id, habit_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_daily_values_entry_num ON daily_values (daily_entry_id, habit_id, value_num);
+CREATE INDEX IF NOT EXISTS idx_daily_values_habit ON daily_values (habit_id, daily_entry_id);
+
+-- Triggers can only write to their own file, so versions and the change log are per shard
+CREATE TABLE IF NOT EXISTS user_data_versions (
+  user_id INTEGER PRIMARY KEY,
+  version INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS dv_version_ins AFTER INSERT ON daily_values
+BEGIN
+  INSERT INTO user_data_versions (user_id, version)
+  SELECT user_id, 1 FROM daily_entries WHERE id = NEW.daily_entry_id
+  ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dv_version_upd AFTER UPDATE OF value ON daily_values
+BEGIN
+  INSERT INTO user_data_versions (user_id, version)
+  SELECT user_id, 1 FROM daily_entries WHERE id = NEW.daily_entry_id
+  ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dv_version_del AFTER DELETE ON daily_values
+BEGIN
+  INSERT INTO user_data_versions (user_id, version)
+  SELECT user_id, 1 FROM daily_entries WHERE id = OLD.daily_entry_id
+  ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TABLE IF NOT EXISTS change_log (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ts TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),  -- UTC
+  tbl TEXT NOT NULL,
+  op TEXT NOT NULL,               -- I | U | D
+  row_id INTEGER NOT NULL,
+  data TEXT                       -- JSON of the new row (NULL for deletes)
+);
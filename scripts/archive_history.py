@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Move old boolean and mood values into the archive DB (health_bot.archive).
+
+The bot does this nightly when RETENTION_DAYS is set; run it by hand for the
+first (large) pass or to see what a horizon would move:
+
+    PYTHONPATH=src python3 scripts/archive_history.py --keep-days 365 --dry-run
+    PYTHONPATH=src python3 scripts/archive_history.py --keep-days 365 --vacuum
+
+Values dated before the first day of the month `--keep-days` ago are
+compacted into per-user monthly bitmaps; numbers and text stay where they
+are. Summaries and streaks keep reading the archived months. Rerunning is
+safe. Freed pages are reused by new check-ins; --vacuum returns them to the
+file system instead (it rewrites each file, so run it while the bot is quiet).
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from pathlib import Path
+
+from health_bot.archive import archive_history
+from health_bot.db import archive_path, connect, existing_shards, shard_path
+
+DB_PATH = Path("db/health_bot.sqlite3")
+
+
+def _sizes(db_path: str) -> int:
+    paths = [shard_path(db_path, s) for s in existing_shards(db_path)] + [archive_path(db_path)]
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--db", type=Path, default=DB_PATH)
+    p.add_argument("--keep-days", type=int, default=int(os.getenv("RETENTION_DAYS") or 365))
+    p.add_argument("--dry-run", action="store_true", help="Count what would move, change nothing")
+    p.add_argument("--vacuum", action="store_true", help="VACUUM the shard files afterwards")
+    args = p.parse_args()
+    if args.keep_days < 1:
+        p.error("--keep-days must be >= 1")
+
+    db_path = str(args.db)
+    before = _sizes(db_path)
+    t0 = time.perf_counter()
+    result = archive_history(db_path, keep_days=args.keep_days, dry_run=args.dry_run)
+    elapsed = time.perf_counter() - t0
+
+    verb = "Would archive" if args.dry_run else "Archived"
+    print(
+        f"{verb} {result.values} value(s) dated before {result.cutoff} into {result.months} month row(s); "
+        f"{result.entries} empty entries removed ({elapsed:.1f}s)"
+    )
+    if args.vacuum and not args.dry_run:
+        for shard in existing_shards(db_path):
+            conn = connect(shard_path(db_path, shard))
+            try:
+                conn.execute("VACUUM")
+            finally:
+                conn.close()
+    if not args.dry_run:
+        after = _sizes(db_path)
+        print(f"Database files: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
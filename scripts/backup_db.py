@@ -1,43 +1,286 @@
+import argparse
+import json
+import os
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
 import shutil
 
+from health_bot.changelog import (
+    apply_changes,
+    drop_change_log_triggers,
+    install_change_log,
+    last_change_id,
+    read_changes,
+    set_last_change_id,
+)
+
 
 DB_PATH = Path("db/health_bot.sqlite3")
 BACKUP_DIR = Path("backups")
-KEEP_LAST_N = 30  # keep last 30 backups
+KEEP_LAST_N = 30  # keep last 30 full (base) backups
 
+# Named after the backed-up file's stem, so shard files can share one directory:
+# Base snapshots:   backups/<stem>_<UTC ts>.sqlite3
+# Change segments:  backups/changes/<stem>/changes_<first id>_<last id>.ndjson
+# (segments of the default DB written before that sit directly in backups/changes/)
+# Files without a change_log table (the archive DB) only get full copies.
 
-def main() -> None:
-    BACKUP_DIR.mkdir(parents=True, exist_ok=True)
 
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_path = BACKUP_DIR / f"health_bot_{ts}.sqlite3"
+def _utc_stamp() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+
+
+def _stamp_to_iso(stamp: str) -> str:
+    return datetime.strptime(stamp, "%Y%m%d_%H%M%S").strftime("%Y-%m-%dT%H:%M:%S.999")
+
+
+def _list_bases(backup_dir: Path, stem: str) -> list[tuple[str, Path]]:
+    """Return [(taken_at_iso_utc, path)] sorted oldest -> newest."""
+    out = []
+    for p in sorted(backup_dir.glob(f"{stem}_*.sqlite3")):
+        stamp = p.name[len(stem) + 1: -len(".sqlite3")]
+        try:
+            out.append((_stamp_to_iso(stamp), p))
+        except ValueError:
+            continue
+    return out
+
+
+def _segment_dir(backup_dir: Path, stem: str) -> Path:
+    return backup_dir / "changes" / stem
+
+
+def _list_segments(backup_dir: Path, stem: str) -> list[tuple[int, int, Path]]:
+    """Return [(first_id, last_id, path)] sorted by id."""
+    out = []
+    paths = list(_segment_dir(backup_dir, stem).glob("changes_*.ndjson"))
+    if stem == DB_PATH.stem:
+        paths += (backup_dir / "changes").glob("changes_*.ndjson")
+    for p in paths:
+        try:
+            _, first, last = p.stem.split("_")
+            out.append((int(first), int(last), p))
+        except ValueError:
+            continue
+    return sorted(out)
+
+
+def _has_change_log(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'").fetchone()
+    return row is not None
+
+
+def _base_change_id(path: Path) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return last_change_id(conn) if _has_change_log(conn) else 0
+    finally:
+        conn.close()
+
+
+def _purge_shipped(src: sqlite3.Connection, upto_id: int) -> None:
+    src.execute("DELETE FROM change_log WHERE id <= ?", (upto_id,))
+    src.commit()
+
+
+def full_backup(db_path: Path, backup_dir: Path) -> Path:
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    backup_path = backup_dir / f"{db_path.stem}_{_utc_stamp()}.sqlite3"
+    if backup_path.exists():
+        raise SystemExit(f"Refusing to overwrite existing backup: {backup_path}")
+
+    if not db_path.exists():
+        raise SystemExit(f"No such database: {db_path}")
+    src = sqlite3.connect(db_path)
+    tracked = _has_change_log(src)
+    if tracked:
+        install_change_log(src)
+        src.commit()
 
-    src = sqlite3.connect(DB_PATH)
     dst = sqlite3.connect(backup_path)
 
     # Online backup (consistent)
     src.backup(dst)
-
     dst.close()
+
+    if not tracked:
+        # A plain copy: nothing to ship or purge
+        src.close()
+        _apply_retention(backup_dir, db_path.stem)
+        return backup_path
+
+    # Everything up to the snapshot's sequence is now contained in the base, but
+    # a restore --at between the previous base and this one still needs it as a
+    # segment: ship it before purging
+    base_id = _base_change_id(backup_path)
+    changes = [ch for ch in read_changes(src) if ch["id"] <= base_id]
+    if changes:
+        _write_segment(backup_dir, db_path.stem, changes)
+    _purge_shipped(src, base_id)
+    src.close()
+
+    _apply_retention(backup_dir, db_path.stem)
+    return backup_path
+
+
+def incremental_backup(db_path: Path, backup_dir: Path) -> Path | None:
+    """Ship pending change_log rows to a new segment file, then drop them."""
+    src = sqlite3.connect(db_path)
+    if not _has_change_log(src):
+        src.close()
+        raise SystemExit(f"{db_path} has no change_log: back it up with `full`")
+    changes = read_changes(src)
+    if not changes:
+        src.close()
+        return None
+
+    seg_path = _write_segment(backup_dir, db_path.stem, changes)
+    _purge_shipped(src, changes[-1]["id"])
     src.close()
+    return seg_path
+
+
+def _write_segment(backup_dir: Path, stem: str, changes: list[dict]) -> Path:
+    seg_dir = _segment_dir(backup_dir, stem)
+    seg_dir.mkdir(parents=True, exist_ok=True)
+
+    first_id, last_id = changes[0]["id"], changes[-1]["id"]
+    seg_path = seg_dir / f"changes_{first_id:012d}_{last_id:012d}.ndjson"
+    tmp_path = seg_path.with_suffix(".tmp")
+
+    with tmp_path.open("w", encoding="utf-8") as f:
+        for ch in changes:
+            f.write(json.dumps(ch, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    tmp_path.replace(seg_path)
+    return seg_path
+
+
+def _read_segment(path: Path):
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def restore(backup_dir: Path, out_path: Path, at: str | None = None, stem: str = DB_PATH.stem) -> int:
+    """Rebuild the DB file named `stem` as of `at` (ISO UTC, inclusive) into `out_path`.
+
+    Returns how many change ids were replayed on top of the base snapshot.
+    """
+    if at is not None:
+        at = at.replace(" ", "T")
+        if "." not in at:
+            at += ".999"
+
+    bases = _list_bases(backup_dir, stem)
+    if at is not None:
+        bases = [b for b in bases if b[0] <= at]
+    if not bases:
+        raise SystemExit("No base backup found for the requested time")
+
+    _, base_path = bases[-1]
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    if out_path.exists():
+        raise SystemExit(f"Refusing to overwrite existing file: {out_path}")
+    shutil.copy2(base_path, out_path)
+
+    conn = sqlite3.connect(out_path)
+    if not _has_change_log(conn):
+        conn.close()
+        return 0  # a plain full copy (see full_backup)
+    conn.execute("PRAGMA foreign_keys = OFF;")
+    drop_change_log_triggers(conn)
 
-    # Optional: also copy -wal/-shm if they exist (not required for the backup file itself)
-    for suffix in ("-wal", "-shm"):
-        p = Path(str(DB_PATH) + suffix)
-        if p.exists():
-            shutil.copy2(p, BACKUP_DIR / f"health_bot_{ts}.sqlite3{suffix}")
+    base_id = last_change_id(conn)
+    last_id = base_id
 
-    # Retention (simple: keep latest N .sqlite3 backups)
-    backups = sorted(BACKUP_DIR.glob("health_bot_*.sqlite3"))
-    if len(backups) > KEEP_LAST_N:
-        for old in backups[: len(backups) - KEEP_LAST_N]:
+    for first, last, seg_path in _list_segments(backup_dir, stem):
+        if last <= last_id:
+            continue
+        pending = (
+            ch for ch in _read_segment(seg_path)
+            if ch["id"] > last_id and (at is None or ch["ts"] <= at)
+        )
+        applied = apply_changes(conn, pending)
+        if applied:
+            last_id = applied
+
+    conn.execute("DELETE FROM change_log")
+    set_last_change_id(conn, last_id)
+    install_change_log(conn)
+    conn.commit()
+    conn.close()
+    return last_id - base_id
+
+
+def compact(backup_dir: Path, stem: str = DB_PATH.stem) -> Path | None:
+    """Fold the latest base + all segments into a new base and prune old files."""
+    if not _list_bases(backup_dir, stem):
+        return None
+
+    new_base = backup_dir / f"{stem}_{_utc_stamp()}.sqlite3"
+    tmp = new_base.with_suffix(".tmp")
+    tmp.unlink(missing_ok=True)
+    restore(backup_dir, tmp, stem=stem)
+    tmp.replace(new_base)
+
+    _apply_retention(backup_dir, stem)
+    return new_base
+
+
+def _apply_retention(backup_dir: Path, stem: str) -> None:
+    # Retention (simple: keep latest N base backups)
+    bases = _list_bases(backup_dir, stem)
+    if len(bases) > KEEP_LAST_N:
+        for _, old in bases[: len(bases) - KEEP_LAST_N]:
             old.unlink(missing_ok=True)
+        bases = bases[len(bases) - KEEP_LAST_N:]
+
+    # Segments fully contained in the oldest kept base are no longer needed
+    if bases:
+        oldest_id = _base_change_id(bases[0][1])
+        for _, last, seg_path in _list_segments(backup_dir, stem):
+            if last <= oldest_id:
+                seg_path.unlink(missing_ok=True)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Full / incremental backups and point-in-time restore.")
+    p.add_argument("--db", default=str(DB_PATH), help="Path to sqlite DB")
+    p.add_argument("--dir", default=str(BACKUP_DIR), help="Backup directory")
+    # Also accepted after the command (`full --db ...`)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=argparse.SUPPRESS, help="Path to sqlite DB")
+    common.add_argument("--dir", default=argparse.SUPPRESS, help="Backup directory")
+    sub = p.add_subparsers(dest="cmd")
+
+    sub.add_parser("full", parents=[common], help="Full snapshot (default)")
+    sub.add_parser("incremental", parents=[common], help="Ship changes since the last backup")
+    sub.add_parser("compact", parents=[common], help="Fold segments into a new full snapshot")
+    r = sub.add_parser("restore", parents=[common], help="Restore to a point in time")
+    r.add_argument("--out", required=True, help="Path of the restored DB (must not exist)")
+    r.add_argument("--at", default=None, help="UTC timestamp, e.g. 2026-10-18T09:30:00")
+
+    args = p.parse_args()
+    db_path = Path(args.db)
+    backup_dir = Path(args.dir)
 
-    print(f"✅ Backup created: {backup_path}")
+    if args.cmd == "incremental":
+        seg = incremental_backup(db_path, backup_dir)
+        print(f"✅ Changes shipped: {seg}" if seg else "✅ No new changes")
+    elif args.cmd == "compact":
+        base = compact(backup_dir, db_path.stem)
+        print(f"✅ Compacted into: {base}" if base else "❌ No base backup to compact")
+    elif args.cmd == "restore":
+        replayed = restore(backup_dir, Path(args.out), args.at, db_path.stem)
+        print(f"✅ Restored to {args.out} ({replayed} change(s) replayed)")
+    else:
+        backup_path = full_backup(db_path, backup_dir)
+        print(f"✅ Backup created: {backup_path}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
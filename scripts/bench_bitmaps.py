@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Benchmark /streaks and /summary's yes/no section: habit_bits vs. daily_values rows.
+
+Builds a synthetic multi-year dataset with the habit_bits triggers installed
+(health_bot.bitmaps), then per user and window computes the check-in and
+perfect streaks plus every boolean habit's 30-day rate and streak two ways:
+
+- rows: the per-day values (Storage.daily_values_since) walked in Python
+- bits: one bitset per habit (bitmaps.load), bit scans and popcounts
+
+Both must agree. Reports latency per user, the Python memory each fetch
+holds, and the on-disk size of the two representations (dbstat):
+
+    PYTHONPATH=src python3 scripts/bench_bitmaps.py --users 8 --years 3
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from health_bot import bitmaps
+from health_bot.archive import values_sql
+from health_bot.db import connect, init_db, upsert_daily_value_rows
+
+SCHEMA_PATH = Path(__file__).resolve().parent.parent / "db" / "schema.sql"
+
+# (title, kind)
+HABITS = [(f"habit {i}", "boolean") for i in range(12)] + [("Кроки", "number"), ("Настрій", "choice")]
+BOOLEAN_IDS = [hid for hid, (_, kind) in enumerate(HABITS, start=1) if kind == "boolean"]
+RATE_DAYS = 30
+
+
+def _prepare(db_path: str, users: int, days: int) -> date:
+    conn = connect(db_path)
+    init_db(conn, str(SCHEMA_PATH))
+    bitmaps.install(conn)
+    conn.execute("INSERT INTO households (name) VALUES ('Bench')")
+    conn.executemany(
+        "INSERT INTO habits (household_id, title, kind, sort_order) VALUES (1, ?, ?, ?)",
+        [(title, kind, i) for i, (title, kind) in enumerate(HABITS)],
+    )
+    conn.executemany(
+        "INSERT INTO users (telegram_user_id, chat_id, household_id, timezone) VALUES (?, ?, 1, 'UTC')",
+        [(i, i) for i in range(1, users + 1)],
+    )
+
+    rnd = random.Random(42)
+    end = date(2026, 1, 1)
+    for user_id in range(1, users + 1):
+        rows = []
+        for n in range(days):
+            if rnd.random() < 0.05:
+                continue  # skipped day
+            ds = (end - timedelta(days=n)).isoformat()
+            for hid, (_, kind) in enumerate(HABITS, start=1):
+                if kind == "boolean":
+                    value = "1" if n < 40 else rnd.choice("0111")  # a streak to find
+                elif kind == "choice":
+                    value = rnd.choice(["😊", "😐", "😞"])
+                else:
+                    value = str(rnd.randint(2000, 15000))
+                rows.append((user_id, ds, hid, value))
+        upsert_daily_value_rows(conn, rows)
+    conn.commit()
+    conn.close()
+    return end
+
+
+def _rows(conn, user_id: int, today: date, start: date) -> tuple:
+    # What the handlers did before: every value of the window, then loops over days
+    values: dict[str, dict[int, str]] = {}
+    for r in conn.execute(values_sql(conn), {"user_id": user_id, "start": start.isoformat(), "end": "9999-12-31"}):
+        values.setdefault(str(r["date"]), {})[int(r["habit_id"])] = "" if r["value"] is None else str(r["value"])
+
+    def run(check) -> int:
+        n, d = 0, today
+        while d >= start and (vals := values.get(d.isoformat())) and check(vals):
+            n, d = n + 1, d - timedelta(days=1)
+        return n
+
+    checkin = run(bool)
+    perfect = run(lambda vals: all(vals.get(hid) == "1" for hid in BOOLEAN_IDS))
+    window = [(today - timedelta(days=i)).isoformat() for i in range(RATE_DAYS)]
+    per_habit = {}
+    for hid in BOOLEAN_IDS:
+        marked = [values[d][hid] for d in window if hid in values.get(d, {})]
+        per_habit[hid] = (marked.count("1"), len(marked), run(lambda vals: vals.get(hid) == "1"))
+    return (checkin, perfect, per_habit), values
+
+
+def _bits(conn, user_id: int, today: date, start: date) -> tuple:
+    bits = bitmaps.load(conn, user_id, start)
+    last = bits.bit(today)
+    first = last - RATE_DAYS + 1
+    checkin = bitmaps.streak(bits.any_tracked(), last)
+    perfect = bitmaps.streak(bits.all_done(BOOLEAN_IDS), last)
+    per_habit = {
+        hid: (
+            bitmaps.count(bits.done.get(hid, 0), first, last),
+            bitmaps.count(bits.tracked.get(hid, 0), first, last),
+            bitmaps.streak(bits.done.get(hid, 0), last),
+        )
+        for hid in BOOLEAN_IDS
+    }
+    return (checkin, perfect, per_habit), bits
+
+
+def _deep_size(obj) -> int:
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k) + _deep_size(v) for k, v in obj.items())
+    elif isinstance(obj, tuple):
+        size += sum(_deep_size(v) for v in obj)
+    return size
+
+
+def _table_bytes(conn, names: list[str]) -> int:
+    marks = ",".join("?" for _ in names)
+    return int(conn.execute(f"SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name IN ({marks})", names).fetchone()[0])
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--users", type=int, default=8)
+    p.add_argument("--years", type=int, default=3)
+    p.add_argument("--repeat", type=int, default=20, help="Calls per user and window")
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.sqlite3")
+        t0 = time.perf_counter()
+        today = _prepare(db_path, args.users, args.years * 365)
+        conn = connect(db_path)
+        n_values = conn.execute("SELECT COUNT(*) FROM daily_values").fetchone()[0]
+        n_months = conn.execute("SELECT COUNT(*) FROM habit_bits").fetchone()[0]
+        print(
+            f"dataset: {n_values} values, {n_months} habit_bits rows, {args.users} users, "
+            f"{args.years} years ({time.perf_counter() - t0:.1f}s to build)"
+        )
+
+        rows_disk = _table_bytes(conn, [
+            "daily_values", "daily_entries", "idx_daily_values_entry_num", "idx_daily_values_habit",
+            "sqlite_autoindex_daily_values_1", "sqlite_autoindex_daily_entries_1",
+        ])
+        bits_disk = _table_bytes(conn, ["habit_bits"])
+        print(f"on disk: rows {rows_disk / 1024:,.0f} KiB, habit_bits {bits_disk / 1024:,.0f} KiB")
+
+        print(f"{'window':>7} {'rows ms':>8} {'bits ms':>8} {'rows KiB':>9} {'bits KiB':>9}")
+        for days in (90, 365, args.years * 365):
+            start = today - timedelta(days=days)
+            timings = {}
+            sizes = {}
+            for label, fn in (("rows", _rows), ("bits", _bits)):
+                t0 = time.perf_counter()
+                for i in range(args.repeat * args.users):
+                    fn(conn, (i % args.users) + 1, today, start)
+                timings[label] = (time.perf_counter() - t0) / (args.repeat * args.users) * 1000
+                sizes[label] = _deep_size(fn(conn, 1, today, start)[1]) / 1024
+            for user_id in range(1, args.users + 1):
+                if _rows(conn, user_id, today, start)[0] != _bits(conn, user_id, today, start)[0]:
+                    print(f"MISMATCH for user {user_id}, window {days}d")
+                    return 1
+            print(
+                f"{days:>6}d {timings['rows']:>8.2f} {timings['bits']:>8.2f} "
+                f"{sizes['rows']:>9.1f} {sizes['bits']:>9.1f}"
+            )
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
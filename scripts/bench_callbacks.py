@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Benchmark callback_data encode/decode and check forged/stale rejection.
+
+    PYTHONPATH=src python3 scripts/bench_callbacks.py --ops 200000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from health_bot import callbacks
+
+
+def _legacy_parse(data: str):
+    parts = data.split(":", 3)
+    return int(parts[1]), parts[2], parts[3]
+
+
+def _rate(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return n / (time.perf_counter() - t0)
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--ops", type=int, default=200_000)
+    args = p.parse_args()
+
+    codec = callbacks.CallbackCodec(b"bench-secret")
+    samples = [
+        codec.encode(callbacks.ACTION_SET, habit_id=random.randint(1, 10**6), value=random.choice("01"), page="sleep")
+        for _ in range(256)
+    ]
+    legacy = [f"hc:{random.randint(1, 10**6)}:{random.choice('01')}:sleep" for _ in range(256)]
+
+    enc = _rate(lambda i: codec.encode(callbacks.ACTION_SET, habit_id=i, value="1", page="sleep"), args.ops)
+    dec = _rate(lambda i: codec.decode(samples[i & 255]), args.ops)
+    old = _rate(lambda i: _legacy_parse(legacy[i & 255]), args.ops)
+
+    # Forged: flip one character of a valid payload
+    forged_accepted = 0
+    for s in samples:
+        i = random.randrange(len(callbacks.PREFIX), len(s))
+        c = "A" if s[i] != "A" else "B"
+        if codec.decode(s[:i] + c + s[i + 1:]) is not None:
+            forged_accepted += 1
+
+    # Other secret (e.g. rotated bot token)
+    other = callbacks.CallbackCodec(b"other-secret")
+    foreign_accepted = sum(other.decode(s) is not None for s in samples)
+
+    # Stale registry reference
+    short = callbacks.CallbackCodec(b"bench-secret", callbacks.PayloadRegistry(ttl_seconds=0))
+    ref = short.encode(callbacks.ACTION_SET, habit_id=1, value="12345.6", page="activity")
+    time.sleep(0.01)
+    stale_accepted = short.decode(ref) is not None
+
+    print(f"payload length: {max(len(s) for s in samples)} chars (limit 64)")
+    print(f"encode ops/s:   {enc:>12.0f}")
+    print(f"decode ops/s:   {dec:>12.0f}   (legacy split parse: {old:.0f} ops/s, unsigned)")
+    print(f"forged accepted: {forged_accepted}/{len(samples)}, foreign secret accepted: {foreign_accepted}, "
+          f"stale ref accepted: {stale_accepted}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
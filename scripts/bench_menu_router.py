@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Benchmark menu_router_handler throughput for non-command text.
+
+Unknown text is the worst case: the old if-chain compared it against every
+label before giving up; the route table needs one dict lookup.
+
+    PYTHONPATH=src python3 scripts/bench_menu_router.py --messages 200000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from health_bot import handlers
+
+
+class _Message:
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    async def reply_text(self, *args, **kwargs) -> None:
+        return None
+
+
+class _Update:
+    def __init__(self, text: str) -> None:
+        self.message = _Message(text)
+
+
+class _Context:
+    def __init__(self) -> None:
+        self.user_data: dict = {}
+        self.bot_data: dict = {}
+
+
+async def _run(texts: list[str], n: int) -> float:
+    updates = [_Update(t) for t in texts]
+    ctx = _Context()
+    t0 = time.perf_counter()
+    for i in range(n):
+        await handlers.menu_router_handler(updates[i % len(updates)], ctx)
+    return n / (time.perf_counter() - t0)
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--messages", type=int, default=200_000)
+    args = p.parse_args()
+
+    unknown = [f"random chat text {i}" for i in range(100)]
+    navigation = [handlers.BTN_MENU_DAILY, handlers.BTN_HOME, handlers.BTN_MENU_SETUP, handlers.BTN_BACK]
+
+    print(f"routes: {len(handlers.MENU_ROUTES)}")
+    print(f"unknown text   msgs/s: {asyncio.run(_run(unknown, args.messages)):>12.0f}")
+    print(f"menu switching msgs/s: {asyncio.run(_run(navigation, args.messages)):>12.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of check-in renders/sec (text + inline keyboard).
+
+cold: templates recompiled on every render (what every tap used to cost)
+warm: precompiled templates, only per-value rows/status are picked
+
+    PYTHONPATH=src python3 scripts/bench_render.py --renders 20000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from health_bot import handlers
+from health_bot.seed import read_field_specs
+
+
+def _fake_habits(fields_path: str) -> list[dict]:
+    return [
+        {"id": i, "title": spec.title, "kind": spec.kind}
+        for i, spec in enumerate(read_field_specs(fields_path), start=1)
+    ]
+
+
+def _random_values(habits: list[dict]) -> dict[int, str]:
+    out = {}
+    for h in habits:
+        if random.random() < 0.3:
+            continue
+        if h["kind"] == "choice":
+            out[h["id"]] = random.choice(handlers.CHOICE_VALUES)
+        elif h["kind"] == "number":
+            out[h["id"]] = str(random.randint(0, 12000))
+        elif h["kind"] == "text":
+            out[h["id"]] = "note"
+        else:
+            out[h["id"]] = random.choice("01")
+    return out
+
+
+def _run(habits, values_list, renders: int, cold: bool) -> float:
+    t0 = time.perf_counter()
+    for i in range(renders):
+        if cold:
+            handlers._compile_checkin_templates.cache_clear()
+        values = values_list[i % len(values_list)]
+        page = handlers.CHECKIN_PAGES[i % len(handlers.CHECKIN_PAGES)]
+        handlers._build_checkin_text("2026-01-01", habits, values, page)
+        handlers._build_checkin_keyboard(habits, values, page)
+    return renders / (time.perf_counter() - t0)
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--fields", default="fields.txt", help="Habit list to render")
+    p.add_argument("--renders", type=int, default=20000)
+    args = p.parse_args()
+
+    habits = _fake_habits(args.fields)
+    values_list = [_random_values(habits) for _ in range(64)]
+
+    cold = _run(habits, values_list, max(1, args.renders // 10), cold=True)
+    warm = _run(habits, values_list, args.renders, cold=False)
+
+    t0 = time.perf_counter()
+    for i in range(args.renders):
+        handlers._menu_keyboard(handlers.MENU_DAILY if i % 2 else handlers.MENU_MAIN)
+    menus = args.renders / (time.perf_counter() - t0)
+
+    print(f"check-in renders/s  cold: {cold:>10.0f}   warm: {warm:>10.0f}   ({warm / cold:.1f}x)")
+    print(f"menu keyboards/s        : {menus:>10.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
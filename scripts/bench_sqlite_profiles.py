@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Compare SQLite tuning profiles on a synthetic check-in write burst.
+
+Each writer thread simulates one user tapping habits: every tap is its own
+transaction (upsert into daily_values), exactly like the bot does.
+
+    PYTHONPATH=src python3 scripts/bench_sqlite_profiles.py --writers 8 --taps 500
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from health_bot.db import SQLITE_PROFILES, checkpoint, connect, init_db
+
+SCHEMA_PATH = Path(__file__).resolve().parent.parent / "db" / "schema.sql"
+HABITS = 15
+
+
+def _prepare(db_path: str, writers: int) -> None:
+    conn = connect(db_path)
+    init_db(conn, str(SCHEMA_PATH))
+    conn.execute("INSERT INTO households (name) VALUES ('Bench')")
+    conn.executemany(
+        "INSERT INTO habits (household_id, title, kind, sort_order) VALUES (1, ?, 'boolean', ?)",
+        [(f"habit {i}", i) for i in range(HABITS)],
+    )
+    conn.executemany(
+        "INSERT INTO users (telegram_user_id, chat_id, household_id, timezone) VALUES (?, ?, 1, 'UTC')",
+        [(i, i) for i in range(1, writers + 1)],
+    )
+    conn.executemany(
+        "INSERT INTO daily_entries (user_id, date) VALUES (?, '2026-01-01')",
+        [(i,) for i in range(1, writers + 1)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _writer(db_path: str, tuning, user_id: int, taps: int, lat: list, errors: list) -> None:
+    conn = connect(db_path, tuning)
+    for i in range(taps):
+        t0 = time.perf_counter()
+        try:
+            conn.execute(
+                """
+                INSERT INTO daily_values (daily_entry_id, habit_id, value)
+                VALUES (?, ?, ?)
+                ON CONFLICT(daily_entry_id, habit_id)
+                DO UPDATE SET value = excluded.value, updated_at = datetime('now')
+                """,
+                (user_id, (i % HABITS) + 1, str(i % 2)),
+            )
+            conn.commit()
+        except sqlite3.OperationalError:
+            conn.rollback()
+            errors.append(1)
+        lat.append(time.perf_counter() - t0)
+    conn.close()
+
+
+def _reader(db_path: str, tuning, stop: threading.Event) -> None:
+    # Long analytics-style reads keep a snapshot open and hold back checkpoints
+    conn = connect(db_path, tuning)
+    while not stop.is_set():
+        conn.execute(
+            "SELECT habit_id, COUNT(*) FROM daily_values GROUP BY habit_id"
+        ).fetchall()
+    conn.close()
+
+
+def run_profile(name: str, writers: int, taps: int) -> dict:
+    tuning = SQLITE_PROFILES[name]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.sqlite3")
+        _prepare(db_path, writers)
+
+        lat: list[float] = []
+        errors: list[int] = []
+        stop = threading.Event()
+        max_wal = 0
+
+        reader = threading.Thread(target=_reader, args=(db_path, tuning, stop))
+        threads = [
+            threading.Thread(target=_writer, args=(db_path, tuning, uid, taps, lat, errors))
+            for uid in range(1, writers + 1)
+        ]
+
+        t0 = time.perf_counter()
+        reader.start()
+        for t in threads:
+            t.start()
+        while any(t.is_alive() for t in threads):
+            wal = Path(db_path + "-wal")
+            if wal.exists():
+                max_wal = max(max_wal, wal.stat().st_size)
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        reader.join()
+
+        conn = connect(db_path, tuning)
+        checkpoint(conn, "TRUNCATE")
+        conn.close()
+
+    lat.sort()
+    return {
+        "profile": name,
+        "taps_per_s": len(lat) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(lat) * 1000 if lat else 0.0,
+        "p95_ms": lat[int(len(lat) * 0.95) - 1] * 1000 if lat else 0.0,
+        "locked": len(errors),
+        "max_wal_kib": max_wal // 1024,
+    }
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--writers", type=int, default=8, help="Concurrent writer threads")
+    p.add_argument("--taps", type=int, default=500, help="Taps (transactions) per writer")
+    p.add_argument("--profiles", nargs="*", default=list(SQLITE_PROFILES), help="Profiles to compare")
+    args = p.parse_args()
+
+    print(f"{'profile':<12} {'taps/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'locked':>7} {'max WAL KiB':>12}")
+    for name in args.profiles:
+        r = run_profile(name, args.writers, args.taps)
+        print(
+            f"{r['profile']:<12} {r['taps_per_s']:>9.0f} {r['p50_ms']:>8.2f} "
+            f"{r['p95_ms']:>8.2f} {r['locked']:>7} {r['max_wal_kib']:>12}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
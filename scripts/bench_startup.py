@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Benchmark bot startup: import time of health_bot.main and the reminder sync.
+
+Import time comes from `python -X importtime -c "import health_bot.main"` in
+a fresh interpreter (best of --runs). The reminder sync is what the startup
+hook does for every user (scheduler.schedule_daily_reminders/_weekly_),
+timed on a synthetic database while a ticker measures how long the event
+loop stalls, i.e. how long an incoming update would wait:
+
+    PYTHONPATH=src python3 scripts/bench_startup.py --users 20000
+    PYTHONPATH=src python3 scripts/bench_startup.py --users 20000 --top 25
+
+The first sync writes every user's rows; a restart only rewrites the ones
+whose settings changed.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from health_bot import scheduler
+from health_bot.db import connect, init_db
+from health_bot.storage import SqliteStorage
+
+ROOT = Path(__file__).resolve().parent.parent
+SCHEMA_PATH = ROOT / "db" / "schema.sql"
+
+# Must not be imported just to start the bot (used lazily by insights, coach reports, the dashboard)
+HEAVY = ("numpy", "pandas", "matplotlib")
+
+ZONES = ["UTC", "Europe/Kyiv", "Europe/Berlin", "America/New_York", "Asia/Tokyo"]
+
+
+def _importtime(runs: int) -> tuple[float, list[tuple[int, str]]]:
+    """(best total seconds, [(cumulative us, module)] of that run)."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (str(ROOT / "src"), env.get("PYTHONPATH", "")) if p)
+    best: tuple[float, list[tuple[int, str]]] | None = None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import health_bot.main"],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            raise SystemExit(proc.stderr.strip().splitlines()[-1])
+
+        modules = []
+        for line in proc.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line.split("|")
+            modules.append((int(cumulative), name[1:].rstrip()))  # nested imports are indented
+        total = sum(us for us, name in modules if not name.startswith(" ")) / 1e6
+        if best is None or total < best[0]:
+            best = (total, modules)
+    assert best is not None
+    return best
+
+
+def _prepare(db_path: str, users: int) -> None:
+    conn = connect(db_path)
+    init_db(conn, str(SCHEMA_PATH))
+    conn.execute("INSERT INTO households (name) VALUES ('Bench')")
+    conn.executemany(
+        """
+        INSERT INTO users (telegram_user_id, chat_id, household_id, timezone, reminder_time)
+        VALUES (?, ?, 1, ?, ?)
+        """,
+        [(i, i, ZONES[i % len(ZONES)], f"{i % 24:02d}:{i % 60:02d}") for i in range(1, users + 1)],
+    )
+    conn.commit()
+    conn.close()
+
+
+async def _timed_sync(storage: SqliteStorage) -> tuple[float, float]:
+    """(seconds, longest event loop stall in seconds) of one full reminder sync."""
+    stall = 0.0
+
+    async def ticker() -> None:
+        nonlocal stall
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            stall = max(stall, now - last)
+            last = now
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    t0 = time.perf_counter()
+    await scheduler.schedule_daily_reminders(storage=storage, timezone="UTC")
+    await scheduler.schedule_weekly_reminders(storage=storage, timezone="UTC")
+    elapsed = time.perf_counter() - t0
+    tick.cancel()
+    return elapsed, stall
+
+
+async def _bench_sync(db_path: str) -> None:
+    storage = SqliteStorage(db_path)
+    try:
+        for label in ("first start", "restart"):
+            elapsed, stall = await _timed_sync(storage)
+            print(f"  {label:<12} {elapsed * 1000:8.1f} ms, longest loop stall {stall * 1000:6.1f} ms")
+    finally:
+        await storage.close()
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--users", type=int, default=10_000)
+    p.add_argument("--runs", type=int, default=3, help="Import time: best of N fresh interpreters")
+    p.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    args = p.parse_args()
+
+    total, modules = _importtime(args.runs)
+    print(f"import health_bot.main: {total * 1000:.0f} ms (best of {args.runs})")
+    for us, name in sorted(modules, reverse=True)[: args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name.strip()}")
+    loaded = {name.strip() for _, name in modules}
+    heavy = [m for m in HEAVY if m in loaded]
+    print(f"heavy modules at startup: {', '.join(heavy) if heavy else 'none'}")
+
+    print(f"reminder sync, {args.users} users:")
+    with tempfile.TemporaryDirectory(prefix="startup-") as tmp:
+        db_path = os.path.join(tmp, "health_bot.sqlite3")
+        _prepare(db_path, args.users)
+        asyncio.run(_bench_sync(db_path))
+    return 1 if heavy else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Benchmark progress stats: SQL aggregates vs. the old Python loop over raw rows.
+
+Builds a synthetic multi-year dataset (several users, boolean/number/mood habits)
+and times /summary-style stats over 7, 30 and 365 day ranges, with and without
+the covering daily_values index.
+
+    PYTHONPATH=src python3 scripts/bench_stats.py --users 8 --years 3
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from health_bot import stats
+from health_bot.db import connect, get_or_create_daily_entry_id, init_db, upsert_daily_values
+
+SCHEMA_PATH = Path(__file__).resolve().parent.parent / "db" / "schema.sql"
+
+# (title, kind, target)
+HABITS = [(f"habit {i}", "boolean", None) for i in range(12)] + [
+    ("Кроки", "number", "10000"),
+    ("Вода, л", "number", "2"),
+    ("Настрій", "choice", None),
+]
+
+
+def _prepare(db_path: str, users: int, days: int) -> date:
+    conn = connect(db_path)
+    init_db(conn, str(SCHEMA_PATH))
+    conn.execute("INSERT INTO households (name) VALUES ('Bench')")
+    conn.executemany(
+        "INSERT INTO habits (household_id, title, kind, target, sort_order) VALUES (1, ?, ?, ?, ?)",
+        [(title, kind, target, i) for i, (title, kind, target) in enumerate(HABITS)],
+    )
+    conn.executemany(
+        "INSERT INTO users (telegram_user_id, chat_id, household_id, timezone) VALUES (?, ?, 1, 'UTC')",
+        [(i, i) for i in range(1, users + 1)],
+    )
+
+    rnd = random.Random(42)
+    end = date(2026, 1, 1)
+    for user_id in range(1, users + 1):
+        for n in range(days):
+            if rnd.random() < 0.1:
+                continue  # skipped day
+            entry_id = get_or_create_daily_entry_id(conn, user_id, (end - timedelta(days=n)).isoformat())
+            values = {}
+            for hid, (_, kind, _) in enumerate(HABITS, start=1):
+                if kind == "boolean":
+                    values[hid] = rnd.choice("0111")
+                elif kind == "choice":
+                    values[hid] = rnd.choice("😊😐😞")
+                elif hid == len(HABITS) - 2:
+                    values[hid] = str(rnd.randint(2000, 15000))
+                else:
+                    values[hid] = str(round(rnd.uniform(0.5, 3.0), 1))
+            upsert_daily_values(conn, entry_id, values)
+    conn.commit()
+    conn.close()
+    return end
+
+
+def _python_stats(conn, user_id: int, start: str, end: str) -> tuple:
+    # Same outputs the old way: pull raw TEXT values and parse/aggregate in Python
+    habits = {int(r["id"]): (str(r["kind"]), r["target"]) for r in conn.execute("SELECT id, kind, target FROM habits")}
+    rows = conn.execute(
+        """
+        SELECT de.date AS date, dv.habit_id AS habit_id, dv.value AS value
+          FROM daily_entries de
+          LEFT JOIN daily_values dv ON dv.daily_entry_id = de.id
+         WHERE de.user_id = ? AND de.date BETWEEN ? AND ?
+        """,
+        (user_id, start, end),
+    ).fetchall()
+    tracked: dict[str, int] = {}
+    attained: dict[str, int] = {}
+    nums: dict[int, list[tuple[str, float]]] = {}
+    for r in rows:
+        v = str(r["value"] or "").strip()
+        if not v:
+            continue
+        d = str(r["date"])
+        hid = int(r["habit_id"])
+        tracked[d] = tracked.get(d, 0) + 1
+        kind, target = habits[hid]
+        if kind == "boolean":
+            num = 1.0 if v == "1" else 0.0
+        elif kind == "choice":
+            num = {"😊": 1.0, "😐": 0.0, "😞": -1.0}[v]
+        else:
+            num = float(v)
+        nums.setdefault(hid, []).append((d, num))
+        if (kind == "boolean" and num >= 1) or (kind == "number" and target is not None and num >= float(target)):
+            attained[d] = attained.get(d, 0) + 1
+
+    window_start = (date.fromisoformat(end) - timedelta(days=6)).isoformat()
+    per_habit = {}
+    for hid, vs in nums.items():
+        recent = [n for d, n in vs if d >= window_start]
+        per_habit[hid] = (
+            sum(n for _, n in vs) / len(vs),
+            sum(recent) / len(recent) if recent else None,
+            max(vs, key=lambda dv: dv[1]),
+            min(vs, key=lambda dv: dv[1]),
+        )
+    ranked = sorted(tracked, key=lambda d: (attained.get(d, 0), tracked[d], d))
+    return tracked, attained, per_habit, (ranked[-1], ranked[0]) if ranked else (None, None)
+
+
+def _sql_stats(conn, user_id: int, start: str, end: str) -> tuple:
+    return (
+        stats.daily_progress(conn, user_id, start, end),
+        stats.habit_stats(conn, user_id, start, end),
+        stats.best_and_worst_days(conn, user_id, start, end),
+    )
+
+
+def _time(fn, conn, users: int, start: str, end: str, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(repeat):
+        fn(conn, (i % users) + 1, start, end)
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--users", type=int, default=8)
+    p.add_argument("--years", type=int, default=3)
+    p.add_argument("--repeat", type=int, default=50, help="Calls per measurement")
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.sqlite3")
+        t0 = time.perf_counter()
+        end = _prepare(db_path, args.users, args.years * 365)
+        conn = connect(db_path)
+        n_values = conn.execute("SELECT COUNT(*) FROM daily_values").fetchone()[0]
+        print(f"dataset: {n_values} values, {args.users} users, {args.years} years ({time.perf_counter() - t0:.1f}s to build)")
+        print(f"{'range':>6} {'python ms':>10} {'sql ms':>8} {'sql no-idx ms':>14}")
+
+        results = []
+        for days in (7, 30, 365):
+            start = (end - timedelta(days=days - 1)).isoformat()
+            py = _time(_python_stats, conn, args.users, start, end.isoformat(), args.repeat)
+            sql = _time(_sql_stats, conn, args.users, start, end.isoformat(), args.repeat)
+            results.append((days, start, py, sql))
+
+        conn.execute("DROP INDEX idx_daily_values_entry_num")
+        for days, start, py, sql in results:
+            no_idx = _time(_sql_stats, conn, args.users, start, end.isoformat(), args.repeat)
+            print(f"{days:>5}d {py:>10.2f} {sql:>8.2f} {no_idx:>14.2f}")
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
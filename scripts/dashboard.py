@@ -8,41 +8,102 @@ from pathlib import Path
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from health_bot.snapshot import DEFAULT_SNAPSHOT_PATH, connect_analytics_shards
+from health_bot.stats import ATTAINED_SQL, habit_stats
 
-def _connect(db_path: Path) -> sqlite3.Connection:
-    conn = sqlite3.connect(str(db_path))
-    conn.row_factory = sqlite3.Row
-    return conn
+ATTAINED = ATTAINED_SQL.format(kind="h.kind", value_num="dv.value_num", target="h.target")
 
 
-def _load_daily(conn: sqlite3.Connection, days: int) -> pd.DataFrame:
-    # Pull last N days worth of values (boolean + choice) for all users
-    q = """
+def _load_progress(conn: sqlite3.Connection, days: int) -> pd.DataFrame:
+    # Per user/date tracked + goals met over the last N days, aggregated in SQL.
+    # goal_pct_7d is a 7-calendar-day rolling average per user (window function).
+    q = f"""
     WITH dates AS (
         SELECT date
           FROM daily_entries
          GROUP BY date
          ORDER BY date DESC
          LIMIT ?
+    ),
+    per_day AS (
+        SELECT
+            de.date,
+            de.user_id,
+            COUNT(NULLIF(dv.value, '')) AS tracked,
+            COUNT(dv.id) AS tracked_total,
+            COALESCE(SUM({ATTAINED}), 0) AS success,
+            COUNT({ATTAINED}) AS success_total
+        FROM daily_entries de
+        JOIN dates d ON d.date = de.date
+        JOIN daily_values dv ON dv.daily_entry_id = de.id
+        JOIN habits h ON h.id = dv.habit_id
+        GROUP BY de.date, de.user_id
     )
     SELECT
-        de.date,
+        p.date,
         u.first_name AS user_name,
-        u.telegram_user_id,
-        h.id AS habit_id,
-        h.title AS habit_title,
-        h.kind AS habit_kind,
-        dv.value AS value
-    FROM daily_entries de
-    JOIN dates d ON d.date = de.date
-    JOIN users u ON u.id = de.user_id
-    LEFT JOIN daily_values dv ON dv.daily_entry_id = de.id
-    LEFT JOIN habits h ON h.id = dv.habit_id
-    ORDER BY de.date ASC, u.first_name ASC
+        p.tracked,
+        p.tracked_total,
+        p.success,
+        p.success_total,
+        ROUND(100.0 * p.tracked / p.tracked_total, 1) AS tracked_pct,
+        ROUND(COALESCE(100.0 * p.success / NULLIF(p.success_total, 0), 0), 1) AS success_pct,
+        ROUND(AVG(COALESCE(100.0 * p.success / NULLIF(p.success_total, 0), 0)) OVER (
+            PARTITION BY p.user_id ORDER BY julianday(p.date)
+            RANGE BETWEEN 6 PRECEDING AND CURRENT ROW
+        ), 1) AS success_pct_7d
+    FROM per_day p
+    JOIN users u ON u.id = p.user_id
+    ORDER BY p.date ASC, u.first_name ASC
     """
     return pd.read_sql_query(q, conn, params=(days,))
 
 
+def _load_habit_stats(conn: sqlite3.Connection, days: int) -> pd.DataFrame:
+    """Per user/habit average, attainment, rolling avg and best/worst day (SQL, see health_bot.stats)."""
+    end = conn.execute("SELECT MAX(date) FROM daily_entries").fetchone()[0]
+    if end is None:
+        return pd.DataFrame()
+    start = conn.execute("SELECT date(?, ?)", (end, f"-{days - 1} days")).fetchone()[0]
+
+    habits = {
+        int(r["id"]): r
+        for r in conn.execute("SELECT id, title, kind, target FROM habits WHERE enabled = 1").fetchall()
+    }
+    rows = []
+    # Only users whose daily data is in this shard
+    users = conn.execute(
+        """
+        SELECT id, first_name
+          FROM users
+         WHERE id IN (SELECT DISTINCT user_id FROM daily_entries)
+         ORDER BY first_name
+        """
+    ).fetchall()
+    for user in users:
+        for hid, st in habit_stats(conn, int(user["id"]), start, end).items():
+            h = habits.get(hid)
+            if h is None:
+                continue
+            rows.append(
+                {
+                    "user_name": user["first_name"],
+                    "habit_title": h["title"],
+                    "habit_kind": h["kind"],
+                    "target": h["target"],
+                    "days": st.days,
+                    "avg": st.avg,
+                    "rolling_avg_7d": st.rolling_avg,
+                    "attainment_pct": st.attainment_pct,
+                    "best_date": st.best_date,
+                    "best_value": st.best_value,
+                    "worst_date": st.worst_date,
+                    "worst_value": st.worst_value,
+                }
+            )
+    return pd.DataFrame(rows)
+
+
 def _load_weekly(conn: sqlite3.Connection, weeks: int) -> pd.DataFrame:
     q = """
     SELECT
@@ -65,41 +126,14 @@ def _ensure_outdir(out_dir: Path) -> None:
     out_dir.mkdir(parents=True, exist_ok=True)
 
 
-def _plot_tracked_success(df: pd.DataFrame, out_dir: Path) -> None:
+def _plot_tracked_success(grouped: pd.DataFrame, out_dir: Path) -> None:
     """
     tracked%: any non-empty value per habit (includes choice + boolean)
-    success%: only boolean == "1"
+    success%: goals met (booleans ✅, numbers at or above their target)
     """
-    if df.empty:
+    if grouped.empty:
         return
 
-    # remove rows with missing habit_kind (can happen if dv is NULL and join didn't match)
-    df2 = df.copy()
-    df2["value_str"] = df2["value"].fillna("").astype(str).str.strip()
-    df2 = df2[df2["habit_kind"].notna()].copy()
-
-    # tracked = value not empty
-    df2["tracked"] = (df2["value_str"] != "").astype(int)
-
-    # success = boolean value == "1"
-    df2["success"] = ((df2["habit_kind"] == "boolean") & (df2["value_str"] == "1")).astype(int)
-
-    # totals:
-    # - tracked_total counts ALL habits (boolean+choice) that appear in daily_values table for that date/user
-    # - success_total counts only boolean habits that appear in daily_values table for that date/user
-    grouped = df2.groupby(["date", "user_name"], as_index=False).agg(
-        tracked=("tracked", "sum"),
-        tracked_total=("tracked", "count"),
-        success=("success", "sum"),
-        success_total=("habit_kind", lambda s: int((s == "boolean").sum())),
-    )
-
-    grouped["tracked_pct"] = (grouped["tracked"] / grouped["tracked_total"] * 100).round(1)
-    grouped["success_pct"] = grouped.apply(
-        lambda r: round((r["success"] / r["success_total"] * 100), 1) if r["success_total"] else 0.0,
-        axis=1,
-    )
-
     # Plot tracked%
     plt.figure()
     for user_name, sub in grouped.groupby("user_name"):
@@ -115,8 +149,9 @@ def _plot_tracked_success(df: pd.DataFrame, out_dir: Path) -> None:
     # Plot success%
     plt.figure()
     for user_name, sub in grouped.groupby("user_name"):
-        plt.plot(sub["date"], sub["success_pct"], marker="o", label=user_name)
-    plt.title("Success % (booleans only, last N days)")
+        line, = plt.plot(sub["date"], sub["success_pct"], marker="o", label=user_name)
+        plt.plot(sub["date"], sub["success_pct_7d"], linestyle="--", color=line.get_color())
+    plt.title("Goals met % (dashed: 7-day rolling, last N days)")
     plt.ylabel("Percent")
     plt.xticks(rotation=45, ha="right")
     plt.legend()
@@ -173,6 +208,9 @@ def main() -> int:
     p.add_argument("--out", default="dashboards", help="Output folder for PNGs")
     p.add_argument("--days", type=int, default=30, help="How many recent days to chart")
     p.add_argument("--weeks", type=int, default=16, help="How many weekly points to chart")
+    p.add_argument("--live", action="store_true", help="Read the live DB instead of a snapshot")
+    p.add_argument("--snapshot", default=DEFAULT_SNAPSHOT_PATH, help="Snapshot file to (re)use")
+    p.add_argument("--max-age", type=int, default=300, help="Reuse snapshot if younger (seconds)")
     args = p.parse_args()
 
     db_path = Path(args.db)
@@ -183,18 +221,29 @@ def main() -> int:
 
     _ensure_outdir(out_dir)
 
-    conn = _connect(db_path)
-    daily = _load_daily(conn, args.days)
-    weekly = _load_weekly(conn, args.weeks)
-    conn.close()
-
-    _plot_tracked_success(daily, out_dir)
+    # Fan out over the shard files (just one unless SQLITE_SHARDS > 1)
+    conns = connect_analytics_shards(
+        str(db_path),
+        live=args.live,
+        snapshot_path=args.snapshot,
+        max_age_seconds=args.max_age,
+    )
+    progress = pd.concat([_load_progress(c, args.days) for c in conns], ignore_index=True)
+    progress = progress.sort_values(["date", "user_name"], kind="stable")
+    per_habit = pd.concat([_load_habit_stats(c, args.days) for c in conns], ignore_index=True)
+    weekly = _load_weekly(conns[0], args.weeks)  # weekly data is not sharded
+    for conn in conns:
+        conn.close()
+
+    _plot_tracked_success(progress, out_dir)
+    per_habit.to_csv(out_dir / "habit_stats.csv", index=False)
     _plot_weight(weekly, out_dir)
     _plot_week_rating(weekly, out_dir)
 
     print(f"✅ Charts saved to: {out_dir.resolve()}")
     print(" - tracked_pct.png")
     print(" - success_pct.png")
+    print(" - habit_stats.csv")
     print(" - weight_weekly.png (if weekly weights exist)")
     print(" - week_rating.png (if weekly ratings exist)")
     return 0
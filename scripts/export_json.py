@@ -1,8 +1,13 @@
+import argparse
 import json
 import sqlite3
 from datetime import datetime
 from pathlib import Path
 
+from health_bot.archive import values_sql
+from health_bot.db import has_archive
+from health_bot.snapshot import DEFAULT_SNAPSHOT_PATH, connect_analytics_shards
+
 
 DB_PATH = Path("db/health_bot.sqlite3")
 OUT_DIR = Path("exports")
@@ -12,28 +17,115 @@ def rows_to_dicts(rows: list[sqlite3.Row]) -> list[dict]:
     return [dict(r) for r in rows]
 
 
+def shard_rows(conns: list[sqlite3.Connection], table: str) -> list[dict]:
+    """Rows of a sharded table from every shard; ids are per shard, so tag them when sharded."""
+    out = []
+    for shard, conn in enumerate(conns):
+        for row in rows_to_dicts(conn.execute(f"SELECT * FROM main.{table}").fetchall()):
+            if len(conns) > 1:
+                row["shard"] = shard
+            out.append(row)
+    return out
+
+
+def write_ndjson(conns: list[sqlite3.Connection], out_file: Path, meta: dict) -> int:
+    """History as one JSON record per line, keyed by Telegram user id and habit
+    title so scripts/import_history.py can load it into another database."""
+    lines = 0
+    with out_file.open("w", encoding="utf-8") as f:
+        f.write(json.dumps({"type": "meta", **meta}, ensure_ascii=False) + "\n")
+        directory = conns[0]
+        habits = {
+            int(r["id"]): (str(r["title"]), int(r["sort_order"]))
+            for r in directory.execute("SELECT id, title, sort_order FROM habits")
+        }
+        shards = {int(r["household_id"]): int(r["shard"]) for r in directory.execute("SELECT household_id, shard FROM shard_map")}
+        users = directory.execute("SELECT id, telegram_user_id, household_id FROM users ORDER BY telegram_user_id").fetchall()
+        for u in users:
+            # Each user's history from their shard, archived months included
+            shard = 0 if u["household_id"] is None else shards.get(int(u["household_id"]), 0)
+            conn = conns[shard] if shard < len(conns) else directory
+            rows = conn.execute(values_sql(conn), {"user_id": int(u["id"]), "start": "0000-01-01", "end": "9999-12-31"})
+            values = sorted(
+                ((str(r["date"]), habits[int(r["habit_id"])], r["value"]) for r in rows if int(r["habit_id"]) in habits),
+                key=lambda v: (v[0], v[1][1]),
+            )
+            for day, (title, _), value in values:
+                record = {"telegram_user_id": u["telegram_user_id"], "date": day, "habit": title, "value": value}
+                f.write(json.dumps({"type": "daily_value", **record}, ensure_ascii=False) + "\n")
+                lines += 1
+
+        rows = conns[0].execute(
+            """
+            SELECT u.telegram_user_id AS telegram_user_id, w.week_start_date AS week_start_date,
+                   w.weight_kg AS weight_kg, w.week_rating AS week_rating, w.note AS note
+              FROM weekly_entries w
+              JOIN users u ON u.id = w.user_id
+             ORDER BY u.telegram_user_id, w.week_start_date
+            """
+        )
+        for r in rows:
+            f.write(json.dumps({"type": "weekly_entry", **dict(r)}, ensure_ascii=False) + "\n")
+            lines += 1
+    return lines
+
+
 def main() -> None:
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    p = argparse.ArgumentParser(description="Export health_bot data to JSON.")
+    p.add_argument("--db", default=str(DB_PATH), help="Path to sqlite DB")
+    p.add_argument("--out", default=str(OUT_DIR), help="Output folder")
+    p.add_argument("--live", action="store_true", help="Read the live DB instead of a snapshot")
+    p.add_argument("--snapshot", default=DEFAULT_SNAPSHOT_PATH, help="Snapshot file to (re)use")
+    p.add_argument("--max-age", type=int, default=300, help="Reuse snapshot if younger (seconds)")
+    p.add_argument("--ndjson", action="store_true", help="Check-in history as NDJSON (for import_history.py)")
+    args = p.parse_args()
+
+    db_path = Path(args.db)
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    conns = connect_analytics_shards(
+        str(db_path),
+        live=args.live,
+        snapshot_path=args.snapshot,
+        max_age_seconds=args.max_age,
+    )
+
+    meta = {
+        "exported_at": datetime.utcnow().isoformat() + "Z",
+        "db_path": str(db_path),
+        "source": "live" if args.live else "snapshot",
+        "shards": len(conns),
+    }
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    if args.ndjson:
+        out_file = out_dir / f"health_bot_export_{stamp}.ndjson"
+        try:
+            lines = write_ndjson(conns, out_file, meta)
+        finally:
+            for conn in conns:
+                conn.close()
+        print(f"✅ Exported {lines} records to: {out_file}")
+        return
 
+    directory = conns[0]
     data = {
-        "meta": {
-            "exported_at": datetime.utcnow().isoformat() + "Z",
-            "db_path": str(DB_PATH),
-        },
-        "households": rows_to_dicts(conn.execute("SELECT * FROM households").fetchall()),
-        "users": rows_to_dicts(conn.execute("SELECT * FROM users").fetchall()),
-        "habits": rows_to_dicts(conn.execute("SELECT * FROM habits").fetchall()),
-        "daily_entries": rows_to_dicts(conn.execute("SELECT * FROM daily_entries").fetchall()),
-        "daily_values": rows_to_dicts(conn.execute("SELECT * FROM daily_values").fetchall()),
-        "weekly_entries": rows_to_dicts(conn.execute("SELECT * FROM weekly_entries").fetchall()),
+        "meta": meta,
+        "households": rows_to_dicts(directory.execute("SELECT * FROM households").fetchall()),
+        "users": rows_to_dicts(directory.execute("SELECT * FROM users").fetchall()),
+        "habits": rows_to_dicts(directory.execute("SELECT * FROM habits").fetchall()),
+        "daily_entries": shard_rows(conns, "daily_entries"),
+        "daily_values": shard_rows(conns, "daily_values"),
+        "weekly_entries": rows_to_dicts(directory.execute("SELECT * FROM weekly_entries").fetchall()),
     }
+    if has_archive(directory):
+        data["archive_months"] = rows_to_dicts(directory.execute("SELECT * FROM archive.archive_months").fetchall())
 
-    conn.close()
+    for conn in conns:
+        conn.close()
 
-    out_file = OUT_DIR / f"health_bot_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    out_file = out_dir / f"health_bot_export_{stamp}.json"
     out_file.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
 
     print(f"✅ Exported to: {out_file}")
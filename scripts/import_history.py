@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""Load years of check-in history from CSV or NDJSON into the database.
+
+Stop the bot first: the load drops the secondary daily_values indexes and
+turns off fsync (PRAGMA synchronous=OFF), then rebuilds the indexes and
+checkpoints the WAL at the end.
+
+    PYTHONPATH=src python3 scripts/import_history.py history.ndjson        # export_json.py --ndjson output
+    PYTHONPATH=src python3 scripts/import_history.py sheet.csv --user 123456789
+    PYTHONPATH=src python3 scripts/import_history.py sheet.csv --user 123456789 --dry-run
+
+Users are matched by Telegram user id (they must have run /start), habits by
+title within the user's household (seed.normalize_title, any case).
+Unknown users and habits are skipped and reported.
+
+CSV layouts, told apart by the header:
+- long:   [telegram_user_id,] date, habit, value
+- wide:   [telegram_user_id,] date, <one column per habit title>   (a spreadsheet)
+- weekly: [telegram_user_id,] week_start_date, weight_kg, week_rating, note
+Without a telegram_user_id column, --user applies to every row. Dates are
+YYYY-MM-DD or DD.MM.YYYY.
+
+Every --batch-size source records are committed and the position is saved
+to a checkpoint file. Run the same command again after an interruption to
+resume from there. Writes are upserts, so a batch redone after a crash is
+harmless.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Iterator
+
+from health_bot.db import (
+    ShardConnections,
+    checkpoint,
+    configure_shards_from_files,
+    connect,
+    ensure_daily_value_indexes,
+    shard_count,
+    shard_for_household,
+    upsert_daily_value_rows,
+)
+from health_bot.seed import normalize_title
+
+DB_PATH = Path("db/health_bot.sqlite3")
+
+# ("daily", telegram_user_id, date, habit title, value) or
+# ("weekly", telegram_user_id, week_start_date, weight_kg, week_rating, note)
+Item = tuple
+
+_TRUE = {"1", "true", "yes", "y", "x", "+", "✅", "так"}
+_FALSE = {"0", "false", "no", "n", "-", "❌", "ні"}
+
+_UPSERT_WEEKLY = """
+    INSERT INTO weekly_entries (user_id, week_start_date, weight_kg, week_rating, note)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(user_id, week_start_date)
+    DO UPDATE SET
+        weight_kg = excluded.weight_kg,
+        week_rating = excluded.week_rating,
+        note = excluded.note,
+        updated_at = datetime('now')
+"""
+
+
+def parse_date(raw: str) -> str | None:
+    raw = raw.strip()
+    try:
+        return date.fromisoformat(raw).isoformat()
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(raw, "%d.%m.%Y").date().isoformat()
+    except ValueError:
+        return None
+
+
+def normalize_value(kind: str, raw) -> str | None:
+    """The stored form of a spreadsheet cell for this habit kind; None = skip."""
+    if raw is None:
+        return None
+    value = str(raw).strip()
+    if not value:
+        return None
+    if kind == "boolean":
+        low = value.lower()
+        if low in _TRUE:
+            return "1"
+        if low in _FALSE:
+            return "0"
+        return None
+    if kind == "number":
+        value = value.replace(",", ".").replace(" ", "")
+        try:
+            float(value)
+        except ValueError:
+            return None
+    return value
+
+
+def _optional(raw, cast):
+    if raw is None or str(raw).strip() == "":
+        return None
+    return cast(str(raw).replace(",", ".")) if cast is float else cast(raw)
+
+
+def read_ndjson(path: str) -> Iterator[list[Item]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            rec = json.loads(line) if line else {}
+            kind = rec.get("type")
+            if kind == "daily_value":
+                yield [("daily", rec["telegram_user_id"], rec["date"], rec["habit"], rec["value"])]
+            elif kind == "weekly_entry":
+                yield [(
+                    "weekly",
+                    rec["telegram_user_id"],
+                    rec["week_start_date"],
+                    rec.get("weight_kg"),
+                    rec.get("week_rating"),
+                    rec.get("note"),
+                )]
+            else:
+                yield []  # meta and blank lines still count as records for resuming
+
+
+def read_csv(path: str, default_user: int | None) -> Iterator[list[Item]]:
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        fields = [c for c in (reader.fieldnames or [])]
+        if "telegram_user_id" not in fields and default_user is None:
+            raise SystemExit("The CSV has no telegram_user_id column: pass --user")
+
+        if "week_start_date" in fields:
+            layout = "weekly"
+        elif {"date", "habit", "value"} <= set(fields):
+            layout = "long"
+        elif "date" in fields:
+            layout = "wide"
+        else:
+            raise SystemExit(f"Unrecognized CSV header: {fields}")
+        habit_columns = [c for c in fields if c not in ("telegram_user_id", "date")]
+
+        for row in reader:
+            user = row.get("telegram_user_id") or default_user
+            if layout == "weekly":
+                yield [(
+                    "weekly",
+                    user,
+                    row["week_start_date"],
+                    row.get("weight_kg"),
+                    row.get("week_rating"),
+                    row.get("note"),
+                )]
+            elif layout == "long":
+                yield [("daily", user, row["date"], row["habit"], row["value"])]
+            else:
+                yield [("daily", user, row["date"], title, row[title]) for title in habit_columns]
+
+
+class Importer:
+    def __init__(self, db_path: str, *, dry_run: bool = False) -> None:
+        self.db_path = db_path
+        self.dry_run = dry_run
+        self.conns = ShardConnections(db_path)
+
+        directory = connect(db_path)
+        try:
+            self.users = {
+                int(r["telegram_user_id"]): (int(r["id"]), r["household_id"])
+                for r in directory.execute("SELECT id, telegram_user_id, household_id FROM users")
+            }
+            self.habits = {
+                (int(r["household_id"]), normalize_title(str(r["title"])).lower()): (int(r["id"]), str(r["kind"]))
+                for r in directory.execute("SELECT id, household_id, title, kind FROM habits")
+            }
+        finally:
+            directory.close()
+
+        self.values = 0
+        self.weekly = 0
+        self.skipped: dict[str, int] = {}
+        self.unknown_habits: dict[str, int] = {}
+        self._daily: dict[int, list[tuple[int, str, int, str]]] = {}
+        self._weekly: list[tuple] = []
+
+    def _skip(self, reason: str) -> None:
+        self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+    def add(self, item: Item) -> None:
+        try:
+            user = self.users.get(int(item[1]))
+        except (TypeError, ValueError):
+            user = None
+        if user is None:
+            self._skip("unknown user")
+            return
+        user_id, household_id = user
+
+        if item[0] == "weekly":
+            week_start = parse_date(str(item[2]))
+            if week_start is None:
+                self._skip("bad date")
+                return
+            try:
+                weight = _optional(item[3], float)
+                rating = _optional(item[4], int)
+            except ValueError:
+                self._skip("bad value")
+                return
+            note = str(item[5]).strip() if item[5] is not None and str(item[5]).strip() else None
+            self._weekly.append((user_id, week_start, weight, rating, note))
+            return
+
+        _, _, raw_date, title, raw_value = item
+        day = parse_date(str(raw_date))
+        if day is None:
+            self._skip("bad date")
+            return
+        if household_id is None:
+            self._skip("user without household")
+            return
+        habit = self.habits.get((int(household_id), normalize_title(str(title)).lower()))
+        if habit is None:
+            self.unknown_habits[str(title)] = self.unknown_habits.get(str(title), 0) + 1
+            self._skip("unknown habit")
+            return
+        value = normalize_value(habit[1], raw_value)
+        if value is None:
+            self._skip("empty or bad value")
+            return
+        shard = shard_for_household(self.db_path, int(household_id))
+        self._daily.setdefault(shard, []).append((user_id, day, habit[0], value))
+
+    def flush(self) -> None:
+        """Write the pending rows: one transaction per shard file, and one for weekly data."""
+        for shard, rows in sorted(self._daily.items()):
+            if not self.dry_run:
+                conn = self.conns.shard(shard)
+                try:
+                    upsert_daily_value_rows(conn, rows)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            self.values += len(rows)
+        if self._weekly:
+            if not self.dry_run:
+                conn = self.conns.shard(0)
+                try:
+                    conn.executemany(_UPSERT_WEEKLY, self._weekly)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            self.weekly += len(self._weekly)
+        self._daily.clear()
+        self._weekly.clear()
+
+
+def _load_checkpoint(path: Path, source: dict) -> dict:
+    if not path.exists():
+        return {"source": source, "records": 0, "indexes": {}}
+    state = json.loads(path.read_text(encoding="utf-8"))
+    if state.get("source") != source:
+        raise SystemExit(f"{path} belongs to another version of the source file; pass --restart to start over")
+    return state
+
+
+def _save_checkpoint(path: Path, state: dict) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    os.replace(tmp, path)  # never a half-written checkpoint
+
+
+def _drop_indexes(conns: ShardConnections, state: dict) -> None:
+    # Rebuilt once at the end instead of updated per row. The checkpoint keeps
+    # the definitions of indexes added by hand; the schema's own come back
+    # from db.ensure_daily_value_indexes even when the checkpoint is lost.
+    for shard in range(shard_count()):
+        conn = conns.shard(shard)
+        rows = conn.execute(
+            """
+            SELECT name, sql FROM main.sqlite_master
+             WHERE type = 'index' AND tbl_name = 'daily_values' AND sql IS NOT NULL
+            """
+        ).fetchall()
+        saved = state["indexes"].setdefault(str(shard), {})
+        for r in rows:
+            saved[r["name"]] = r["sql"]
+            conn.execute(f"DROP INDEX main.{r['name']}")
+        conn.commit()
+
+
+def _rebuild_indexes(conns: ShardConnections, state: dict) -> None:
+    for shard in range(shard_count()):
+        conn = conns.shard(shard)
+        ensure_daily_value_indexes(conn)
+        existing = {r["name"] for r in conn.execute("SELECT name FROM main.sqlite_master WHERE type = 'index'")}
+        for name, sql in state["indexes"].get(str(shard), {}).items():
+            if name not in existing:
+                conn.execute(sql)
+        conn.commit()
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("source", help="CSV or NDJSON file")
+    p.add_argument("--db", default=str(DB_PATH), help="Path to the directory sqlite DB")
+    p.add_argument("--format", choices=("csv", "ndjson"), help="Default: from the file extension")
+    p.add_argument("--user", type=int, help="Telegram user id for CSV files without a telegram_user_id column")
+    p.add_argument("--batch-size", type=int, default=50_000, help="Source records per transaction")
+    p.add_argument("--checkpoint", help="Progress file (default: <source>.checkpoint.json)")
+    p.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    p.add_argument("--keep-indexes", action="store_true", help="Don't drop indexes during the load")
+    p.add_argument("--dry-run", action="store_true", help="Map and count, write nothing")
+    args = p.parse_args()
+
+    db_path = str(args.db)
+    configure_shards_from_files(db_path)
+    fmt = args.format or ("csv" if args.source.lower().endswith(".csv") else "ndjson")
+    records = read_csv(args.source, args.user) if fmt == "csv" else read_ndjson(args.source)
+
+    stat = os.stat(args.source)
+    source = {"path": os.path.abspath(args.source), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    checkpoint_path = Path(args.checkpoint or f"{args.source}.checkpoint.json")
+    if args.restart and checkpoint_path.exists():
+        checkpoint_path.unlink()
+    state = _load_checkpoint(checkpoint_path, source)
+    done = int(state["records"])
+    if done:
+        print(f"Resuming after record {done} ({checkpoint_path})")
+
+    importer = Importer(db_path, dry_run=args.dry_run)
+    if not args.dry_run:
+        for shard in range(shard_count()):
+            importer.conns.shard(shard).execute("PRAGMA synchronous = OFF")
+        if not args.keep_indexes:
+            _drop_indexes(importer.conns, state)
+            _save_checkpoint(checkpoint_path, state)
+
+    t0 = time.perf_counter()
+    read = pending = 0
+    try:
+        for n, items in enumerate(records, start=1):
+            if n <= done:
+                continue
+            for item in items:
+                importer.add(item)
+            read += 1
+            pending += 1
+            if pending >= args.batch_size:
+                importer.flush()
+                pending = 0
+                state["records"] = n
+                if not args.dry_run:
+                    _save_checkpoint(checkpoint_path, state)
+                elapsed = time.perf_counter() - t0
+                print(f"  {n} records, {importer.values} values ({importer.values / elapsed:,.0f} rows/s)")
+        importer.flush()
+
+        if not args.dry_run:
+            t1 = time.perf_counter()
+            _rebuild_indexes(importer.conns, state)
+            for shard in range(shard_count()):
+                conn = importer.conns.shard(shard)
+                conn.execute("PRAGMA synchronous = NORMAL")
+                checkpoint(conn, "TRUNCATE")
+            print(f"Indexes rebuilt and WAL checkpointed in {time.perf_counter() - t1:.1f}s")
+            checkpoint_path.unlink(missing_ok=True)
+    finally:
+        importer.conns.close()
+
+    elapsed = time.perf_counter() - t0
+    rows = importer.values + importer.weekly
+    print(
+        f"{'Would import' if args.dry_run else 'Imported'} {importer.values} daily values and "
+        f"{importer.weekly} weekly entries from {read} records in {elapsed:.1f}s "
+        f"({rows / elapsed if elapsed else 0:,.0f} rows/s)"
+    )
+    if importer.skipped:
+        print(f"Skipped: {dict(sorted(importer.skipped.items()))}")
+    if importer.unknown_habits:
+        top = sorted(importer.unknown_habits.items(), key=lambda kv: -kv[1])[:10]
+        print("Unknown habit titles: " + ", ".join(f"{title!r} ×{n}" for title, n in top))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,7 +1,8 @@
 import logging
+from health_bot import bitmaps
 from health_bot.config import load_settings
 from health_bot.logging_setup import setup_logging
-from health_bot.db import connect, init_db
+from health_bot.db import configure_shards, connect, init_archive, init_db, init_shards, shard_path
 
 
 def main() -> None:
@@ -13,7 +14,22 @@ def main() -> None:
     init_db(conn)
     conn.close()
 
-    log.info("DB initialized at %s", settings.db_path)
+    configure_shards(settings.sqlite_shards)
+    init_shards(settings.db_path)
+    init_archive(settings.db_path)
+
+    # Every file holding daily tables gets (or loses) its own habit_bits
+    for shard in range(settings.sqlite_shards):
+        conn = connect(shard_path(settings.db_path, shard))
+        if settings.habit_bitmaps:
+            rows = bitmaps.install(conn)
+            log.info("habit_bits rebuilt on shard %s: %s month row(s)", shard, rows)
+        else:
+            bitmaps.uninstall(conn)
+        conn.commit()
+        conn.close()
+
+    log.info("DB initialized at %s (%s shard(s))", settings.db_path, settings.sqlite_shards)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Move households between shard files until daily data is evenly spread.
+
+Also the way to grow or shrink the shard count: households on shards >= the
+new count are always moved. Stop the bot first (it caches placements), then
+set SQLITE_SHARDS to the new count.
+
+    PYTHONPATH=src python3 scripts/rebalance_shards.py --shards 4 --dry-run
+    PYTHONPATH=src python3 scripts/rebalance_shards.py --shards 4
+
+A move copies the household's daily entries and values into the target shard,
+deletes them from the source, then updates shard_map. Each step is idempotent:
+if a run is interrupted, run it again.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+from health_bot.db import (
+    configure_shards,
+    configure_shards_from_files,
+    connect,
+    connect_shard,
+    init_shards,
+    move_user_data,
+)
+
+DB_PATH = Path("db/health_bot.sqlite3")
+
+
+def _placements(db_path: str) -> dict[int, int]:
+    conn = connect(db_path)
+    try:
+        households = [int(r["id"]) for r in conn.execute("SELECT id FROM households")]
+        mapped = {int(r["household_id"]): int(r["shard"]) for r in conn.execute("SELECT household_id, shard FROM shard_map")}
+    finally:
+        conn.close()
+    return {hid: mapped.get(hid, 0) for hid in households}
+
+
+def _loads(db_path: str, shards: list[int]) -> dict[tuple[int, int], int]:
+    """Daily entries per (household, shard holding them)."""
+    loads: dict[tuple[int, int], int] = {}
+    for shard in shards:
+        conn = connect_shard(db_path, shard)
+        try:
+            rows = conn.execute(
+                """
+                SELECT u.household_id AS household_id, COUNT(*) AS n
+                  FROM main.daily_entries de
+                  JOIN users u ON u.id = de.user_id
+                 WHERE u.household_id IS NOT NULL
+                 GROUP BY u.household_id
+                """
+            ).fetchall()
+        finally:
+            conn.close()
+        for r in rows:
+            loads[(int(r["household_id"]), shard)] = int(r["n"])
+    return loads
+
+
+def plan_moves(
+    placement: dict[int, int],
+    loads: dict[int, int],
+    count: int,
+    tolerance: float = 0.1,
+) -> list[tuple[int, int, int]]:
+    """Greedy: evacuate shards >= count, then move the smallest household that
+    still helps from the fullest shard to the emptiest. Returns (household, from, to)."""
+    placement = dict(placement)
+    per_shard = {s: 0 for s in range(count)}
+    moves = []
+
+    for hid, shard in sorted(placement.items()):
+        if shard < count:
+            per_shard[shard] += loads.get(hid, 0)
+
+    for hid, shard in sorted(placement.items(), key=lambda kv: -loads.get(kv[0], 0)):
+        if shard >= count:
+            target = min(per_shard, key=per_shard.get)
+            per_shard[target] += loads.get(hid, 0)
+            placement[hid] = target
+            moves.append((hid, shard, target))
+
+    limit = sum(per_shard.values()) / count * (1 + tolerance)
+    while True:
+        src = max(per_shard, key=per_shard.get)
+        dst = min(per_shard, key=per_shard.get)
+        if per_shard[src] <= limit or src == dst:
+            break
+        gap = per_shard[src] - per_shard[dst]
+        candidates = [
+            hid for hid, shard in placement.items()
+            if shard == src and 0 < loads.get(hid, 0) < gap
+        ]
+        if not candidates:
+            break
+        hid = max(candidates, key=lambda h: min(loads[h], gap - loads[h]))
+        per_shard[src] -= loads[hid]
+        per_shard[dst] += loads[hid]
+        placement[hid] = dst
+        moves.append((hid, src, dst))
+
+    # A household moved twice only needs its final hop
+    final: dict[int, tuple[int, int]] = {}
+    for hid, src, dst in moves:
+        first_src = final.get(hid, (src, dst))[0]
+        final[hid] = (first_src, dst)
+    return [(hid, src, dst) for hid, (src, dst) in final.items() if src != dst]
+
+
+def move_household(db_path: str, household_id: int, src: int, dst: int) -> int:
+    """Move one household's daily data from shard src to dst and repoint shard_map."""
+    conn = connect(db_path)
+    try:
+        user_ids = [int(r["id"]) for r in conn.execute("SELECT id FROM users WHERE household_id = ?", (household_id,))]
+    finally:
+        conn.close()
+
+    moved = move_user_data(db_path, user_ids, src, dst)
+
+    conn = connect(db_path)
+    try:
+        if dst == 0:
+            conn.execute("DELETE FROM shard_map WHERE household_id = ?", (household_id,))
+        else:
+            conn.execute(
+                """
+                INSERT INTO shard_map (household_id, shard) VALUES (?, ?)
+                ON CONFLICT(household_id) DO UPDATE SET shard = excluded.shard
+                """,
+                (household_id, dst),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    return moved
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--db", default=str(DB_PATH), help="Path to the directory sqlite DB")
+    p.add_argument("--shards", type=int, required=True, help="Shard count after rebalancing")
+    p.add_argument("--tolerance", type=float, default=0.1, help="Allowed overload over the mean")
+    p.add_argument("--dry-run", action="store_true", help="Only print the plan")
+    args = p.parse_args()
+
+    db_path = str(args.db)
+    existing = configure_shards_from_files(db_path)
+    configure_shards(max(existing, args.shards))
+    init_shards(db_path)
+
+    placement = _placements(db_path)
+    located = _loads(db_path, list(range(max(existing, args.shards))))
+    loads: dict[int, int] = {}
+    for (hid, shard), n in located.items():
+        loads[hid] = loads.get(hid, 0) + n
+
+    # Data not on its mapped shard is left over from an interrupted move
+    for (hid, shard), n in sorted(located.items()):
+        if hid in placement and shard != placement[hid]:
+            print(f"  household {hid}: {n} entries on shard {shard}, mapped to {placement[hid]}; moving back")
+            if not args.dry_run:
+                move_household(db_path, hid, shard, placement[hid])
+
+    moves = plan_moves(placement, loads, args.shards, args.tolerance)
+
+    per_shard: dict[int, int] = {}
+    for hid, shard in placement.items():
+        per_shard[shard] = per_shard.get(shard, 0) + loads.get(hid, 0)
+    print(f"Daily entries per shard now: {dict(sorted(per_shard.items()))}")
+    print(f"{len(moves)} household move(s) planned")
+    for hid, src, dst in moves:
+        print(f"  household {hid}: shard {src} -> {dst} ({loads.get(hid, 0)} entries)")
+
+    if args.dry_run or not moves:
+        return 0
+
+    t0 = time.perf_counter()
+    values = 0
+    for hid, src, dst in moves:
+        values += move_household(db_path, hid, src, dst)
+    print(f"Moved {values} values in {time.perf_counter() - t0:.1f}s. Set SQLITE_SHARDS={args.shards}.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
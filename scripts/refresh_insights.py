@@ -0,0 +1,32 @@
+import argparse
+import time
+from pathlib import Path
+
+from health_bot.db import configure_shards_from_files, connect, init_db
+from health_bot.insights import refresh_insights
+
+
+DB_PATH = Path("db/health_bot.sqlite3")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Recompute cached insights for users with new data.")
+    p.add_argument("--db", default=str(DB_PATH), help="Path to sqlite DB")
+    p.add_argument("--timezone", default="Europe/Kiev", help="Default timezone for users without one")
+    p.add_argument("--workers", type=int, default=4, help="Worker processes (1 = inline)")
+    p.add_argument("--force", action="store_true", help="Recompute everyone, even if up to date")
+    args = p.parse_args()
+
+    conn = connect(args.db)
+    init_db(conn)
+    conn.close()
+    configure_shards_from_files(args.db)
+
+    t0 = time.perf_counter()
+    computed, fresh = refresh_insights(args.db, timezone=args.timezone, max_workers=args.workers, force=args.force)
+    elapsed = time.perf_counter() - t0
+    print(f"Recomputed {computed} user(s), {fresh} up to date, in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""Replay Telegram updates through the webhook ingress and measure throughput.
+
+Runs a stub Bot API server (answers every method and counts the bot's
+replies), starts the bot with WORKERS=N pointed at it, then POSTs updates:
+
+    PYTHONPATH=src python3 scripts/replay_updates.py --workers 1 --users 200 --taps 20
+    PYTHONPATH=src python3 scripts/replay_updates.py --workers 4 --users 200 --taps 20
+    PYTHONPATH=src python3 scripts/replay_updates.py --workers 4 --file updates.ndjson --db db/copy.sqlite3
+
+Without --file the traffic is synthetic: /start for every user, then per
+user /checkin, N check-in taps and /today. Record real traffic by running the
+bot with INGRESS_RECORD_PATH=updates.ndjson, and replay it against a copy of
+the database. Each user's updates go over one connection in order, as
+Telegram sends them. A reply of "Please run /start first." means a worker ran
+a user's updates out of order, so the script counts those replies.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl
+
+from health_bot import callbacks
+from health_bot.db import connect, init_db
+from health_bot.workers import serve_http, update_user_id
+
+ROOT = Path(__file__).resolve().parent.parent
+TOKEN = "123456:replay-benchmark"
+OUT_OF_ORDER = "Please run /start first."
+
+
+class StubBotApi:
+    """Answers Bot API calls the way Telegram would, minus the network."""
+
+    def __init__(self) -> None:
+        self.calls: dict[str, int] = {}
+        self.replies = 0  # sendMessage + answerCallbackQuery: one per handled update
+        self.last_reply_at = 0.0
+        self.out_of_order = 0
+        self._message_id = 0
+
+    def handle(self, method: str, path: str, headers: dict[str, str], body: bytes) -> tuple[int, bytes]:
+        name = path.rsplit("/", 1)[-1]
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if headers.get("content-type", "").startswith("application/json"):
+            params = json.loads(body or b"{}")
+        else:
+            params = dict(parse_qsl(body.decode("utf-8")))
+
+        if name in ("sendMessage", "answerCallbackQuery"):
+            self.replies += 1
+            self.last_reply_at = time.perf_counter()
+            if str(params.get("text", "")).startswith(OUT_OF_ORDER):
+                self.out_of_order += 1
+
+        if name == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Replay", "username": "replay_bot"}
+        elif name in ("sendMessage", "editMessageText"):
+            self._message_id += 1
+            result = {
+                "message_id": int(params.get("message_id") or self._message_id),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id") or 0), "type": "private"},
+                "text": str(params.get("text", "")),
+            }
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode("utf-8")
+
+
+def _user(uid: int) -> dict:
+    return {"id": uid, "is_bot": False, "first_name": f"u{uid}"}
+
+
+def _command(update_id: int, uid: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": uid, "type": "private"},
+            "from": _user(uid),
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}],
+        },
+    }
+
+
+def _tap(update_id: int, uid: int, data: str) -> dict:
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": _user(uid),
+            "chat_instance": str(uid),
+            "data": data,
+            "message": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": uid, "type": "private"},
+                "text": "check-in",
+            },
+        },
+    }
+
+
+def _boolean_habits(db_path: str) -> dict[int, list[int]]:
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(
+            """
+            SELECT u.telegram_user_id AS uid, h.id AS habit_id
+              FROM users u
+              JOIN habits h ON h.household_id = u.household_id
+             WHERE h.enabled = 1 AND h.kind = 'boolean'
+            """
+        ).fetchall()
+    finally:
+        conn.close()
+    out: dict[int, list[int]] = {}
+    for r in rows:
+        out.setdefault(int(r["uid"]), []).append(int(r["habit_id"]))
+    return out
+
+
+def _checkin_traffic(users: list[int], habits: dict[int, list[int]], taps: int, first_id: int) -> list[dict]:
+    codec = callbacks.CallbackCodec(callbacks.secret_from_token(TOKEN))
+    streams = []
+    for uid in users:
+        stream = [_command(0, uid, "/checkin")]
+        for _ in range(taps):
+            data = codec.encode(
+                callbacks.ACTION_SET,
+                habit_id=random.choice(habits[uid]),
+                value=random.choice("01"),
+                page=callbacks.PAGES[0],
+            )
+            stream.append(_tap(0, uid, data))
+        stream.append(_command(0, uid, "/today"))
+        streams.append(stream)
+
+    # Interleave users the way concurrent chats arrive
+    updates = []
+    for step in range(taps + 2):
+        for stream in streams:
+            updates.append(stream[step])
+    for i, u in enumerate(updates):
+        u["update_id"] = first_id + i
+    return updates
+
+
+async def _post_all(port: int, bodies: list[bytes], connections: int) -> float:
+    """POST every update; one user always uses the same connection. Returns seconds."""
+    lanes: list[list[bytes]] = [[] for _ in range(connections)]
+    for body in bodies:
+        uid = update_user_id(json.loads(body)) or 0
+        lanes[uid % connections].append(body)
+
+    async def send(lane: list[bytes]) -> None:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for body in lane:
+            writer.write(
+                b"POST / HTTP/1.1\r\nHost: ingress\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1")
+                + body
+            )
+            await writer.drain()
+            status = await reader.readline()
+            length = 0
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            if length:
+                await reader.readexactly(length)
+            if b" 200 " not in status:
+                raise RuntimeError(f"ingress answered {status!r}")
+        writer.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(send(lane) for lane in lanes if lane))
+    return time.perf_counter() - t0
+
+
+async def _wait_replies(api: StubBotApi, target: int | None, idle_s: float) -> None:
+    """Until `target` replies arrived, or (target None) no reply for idle_s."""
+    while True:
+        await asyncio.sleep(0.05)
+        if target is not None and api.replies >= target:
+            return
+        if api.last_reply_at and time.perf_counter() - api.last_reply_at > idle_s:
+            if target is not None:
+                print(f"  timed out: {api.replies}/{target} replies")
+            return
+
+
+async def _run_phase(label: str, api: StubBotApi, port: int, updates: list[bytes], args, expect: bool) -> None:
+    before = api.replies
+    t0 = time.perf_counter()
+    api.last_reply_at = t0
+    post_s = await _post_all(port, updates, args.connections)
+    # Recorded traffic has no known reply count: stop once replies dry up
+    await _wait_replies(api, before + len(updates) if expect else None, args.idle_timeout if expect else 3.0)
+    total_s = (api.last_reply_at or time.perf_counter()) - t0
+    handled = api.replies - before
+    print(
+        f"{label}: {len(updates)} updates, ingress {len(updates) / post_s:,.0f}/s, "
+        f"handled {handled} in {total_s:.2f}s ({handled / total_s:,.0f}/s)"
+    )
+
+
+async def _wait_ready(api: StubBotApi, proc: subprocess.Popen, workers: int, timeout: float = 60) -> None:
+    # Every worker calls getMe while initializing
+    deadline = time.monotonic() + timeout
+    while api.calls.get("getMe", 0) < workers:
+        if proc.poll() is not None:
+            raise SystemExit(f"bot exited with code {proc.returncode}")
+        if time.monotonic() > deadline:
+            raise SystemExit("workers did not start in time")
+        await asyncio.sleep(0.1)
+    await asyncio.sleep(0.5)
+
+
+async def _main(args) -> int:
+    db_path = args.db
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="replay-"), "health_bot.sqlite3")
+        conn = connect(db_path)
+        init_db(conn, str(ROOT / "db" / "schema.sql"))
+        conn.close()
+
+    api = StubBotApi()
+    api_server = await asyncio.start_server(lambda r, w: serve_http(api.handle, r, w), "127.0.0.1", args.api_port)
+
+    env = dict(os.environ)
+    env.update(
+        TELEGRAM_BOT_TOKEN=TOKEN,
+        DB_PATH=db_path,
+        WORKERS=str(args.workers),
+        WEBHOOK_LISTEN="127.0.0.1",
+        WEBHOOK_PORT=str(args.port),
+        WEBHOOK_URL="",
+        WEBHOOK_SECRET="",
+        INGRESS_RECORD_PATH="",
+        BOT_API_URL=f"http://127.0.0.1:{args.api_port}/bot",
+        LOG_LEVEL=args.log_level,
+        PYTHONPATH=os.pathsep.join(p for p in (str(ROOT / "src"), env.get("PYTHONPATH", "")) if p),
+    )
+    proc = subprocess.Popen([sys.executable, "-m", "health_bot.main"], cwd=ROOT, env=env)
+    try:
+        await _wait_ready(api, proc, args.workers)
+        print(f"{args.workers} worker(s) ready, db {db_path}")
+
+        if args.file:
+            bodies = [line.strip().encode("utf-8") for line in open(args.file, encoding="utf-8") if line.strip()]
+            await _run_phase("replay", api, args.port, bodies, args, expect=False)
+        else:
+            users = [100_000 + i for i in range(args.users)]
+            starts = [json.dumps(_command(i + 1, uid, "/start")).encode() for i, uid in enumerate(users)]
+            await _run_phase("/start", api, args.port, starts, args, expect=True)
+
+            habits = _boolean_habits(db_path)
+            missing = [uid for uid in users if not habits.get(uid)]
+            if missing:
+                print(f"{len(missing)} user(s) have no habits (is FIELDS_PATH set?)")
+                return 1
+            traffic = _checkin_traffic(users, habits, args.taps, len(users) + 1)
+            await _run_phase("check-ins", api, args.port, [json.dumps(u).encode() for u in traffic], args, expect=True)
+
+        print(f"Out-of-order replies: {api.out_of_order}")
+        print(f"Bot API calls: {dict(sorted(api.calls.items()))}")
+    finally:
+        proc.send_signal(signal.SIGINT)
+        try:
+            proc.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        api_server.close()
+    return 0
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--users", type=int, default=100, help="Synthetic users")
+    p.add_argument("--taps", type=int, default=20, help="Check-in taps per synthetic user")
+    p.add_argument("--file", help="NDJSON updates to replay instead (INGRESS_RECORD_PATH output)")
+    p.add_argument("--db", help="Database to run against (default: a fresh temp DB)")
+    p.add_argument("--connections", type=int, default=16, help="Concurrent webhook connections")
+    p.add_argument("--port", type=int, default=8443, help="Ingress port")
+    p.add_argument("--api-port", type=int, default=8081, help="Stub Bot API port")
+    p.add_argument("--idle-timeout", type=float, default=30.0, help="Give up after this long without a reply")
+    p.add_argument("--log-level", default="WARNING")
+    args = p.parse_args()
+    if args.workers < 1:
+        p.error("--workers must be >= 1")
+    return asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,11 +1,33 @@
+"""Make households' habits match fields.txt.
+
+    PYTHONPATH=src python3 scripts/seed_habits.py                  # legacy shared "Family" household
+    PYTHONPATH=src python3 scripts/seed_habits.py --all --dry-run  # print the diff for every household
+    PYTHONPATH=src python3 scripts/seed_habits.py --all
+    PYTHONPATH=src python3 scripts/seed_habits.py --household 3 --household 7
+
+New titles are added, changed kinds/targets/order are updated, and habits no
+longer listed are disabled (never deleted: their history stays). All
+households are written in one transaction.
+"""
+import argparse
 import logging
+import time
+
 from health_bot.config import load_settings
 from health_bot.logging_setup import setup_logging
 from health_bot.db import connect, init_db
-from health_bot.seed import ensure_household, seed_habits_from_fields
+from health_bot.seed import apply_seed, ensure_household, format_diff, plan_seed, read_field_specs
 
 
 def main() -> None:
+    p = argparse.ArgumentParser(description="Seed habits from fields.txt")
+    target = p.add_mutually_exclusive_group()
+    target.add_argument("--all", action="store_true", help="Every household")
+    target.add_argument("--household", type=int, action="append", help="Household id (repeatable)")
+    p.add_argument("--fields", help="Habit list (default: FIELDS_PATH)")
+    p.add_argument("--dry-run", action="store_true", help="Print the diff, write nothing")
+    args = p.parse_args()
+
     settings = load_settings()
     setup_logging(settings.log_level)
     log = logging.getLogger("health_bot.seed_habits")
@@ -15,20 +37,46 @@ def main() -> None:
     # Safety: ensure schema exists
     init_db(conn)
 
-    household_id = ensure_household(conn, "Family")
+    specs = read_field_specs(args.fields or settings.fields_path)
+    if args.all:
+        household_ids = None
+    elif args.household:
+        household_ids = args.household
+    else:
+        household_ids = [ensure_household(conn, "Family")]
+
+    t0 = time.perf_counter()
+    diffs = plan_seed(conn, specs, household_ids)
+    changed = [d for d in diffs if d]
 
-    inserted = seed_habits_from_fields(
-        conn,
-        household_id=household_id,
-        fields_path="fields.txt",
-    )
-    conn.close()
+    if args.dry_run:
+        names = {int(r["id"]): r["name"] for r in conn.execute("SELECT id, name FROM households")}
+        for diff in changed:
+            print("\n".join(format_diff(diff, names.get(diff.household_id))))
+        print(f"{len(changed)} of {len(diffs)} household(s) would change (dry run, nothing written)")
+        conn.rollback()
+        conn.close()
+        return
 
-    if inserted == 0:
-        log.info("Habits already exist for household 'Family' — nothing to seed.")
-    else:
-        log.info("Seeded %s habits into household 'Family' (id=%s).", inserted, household_id)
+    try:
+        apply_seed(conn, changed)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    log.info(
+        "Seeded %s household(s) from %s habit(s): %s written, %s disabled, %s unchanged in %.2fs",
+        len(changed),
+        len(specs),
+        sum(len(d.upserts) for d in diffs),
+        sum(len(d.disabled) for d in diffs),
+        sum(d.unchanged for d in diffs),
+        time.perf_counter() - t0,
+    )
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
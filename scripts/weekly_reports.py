@@ -0,0 +1,42 @@
+import argparse
+from pathlib import Path
+
+from health_bot.coach import generate_weekly_reports, load_latest_report, render_report
+from health_bot.db import configure_shards_from_files, connect, init_db
+from health_bot.timezones import week_start_str
+
+
+DB_PATH = Path("db/health_bot.sqlite3")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Generate this week's coach reports now (same as the Sunday job).")
+    p.add_argument("--db", default=str(DB_PATH), help="Path to sqlite DB")
+    p.add_argument("--timezone", default="Europe/Kiev", help="Default timezone for users without one")
+    p.add_argument("--only-timezone", default=None, help="Only users in this timezone")
+    p.add_argument("--workers", type=int, default=2, help="Worker processes (1 = inline)")
+    p.add_argument("--show", type=int, default=None, metavar="USER_ID", help="Print a user's report afterwards")
+    args = p.parse_args()
+
+    conn = connect(args.db)
+    init_db(conn)
+    conn.close()
+    configure_shards_from_files(args.db)
+
+    n = generate_weekly_reports(
+        args.db,
+        timezone=args.timezone,
+        only_timezone=args.only_timezone,
+        max_workers=args.workers,
+    )
+    print(f"Stored {n} report(s)")
+
+    if args.show is not None:
+        conn = connect(args.db)
+        report = load_latest_report(conn, args.show, week_start_str(args.timezone))
+        conn.close()
+        print(render_report(report) if report else "No report stored for this user.")
+
+
+if __name__ == "__main__":
+    main()
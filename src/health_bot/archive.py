@@ -0,0 +1,237 @@
+"""Retention: compact old daily values into monthly bitmaps in the archive DB.
+
+Values dated before the retention horizon move from the shards' daily_values
+to `archive.archive_months` (db/archive_schema.sql), one row per user, month
+and habit:
+
+- boolean habits: a `tracked` and a `done` bitmask (bit d-1 = day d)
+- mood habits (choice 😊/😐/😞): `tracked` plus one code per day in `moods`
+
+Numbers, text and anything else stay in daily_values. The horizon is rounded
+down to a month start, so a month is archived whole.
+
+Readers use `values_sql`: the hot rows, plus the archived days expanded back
+into (date, habit_id, value, value_num) rows when the connection has the
+archive attached (db.connect_shard). A hot row wins over an archived one for
+the same day and habit, so a value written after archiving (a late backfill,
+or a run interrupted between its two commits) is never counted twice.
+"""
+import logging
+import sqlite3
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from health_bot.db import archive_path, connect, existing_shards, has_archive, init_archive, shard_path
+
+log = logging.getLogger("health_bot.archive")
+
+MOOD_CODES = {"😊": "+", "😐": "0", "😞": "-"}
+NO_MOOD = "."
+USERS_PER_BATCH = 200
+
+HOT_VALUES_SQL = """
+    SELECT de.date AS date, dv.habit_id AS habit_id, dv.value AS value, dv.value_num AS value_num
+      FROM main.daily_entries de
+      JOIN main.daily_values dv ON dv.daily_entry_id = de.id
+     WHERE de.user_id = :user_id
+       AND de.date BETWEEN :start AND :end
+"""
+
+# Each set bit of `tracked` becomes a row; mood codes map back through '-0+' -> -1/0/1
+ARCHIVED_VALUES_SQL = """
+    SELECT x.date AS date,
+           x.habit_id AS habit_id,
+           CASE x.mood WHEN 1 THEN '😊' WHEN 0 THEN '😐' WHEN -1 THEN '😞' ELSE CAST(x.bit AS TEXT) END AS value,
+           COALESCE(x.mood, x.bit) * 1.0 AS value_num
+      FROM (
+        SELECT a.month || '-' || printf('%02d', d.day) AS date,
+               a.habit_id AS habit_id,
+               (a.done >> (d.day - 1)) & 1 AS bit,
+               CASE WHEN a.moods IS NOT NULL THEN instr('-0+', substr(a.moods, d.day, 1)) - 2 END AS mood
+          FROM archive.archive_months a
+          JOIN archive.days d ON (a.tracked >> (d.day - 1)) & 1
+         WHERE a.user_id = :user_id
+           AND a.month BETWEEN substr(:start, 1, 7) AND substr(:end, 1, 7)
+      ) x
+     WHERE x.date BETWEEN :start AND :end
+       AND NOT EXISTS (
+             SELECT 1
+               FROM main.daily_entries de
+               JOIN main.daily_values dv ON dv.daily_entry_id = de.id
+              WHERE de.user_id = :user_id AND de.date = x.date AND dv.habit_id = x.habit_id
+           )
+"""
+
+TIERED_VALUES_SQL = f"{HOT_VALUES_SQL}\n     UNION ALL\n{ARCHIVED_VALUES_SQL}"
+
+
+def values_sql(conn: sqlite3.Connection) -> str:
+    """(date, habit_id, value, value_num) rows of :user_id in [:start, :end], across tiers."""
+    return TIERED_VALUES_SQL if has_archive(conn) else HOT_VALUES_SQL
+
+
+def horizon(today: date, keep_days: int) -> str:
+    """First day of the month `keep_days` before today: older values get archived."""
+    return (today - timedelta(days=keep_days)).replace(day=1).isoformat()
+
+
+@dataclass
+class ArchiveResult:
+    cutoff: str
+    values: int = 0     # daily_values rows moved to the archive
+    entries: int = 0    # daily_entries left empty and deleted
+    months: int = 0     # archive_months rows written
+
+
+def _merge(cur: list | None, day: int, value: str) -> list:
+    """[tracked, done, moods] of one archive row with the value of `day` applied."""
+    tracked, done, moods = cur or (0, 0, None)
+    bit = 1 << (day - 1)
+    tracked |= bit
+    mood = MOOD_CODES.get(value)
+    if mood is None:
+        done = done | bit if value == "1" else done & ~bit
+    else:
+        codes = list(moods or NO_MOOD * 31)
+        codes[day - 1] = mood
+        moods = "".join(codes)
+    return [tracked, done, moods]
+
+
+def _archive_users(conn: sqlite3.Connection, aconn: sqlite3.Connection, kinds: dict[int, str],
+                   user_ids: list[int], cutoff: str, result: ArchiveResult, dry_run: bool) -> None:
+    ids = ",".join(str(int(u)) for u in user_ids)
+    # Holds the shard's write lock until the deletes commit, so no check-in lands in between
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = [
+            r
+            for r in conn.execute(
+                f"""
+                SELECT dv.id AS id, de.user_id AS user_id, de.date AS date, dv.habit_id AS habit_id, dv.value AS value
+                  FROM daily_entries de
+                  JOIN daily_values dv ON dv.daily_entry_id = de.id
+                 WHERE de.user_id IN ({ids})
+                   AND de.date < ?
+                   AND dv.value IN ('0', '1', '😊', '😐', '😞')
+                """,
+                (cutoff,),
+            )
+            if kinds.get(int(r["habit_id"])) == ("choice" if r["value"] in MOOD_CODES else "boolean")
+        ]
+        if not rows:
+            conn.rollback()
+            return
+
+        months: dict[tuple[int, str, int], list] = {}
+        for r in aconn.execute(
+            f"SELECT user_id, month, habit_id, tracked, done, moods FROM archive_months WHERE user_id IN ({ids})"
+        ):
+            months[(int(r["user_id"]), str(r["month"]), int(r["habit_id"]))] = [r["tracked"], r["done"], r["moods"]]
+        touched = set()
+        for r in rows:
+            d = str(r["date"])
+            key = (int(r["user_id"]), d[:7], int(r["habit_id"]))
+            months[key] = _merge(months.get(key), int(d[8:10]), str(r["value"]))
+            touched.add(key)
+
+        result.values += len(rows)
+        result.months += len(touched)
+        if dry_run:
+            conn.rollback()
+            return
+
+        # Archive first, in its own file: a crash before the deletes leaves the
+        # values hot, where they win over the archived copy until the next run
+        aconn.executemany(
+            """
+            INSERT OR REPLACE INTO archive_months (user_id, month, habit_id, tracked, done, moods)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [(*key, *months[key]) for key in sorted(touched)],
+        )
+        aconn.commit()
+
+        conn.executemany("DELETE FROM daily_values WHERE id = ?", [(int(r["id"]),) for r in rows])
+        result.entries += conn.execute(
+            f"""
+            DELETE FROM daily_entries
+             WHERE user_id IN ({ids})
+               AND date < ?
+               AND NOT EXISTS (SELECT 1 FROM daily_values dv WHERE dv.daily_entry_id = daily_entries.id)
+            """,
+            (cutoff,),
+        ).rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def archive_history(
+    db_path: str,
+    *,
+    keep_days: int,
+    today: date | None = None,
+    dry_run: bool = False,
+    users_per_batch: int = USERS_PER_BATCH,
+) -> ArchiveResult:
+    """Move archivable values dated before horizon(today, keep_days) to the archive.
+
+    Safe to rerun: rows merge into the existing months. Each batch of users is
+    its own pair of short transactions, so the bot keeps writing meanwhile.
+    """
+    if keep_days < 1:
+        raise RuntimeError(f"keep_days must be >= 1, got {keep_days}")
+    result = ArchiveResult(cutoff=horizon(today or date.today(), keep_days))
+    init_archive(db_path)
+
+    conn = connect(db_path)
+    try:
+        kinds = {
+            int(r["id"]): str(r["kind"])
+            for r in conn.execute("SELECT id, kind FROM habits WHERE kind IN ('boolean', 'choice')")
+        }
+    finally:
+        conn.close()
+
+    aconn = connect(archive_path(db_path))
+    try:
+        for shard in existing_shards(db_path):
+            # The shard file alone: BEGIN IMMEDIATE would also lock every attached file
+            conn = connect(shard_path(db_path, shard))
+            try:
+                user_ids = [
+                    int(r["user_id"])
+                    for r in conn.execute(
+                        "SELECT DISTINCT user_id FROM daily_entries WHERE date < ? ORDER BY user_id",
+                        (result.cutoff,),
+                    )
+                ]
+                for i in range(0, len(user_ids), users_per_batch):
+                    batch = user_ids[i: i + users_per_batch]
+                    _archive_users(conn, aconn, kinds, batch, result.cutoff, result, dry_run)
+            finally:
+                conn.close()
+
+        if not dry_run:
+            aconn.execute(
+                """
+                INSERT INTO archive_state (key, value) VALUES ('archived_before', ?)
+                ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)
+                """,
+                (result.cutoff,),
+            )
+            aconn.commit()
+    finally:
+        aconn.close()
+
+    log.info(
+        "Archived %s value(s) before %s into %s month row(s), %s empty entries removed%s",
+        result.values,
+        result.cutoff,
+        result.months,
+        result.entries,
+        " (dry run)" if dry_run else "",
+    )
+    return result
@@ -0,0 +1,199 @@
+"""Per-habit day bitsets: streaks by bit scan, success rates by popcount.
+
+Optional (HABIT_BITMAPS=1, installed by scripts/init_db.py): `habit_bits`
+keeps, per user, habit and month, a `tracked` mask (day has a value) and a
+`done` mask (value is '1', i.e. ✅), bit d-1 = day d, the same layout as
+archive.archive_months. Triggers on daily_entries/daily_values maintain it
+on every write path, imports and shard moves included.
+
+`load` joins a user's months into one Python int per habit, bit 0 being the
+start day, so a streak is a couple of shifts and a bit_length() and a rate
+is an int.bit_count() instead of a loop over per-day rows. Backends or files
+without the table build the same `HabitBits` from rows (`from_values`).
+"""
+import sqlite3
+from datetime import date
+from typing import Iterable, NamedTuple
+
+from health_bot.db import has_archive
+
+_DAY = "CAST(substr(de.date, 9, 2) AS INTEGER) - 1"
+
+# Set the day's bit in tracked and make done follow the value
+_SET_BITS = f"""
+    INSERT INTO habit_bits (user_id, month, habit_id, tracked, done)
+    SELECT de.user_id, substr(de.date, 1, 7), NEW.habit_id, 1 << ({_DAY}), (NEW.value IS '1') << ({_DAY})
+      FROM daily_entries de
+     WHERE de.id = NEW.daily_entry_id
+    ON CONFLICT (user_id, month, habit_id) DO UPDATE
+       SET tracked = tracked | excluded.tracked,
+           done = (done & ~excluded.tracked) | excluded.done;
+"""
+
+_TRIGGERS = {
+    "habit_bits_ins": f"AFTER INSERT ON daily_values BEGIN {_SET_BITS} END",
+    "habit_bits_upd": f"AFTER UPDATE OF value ON daily_values BEGIN {_SET_BITS} END",
+    # A value deleted on its own; its entry still exists
+    "habit_bits_del": f"""
+        AFTER DELETE ON daily_values BEGIN
+            UPDATE habit_bits
+               SET tracked = tracked & ~(1 << ({_DAY})), done = done & ~(1 << ({_DAY}))
+              FROM daily_entries de
+             WHERE de.id = OLD.daily_entry_id
+               AND habit_bits.user_id = de.user_id
+               AND habit_bits.month = substr(de.date, 1, 7)
+               AND habit_bits.habit_id = OLD.habit_id;
+        END
+    """,
+    # A deleted entry: its values go by cascade once the entry row is gone, so clear them first
+    "habit_bits_entry_del": """
+        BEFORE DELETE ON daily_entries BEGIN
+            UPDATE habit_bits
+               SET tracked = tracked & ~(1 << (CAST(substr(OLD.date, 9, 2) AS INTEGER) - 1)),
+                   done = done & ~(1 << (CAST(substr(OLD.date, 9, 2) AS INTEGER) - 1))
+             WHERE user_id = OLD.user_id
+               AND month = substr(OLD.date, 1, 7)
+               AND habit_id IN (SELECT habit_id FROM daily_values WHERE daily_entry_id = OLD.id);
+        END
+    """,
+}
+
+
+def install(conn: sqlite3.Connection) -> int:
+    """Create habit_bits and its triggers on a file with the daily tables, and
+    rebuild it from daily_values (caller commits). Returns month rows written."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS habit_bits (
+          user_id INTEGER NOT NULL,
+          month TEXT NOT NULL,       -- YYYY-MM
+          habit_id INTEGER NOT NULL,
+          tracked INTEGER NOT NULL,  -- bit d-1: day d has a value
+          done INTEGER NOT NULL,     -- bit d-1: day d is '1'
+          PRIMARY KEY (user_id, month, habit_id)
+        ) WITHOUT ROWID
+        """
+    )
+    for name, body in _TRIGGERS.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {body}")
+
+    conn.execute("DELETE FROM habit_bits")
+    # One value per (user, date, habit), so SUM of the day bits is their OR
+    return conn.execute(
+        f"""
+        INSERT INTO habit_bits (user_id, month, habit_id, tracked, done)
+        SELECT de.user_id, substr(de.date, 1, 7), dv.habit_id,
+               SUM(1 << ({_DAY})), SUM((dv.value IS '1') << ({_DAY}))
+          FROM daily_values dv
+          JOIN daily_entries de ON de.id = dv.daily_entry_id
+         GROUP BY de.user_id, substr(de.date, 1, 7), dv.habit_id
+        """
+    ).rowcount
+
+
+def uninstall(conn: sqlite3.Connection) -> None:
+    for name in _TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.execute("DROP TABLE IF EXISTS habit_bits")
+
+
+def installed(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = 'habit_bits'").fetchone()
+    return row is not None
+
+
+class HabitBits(NamedTuple):
+    start: date                 # the day of bit 0
+    tracked: dict[int, int]     # habit_id -> days with a value
+    done: dict[int, int]        # habit_id -> days marked ✅
+
+    def bit(self, day: date) -> int:
+        return (day - self.start).days
+
+    def any_tracked(self) -> int:
+        """Days with a value for any habit."""
+        mask = 0
+        for m in self.tracked.values():
+            mask |= m
+        return mask
+
+    def all_done(self, habit_ids: Iterable[int]) -> int:
+        """Days with a value where every one of `habit_ids` is ✅ (mirrors the perfect-day rule)."""
+        mask = self.any_tracked()
+        for hid in habit_ids:
+            mask &= self.done.get(hid, 0)
+        return mask
+
+
+def streak(mask: int, end: int) -> int:
+    """Consecutive set bits ending at bit `end` (0 if `end` is clear)."""
+    if end < 0 or not (mask >> end) & 1:
+        return 0
+    window = (1 << (end + 1)) - 1
+    gaps = ~mask & window
+    return end + 1 if not gaps else end - (gaps.bit_length() - 1)
+
+
+def count(mask: int, first: int, last: int) -> int:
+    """Set bits in [first, last]."""
+    first = max(first, 0)
+    if last < first:
+        return 0
+    return ((mask >> first) & ((1 << (last - first + 1)) - 1)).bit_count()
+
+
+def _add_month(bits: HabitBits, habit_id: int, month: str, tracked: int, done: int) -> None:
+    offset = (date.fromisoformat(f"{month}-01") - bits.start).days
+    if offset < 0:
+        tracked >>= -offset
+        done >>= -offset
+    else:
+        tracked <<= offset
+        done <<= offset
+    if tracked:
+        bits.tracked[habit_id] = bits.tracked.get(habit_id, 0) | tracked
+    if done:
+        bits.done[habit_id] = bits.done.get(habit_id, 0) | done
+
+
+_ARCHIVED_MONTHS_SQL = """
+    SELECT a.habit_id AS habit_id, a.month AS month, a.tracked AS tracked, a.done AS done,
+           COALESCE(h.tracked, 0) AS hot
+      FROM archive.archive_months a
+      LEFT JOIN main.habit_bits h ON h.user_id = a.user_id AND h.month = a.month AND h.habit_id = a.habit_id
+     WHERE a.user_id = ? AND a.month >= ?
+"""
+
+
+def load(conn: sqlite3.Connection, user_id: int, start: date) -> HabitBits | None:
+    """The user's bitsets from `start` on, archived months included; None if not installed."""
+    if not installed(conn):
+        return None
+    bits = HabitBits(start, {}, {})
+    month = start.isoformat()[:7]
+    for r in conn.execute(
+        "SELECT habit_id, month, tracked, done FROM main.habit_bits WHERE user_id = ? AND month >= ?",
+        (user_id, month),
+    ):
+        _add_month(bits, int(r["habit_id"]), str(r["month"]), int(r["tracked"]), int(r["done"]))
+    if has_archive(conn):
+        # A hot value wins over the archived one for the same day (health_bot.archive)
+        for r in conn.execute(_ARCHIVED_MONTHS_SQL, (user_id, month)):
+            hot = int(r["hot"])
+            _add_month(bits, int(r["habit_id"]), str(r["month"]), int(r["tracked"]) & ~hot, int(r["done"]) & ~hot)
+    return bits
+
+
+def from_values(start: date, values_by_date: dict[str, dict[int, str]]) -> HabitBits:
+    """The same bitsets from rows (Storage.daily_values_since output)."""
+    bits = HabitBits(start, {}, {})
+    for ds, values in values_by_date.items():
+        i = (date.fromisoformat(ds) - start).days
+        if i < 0:
+            continue
+        for hid, value in values.items():
+            bits.tracked[hid] = bits.tracked.get(hid, 0) | (1 << i)
+            if value == "1":
+                bits.done[hid] = bits.done.get(hid, 0) | (1 << i)
+    return bits
@@ -1,5 +1,15 @@
+import asyncio
+import functools
+import logging
+from typing import Awaitable, Callable
+
 from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler, filters
+from health_bot import callbacks
 from health_bot.config import Settings
+from health_bot.edits import RenderedMessageCache
+from health_bot.sessions import UserSessionCache
+from health_bot.storage import open_storage
+from health_bot.writebuffer import CheckinWriteBuffer
 from health_bot.handlers import (
     start_handler,
     help_handler,
@@ -7,18 +17,91 @@ from health_bot.handlers import (
     join_handler,
     checkin_handler,
     checkin_callback_handler,
+    backfill_handler,
     today_handler,
     summary_handler,
-    set_reminder_handler, reminders_on_handler, reminders_off_handler,
+    set_reminder_handler, reminders_on_handler, reminders_off_handler, timezone_handler,
     weekly_handler, weekly_cancel_handler, weekly_input_handler,
     family_summary_handler, streaks_handler, weekly_show_handler,
+    insights_handler,
     menu_router_handler,
     menu_handler
 )
 
+log = logging.getLogger("health_bot.bot")
+
+StartHook = Callable[[Application], Awaitable[None]]
+
+
+async def _on_start(app: Application, on_started: StartHook | None = None) -> None:
+    # The storage (e.g. the Postgres pool) must be open before any job or update runs
+    await app.bot_data["storage"].open()
+    if on_started is not None:
+        # In the background: the bot takes updates now, not once every user's jobs are scheduled
+        app.bot_data["startup_task"] = asyncio.create_task(_run_start_hook(app, on_started))
+
+
+async def _run_start_hook(app: Application, on_started: StartHook) -> None:
+    t0 = asyncio.get_running_loop().time()
+    try:
+        await on_started(app)
+    except Exception:
+        log.exception("Startup hook failed")
+        return
+    log.info("Startup hook done in %.2fs", asyncio.get_running_loop().time() - t0)
+
+
+async def _on_stop(app: Application) -> None:
+    startup = app.bot_data.get("startup_task")
+    if startup is not None and not startup.done():
+        startup.cancel()
+
+    # Durability on shutdown: write any coalesced taps still in memory
+    buffer = app.bot_data.get("checkin_buffer")
+    if buffer is not None:
+        flushed = await buffer.flush_all()
+        log.info(
+            "Check-in buffer flushed on stop: %s key(s); %s taps in %s transactions total",
+            flushed,
+            buffer.taps,
+            buffer.transactions,
+        )
+
+    cache = app.bot_data.get("render_cache")
+    if cache is not None:
+        log.info("Check-in edits: %s", cache.stats())
+
+    sessions = app.bot_data.get("user_sessions")
+    if sessions is not None:
+        log.info("User sessions: %s", sessions.stats())
+
+    await app.bot_data["storage"].close()
+
+
+def build_application(settings: Settings, on_started: StartHook | None = None) -> Application:
+    """`on_started` runs in the background once the storage is open (schedule jobs there)."""
+    callbacks.configure(callbacks.secret_from_token(settings.telegram_bot_token))
+
+    builder = (
+        Application.builder()
+        .token(settings.telegram_bot_token)
+        .post_init(functools.partial(_on_start, on_started=on_started))
+        .post_stop(_on_stop)
+    )
+    if settings.bot_api_url:
+        builder = builder.base_url(settings.bot_api_url)
+    app = builder.build()
 
-def build_application(settings: Settings) -> Application:
-    app = Application.builder().token(settings.telegram_bot_token).build()
+    storage = open_storage(settings)
+    app.bot_data["storage"] = storage
+    if settings.checkin_coalesce_ms > 0:
+        app.bot_data["checkin_buffer"] = CheckinWriteBuffer(
+            storage,
+            window_seconds=settings.checkin_coalesce_ms / 1000,
+        )
+    app.bot_data["render_cache"] = RenderedMessageCache()
+    if settings.session_cache_ttl_seconds > 0:
+        app.bot_data["user_sessions"] = UserSessionCache(ttl_seconds=settings.session_cache_ttl_seconds)
 
     app.add_handler(CommandHandler("start", start_handler))
     app.add_handler(CommandHandler("help", help_handler))
@@ -28,17 +111,20 @@ def build_application(settings: Settings) -> Application:
 
     # NEW
     app.add_handler(CommandHandler("checkin", checkin_handler))
-    app.add_handler(CallbackQueryHandler(checkin_callback_handler, pattern=r"^(hc|hcp):"))
+    app.add_handler(CallbackQueryHandler(checkin_callback_handler, pattern=r"^(hc|hcp|h2):"))
+    app.add_handler(CommandHandler("backfill", backfill_handler))
     app.add_handler(CommandHandler("today", today_handler))
     app.add_handler(CommandHandler("summary", summary_handler))
     app.add_handler(CommandHandler("set_reminder", set_reminder_handler))
     app.add_handler(CommandHandler("reminders_on", reminders_on_handler))
     app.add_handler(CommandHandler("reminders_off", reminders_off_handler))
+    app.add_handler(CommandHandler("timezone", timezone_handler))
     app.add_handler(CommandHandler("weekly", weekly_handler))
     app.add_handler(CommandHandler("weekly_cancel", weekly_cancel_handler))
     app.add_handler(CommandHandler("weekly_show", weekly_show_handler))
     app.add_handler(CommandHandler("family_summary", family_summary_handler))
     app.add_handler(CommandHandler("streaks", streaks_handler))
+    app.add_handler(CommandHandler("insights", insights_handler))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, menu_router_handler))
 
     return app
\ No newline at end of file
@@ -0,0 +1,178 @@
+"""Compact, signed callback_data for inline keyboards.
+
+Layout (before base64url): version | action | habit_id | value code | page | day | tag
+
+- struct-packed, 10 bytes of body + 6 bytes of truncated HMAC-SHA256
+- "h2:" + 22 base64 chars, well below Telegram's 64-byte limit
+- values that don't fit a code (free text, large numbers, multi-field actions)
+  are kept in a short-lived server-side PayloadRegistry and referenced by token
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import secrets
+import struct
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import NamedTuple
+
+PREFIX = "h2:"
+VERSION = 1
+
+ACTION_SET = 1
+ACTION_PAGE = 2
+ACTION_OVERVIEW = 3
+ACTION_ALLOK = 4
+ACTION_REFRESH = 5
+ACTION_REF = 6  # habit_id field carries a PayloadRegistry token
+ACTION_INPUT = 7  # ask the user to type a value (number / text habits)
+ACTION_DAYS = 8  # open the date picker
+
+_BODY = struct.Struct(">BBIBBH")
+_TAG_LEN = 6
+
+# Small closed set of values that fit in one byte
+VALUE_CODES: dict[str, int] = {"0": 0, "1": 1, "😊": 2, "😐": 3, "😞": 4}
+_VALUES_BY_CODE = {v: k for k, v in VALUE_CODES.items()}
+NO_VALUE = 255
+
+PAGES = ("nutrition", "activity", "sleep", "discipline", "mental")
+
+# Dates travel as days since this epoch (0 = "today" in the user's timezone)
+DAY_EPOCH = date(2020, 1, 1)
+
+
+class CallbackData(NamedTuple):
+    action: int
+    habit_id: int
+    value: str
+    page: str
+    day: date | None
+
+
+def day_to_int(d: date | None) -> int:
+    return 0 if d is None else (d - DAY_EPOCH).days
+
+
+def int_to_day(n: int) -> date | None:
+    return None if n == 0 else DAY_EPOCH + timedelta(days=n)
+
+
+class PayloadRegistry:
+    """Short-lived server-side store for payloads too big for callback_data."""
+
+    def __init__(self, ttl_seconds: int = 2 * 24 * 3600, max_entries: int = 50_000) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._items: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+
+    def put(self, payload: dict) -> int:
+        token = secrets.randbits(32) or 1
+        while token in self._items:
+            token = secrets.randbits(32) or 1
+        self._items[token] = (time.monotonic() + self.ttl_seconds, payload)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+        return token
+
+    def get(self, token: int) -> dict | None:
+        item = self._items.get(token)
+        if item is None:
+            return None
+        expires_at, payload = item
+        if time.monotonic() > expires_at:
+            self._items.pop(token, None)
+            return None
+        return payload
+
+
+class CallbackCodec:
+    def __init__(self, secret: bytes, registry: PayloadRegistry | None = None) -> None:
+        self._secret = secret
+        self.registry = registry or PayloadRegistry()
+        # Caches of rendered keyboards key on this, so a new secret invalidates them
+        self.key_id = hashlib.sha256(b"key-id:" + secret).hexdigest()[:8]
+
+    def _tag(self, body: bytes) -> bytes:
+        return hmac.new(self._secret, body, hashlib.sha256).digest()[:_TAG_LEN]
+
+    def encode(
+        self,
+        action: int,
+        *,
+        habit_id: int = 0,
+        value: str = "",
+        page: str = PAGES[0],
+        day: date | None = None,
+    ) -> str:
+        code = NO_VALUE if value == "" else VALUE_CODES.get(value)
+        if code is None:
+            token = self.registry.put(
+                {"action": action, "habit_id": habit_id, "value": value, "page": page, "day": day}
+            )
+            return self.encode(ACTION_REF, habit_id=token, page=page, day=day)
+
+        page_idx = PAGES.index(page) if page in PAGES else 0
+        body = _BODY.pack(VERSION, action, habit_id, code, page_idx, day_to_int(day))
+        return PREFIX + base64.urlsafe_b64encode(body + self._tag(body)).rstrip(b"=").decode("ascii")
+
+    def decode(self, data: str) -> CallbackData | None:
+        """Return None for anything forged, malformed, from another version or expired."""
+        if not data.startswith(PREFIX):
+            return None
+        raw = data[len(PREFIX):]
+        try:
+            blob = base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4))
+        except (binascii.Error, ValueError):
+            return None
+        if len(blob) != _BODY.size + _TAG_LEN:
+            return None
+        # Reject non-canonical encodings (unused trailing bits set)
+        if base64.urlsafe_b64encode(blob).rstrip(b"=").decode("ascii") != raw:
+            return None
+
+        body, tag = blob[: _BODY.size], blob[_BODY.size:]
+        if not hmac.compare_digest(tag, self._tag(body)):
+            return None
+
+        version, action, habit_id, code, page_idx, day_n = _BODY.unpack(body)
+        if version != VERSION or page_idx >= len(PAGES):
+            return None
+
+        if action == ACTION_REF:
+            payload = self.registry.get(habit_id)
+            if payload is None:
+                return None
+            return CallbackData(
+                int(payload["action"]),
+                int(payload["habit_id"]),
+                str(payload["value"]),
+                str(payload["page"]),
+                payload["day"],
+            )
+
+        value = "" if code == NO_VALUE else _VALUES_BY_CODE.get(code)
+        if value is None:
+            return None
+        return CallbackData(action, habit_id, value, PAGES[page_idx], int_to_day(day_n))
+
+
+def secret_from_token(bot_token: str) -> bytes:
+    """Stable across restarts, so buttons in old messages keep working."""
+    return hashlib.sha256(b"health_bot/callbacks:" + bot_token.encode("utf-8")).digest()
+
+
+_codec = CallbackCodec(os.urandom(32))
+
+
+def configure(secret: bytes) -> CallbackCodec:
+    global _codec
+    _codec = CallbackCodec(secret)
+    return _codec
+
+
+def get_codec() -> CallbackCodec:
+    return _codec
@@ -0,0 +1,135 @@
+import json
+import sqlite3
+from typing import Iterable
+
+# Tables whose row changes are captured into `change_log`.
+# Order matters for replay into an empty DB (parents before children).
+TRACKED_TABLES = (
+    "households",
+    "users",
+    "habits",
+    "household_invites",
+    "daily_entries",
+    "daily_values",
+    "weekly_entries",
+)
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [str(r[1]) for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def install_change_log(conn: sqlite3.Connection) -> None:
+    """(Re)create change-capture triggers for all tracked tables.
+
+    Triggers are regenerated every time so that columns added by migrations
+    are included in the captured JSON.
+    """
+    for table in TRACKED_TABLES:
+        cols = _columns(conn, table)
+        if not cols:
+            continue
+
+        payload = ", ".join(f"'{c}', NEW.{c}" for c in cols)
+
+        conn.execute(f"DROP TRIGGER IF EXISTS cl_{table}_ins")
+        conn.execute(f"DROP TRIGGER IF EXISTS cl_{table}_upd")
+        conn.execute(f"DROP TRIGGER IF EXISTS cl_{table}_del")
+
+        conn.execute(
+            f"""
+            CREATE TRIGGER cl_{table}_ins AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO change_log (tbl, op, row_id, data)
+                VALUES ('{table}', 'I', NEW.id, json_object({payload}));
+            END
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER cl_{table}_upd AFTER UPDATE ON {table}
+            BEGIN
+                INSERT INTO change_log (tbl, op, row_id, data)
+                VALUES ('{table}', 'U', NEW.id, json_object({payload}));
+            END
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER cl_{table}_del AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO change_log (tbl, op, row_id, data)
+                VALUES ('{table}', 'D', OLD.id, NULL);
+            END
+            """
+        )
+
+
+def drop_change_log_triggers(conn: sqlite3.Connection) -> None:
+    for table in TRACKED_TABLES:
+        for suffix in ("ins", "upd", "del"):
+            conn.execute(f"DROP TRIGGER IF EXISTS cl_{table}_{suffix}")
+
+
+def last_change_id(conn: sqlite3.Connection) -> int:
+    """Highest change id ever allocated in this DB (survives log truncation)."""
+    row = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'change_log'"
+    ).fetchone()
+    return int(row[0]) if row else 0
+
+
+def set_last_change_id(conn: sqlite3.Connection, change_id: int) -> None:
+    conn.execute("DELETE FROM sqlite_sequence WHERE name = 'change_log'")
+    conn.execute(
+        "INSERT INTO sqlite_sequence (name, seq) VALUES ('change_log', ?)",
+        (int(change_id),),
+    )
+
+
+def read_changes(conn: sqlite3.Connection, after_id: int = 0) -> list[dict]:
+    rows = conn.execute(
+        """
+        SELECT id, ts, tbl, op, row_id, data
+          FROM change_log
+         WHERE id > ?
+         ORDER BY id ASC
+        """,
+        (int(after_id),),
+    ).fetchall()
+    return [
+        {
+            "id": int(r[0]),
+            "ts": str(r[1]),
+            "tbl": str(r[2]),
+            "op": str(r[3]),
+            "row_id": int(r[4]),
+            "data": json.loads(r[5]) if r[5] is not None else None,
+        }
+        for r in rows
+    ]
+
+
+def apply_changes(conn: sqlite3.Connection, changes: Iterable[dict]) -> int:
+    """Replay captured changes (last-write-wins per row). Returns last applied id.
+
+    Caller is responsible for disabling foreign keys and triggers on `conn`.
+    """
+    last_id = 0
+    for ch in changes:
+        table = ch["tbl"]
+        if table not in TRACKED_TABLES:
+            continue
+
+        if ch["op"] == "D":
+            conn.execute(f"DELETE FROM {table} WHERE id = ?", (ch["row_id"],))
+        else:
+            data = ch["data"] or {}
+            cols = list(data.keys())
+            conn.execute(
+                f"INSERT OR REPLACE INTO {table} ({', '.join(cols)}) "
+                f"VALUES ({', '.join('?' for _ in cols)})",
+                [data[c] for c in cols],
+            )
+        last_id = int(ch["id"])
+    return last_id
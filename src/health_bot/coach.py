@@ -0,0 +1,235 @@
+"""Weekly "coach" reports, precomputed in the background.
+
+Once a week (before the Sunday weekly reminder) `generate_weekly_reports`
+loads each user's last 14 days as a dense days × habits matrix, computes
+per-habit rates, consistency gaps, streak breaks and a pairwise correlation
+matrix with NumPy in a process pool, and stores the result as JSON in
+`weekly_reports`. /weekly_show only reads and renders the stored report.
+"""
+import json
+import logging
+import sqlite3
+from datetime import date, timedelta
+
+import numpy as np
+
+from health_bot import timezones
+from health_bot.db import ShardConnections, connect
+from health_bot.insights import dense_matrix, goal_attainment, load_history, pairwise_correlation, run_in_pool
+
+log = logging.getLogger("health_bot.coach")
+
+REPORT_VERSION = 1
+WINDOW_DAYS = 14
+MIN_PAIR_DAYS = 5           # correlations need at least this many shared days
+MIN_ABS_CORRELATION = 0.4
+STREAK_BREAK_MIN = 3        # a miss after >= this many goal days in a row
+
+
+def _user_payload(conn: sqlite3.Connection, user_id: int, household_id: int, today: date) -> dict:
+    """Everything compute_report needs, as plain picklable data."""
+    payload = load_history(conn, user_id, household_id, today, WINDOW_DAYS)
+    payload["week_start"] = (today - timedelta(days=today.weekday())).isoformat()
+    return payload
+
+
+def compute_report(payload: dict) -> tuple[int, str, dict]:
+    """Pure function, runs in a worker process. Returns (user_id, week_start, report)."""
+    dates: list[str] = payload["dates"]
+    habits = payload["habits"]
+
+    x = dense_matrix(payload)
+    attained = goal_attainment(x, habits)
+
+    week, prev = slice(WINDOW_DAYS - 7, WINDOW_DAYS), slice(0, WINDOW_DAYS - 7)
+    tracked_week = (~np.isnan(x[week])).sum(axis=0)
+
+    def _mean(a: np.ndarray) -> np.ndarray:
+        counts = (~np.isnan(a)).sum(axis=0)
+        sums = np.nansum(a, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    rate_week, rate_prev = _mean(attained[week]), _mean(attained[prev])
+    avg_week = _mean(x[week])
+
+    def _f(v) -> float | None:
+        return None if v is None or not np.isfinite(v) else round(float(v), 3)
+
+    per_habit = [
+        {
+            "id": hid,
+            "title": title,
+            "kind": kind,
+            "tracked": int(tracked_week[j]),
+            "rate": _f(rate_week[j]),
+            "prev_rate": _f(rate_prev[j]),
+            "avg": _f(avg_week[j]),
+        }
+        for j, (hid, title, kind, _) in enumerate(habits)
+    ]
+
+    # Consistency gaps: days without any value, habits tracked on fewer than 4 of 7 days
+    missed_days = [dates[week.start + i] for i, row in enumerate(x[week]) if np.isnan(row).all()]
+    gaps = [
+        {"title": h["title"], "tracked": h["tracked"]}
+        for h in sorted(per_habit, key=lambda h: h["tracked"])
+        if h["tracked"] < 4 and len(missed_days) < 7
+    ]
+
+    # Streak breaks: a missed goal right after STREAK_BREAK_MIN met days in a row
+    breaks = []
+    for j, (_, title, _, _) in enumerate(habits):
+        run = 0
+        for i in range(len(dates)):
+            a = attained[i, j]
+            if a == 1.0:
+                run += 1
+                continue
+            if run >= STREAK_BREAK_MIN and i >= week.start:
+                breaks.append({"title": title, "date": dates[i], "streak": run})
+            run = 0
+
+    # Correlations over the whole window; pairs with a mood habit first
+    r, n = pairwise_correlation(x, MIN_PAIR_DAYS)
+    kinds = [kind for _, _, kind, _ in habits]
+    pairs = []
+    for i in range(len(habits)):
+        for j in range(i + 1, len(habits)):
+            if np.isnan(r[i, j]) or abs(r[i, j]) < MIN_ABS_CORRELATION:
+                continue
+            pairs.append(
+                {
+                    "a": habits[i][1],
+                    "b": habits[j][1],
+                    "r": round(float(r[i, j]), 2),
+                    "n": int(n[i, j]),
+                    "mood": "choice" in (kinds[i], kinds[j]),
+                }
+            )
+    pairs.sort(key=lambda p: (not p["mood"], -abs(p["r"])))
+
+    report = {
+        "version": REPORT_VERSION,
+        "week_start": payload["week_start"],
+        "dates": [dates[0], dates[-1]],
+        "checkin_days": 7 - len(missed_days),
+        "habits": per_habit,
+        "missed_days": missed_days,
+        "gaps": gaps[:5],
+        "streak_breaks": breaks[:5],
+        "correlations": pairs[:5],
+    }
+    return payload["user_id"], payload["week_start"], report
+
+
+def generate_weekly_reports(
+    db_path: str,
+    *,
+    timezone: str,
+    only_timezone: str | None = None,
+    max_workers: int = 2,
+) -> int:
+    """Compute and store this week's report for every user (or users in one zone).
+
+    Blocking: call from a thread (see scheduler) or a script. Returns reports stored.
+    """
+    with ShardConnections(db_path) as shards:
+        users = shards.shard(0).execute(
+            "SELECT id, household_id, timezone FROM users WHERE household_id IS NOT NULL"
+        ).fetchall()
+        payloads = []
+        for u in users:
+            tz_name = (u["timezone"] or timezone).strip() or timezone
+            if only_timezone is not None and tz_name != only_timezone:
+                continue
+            household_id = int(u["household_id"])
+            payloads.append(
+                _user_payload(shards.for_household(household_id), int(u["id"]), household_id, timezones.today(tz_name))
+            )
+
+    if not payloads:
+        return 0
+
+    results = run_in_pool(compute_report, payloads, max_workers)
+
+    conn = connect(db_path)
+    try:
+        conn.executemany(
+            """
+            INSERT INTO weekly_reports (user_id, week_start_date, report)
+            VALUES (?, ?, ?)
+            ON CONFLICT(user_id, week_start_date)
+            DO UPDATE SET report = excluded.report, created_at = datetime('now')
+            """,
+            [(uid, week_start, json.dumps(report, ensure_ascii=False)) for uid, week_start, report in results],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    log.info("Stored %s weekly report(s)%s", len(results), f" for {only_timezone}" if only_timezone else "")
+    return len(results)
+
+
+def load_latest_report(conn: sqlite3.Connection, user_id: int, week_start: str) -> dict | None:
+    """Most recent stored report for a week starting on or before week_start."""
+    row = conn.execute(
+        """
+        SELECT report
+          FROM weekly_reports
+         WHERE user_id = ? AND week_start_date <= ?
+         ORDER BY week_start_date DESC
+         LIMIT 1
+        """,
+        (user_id, week_start),
+    ).fetchone()
+    return json.loads(row["report"]) if row else None
+
+
+def _pct(v: float | None) -> str:
+    return "—" if v is None else f"{int(round(v * 100))}%"
+
+
+def render_report(report: dict) -> str:
+    lines = [
+        f"🧭 Coach — week of {report['week_start']}",
+        f"Checked in {report['checkin_days']}/7 days",
+        "",
+    ]
+
+    rated = [h for h in report["habits"] if h["rate"] is not None]
+    if rated:
+        lines.append("🎯 Goal rates (vs previous week):")
+        for h in sorted(rated, key=lambda h: h["rate"]):
+            trend = ""
+            if h["prev_rate"] is not None:
+                delta = h["rate"] - h["prev_rate"]
+                trend = " ↗️" if delta > 0.05 else (" ↘️" if delta < -0.05 else " →")
+            lines.append(f"• {h['title']}: {_pct(h['rate'])}{trend} (was {_pct(h['prev_rate'])})")
+        lines.append("")
+
+    if report["gaps"] or report["missed_days"]:
+        lines.append("🕳️ Consistency gaps:")
+        if len(report["missed_days"]) == 7:
+            lines.append("• No check-ins this week")
+        elif report["missed_days"]:
+            lines.append(f"• No check-in on {', '.join(report['missed_days'])}")
+        for g in report["gaps"]:
+            lines.append(f"• {g['title']}: tracked {g['tracked']}/7 days")
+        lines.append("")
+
+    if report["streak_breaks"]:
+        lines.append("💔 Streak breaks:")
+        for b in report["streak_breaks"]:
+            lines.append(f"• {b['title']}: {b['streak']}-day run ended on {b['date']}")
+        lines.append("")
+
+    if report["correlations"]:
+        lines.append("🔗 Moves together (last 14 days):")
+        for c in report["correlations"]:
+            sign = "↑↑" if c["r"] > 0 else "↑↓"
+            lines.append(f"• {c['a']} {sign} {c['b']} (r={c['r']:+.2f}, {c['n']} days)")
+        lines.append("")
+
+    return "\n".join(lines).rstrip()
@@ -10,6 +10,72 @@ class Settings:
     db_path: str
     log_level: str
 
+    # SQLite tuning (profile from health_bot.db.SQLITE_PROFILES; None = profile value)
+    sqlite_profile: str = "default"
+    sqlite_cache_size_kib: int | None = None
+    sqlite_mmap_size: int | None = None
+    sqlite_busy_timeout_ms: int | None = None
+    sqlite_wal_autocheckpoint: int | None = None
+
+    # Daily data split across this many SQLite files by household (1 = single file)
+    sqlite_shards: int = 1
+
+    # WAL checkpoints: PASSIVE every N minutes, TRUNCATE once a day at quiet hour
+    checkpoint_interval_minutes: int = 15
+    checkpoint_quiet_hour: int = 4
+
+    # Coalesce check-in taps within this window into one write (0 = write every tap)
+    checkin_coalesce_ms: int = 400
+
+    # Cache users rows (id, household, timezone) in memory for this long (0 = always query)
+    session_cache_ttl_seconds: int = 600
+
+    # Worker processes for the weekly coach report batch (1 = compute inline)
+    coach_workers: int = 2
+
+    # Habit template copied into every new household
+    fields_path: str = "fields.txt"
+
+    # Where bot state lives: "sqlite" (db_path) or "postgres" (database_url, see health_bot.storage)
+    storage_backend: str = "sqlite"
+    database_url: str = ""
+    pg_pool_min_size: int = 1
+    pg_pool_max_size: int = 10
+
+    # Bot processes: 0 = polling in this process; N >= 1 = webhook ingress + N workers (health_bot.workers)
+    workers: int = 0
+    webhook_listen: str = "127.0.0.1"
+    webhook_port: int = 8443
+    webhook_url: str = ""     # public URL registered with Telegram ("" = don't register)
+    webhook_secret: str = ""  # checked against X-Telegram-Bot-Api-Secret-Token
+    ingress_record_path: str = ""  # append every received update here (NDJSON) for scripts/replay_updates.py
+
+    # Bot API endpoint ("" = Telegram's); e.g. a local Bot API server or the replay stub
+    bot_api_url: str = ""
+
+    # Reminders: stored in the DB and sent by one tick job every N seconds (health_bot.scheduler).
+    # Reminders missed by more than the grace (e.g. the bot was down) are skipped, not sent late.
+    reminder_tick_seconds: int = 30
+    reminder_misfire_grace_minutes: int = 180
+
+    # Retention: nightly, boolean and mood values older than this many days move to the
+    # archive DB as monthly bitmaps (health_bot.archive). 0 = keep everything in daily_values.
+    retention_days: int = 0
+
+    # Keep per-habit day bitsets next to daily_values for /streaks and /summary (health_bot.bitmaps).
+    # Applied by scripts/init_db.py: installs (and backfills) or drops the table and its triggers.
+    habit_bitmaps: bool = False
+
+
+def _env_int(name: str, default: int | None = None) -> int | None:
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        raise RuntimeError(f"{name} must be an integer, got {raw!r}")
+
 
 def load_settings() -> Settings:
     load_dotenv()
@@ -23,4 +89,31 @@ def load_settings() -> Settings:
         timezone=os.getenv("TIMEZONE", "Europe/Kiev").strip(),
         db_path=os.getenv("DB_PATH", "db/health_bot.sqlite3").strip(),
         log_level=os.getenv("LOG_LEVEL", "INFO").strip(),
-    )
\ No newline at end of file
+        sqlite_profile=os.getenv("SQLITE_PROFILE", "default").strip(),
+        sqlite_cache_size_kib=_env_int("SQLITE_CACHE_SIZE_KIB"),
+        sqlite_mmap_size=_env_int("SQLITE_MMAP_SIZE"),
+        sqlite_busy_timeout_ms=_env_int("SQLITE_BUSY_TIMEOUT_MS"),
+        sqlite_wal_autocheckpoint=_env_int("SQLITE_WAL_AUTOCHECKPOINT"),
+        sqlite_shards=_env_int("SQLITE_SHARDS", 1),
+        checkpoint_interval_minutes=_env_int("CHECKPOINT_INTERVAL_MINUTES", 15),
+        checkpoint_quiet_hour=_env_int("CHECKPOINT_QUIET_HOUR", 4),
+        checkin_coalesce_ms=_env_int("CHECKIN_COALESCE_MS", 400),
+        session_cache_ttl_seconds=_env_int("SESSION_CACHE_TTL_SECONDS", 600),
+        coach_workers=_env_int("COACH_WORKERS", 2),
+        fields_path=os.getenv("FIELDS_PATH", "fields.txt").strip() or "fields.txt",
+        storage_backend=os.getenv("STORAGE_BACKEND", "sqlite").strip().lower() or "sqlite",
+        database_url=os.getenv("DATABASE_URL", "").strip(),
+        pg_pool_min_size=_env_int("PG_POOL_MIN_SIZE", 1),
+        pg_pool_max_size=_env_int("PG_POOL_MAX_SIZE", 10),
+        workers=_env_int("WORKERS", 0),
+        webhook_listen=os.getenv("WEBHOOK_LISTEN", "127.0.0.1").strip() or "127.0.0.1",
+        webhook_port=_env_int("WEBHOOK_PORT", 8443),
+        webhook_url=os.getenv("WEBHOOK_URL", "").strip(),
+        webhook_secret=os.getenv("WEBHOOK_SECRET", "").strip(),
+        ingress_record_path=os.getenv("INGRESS_RECORD_PATH", "").strip(),
+        bot_api_url=os.getenv("BOT_API_URL", "").strip(),
+        reminder_tick_seconds=_env_int("REMINDER_TICK_SECONDS", 30),
+        reminder_misfire_grace_minutes=_env_int("REMINDER_MISFIRE_GRACE_MINUTES", 180),
+        retention_days=_env_int("RETENTION_DAYS", 0),
+        habit_bitmaps=bool(_env_int("HABIT_BITMAPS", 0)),
+    )
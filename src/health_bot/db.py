@@ -1,6 +1,58 @@
 import sqlite3
+from dataclasses import dataclass, replace
 from pathlib import Path
 
+from health_bot.changelog import install_change_log
+
+
+@dataclass(frozen=True)
+class SqliteTuning:
+    cache_size_kib: int = 2000          # PRAGMA cache_size = -N (KiB)
+    mmap_size: int = 0                  # bytes, 0 = off
+    busy_timeout_ms: int = 5000
+    wal_autocheckpoint: int = 1000      # pages
+    journal_size_limit: int = 64 * 1024 * 1024  # truncate WAL to this after checkpoints
+    temp_store: str = "DEFAULT"         # DEFAULT | FILE | MEMORY
+
+
+SQLITE_PROFILES: dict[str, SqliteTuning] = {
+    # SQLite defaults + busy timeout (what the bot always ran with)
+    "default": SqliteTuning(),
+    # Bursty check-ins on a box with spare RAM
+    "throughput": SqliteTuning(
+        cache_size_kib=32_000,
+        mmap_size=256 * 1024 * 1024,
+        busy_timeout_ms=10_000,
+        wal_autocheckpoint=4000,
+        temp_store="MEMORY",
+    ),
+    # Small machines: keep cache and WAL small
+    "low_memory": SqliteTuning(
+        cache_size_kib=1000,
+        busy_timeout_ms=5000,
+        wal_autocheckpoint=500,
+        journal_size_limit=8 * 1024 * 1024,
+        temp_store="FILE",
+    ),
+}
+
+_tuning = SQLITE_PROFILES["default"]
+
+
+def tuning_for(profile: str, **overrides) -> SqliteTuning:
+    """Build a tuning profile; None overrides keep the profile value."""
+    base = SQLITE_PROFILES.get(profile)
+    if base is None:
+        raise RuntimeError(f"Unknown SQLite profile: {profile!r}")
+    return replace(base, **{k: v for k, v in overrides.items() if v is not None})
+
+
+def configure(tuning: SqliteTuning) -> None:
+    """Set the tuning applied by every subsequent `connect()` in this process."""
+    global _tuning
+    _tuning = tuning
+
+
 def _ensure_user_columns(conn: sqlite3.Connection) -> None:
     cols = {row["name"] for row in conn.execute("PRAGMA table_info(users)").fetchall()}
 
@@ -13,18 +65,437 @@ def _ensure_user_columns(conn: sqlite3.Connection) -> None:
         # HH:MM in user's timezone
         conn.execute("ALTER TABLE users ADD COLUMN reminder_time TEXT")
 
-def connect(db_path: str) -> sqlite3.Connection:
+def _ensure_household_columns(conn: sqlite3.Connection) -> None:
+    cols = {row["name"] for row in conn.execute("PRAGMA table_info(households)").fetchall()}
+
+    if "owner_telegram_user_id" not in cols:
+        conn.execute("ALTER TABLE households ADD COLUMN owner_telegram_user_id INTEGER")
+
+
+# Numeric projection of a stored value, by habit kind:
+#   boolean -> 1 / 0, number -> the number, choice (mood) -> 1 / 0 / -1, text -> NULL
+MOOD_SCORES = {"😊": 1, "😐": 0, "😞": -1}
+
+VALUE_NUM_SQL = """
+    CASE {kind}
+        WHEN 'boolean' THEN CASE {value} WHEN '1' THEN 1.0 WHEN '0' THEN 0.0 END
+        WHEN 'number' THEN CAST({value} AS REAL)
+        WHEN 'choice' THEN CASE {value} WHEN '😊' THEN 1.0 WHEN '😐' THEN 0.0 WHEN '😞' THEN -1.0 END
+    END
+"""
+
+
+def _ensure_daily_value_columns(conn: sqlite3.Connection) -> None:
+    cols = {row["name"] for row in conn.execute("PRAGMA table_info(daily_values)").fetchall()}
+
+    if "value_num" not in cols:
+        conn.execute("ALTER TABLE daily_values ADD COLUMN value_num REAL")
+        conn.execute(
+            f"""
+            UPDATE daily_values
+               SET value_num = (
+                   SELECT {VALUE_NUM_SQL.format(kind="h.kind", value="daily_values.value")}
+                     FROM habits h
+                    WHERE h.id = daily_values.habit_id
+               )
+            """
+        )
+
+
+def ensure_daily_value_indexes(conn: sqlite3.Connection) -> None:
+    """The secondary daily_values indexes of this file (db/shard_schema.sql has the same)."""
+    # Covering index for per-user stats (daily_entries(user_id, date) -> values):
+    # aggregates over value_num never touch the daily_values table rows.
+    # Lives here, not in schema.sql, because value_num may only exist after the migration above.
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS main.idx_daily_values_entry_num
+            ON daily_values (daily_entry_id, habit_id, value_num)
+        """
+    )
+    # Per-habit scans across all users (dashboard)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS main.idx_daily_values_habit ON daily_values (habit_id, daily_entry_id)"
+    )
+
+
+def _ensure_indexes(conn: sqlite3.Connection) -> None:
+    ensure_daily_value_indexes(conn)
+    # One household per owner; create_household relies on it for ON CONFLICT
+    conn.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_households_owner
+            ON households (owner_telegram_user_id)
+        """
+    )
+    _ensure_unique_habit_titles(conn)
+
+
+def _ensure_unique_habit_titles(conn: sqlite3.Connection) -> None:
+    # The seeder upserts ON CONFLICT(household_id, title). Older seeds could store
+    # a title twice: keep the oldest row, rename and disable the others (their
+    # history stays attached to them).
+    dupes = conn.execute(
+        """
+        SELECT h.id, h.title
+          FROM habits h
+         WHERE EXISTS (
+               SELECT 1 FROM habits o
+                WHERE o.household_id = h.household_id AND o.title = h.title AND o.id < h.id
+         )
+        """
+    ).fetchall()
+    conn.executemany(
+        "UPDATE habits SET title = ?, enabled = 0 WHERE id = ?",
+        [(f"{r['title']} (#{r['id']})", int(r["id"])) for r in dupes],
+    )
+    conn.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_habits_household_title
+            ON habits (household_id, title)
+        """
+    )
+
+
+def connect(db_path: str, tuning: SqliteTuning | None = None) -> sqlite3.Connection:
+    t = tuning or _tuning
     Path(db_path).parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(db_path)
+    conn = sqlite3.connect(db_path, timeout=t.busy_timeout_ms / 1000)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON;")
     conn.execute("PRAGMA journal_mode = WAL;")
     conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute(f"PRAGMA busy_timeout = {int(t.busy_timeout_ms)};")
+    conn.execute(f"PRAGMA cache_size = -{int(t.cache_size_kib)};")
+    conn.execute(f"PRAGMA mmap_size = {int(t.mmap_size)};")
+    conn.execute(f"PRAGMA wal_autocheckpoint = {int(t.wal_autocheckpoint)};")
+    conn.execute(f"PRAGMA journal_size_limit = {int(t.journal_size_limit)};")
+    conn.execute(f"PRAGMA temp_store = {t.temp_store};")
     return conn
 
 
+def checkpoint(conn: sqlite3.Connection, mode: str = "PASSIVE") -> tuple[int, int, int]:
+    """Run a WAL checkpoint. Returns (busy, wal_frames, checkpointed_frames)."""
+    if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+        raise ValueError(f"Invalid checkpoint mode: {mode}")
+    row = conn.execute(f"PRAGMA wal_checkpoint({mode});").fetchone()
+    return int(row[0]), int(row[1]), int(row[2])
+
+
+def get_or_create_daily_entry_id(conn: sqlite3.Connection, user_id: int, date_str: str) -> int:
+    row = conn.execute(
+        "SELECT id FROM daily_entries WHERE user_id = ? AND date = ?",
+        (user_id, date_str),
+    ).fetchone()
+    if row:
+        return int(row["id"])
+
+    cur = conn.execute(
+        "INSERT INTO daily_entries (user_id, date) VALUES (?, ?)",
+        (user_id, date_str),
+    )
+    return int(cur.lastrowid)
+
+
+_UPSERT_VALUE_SQL = f"""
+    INSERT INTO daily_values (daily_entry_id, habit_id, value, value_num)
+    SELECT {{entry_id}}, h.id, :value, {VALUE_NUM_SQL.format(kind="h.kind", value=":value")}
+      FROM {{source}}
+     WHERE h.id = :habit_id{{where}}
+    ON CONFLICT(daily_entry_id, habit_id)
+    DO UPDATE SET value = excluded.value,
+                 value_num = excluded.value_num,
+                 updated_at = datetime('now')
+"""
+
+
+def upsert_daily_values(conn: sqlite3.Connection, daily_entry_id: int, values: dict[int, str]) -> None:
+    """Write {habit_id: value} for one daily entry (caller commits).
+
+    value_num is derived in SQL from the habit kind, so every write path
+    keeps the typed column in sync.
+    """
+    conn.executemany(
+        _UPSERT_VALUE_SQL.format(entry_id=":entry_id", source="habits h", where=""),
+        [
+            {"entry_id": daily_entry_id, "habit_id": int(hid), "value": value}
+            for hid, value in values.items()
+        ],
+    )
+
+
+def upsert_daily_values_for_dates(
+    conn: sqlite3.Connection,
+    user_id: int,
+    dates: list[str],
+    values: dict[int, str],
+) -> int:
+    """Write the same {habit_id: value} to every date (backfill). Caller commits.
+
+    Returns the number of values written.
+    """
+    return upsert_daily_value_rows(
+        conn, [(user_id, d, hid, value) for d in dates for hid, value in values.items()]
+    )
+
+
+def upsert_daily_value_rows(conn: sqlite3.Connection, rows: list[tuple[int, str, int, str]]) -> int:
+    """Write (user_id, date, habit_id, value) rows. Caller commits.
+
+    One executemany creates the missing daily entries, one more writes all
+    values; returns the number of values written.
+    """
+    conn.executemany(
+        "INSERT INTO daily_entries (user_id, date) VALUES (?, ?) ON CONFLICT(user_id, date) DO NOTHING",
+        sorted({(int(user_id), d) for user_id, d, _, _ in rows}),
+    )
+    params = [
+        {"user_id": int(user_id), "date": d, "habit_id": int(hid), "value": value}
+        for user_id, d, hid, value in rows
+    ]
+    conn.executemany(
+        _UPSERT_VALUE_SQL.format(
+            entry_id="de.id",
+            source="daily_entries de JOIN habits h",
+            where=" AND de.user_id = :user_id AND de.date = :date",
+        ),
+        params,
+    )
+    return len(params)
+
+
 def init_db(conn: sqlite3.Connection, schema_path: str = "db/schema.sql") -> None:
     schema = Path(schema_path).read_text(encoding="utf-8")
     conn.executescript(schema)
     _ensure_user_columns(conn)
-    conn.commit()
\ No newline at end of file
+    _ensure_household_columns(conn)
+    _ensure_daily_value_columns(conn)
+    _ensure_indexes(conn)
+    install_change_log(conn)
+    conn.commit()
+
+# -------------------------
+# Sharding: daily data of a household lives in one of N SQLite files
+# -------------------------
+#
+# Shard 0 is the directory DB itself (`db_path`): users, households, habits,
+# weekly data, shard_map, and the daily data of households mapped to it.
+# Shards 1..N-1 are `<stem>.shard<k>.sqlite3` next to it with only the daily
+# tables (db/shard_schema.sql); their connections ATTACH the directory as
+# `dir`, so unqualified queries joining habits/users work unchanged. Each file
+# has its own WAL writer, which is what lets write throughput scale.
+
+_shard_count = 1
+_shard_cache: dict[tuple[str, int], int] = {}
+
+
+def configure_shards(count: int) -> None:
+    """Set the number of shards (1 = everything in db_path, the default)."""
+    global _shard_count
+    if count < 1:
+        raise RuntimeError(f"Shard count must be >= 1, got {count}")
+    _shard_count = count
+    _shard_cache.clear()
+
+
+def shard_count() -> int:
+    return _shard_count
+
+
+def shard_path(db_path: str, shard: int) -> str:
+    if shard == 0:
+        return db_path
+    p = Path(db_path)
+    return str(p.with_name(f"{p.stem}.shard{shard}{p.suffix}"))
+
+
+def existing_shards(db_path: str) -> list[int]:
+    """Shard 0 plus every shard file on disk (for scripts that don't load settings)."""
+    p = Path(db_path)
+    found = {0}
+    for f in p.parent.glob(f"{p.stem}.shard*{p.suffix}"):
+        n = f.name[len(p.stem) + len(".shard"): len(f.name) - len(p.suffix)]
+        if n.isdigit():
+            found.add(int(n))
+    return sorted(found)
+
+
+def configure_shards_from_files(db_path: str) -> int:
+    """configure_shards() to cover every shard file on disk; returns the count."""
+    count = max(existing_shards(db_path)) + 1
+    configure_shards(count)
+    return count
+
+
+def assign_shard(conn: sqlite3.Connection, household_id: int) -> int:
+    """Place a new household (directory connection; caller commits)."""
+    shard = int(household_id) % _shard_count
+    if shard != 0:
+        conn.execute(
+            "INSERT OR IGNORE INTO shard_map (household_id, shard) VALUES (?, ?)",
+            (int(household_id), shard),
+        )
+    return shard
+
+
+def shard_for_household(db_path: str, household_id: int) -> int:
+    if _shard_count == 1:
+        return 0  # check_shard_map (init_shards, startup) guarantees shard_map is empty then
+    key = (db_path, int(household_id))
+    shard = _shard_cache.get(key)
+    if shard is None:
+        conn = connect(db_path)
+        try:
+            row = conn.execute("SELECT shard FROM shard_map WHERE household_id = ?", (int(household_id),)).fetchone()
+        finally:
+            conn.close()
+        shard = int(row["shard"]) if row else 0
+        _shard_cache[key] = shard
+    return shard
+
+
+def connect_shard(db_path: str, shard: int, tuning: SqliteTuning | None = None) -> sqlite3.Connection:
+    if shard == 0:
+        conn = connect(db_path, tuning)
+    else:
+        conn = connect(shard_path(db_path, shard), tuning)
+        conn.execute("ATTACH DATABASE ? AS dir", (db_path,))
+    archive = archive_path(db_path)
+    if Path(archive).exists():
+        conn.execute("ATTACH DATABASE ? AS archive", (archive,))
+    return conn
+
+
+def connect_for_household(db_path: str, household_id: int) -> sqlite3.Connection:
+    """Connection to the shard holding this household's daily data."""
+    return connect_shard(db_path, shard_for_household(db_path, household_id))
+
+
+class ShardConnections:
+    """One lazily opened connection per shard, for batch jobs over many households."""
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._conns: dict[int, sqlite3.Connection] = {}
+
+    def shard(self, shard: int) -> sqlite3.Connection:
+        conn = self._conns.get(shard)
+        if conn is None:
+            conn = self._conns[shard] = connect_shard(self.db_path, shard)
+        return conn
+
+    def for_household(self, household_id: int) -> sqlite3.Connection:
+        return self.shard(shard_for_household(self.db_path, household_id))
+
+    def close(self) -> None:
+        for conn in self._conns.values():
+            conn.close()
+        self._conns.clear()
+
+    def __enter__(self) -> "ShardConnections":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def move_user_data(db_path: str, user_ids: list[int], src: int, dst: int) -> int:
+    """Copy users' daily entries/values from shard src to dst, then delete them
+    from src. Returns values copied. Re-running after an interruption is safe:
+    with WAL the two files commit separately, and rows already copied are skipped."""
+    if src == dst or not user_ids:
+        return 0
+    conn = connect_shard(db_path, dst)
+    try:
+        if src == 0:
+            source = "dir"
+        else:
+            conn.execute("ATTACH DATABASE ? AS src", (shard_path(db_path, src),))
+            source = "src"
+        ids = ",".join(str(int(u)) for u in user_ids)
+        conn.execute(
+            f"""
+            INSERT INTO main.daily_entries (user_id, date, created_at, updated_at)
+            SELECT user_id, date, created_at, updated_at
+              FROM {source}.daily_entries
+             WHERE user_id IN ({ids})
+            ON CONFLICT(user_id, date) DO NOTHING
+            """
+        )
+        moved = conn.execute(
+            f"""
+            INSERT INTO main.daily_values (daily_entry_id, habit_id, value, value_num, created_at, updated_at)
+            SELECT ne.id, sv.habit_id, sv.value, sv.value_num, sv.created_at, sv.updated_at
+              FROM {source}.daily_values sv
+              JOIN {source}.daily_entries se ON se.id = sv.daily_entry_id
+              JOIN main.daily_entries ne ON ne.user_id = se.user_id AND ne.date = se.date
+             WHERE se.user_id IN ({ids})
+            ON CONFLICT(daily_entry_id, habit_id) DO NOTHING
+            """
+        ).rowcount
+        conn.execute(f"DELETE FROM {source}.daily_entries WHERE user_id IN ({ids})")  # values cascade
+        conn.execute(f"DELETE FROM {source}.user_data_versions WHERE user_id IN ({ids})")
+        conn.commit()
+        return moved
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def check_shard_map(db_path: str) -> None:
+    """Refuse a shard count below what shard_map already uses (households would be lost)."""
+    if not Path(db_path).exists():
+        return  # not initialized yet: shard_map is empty
+    conn = connect(db_path)
+    try:
+        row = conn.execute("SELECT MAX(shard) AS m FROM shard_map").fetchone()
+    finally:
+        conn.close()
+    if row["m"] is not None and int(row["m"]) >= _shard_count:
+        raise RuntimeError(
+            f"shard_map uses shard {int(row['m'])} but only {_shard_count} shard(s) are configured"
+        )
+
+
+def init_shards(db_path: str, schema_path: str = "db/shard_schema.sql") -> None:
+    """Create/upgrade shard files 1..N-1 (the directory DB is init_db's job)."""
+    check_shard_map(db_path)
+
+    schema = Path(schema_path).read_text(encoding="utf-8")
+    for shard in range(1, _shard_count):
+        conn = connect(shard_path(db_path, shard))
+        try:
+            conn.executescript(schema)
+            install_change_log(conn)  # only the daily tables exist here
+            conn.commit()
+        finally:
+            conn.close()
+
+
+# -------------------------
+# Archive tier: old daily values as monthly bitmaps (see health_bot.archive)
+# -------------------------
+#
+# `<stem>.archive.sqlite3` next to the directory DB (db/archive_schema.sql).
+# connect_shard ATTACHes it as `archive` when the file exists, so create it
+# (init_archive, run by scripts/init_db.py) before the bot opens connections.
+
+
+def archive_path(db_path: str) -> str:
+    p = Path(db_path)
+    return str(p.with_name(f"{p.stem}.archive{p.suffix}"))
+
+
+def init_archive(db_path: str, schema_path: str = "db/archive_schema.sql") -> None:
+    conn = connect(archive_path(db_path))
+    try:
+        conn.executescript(Path(schema_path).read_text(encoding="utf-8"))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def has_archive(conn: sqlite3.Connection) -> bool:
+    return any(r["name"] == "archive" for r in conn.execute("PRAGMA database_list"))
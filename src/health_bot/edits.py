@@ -0,0 +1,91 @@
+import logging
+from collections import OrderedDict
+
+from telegram import InlineKeyboardMarkup
+from telegram.error import BadRequest
+
+log = logging.getLogger("health_bot.edits")
+
+
+def _markup_key(markup: InlineKeyboardMarkup | None) -> tuple:
+    if markup is None:
+        return ()
+    return tuple(
+        tuple((b.text, b.callback_data, b.url) for b in row)
+        for row in markup.inline_keyboard
+    )
+
+
+class RenderedMessageCache:
+    """Remembers what we last rendered into each (chat_id, message_id).
+
+    Lets us skip Telegram edits that would not change anything, and send
+    only `editMessageReplyMarkup` when the text is unchanged.
+    """
+
+    def __init__(self, max_entries: int = 10_000) -> None:
+        self.max_entries = max_entries
+        self._rendered: OrderedDict[tuple[int, int], tuple[int, int]] = OrderedDict()
+
+        self.skipped = 0
+        self.markup_only = 0
+        self.full = 0
+        self.not_modified = 0
+
+    def remember(self, chat_id: int, message_id: int, text: str, markup: InlineKeyboardMarkup | None) -> None:
+        key = (int(chat_id), int(message_id))
+        self._rendered[key] = (hash(text), hash(_markup_key(markup)))
+        self._rendered.move_to_end(key)
+        while len(self._rendered) > self.max_entries:
+            self._rendered.popitem(last=False)
+
+    def forget(self, chat_id: int, message_id: int) -> None:
+        self._rendered.pop((int(chat_id), int(message_id)), None)
+
+    async def edit(self, q, text: str, markup: InlineKeyboardMarkup | None) -> str:
+        """Edit the callback's message only as much as needed.
+
+        Returns "skipped", "markup" or "full". Other BadRequests propagate.
+        """
+        msg = q.message
+        if msg is None:
+            await q.edit_message_text(text, reply_markup=markup)
+            self.full += 1
+            return "full"
+
+        key = (int(msg.chat_id), int(msg.message_id))
+        text_hash, markup_hash = hash(text), hash(_markup_key(markup))
+        prev = self._rendered.get(key)
+
+        if prev == (text_hash, markup_hash):
+            self.skipped += 1
+            return "skipped"
+
+        try:
+            if prev is not None and prev[0] == text_hash:
+                await q.edit_message_reply_markup(reply_markup=markup)
+                self.markup_only += 1
+                result = "markup"
+            else:
+                await q.edit_message_text(text, reply_markup=markup)
+                self.full += 1
+                result = "full"
+        except BadRequest as e:
+            # Cache was cold (e.g. after restart) and Telegram already has this content
+            if "not modified" not in str(e).lower():
+                self.forget(*key)
+                raise
+            self.not_modified += 1
+            result = "skipped"
+
+        self.remember(key[0], key[1], text, markup)
+        return result
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "skipped": self.skipped,
+            "markup_only": self.markup_only,
+            "full": self.full,
+            "not_modified": self.not_modified,
+            "tracked_messages": len(self._rendered),
+        }
@@ -1,17 +1,27 @@
+import asyncio
+import functools
 import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 from telegram.ext import ContextTypes
 from telegram.error import BadRequest
-from health_bot.db import connect
-from health_bot.seed import ensure_household
+from health_bot import bitmaps, callbacks, timezones
+from health_bot.db import connect, connect_for_household
+from health_bot.storage import Storage
+from health_bot.stats import has_goal
 import secrets
 import string
-from datetime import datetime, timedelta
+from datetime import date, timedelta
 from datetime import time as dtime
-from zoneinfo import ZoneInfo
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 import re
-from health_bot.scheduler import schedule_daily_reminders
+from health_bot.scheduler import (
+    ensure_timezone_refresh,
+    schedule_daily_reminders,
+    schedule_weekly_reminders,
+    schedule_weekly_reports,
+)
 
 
 log = logging.getLogger("health_bot.handlers")
@@ -27,54 +37,121 @@ MENU_FAMILY = "family"
 MENU_REMINDERS = "reminders"
 MENU_SETUP = "setup"
 
-
+# Button labels (single source of truth for layouts and the router)
+BTN_HOME = "🏠 Home"
+BTN_BACK = "⬅️ Back"
+BTN_HELP = "❓ Help"
+BTN_CANCEL = "✖️ Cancel"
+
+BTN_MENU_DAILY = "Daily ✅"
+BTN_MENU_WEEKLY = "Weekly 📅"
+BTN_MENU_FAMILY = "Family 👨‍👩‍👧"
+BTN_MENU_REMINDERS = "Reminders ⏰"
+BTN_MENU_SETUP = "Setup ⚙️"
+
+BTN_CHECKIN = "📝 Check-in"
+BTN_TODAY = "📊 Today"
+BTN_SUMMARY = "📈 Summary"
+BTN_STREAKS = "🔥 Streaks"
+BTN_INSIGHTS = "💡 Insights"
+BTN_WEEKLY = "📅 Weekly"
+BTN_WEEKLY_SHOW = "📄 Weekly show"
+BTN_WEEKLY_CANCEL = "🛑 Weekly cancel"
+BTN_FAMILY_SUMMARY = "👨‍👩‍👧 Family summary"
+BTN_REMINDERS_ON = "🔔 Reminders on"
+BTN_REMINDERS_OFF = "🔕 Reminders off"
+BTN_SET_REMINDER = "⏰ Set reminder"
+BTN_INVITE = "➕ Invite"
+BTN_JOIN = "🔗 Join"
+BTN_TIMEZONE = "🌍 Timezone"
+
+_NAV_ROW = [BTN_HOME, BTN_BACK]
+
+MENU_LAYOUTS: dict[str, list[list[str]]] = {
+    MENU_MAIN: [
+        [BTN_MENU_DAILY, BTN_MENU_WEEKLY],
+        [BTN_MENU_FAMILY, BTN_MENU_REMINDERS],
+        [BTN_MENU_SETUP],
+    ],
+    MENU_DAILY: [
+        [BTN_CHECKIN, BTN_TODAY],
+        [BTN_SUMMARY, BTN_STREAKS],
+        [BTN_INSIGHTS],
+        _NAV_ROW,
+    ],
+    MENU_WEEKLY: [
+        [BTN_WEEKLY, BTN_WEEKLY_SHOW],
+        [BTN_WEEKLY_CANCEL],
+        _NAV_ROW,
+    ],
+    MENU_FAMILY: [
+        [BTN_FAMILY_SUMMARY],
+        _NAV_ROW,
+    ],
+    MENU_REMINDERS: [
+        [BTN_REMINDERS_ON, BTN_REMINDERS_OFF],
+        [BTN_SET_REMINDER, BTN_CANCEL],
+        _NAV_ROW,
+    ],
+    MENU_SETUP: [
+        [BTN_INVITE, BTN_JOIN],
+        [BTN_TIMEZONE, BTN_HELP],
+        _NAV_ROW,
+    ],
+}
+
+
+@functools.lru_cache(maxsize=None)
 def _menu_keyboard(menu: str) -> ReplyKeyboardMarkup:
-    menu = menu or MENU_MAIN
-
-    if menu == MENU_DAILY:
-        buttons = [
-            [KeyboardButton("📝 Check-in"), KeyboardButton("📊 Today")],
-            [KeyboardButton("📈 Summary"), KeyboardButton("🔥 Streaks")],
-            [KeyboardButton("🏠 Home"), KeyboardButton("⬅️ Back")],
-        ]
-    elif menu == MENU_WEEKLY:
-        buttons = [
-            [KeyboardButton("📅 Weekly"), KeyboardButton("📄 Weekly show")],
-            [KeyboardButton("🛑 Weekly cancel")],
-            [KeyboardButton("🏠 Home"), KeyboardButton("⬅️ Back")],
-        ]
-    elif menu == MENU_FAMILY:
-        buttons = [
-            [KeyboardButton("👨‍👩‍👧 Family summary")],
-            [KeyboardButton("🏠 Home"), KeyboardButton("⬅️ Back")],
-        ]
-    elif menu == MENU_REMINDERS:
-        buttons = [
-            [KeyboardButton("🔔 Reminders on"), KeyboardButton("🔕 Reminders off")],
-            [KeyboardButton("⏰ Set reminder"), KeyboardButton("✖️ Cancel")],
-            [KeyboardButton("🏠 Home"), KeyboardButton("⬅️ Back")],
-        ]
-    elif menu == MENU_SETUP:
-        buttons = [
-            [KeyboardButton("➕ Invite"), KeyboardButton("🔗 Join")],
-            [KeyboardButton("❓ Help")],
-            [KeyboardButton("🏠 Home"), KeyboardButton("⬅️ Back")],
-        ]
-    else:
-        # Main menu
-        buttons = [
-            [KeyboardButton("Daily ✅"), KeyboardButton("Weekly 📅")],
-            [KeyboardButton("Family 👨‍👩‍👧"), KeyboardButton("Reminders ⏰")],
-            [KeyboardButton("Setup ⚙️")],
-        ]
-
+    # Cached: ReplyKeyboardMarkup is immutable, one instance per menu is enough
+    layout = MENU_LAYOUTS.get(menu or MENU_MAIN) or MENU_LAYOUTS[MENU_MAIN]
     return ReplyKeyboardMarkup(
-        keyboard=buttons,
+        keyboard=[[KeyboardButton(label) for label in row] for row in layout],
         resize_keyboard=True,
         is_persistent=True,
     )
 
 
+@dataclass(frozen=True)
+class MenuRoute:
+    """What a bottom-menu button does.
+
+    menu:    switch to this menu and reply `reply` with its keyboard
+    handler: then await handler(update, context)
+    """
+
+    handler: Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[None]] | None = None
+    menu: str | None = None
+    reply: str | None = None
+
+
+MENU_ROUTES: dict[str, MenuRoute] = {}
+
+
+def register_menu_route(label: str, handler=None, *, menu: str | None = None, reply: str | None = None) -> None:
+    """Plugin hook: bind a button label to a handler and/or a target menu."""
+    MENU_ROUTES[label] = MenuRoute(handler=handler, menu=menu, reply=reply)
+
+
+def register_menu_section(
+    menu: str,
+    label: str,
+    rows: list[list[str]],
+    *,
+    reply: str | None = None,
+) -> None:
+    """Plugin hook: add a new menu section reachable from the main menu.
+
+    `rows` are button labels; bind each one with `register_menu_route`.
+    Home/Back are appended automatically.
+    """
+    MENU_LAYOUTS[menu] = [*rows, _NAV_ROW]
+    if not any(label in row for row in MENU_LAYOUTS[MENU_MAIN]):
+        MENU_LAYOUTS[MENU_MAIN].append([label])
+    register_menu_route(label, menu=menu, reply=reply or label)
+    _menu_keyboard.cache_clear()
+
+
 def _set_menu_state(context: ContextTypes.DEFAULT_TYPE, menu: str) -> None:
     context.user_data["menu"] = menu
 
@@ -86,77 +163,49 @@ def _get_menu_state(context: ContextTypes.DEFAULT_TYPE) -> str:
 def _normalize_menu_text(text: str) -> str:
     return (text or "").strip()
 
-def _get_user_row(conn, telegram_user_id: int):
-    return conn.execute(
-        """
-        SELECT id, household_id, timezone
-          FROM users
-         WHERE telegram_user_id = ?
-        """,
-        (telegram_user_id,),
-    ).fetchone()
-
-
-def _get_enabled_habits(conn, household_id: int):
-    return conn.execute(
-        """
-        SELECT id, title, kind
-          FROM habits
-         WHERE household_id = ? AND enabled = 1
-         ORDER BY sort_order ASC, id ASC
-        """,
-        (household_id,),
-    ).fetchall()
+def _storage(context: ContextTypes.DEFAULT_TYPE) -> Storage:
+    return context.bot_data["storage"]
 
 
-def _today_date_str(tz_name: str) -> str:
-    tz = ZoneInfo(tz_name)
-    return datetime.now(tz).date().isoformat()
+async def _lookup_user(context: ContextTypes.DEFAULT_TYPE, telegram_user_id: int):
+    """id/household_id/timezone for a Telegram user, via the session cache.
 
+    The storage is only queried on a cache miss.
+    Returns None for unknown users (not cached, so /start takes effect at once).
+    """
+    sessions = context.bot_data.get("user_sessions")
+    if sessions is not None:
+        session = sessions.get(telegram_user_id)
+        if session is not None:
+            return session
+
+    row = await _storage(context).get_user(telegram_user_id)
+    if row is None:
+        return None
+
+    session = {"id": int(row["id"]), "household_id": row["household_id"], "timezone": row["timezone"]}
+    if sessions is not None:
+        sessions.put(telegram_user_id, session)
+    return session
+
+
+def _invalidate_user_session(context: ContextTypes.DEFAULT_TYPE, telegram_user_id: int) -> None:
+    """Call after changing a user's household or timezone."""
+    sessions = context.bot_data.get("user_sessions")
+    if sessions is not None:
+        sessions.invalidate(telegram_user_id)
+
+
+def _today_date_str(tz_name: str) -> str:
+    return timezones.today_str(tz_name)
 
-def _get_or_create_daily_entry_id(conn, user_id: int, date_str: str) -> int:
-    row = conn.execute(
-        "SELECT id FROM daily_entries WHERE user_id = ? AND date = ?",
-        (user_id, date_str),
-    ).fetchone()
-    if row:
-        return int(row["id"])
 
-    cur = conn.execute(
-        "INSERT INTO daily_entries (user_id, date) VALUES (?, ?)",
-        (user_id, date_str),
-    )
-    return int(cur.lastrowid)
-
-
-def _load_daily_values(conn, daily_entry_id: int) -> dict[int, str]:
-    rows = conn.execute(
-        "SELECT habit_id, value FROM daily_values WHERE daily_entry_id = ?",
-        (daily_entry_id,),
-    ).fetchall()
-    return {int(r["habit_id"]): ("" if r["value"] is None else str(r["value"])) for r in rows}
-
-
-def _set_daily_value(conn, daily_entry_id: int, habit_id: int, value: str) -> None:
-    conn.execute(
-        """
-        INSERT INTO daily_values (daily_entry_id, habit_id, value)
-        VALUES (?, ?, ?)
-        ON CONFLICT(daily_entry_id, habit_id)
-        DO UPDATE SET value = excluded.value,
-                     updated_at = datetime('now')
-        """,
-        (daily_entry_id, habit_id, value),
-    )
 def _make_invite_code() -> str:
     alphabet = string.ascii_uppercase + string.digits
     return "JOIN-" + "".join(secrets.choice(alphabet) for _ in range(6))
 
 def _week_start_date_str(tz_name: str) -> str:
-    tz = ZoneInfo(tz_name)
-    today = datetime.now(tz).date()
-    monday = today - timedelta(days=today.weekday())  # Monday = 0
-    return monday.isoformat()
+    return timezones.week_start_str(tz_name)
 
 def _current_week_start_for_user(tz_name: str) -> str:
     return _week_start_date_str(tz_name)
@@ -165,43 +214,23 @@ async def start_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     user = update.effective_user
     chat_id = update.effective_chat.id
 
-    conn = connect(context.bot_data["db_path"])
-
-    household_id = ensure_household(conn, "Family")
-
-    row = conn.execute(
-        "SELECT id FROM users WHERE telegram_user_id = ?",
-        (user.id,),
-    ).fetchone()
-
-    if row:
-        text = f"👋 Welcome back, {user.first_name}!"
-    else:
-        conn.execute(
-            """
-            INSERT INTO users (
-                telegram_user_id,
-                chat_id,
-                household_id,
-                timezone,
-                first_name,
-                username
-            )
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (
-                user.id,
-                chat_id,
-                household_id,
-                context.bot_data["timezone"],
-                user.first_name,
-                user.username,
-            ),
-        )
-        conn.commit()
+    # Every new user gets their own household (others join it with /invite)
+    created = await _storage(context).register_user(
+        telegram_user_id=user.id,
+        chat_id=chat_id,
+        first_name=user.first_name,
+        username=user.username,
+        timezone=context.bot_data["timezone"],
+        household_name=f"{user.first_name or user.username or user.id}'s family",
+        fields_path=context.bot_data.get("fields_path", "fields.txt"),
+    )
+    if created:
         text = f"👋 Hi {user.first_name}! You’re registered."
+    else:
+        text = f"👋 Welcome back, {user.first_name}!"
 
-    conn.close()
+    _invalidate_user_session(context, user.id)
+    await _lookup_user(context, user.id)
     _set_menu_state(context, MENU_MAIN)
     await update.message.reply_text(text, reply_markup=_menu_keyboard(MENU_MAIN))
 
@@ -215,10 +244,12 @@ async def help_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         "📌 Commands (or use the bottom menu; /menu to show it)\n"
         "\n"
         "Daily\n"
-        "  /checkin  – daily checklist (tap buttons)\n"
+        "  /checkin  – daily checklist (tap buttons, 📅 for past days)\n"
+        "  /backfill FROM [TO] all|N=V – fill in several past days at once\n"
         "  /today    – today status (read-only)\n"
         "  /summary  – last 7 days (tracked vs success)\n"
         "  /streaks  – current streaks\n"
+        "  /insights – correlations, next-day effects, next best habit\n"
         "\n"
         "Weekly\n"
         "  /weekly        – weekly check-in\n"
@@ -232,6 +263,7 @@ async def help_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         "  /set_reminder HH:MM – set your daily reminder time\n"
         "  /reminders_on       – enable reminders\n"
         "  /reminders_off      – disable reminders\n"
+        "  /timezone [ZONE]    – show or change your timezone\n"
         "\n"
         "Setup\n"
         "  /start   – register or reconnect\n"
@@ -251,25 +283,14 @@ async def menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 
 async def invite_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
-    conn = connect(context.bot_data["db_path"])
-
-    me = conn.execute(
-        "SELECT id, household_id FROM users WHERE telegram_user_id = ?",
-        (user.id,),
-    ).fetchone()
+    me = await _lookup_user(context, user.id)
 
     if not me or not me["household_id"]:
-        conn.close()
         await update.message.reply_text("❌ You are not linked to a household. Use /start first.")
         return
 
     code = _make_invite_code()
-    conn.execute(
-        "INSERT INTO household_invites (household_id, code) VALUES (?, ?)",
-        (int(me["household_id"]), code),
-    )
-    conn.commit()
-    conn.close()
+    await _storage(context).create_invite(int(me["household_id"]), code)
 
     await update.message.reply_text(
         f"✅ Invite code created:\n\n`{code}`\n\n"
@@ -287,70 +308,21 @@ async def join_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         return
 
     code = context.args[0].strip()
-    conn = connect(context.bot_data["db_path"])
-
-    invite = conn.execute(
-        "SELECT id, household_id, used_at FROM household_invites WHERE code = ?",
-        (code,),
-    ).fetchone()
-
-    if not invite or invite["used_at"]:
-        conn.close()
+    # Creates the user if they didn't run /start yet
+    user_id = await _storage(context).redeem_invite(
+        code,
+        telegram_user_id=user.id,
+        chat_id=chat_id,
+        first_name=user.first_name,
+        username=user.username,
+        timezone=context.bot_data["timezone"],
+    )
+    if user_id is None:
         await update.message.reply_text("❌ Invalid or already used invite code.")
         return
 
-    # ensure user exists (in case they didn't run /start yet)
-    row = conn.execute(
-        "SELECT id FROM users WHERE telegram_user_id = ?",
-        (user.id,),
-    ).fetchone()
-
-    if row:
-        user_id = int(row["id"])
-        conn.execute(
-            """
-            UPDATE users
-               SET chat_id = ?, household_id = ?, timezone = ?, first_name = ?, username = ?
-             WHERE id = ?
-            """,
-            (
-                chat_id,
-                int(invite["household_id"]),
-                context.bot_data["timezone"],
-                user.first_name,
-                user.username,
-                user_id,
-            ),
-        )
-    else:
-        cur = conn.execute(
-            """
-            INSERT INTO users (telegram_user_id, chat_id, household_id, timezone, first_name, username)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (
-                user.id,
-                chat_id,
-                int(invite["household_id"]),
-                context.bot_data["timezone"],
-                user.first_name,
-                user.username,
-            ),
-        )
-        user_id = int(cur.lastrowid)
-
-    conn.execute(
-        """
-        UPDATE household_invites
-           SET used_at = datetime('now'),
-               used_by_user_id = ?
-         WHERE id = ?
-        """,
-        (user_id, int(invite["id"])),
-    )
-
-    conn.commit()
-    conn.close()
+    _invalidate_user_session(context, user.id)
+    await _lookup_user(context, user.id)
 
     _set_menu_state(context, MENU_MAIN)
     await update.message.reply_text(
@@ -365,9 +337,33 @@ def _status_for_habit(kind: str, value: str) -> str:
         return "✅" if value == "1" else "❌"
     if kind == "choice":
         return value
+    if kind == "number":
+        return _format_number(value)
+    if kind == "text":
+        return "📝"
     return "▫️"
 
-CHECKIN_PAGES = ["nutrition", "activity", "sleep", "discipline", "mental"]
+
+def _format_number(value: str) -> str:
+    try:
+        num = float(value)
+    except ValueError:
+        return value
+    return str(int(num)) if num.is_integer() else f"{num:g}"
+
+
+def _parse_number(text: str) -> str | None:
+    """Normalize user number input ("7,5" -> "7.5"); None if not a finite number."""
+    t = (text or "").strip().replace(",", ".").replace(" ", "")
+    try:
+        num = float(t)
+    except ValueError:
+        return None
+    if num != num or num in (float("inf"), float("-inf")):
+        return None
+    return _format_number(t)
+
+CHECKIN_PAGES = list(callbacks.PAGES)
 
 def _page_index(page: str) -> int:
     try:
@@ -435,85 +431,155 @@ def _count_done_in_habits(habits_subset, values_by_habit_id: dict[int, str]) ->
             done += 1
     return done, total
 
-def _build_checkin_text(date_str: str, habits, values_by_habit_id: dict[int, str], page: str) -> str:
-    page = _clamp_page(page)
-    page_habits = _habits_for_page(habits, page)
-    page_num = _page_index(page) + 1
-    total_pages = len(CHECKIN_PAGES)
+# -------------------------
+# Precompiled check-in templates
+# -------------------------
+#
+# Everything that depends only on the habit catalog (titles, rows of buttons
+# for every possible current value, static nav rows, callback_data strings)
+# is built once per catalog version; a render only picks prebuilt rows and
+# fills in the ✅/❌ status per line.
+
+_CATEGORY_ICONS = (
+    ("🥗", "nutrition"),
+    ("🏃", "activity"),
+    ("😴", "sleep"),
+    ("🧹", "discipline"),
+    ("🧠", "mental"),
+)
+
+
+def _nav_button(label: str, action: int, page: str, day: int = 0) -> InlineKeyboardButton:
+    return InlineKeyboardButton(
+        label,
+        callback_data=callbacks.get_codec().encode(action, page=page, day=callbacks.int_to_day(day)),
+    )
 
-    done, total = _count_done_in_habits(page_habits, values_by_habit_id)
 
-    lines = [
-        f"🗓️ Daily check-in — {date_str}",
-        f"{_page_label(page)} (page {page_num}/{total_pages}) — {done}/{total}",
-        "",
-    ]
+@functools.lru_cache(maxsize=64)
+def _category_row(key_id: str, day: int = 0) -> tuple[InlineKeyboardButton, ...]:
+    return tuple(_nav_button(icon, callbacks.ACTION_PAGE, page, day) for icon, page in _CATEGORY_ICONS)
 
-    for i, h in enumerate(page_habits, start=1):
-        hid = int(h["id"])
-        title = str(h["title"]).strip()
-        kind = str(h["kind"])
-        val = values_by_habit_id.get(hid, "")
-        lines.append(f"{i}. {_status_for_habit(kind, val)} {title}")
+CHOICE_VALUES = ("😊", "😐", "😞")
 
-    lines.append("")
-    lines.append("Tap ✅/❌. Use ⬅️/➡️ to change section.")
-    return "\n".join(lines)
 
+INPUT_KINDS = ("number", "text")
 
-def _build_checkin_keyboard(habits, values_by_habit_id: dict[int, str], page: str) -> InlineKeyboardMarkup:
-    page = _clamp_page(page)
-    page_habits = _habits_for_page(habits, page)
-
-    rows: list[list[InlineKeyboardButton]] = []
-
-    # Jump to section (compact row for phone UX)
-    rows.append(
-        [
-            InlineKeyboardButton("🥗", callback_data="hcp:nutrition"),
-            InlineKeyboardButton("🏃", callback_data="hcp:activity"),
-            InlineKeyboardButton("😴", callback_data="hcp:sleep"),
-            InlineKeyboardButton("🧹", callback_data="hcp:discipline"),
-            InlineKeyboardButton("🧠", callback_data="hcp:mental"),
-        ]
-    )
 
-    for h in page_habits:
-        hid = int(h["id"])
-        kind = str(h["kind"])
-        current = values_by_habit_id.get(hid, "")
-
-        if kind == "choice":
-            rows.append(
-                [
-                    InlineKeyboardButton("😊✓" if current == "😊" else "😊", callback_data=f"hc:{hid}:😊:{page}"),
-                    InlineKeyboardButton("😐✓" if current == "😐" else "😐", callback_data=f"hc:{hid}:😐:{page}"),
-                    InlineKeyboardButton("😞✓" if current == "😞" else "😞", callback_data=f"hc:{hid}:😞:{page}"),
-                ]
+def _value_rows(hid: int, kind: str, page: str, day: int = 0) -> dict[str, tuple[InlineKeyboardButton, ...]]:
+    """Prebuilt keyboard row for every possible current value of one habit.
+
+    "" = unset; "*" = any other value (typed habits only have enter/edit rows).
+    """
+    codec = callbacks.get_codec()
+    day_date = callbacks.int_to_day(day)
+
+    if kind in INPUT_KINDS:
+        data = codec.encode(callbacks.ACTION_INPUT, habit_id=hid, page=page, day=day_date)
+        hint = "🔢" if kind == "number" else "📝"
+        return {
+            "": (InlineKeyboardButton(f"{hint} Enter", callback_data=data),),
+            "*": (InlineKeyboardButton(f"{hint} Edit ✓", callback_data=data),),
+        }
+
+    options = CHOICE_VALUES if kind == "choice" else ("1", "0")
+    labels = {"1": "✅", "0": "❌"}
+
+    def row(current: str) -> tuple[InlineKeyboardButton, ...]:
+        return tuple(
+            InlineKeyboardButton(
+                labels.get(v, v) + ("✓" if v == current else ""),
+                callback_data=codec.encode(callbacks.ACTION_SET, habit_id=hid, value=v, page=page, day=day_date),
             )
-        else:
-            rows.append(
-                [
-                    InlineKeyboardButton("✅✓" if current == "1" else "✅", callback_data=f"hc:{hid}:1:{page}"),
-                    InlineKeyboardButton("❌✓" if current == "0" else "❌", callback_data=f"hc:{hid}:0:{page}"),
-                ]
+            for v in options
         )
 
-    idx = _page_index(page)
-    prev_page = CHECKIN_PAGES[idx - 1] if idx > 0 else None
-    next_page = CHECKIN_PAGES[idx + 1] if idx < len(CHECKIN_PAGES) - 1 else None
+    return {v: row(v) for v in ("", *options)}
 
-    nav_row: list[InlineKeyboardButton] = []
-    if prev_page:
-        nav_row.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"hcp:{prev_page}"))
-    if next_page:
-        nav_row.append(InlineKeyboardButton("Next ➡️", callback_data=f"hcp:{next_page}"))
-    nav_row.append(InlineKeyboardButton("📊 Overview", callback_data=f"hc:0:overview:{page}"))
-    nav_row.append(InlineKeyboardButton("✅ All", callback_data=f"hc:0:allok:{page}"))
-    nav_row.append(InlineKeyboardButton("🔄 Refresh", callback_data=f"hc:0:refresh:{page}"))
-    rows.append(nav_row)
 
-    return InlineKeyboardMarkup(rows)
+class _CheckinPageTemplate:
+    __slots__ = ("page", "day", "header", "habits", "rows", "nav_row")
+
+    def __init__(self, page: str, page_habits, day: int = 0) -> None:
+        self.page = page
+        self.day = day  # callbacks day number; 0 = the user's today
+        self.header = f"{_page_label(page)} (page {_page_index(page) + 1}/{len(CHECKIN_PAGES)})"
+        # (habit_id, kind, "<n>. ", " <title>")
+        self.habits = [
+            (int(h["id"]), str(h["kind"]), f"{i}. ", f" {str(h['title']).strip()}")
+            for i, h in enumerate(page_habits, start=1)
+        ]
+        self.rows = [_value_rows(hid, kind, page, day) for hid, kind, _, _ in self.habits]
+
+        idx = _page_index(page)
+        prev_page = CHECKIN_PAGES[idx - 1] if idx > 0 else None
+        next_page = CHECKIN_PAGES[idx + 1] if idx < len(CHECKIN_PAGES) - 1 else None
+
+        nav_row: list[InlineKeyboardButton] = []
+        if prev_page:
+            nav_row.append(_nav_button("⬅️ Prev", callbacks.ACTION_PAGE, prev_page, day))
+        if next_page:
+            nav_row.append(_nav_button("Next ➡️", callbacks.ACTION_PAGE, next_page, day))
+        nav_row.append(_nav_button("📊 Overview", callbacks.ACTION_OVERVIEW, page, day))
+        nav_row.append(_nav_button("✅ All", callbacks.ACTION_ALLOK, page, day))
+        nav_row.append(_nav_button("🔄 Refresh", callbacks.ACTION_REFRESH, page, day))
+        nav_row.append(_nav_button("📅", callbacks.ACTION_DAYS, page, day))
+        self.nav_row = tuple(nav_row)
+
+    def text(self, date_str: str, values_by_habit_id: dict[int, str]) -> str:
+        done = 0
+        body = []
+        for hid, kind, prefix, suffix in self.habits:
+            val = values_by_habit_id.get(hid, "")
+            if str(val).strip() != "":
+                done += 1
+            body.append(prefix + _status_for_habit(kind, val) + suffix)
+
+        return "\n".join(
+            [
+                f"🗓️ Daily check-in — {date_str}" + (" (past day ✏️)" if self.day else ""),
+                f"{self.header} — {done}/{len(self.habits)}",
+                "",
+                *body,
+                "",
+                "Tap ✅/❌ (🔢/📝 to type a value). Use ⬅️/➡️ to change section, 📅 for another day.",
+            ]
+        )
+
+    def keyboard(self, values_by_habit_id: dict[int, str]) -> InlineKeyboardMarkup:
+        rows = [_category_row(callbacks.get_codec().key_id, self.day)]
+        for (hid, _, _, _), variants in zip(self.habits, self.rows):
+            current = values_by_habit_id.get(hid, "")
+            row = variants.get(current)
+            if row is None:
+                row = variants.get("*", variants[""])
+            rows.append(row)
+        rows.append(self.nav_row)
+        return InlineKeyboardMarkup(rows)
+
+
+def _catalog_version(habits) -> tuple:
+    return tuple((int(h["id"]), str(h["title"]), str(h["kind"])) for h in habits)
+
+
+@functools.lru_cache(maxsize=512)
+def _compile_checkin_templates(catalog: tuple, key_id: str, day: int = 0) -> dict[str, _CheckinPageTemplate]:
+    # Past days get their own templates (their buttons carry the date); today's stay shared
+    habits = [{"id": hid, "title": title, "kind": kind} for hid, title, kind in catalog]
+    return {p: _CheckinPageTemplate(p, _habits_for_page(habits, p), day) for p in CHECKIN_PAGES}
+
+
+def _checkin_template(habits, page: str, day: int = 0) -> _CheckinPageTemplate:
+    templates = _compile_checkin_templates(_catalog_version(habits), callbacks.get_codec().key_id, day)
+    return templates[_clamp_page(page)]
+
+
+def _build_checkin_text(date_str: str, habits, values_by_habit_id: dict[int, str], page: str, day: int = 0) -> str:
+    return _checkin_template(habits, page, day).text(date_str, values_by_habit_id)
+
+
+def _build_checkin_keyboard(habits, values_by_habit_id: dict[int, str], page: str, day: int = 0) -> InlineKeyboardMarkup:
+    return _checkin_template(habits, page, day).keyboard(values_by_habit_id)
 
 def _build_overview_text(date_str: str, habits, values_by_habit_id: dict[int, str]) -> str:
     lines = [f"🗓️ Daily check-in — {date_str}", "📊 Overview", ""]
@@ -534,29 +600,71 @@ def _build_overview_text(date_str: str, habits, values_by_habit_id: dict[int, st
     return "\n".join(lines)
 
 
-def _build_overview_keyboard(current_page: str) -> InlineKeyboardMarkup:
-    rows: list[list[InlineKeyboardButton]] = [
-        [
-            InlineKeyboardButton("🥗", callback_data="hcp:nutrition"),
-            InlineKeyboardButton("🏃", callback_data="hcp:activity"),
-            InlineKeyboardButton("😴", callback_data="hcp:sleep"),
-            InlineKeyboardButton("🧹", callback_data="hcp:discipline"),
-            InlineKeyboardButton("🧠", callback_data="hcp:mental"),
-        ]
+def _build_overview_keyboard(current_page: str, day: int = 0) -> InlineKeyboardMarkup:
+    return _overview_keyboard(_clamp_page(current_page), callbacks.get_codec().key_id, day)
+
+
+@functools.lru_cache(maxsize=64)
+def _overview_keyboard(page: str, key_id: str, day: int = 0) -> InlineKeyboardMarkup:
+    rows = [
+        _category_row(key_id, day),
+        (_nav_button("⬅️ Back", callbacks.ACTION_PAGE, page, day),),
+    ]
+    return InlineKeyboardMarkup(rows)
+
+
+# How far back check-ins can be edited (date picker and /backfill)
+BACKFILL_MAX_DAYS = 62
+DAY_PICKER_DAYS = 7
+
+
+def _build_day_picker_text() -> str:
+    return "📅 Pick a day to fill in or correct:"
+
+
+def _build_day_picker_keyboard(today, page: str) -> InlineKeyboardMarkup:
+    """Today + the previous DAY_PICKER_DAYS days; buttons open the check-in for that day."""
+    days = [today - timedelta(days=n) for n in range(1, DAY_PICKER_DAYS + 1)]
+    buttons = [
+        _nav_button(d.strftime("%a %d.%m"), callbacks.ACTION_PAGE, page, callbacks.day_to_int(d))
+        for d in days
     ]
-    rows.append([InlineKeyboardButton("⬅️ Back", callback_data=f"hcp:{_clamp_page(current_page)}")])
+    rows = [(_nav_button("Today", callbacks.ACTION_PAGE, page),)]
+    rows += [tuple(buttons[i:i + 4]) for i in range(0, len(buttons), 4)]
     return InlineKeyboardMarkup(rows)
 
+
+def _resolve_checkin_day(tz_name: str, day) -> tuple[str, int] | None:
+    """Map a callback day (None = today) to (date_str, day number); None if out of range."""
+    today = timezones.today(tz_name)
+    if day is None or day == today:
+        return today.isoformat(), 0
+    if day > today or (today - day).days > BACKFILL_MAX_DAYS:
+        return None
+    return day.isoformat(), callbacks.day_to_int(day)
+
+async def _edit_checkin_message(context: ContextTypes.DEFAULT_TYPE, q, text: str, markup) -> None:
+    """Edit a check-in message, skipping the API call when nothing changed."""
+    cache = context.bot_data.get("render_cache")
+    if cache is None:
+        await q.edit_message_text(text, reply_markup=markup)
+        return
+    await cache.edit(q, text, markup)
+
+
+async def _flush_pending_checkins(context: ContextTypes.DEFAULT_TYPE, user_id: int, date_str: str) -> None:
+    buffer = context.bot_data.get("checkin_buffer")
+    if buffer is not None:
+        await buffer.flush(user_id, date_str)
+
+
 async def checkin_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     tg_user = update.effective_user
     if not tg_user or not update.effective_chat or not update.message:
         return
 
-    conn = connect(context.bot_data["db_path"])
-
-    user_row = _get_user_row(conn, tg_user.id)
+    user_row = await _lookup_user(context, tg_user.id)
     if not user_row:
-        conn.close()
         await update.message.reply_text("Please run /start first.")
         return
 
@@ -565,100 +673,179 @@ async def checkin_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     tz_name = str(user_row["timezone"] or context.bot_data["timezone"])
 
     if not household_id:
-        conn.close()
         await update.message.reply_text("You are not linked to a household. Use /start first.")
         return
 
     date_str = _today_date_str(tz_name)
-    daily_entry_id = _get_or_create_daily_entry_id(conn, user_id, date_str)
-    habits = _get_enabled_habits(conn, household_id)
-    values = _load_daily_values(conn, daily_entry_id)
+    await _flush_pending_checkins(context, user_id, date_str)
 
-    conn.commit()
-    conn.close()
+    storage = _storage(context)
+    habits = await storage.enabled_habits(household_id)
+    values = await storage.daily_values(user_id, household_id, date_str)
 
     page = "nutrition"
     text = _build_checkin_text(date_str, habits, values, page)
     markup = _build_checkin_keyboard(habits, values, page)
-    await update.message.reply_text(text, reply_markup=markup)
+    msg = await update.message.reply_text(text, reply_markup=markup)
 
+    cache = context.bot_data.get("render_cache")
+    if cache is not None:
+        cache.remember(msg.chat_id, msg.message_id, text, markup)
 
-async def checkin_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    q = update.callback_query
-    if not q:
-        return
 
-    data = q.data or ""
+_ACTION_VALUES = {
+    callbacks.ACTION_DAYS: "days",
+    callbacks.ACTION_OVERVIEW: "overview",
+    callbacks.ACTION_ALLOK: "allok",
+    callbacks.ACTION_REFRESH: "refresh",
+}
 
-    # Defaults
-    page = "nutrition"
-    habit_id = 0
-    value = "refresh"
+
+def _parse_checkin_callback(data: str) -> tuple[int, str, str, date | None] | None:
+    """Return (habit_id, value, page, day); value "nav" means page navigation.
+
+    day is the check-in date carried by the button (None = the user's today).
+    Accepts signed "h2:" payloads and the legacy "hc:"/"hcp:" format still
+    present on messages sent before the codec existed.
+    """
+    if data.startswith(callbacks.PREFIX):
+        cb = callbacks.get_codec().decode(data)
+        if cb is None:
+            return None
+        if cb.action == callbacks.ACTION_PAGE:
+            # IMPORTANT: navigation must re-render TEXT, not only markup
+            return 0, "nav", cb.page, cb.day
+        if cb.action == callbacks.ACTION_SET:
+            return cb.habit_id, cb.value, cb.page, cb.day
+        if cb.action == callbacks.ACTION_INPUT:
+            return cb.habit_id, "input", cb.page, cb.day
+        if cb.action in _ACTION_VALUES:
+            return 0, _ACTION_VALUES[cb.action], cb.page, cb.day
+        return None
 
     if data.startswith("hcp:"):
-        page = data.split(":", 1)[1].strip() or "nutrition"
-        value = "nav"   # IMPORTANT: navigation must re-render TEXT, not only markup
-    else:
-        # Update/refresh: hc:<habit_id>:<value>:<page>
-        parts = data.split(":", 3)
-        if len(parts) < 3:
-            await q.answer()
-            return
+        return 0, "nav", data.split(":", 1)[1].strip() or "nutrition", None
 
-        try:
-            habit_id = int(parts[1])
-        except ValueError:
-            await q.answer()
-            return
+    # Update/refresh: hc:<habit_id>:<value>:<page>
+    parts = data.split(":", 3)
+    if len(parts) < 3:
+        return None
+    try:
+        habit_id = int(parts[1])
+    except ValueError:
+        return None
+    page = parts[3].strip() if len(parts) == 4 and parts[3].strip() else "nutrition"
+    return habit_id, parts[2], page, None
 
-        value = parts[2]
-        if len(parts) == 4 and parts[3].strip():
-            page = parts[3].strip()
+
+def _is_valid_value(habits, habit_id: int, value: str) -> bool:
+    """Guard against stale or forged payloads (disabled habit, foreign habit, bad value)."""
+    for h in habits:
+        if int(h["id"]) == habit_id:
+            kind = str(h["kind"])
+            if kind == "number":
+                return _parse_number(value) is not None
+            if kind == "text":
+                return bool(value.strip())
+            options = CHOICE_VALUES if kind == "choice" else ("1", "0")
+            return value in options
+    return False
+
+
+def _find_habit(habits, habit_id: int):
+    for h in habits:
+        if int(h["id"]) == habit_id:
+            return h
+    return None
+
+
+async def checkin_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    q = update.callback_query
+    if not q:
+        return
+
+    parsed = _parse_checkin_callback(q.data or "")
+    if parsed is None:
+        await q.answer("This button has expired. Use /checkin again.")
+        return
+    habit_id, value, page, day = parsed
 
     tg_user = update.effective_user
     if not tg_user:
         await q.answer()
         return
 
-    conn = connect(context.bot_data["db_path"])
-    user_row = _get_user_row(conn, tg_user.id)
+    # Identity comes from the session cache: no query on the hot tap path
+    user_row = await _lookup_user(context, tg_user.id)
     if not user_row or user_row["household_id"] is None:
-        conn.close()
         await q.answer()
         return
 
     user_id = int(user_row["id"])
     household_id = int(user_row["household_id"])
     tz_name = str(user_row["timezone"] or context.bot_data["timezone"])
-    date_str = _today_date_str(tz_name)
+    resolved = _resolve_checkin_day(tz_name, day)
+    if resolved is None:
+        await q.answer(f"Only the last {BACKFILL_MAX_DAYS} days can be edited.")
+        return
+    date_str, day_n = resolved
 
-    daily_entry_id = _get_or_create_daily_entry_id(conn, user_id, date_str)
+    if value == "days":
+        today = timezones.today(tz_name)
+        try:
+            await _edit_checkin_message(context, q, _build_day_picker_text(), _build_day_picker_keyboard(today, page))
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                log.exception("Failed to show day picker")
+        await q.answer()
+        return
 
-    # Persist only when it's a real habit update
-    # Persist only when it's a real habit update
-    if habit_id != 0 and value not in ("refresh", "overview", "allok"):
-        _set_daily_value(conn, daily_entry_id, habit_id, value)
+    is_value_tap = habit_id != 0 and value not in ("refresh", "overview", "allok", "nav", "input")
+    storage = _storage(context)
+    habits = await storage.enabled_habits(household_id)
+
+    if value == "input":
+        await _start_value_input(q, context, _find_habit(habits, habit_id), date_str, page, day_n)
+        return
+    if is_value_tap and not _is_valid_value(habits, habit_id, value):
+        await q.answer("This habit is no longer available. Tap 🔄 Refresh.")
+        return
+
+    buffer = context.bot_data.get("checkin_buffer")
+
+    if buffer is not None and is_value_tap:
+        # Coalesce rapid taps: answer now, write + re-render once per window
+        buffer.put(
+            user_id,
+            date_str,
+            habit_id,
+            value,
+            household_id=household_id,
+            on_flushed=lambda: _rerender_checkin_message(
+                q, context, user_id, household_id, date_str, page, day_n
+            ),
+        )
+        await q.answer("Saved ✅")
+        return
 
-    habits = _get_enabled_habits(conn, household_id)
-    values = _load_daily_values(conn, daily_entry_id)
+    # Anything else must see all earlier taps
+    await _flush_pending_checkins(context, user_id, date_str)
+
+    # Persist only when it's a real habit update
+    if is_value_tap:
+        await storage.save_daily_values(user_id, household_id, date_str, {habit_id: value})
 
     # ✅ All in this section: set all boolean habits in the current page to "1"
     if habit_id == 0 and value == "allok":
         page_habits = _habits_for_page(habits, page)
-        for h in page_habits:
-            if str(h["kind"]) != "boolean":
-                continue
-            hid = int(h["id"])
-            _set_daily_value(conn, daily_entry_id, hid, "1")
+        all_ok = {int(h["id"]): "1" for h in page_habits if str(h["kind"]) == "boolean"}
+        if all_ok:
+            await storage.save_daily_values(user_id, household_id, date_str, all_ok)
 
-        # Reload after bulk update
-        values = _load_daily_values(conn, daily_entry_id)
+    values = await storage.daily_values(user_id, household_id, date_str)
 
-    conn.commit()
-    conn.close()
-
-    text = _build_checkin_text(date_str, habits, values, page)
-    markup = _build_checkin_keyboard(habits, values, page)
+    text = _build_checkin_text(date_str, habits, values, page, day_n)
+    markup = _build_checkin_keyboard(habits, values, page, day_n)
 
     # One answer per callback. Provide user feedback especially for refresh.
     toast = ""
@@ -668,21 +855,17 @@ async def checkin_callback_handler(update: Update, context: ContextTypes.DEFAULT
         toast = "All set ✅"
     elif habit_id == 0 and value == "overview":
         toast = ""
-    elif data.startswith("hcp:"):
+    elif value == "nav":
         toast = ""
     else:
         toast = "Saved ✅"
 
-    try:
-        if habit_id == 0 and value == "refresh":
-            await q.edit_message_reply_markup(reply_markup=markup)
-        elif habit_id == 0 and value == "overview":
-            overview_text = _build_overview_text(date_str, habits, values)
-            overview_markup = _build_overview_keyboard(page)
-            await q.edit_message_text(overview_text, reply_markup=overview_markup)
-        else:
-            await q.edit_message_text(text, reply_markup=markup)
+    if habit_id == 0 and value == "overview":
+        text = _build_overview_text(date_str, habits, values)
+        markup = _build_overview_keyboard(page, day_n)
 
+    try:
+        await _edit_checkin_message(context, q, text, markup)
         await q.answer(toast) if toast else await q.answer()
 
     except BadRequest as e:
@@ -699,16 +882,256 @@ async def checkin_callback_handler(update: Update, context: ContextTypes.DEFAULT
         log.exception("Failed to edit check-in message")
         await q.answer("Error ❌")
 
+# --- Typed value input (number / text habits) ---
+
+async def _start_value_input(
+    q, context: ContextTypes.DEFAULT_TYPE, habit, date_str: str, page: str, day: int = 0
+) -> None:
+    if habit is None or str(habit["kind"]) not in INPUT_KINDS:
+        await q.answer("This habit is no longer available. Tap 🔄 Refresh.")
+        return
+
+    kind = str(habit["kind"])
+    context.user_data["value_step"] = {
+        "habit_id": int(habit["id"]),
+        "kind": kind,
+        "title": str(habit["title"]).strip(),
+        "date": date_str,
+        "page": page,
+        "day": day,
+        "chat_id": q.message.chat_id if q.message else None,
+        "message_id": q.message.message_id if q.message else None,
+    }
+    await q.answer()
+
+    example = "e.g. 10000 or 7.5" if kind == "number" else "any short text"
+    if q.message:
+        await q.message.reply_text(
+            f"✏️ {str(habit['title']).strip()} — {date_str}\n\n"
+            f"Send a value ({example}).\n"
+            "Type 'clear' to remove it or 'cancel' to stop."
+        )
+
+
+async def value_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle typed value for a number/text habit started from the check-in keyboard."""
+    if not update.message:
+        return
+
+    step = context.user_data.get("value_step")
+    tg_user = update.effective_user
+    if not step or not tg_user:
+        return
+
+    text = (update.message.text or "").strip()
+    if text == BTN_CANCEL or text.lower() in ("cancel", "/cancel"):
+        context.user_data.pop("value_step", None)
+        await update.message.reply_text("✅ Cancelled.")
+        return
+
+    clear = text.lower() == "clear"
+    if clear:
+        value = ""
+    elif step["kind"] == "number":
+        value = _parse_number(text)
+        if value is None:
+            await update.message.reply_text("Please send a number (e.g. 10000 or 7.5), or 'cancel'.")
+            return
+    else:
+        value = text[:500]
+
+    user_row = await _lookup_user(context, tg_user.id)
+    if not user_row or user_row["household_id"] is None:
+        await update.message.reply_text("Please run /start first.")
+        return
+
+    user_id = int(user_row["id"])
+    household_id = int(user_row["household_id"])
+    date_str = step["date"]
+    await _flush_pending_checkins(context, user_id, date_str)
+
+    storage = _storage(context)
+    habits = await storage.enabled_habits(household_id)
+    if _find_habit(habits, int(step["habit_id"])) is None:
+        context.user_data.pop("value_step", None)
+        await update.message.reply_text("This habit is no longer available.")
+        return
+
+    if clear:
+        await storage.clear_daily_value(user_id, household_id, date_str, int(step["habit_id"]))
+    else:
+        await storage.save_daily_values(user_id, household_id, date_str, {int(step["habit_id"]): value})
+    values = await storage.daily_values(user_id, household_id, date_str)
+
+    context.user_data.pop("value_step", None)
+    await update.message.reply_text(
+        f"✅ {step['title']}: {'cleared' if clear else _status_for_habit(step['kind'], value)}"
+    )
+
+    # Refresh the check-in message the value was entered from
+    if step.get("chat_id") and step.get("message_id"):
+        text_out = _build_checkin_text(date_str, habits, values, step["page"], step.get("day", 0))
+        markup = _build_checkin_keyboard(habits, values, step["page"], step.get("day", 0))
+        try:
+            await context.bot.edit_message_text(
+                text_out,
+                chat_id=step["chat_id"],
+                message_id=step["message_id"],
+                reply_markup=markup,
+            )
+            cache = context.bot_data.get("render_cache")
+            if cache is not None:
+                cache.remember(step["chat_id"], step["message_id"], text_out, markup)
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                log.warning("Could not refresh check-in message: %s", e)
+
+
+# --- Backfill (apply values across past days) ---
+
+BACKFILL_USAGE = (
+    "Usage: /backfill FROM [TO] all | N=VALUE ...\n"
+    "  FROM/TO: YYYY-MM-DD, 'yesterday' or -N (N days ago)\n"
+    "  all: mark every ✅/❌ habit as done\n"
+    "  N=VALUE: habit number from the list below, e.g. 3=1 4=0 12=😊 14=8000\n"
+    "\n"
+    "Example: /backfill -3 -1 all 12=😐"
+)
+
+
+def _parse_backfill_day(token: str, today: date) -> date | None:
+    t = token.strip().lower()
+    if t == "today":
+        return today
+    if t == "yesterday":
+        return today - timedelta(days=1)
+    if re.fullmatch(r"-\d{1,3}", t):
+        return today - timedelta(days=int(t[1:]))
+    try:
+        return date.fromisoformat(t)
+    except ValueError:
+        return None
+
+
+def _parse_backfill_args(args: list[str], habits, today: date) -> tuple[list[str], dict[int, str]] | str:
+    """Return (dates, {habit_id: value}) or an error message."""
+    days: list[date] = []
+    rest = list(args)
+    while rest and len(days) < 2:
+        d = _parse_backfill_day(rest[0], today)
+        if d is None:
+            break
+        days.append(d)
+        rest.pop(0)
+    if not days:
+        return "Start with a date: YYYY-MM-DD, 'yesterday' or -N."
+
+    start, end = (days[0], days[-1]) if days[0] <= days[-1] else (days[-1], days[0])
+    if end > today:
+        return "Can't fill in future days."
+    if (today - start).days > BACKFILL_MAX_DAYS:
+        return f"Only the last {BACKFILL_MAX_DAYS} days can be edited."
+
+    values: dict[int, str] = {}
+    for token in rest:
+        if token.lower() == "all":
+            for h in habits:
+                if str(h["kind"]) == "boolean":
+                    values.setdefault(int(h["id"]), "1")
+            continue
+        num, sep, raw = token.partition("=")
+        if not sep or not num.isdigit() or not (1 <= int(num) <= len(habits)):
+            return f"Can't read '{token}'. Use N=VALUE with N from 1 to {len(habits)}."
+        h = habits[int(num) - 1]
+        value = _parse_number(raw) if str(h["kind"]) == "number" else raw.strip()
+        if value is None or not _is_valid_value(habits, int(h["id"]), value):
+            return f"'{raw}' is not a valid value for {str(h['title']).strip()}."
+        values[int(h["id"])] = value
+    if not values:
+        return "Nothing to set. Add 'all' and/or N=VALUE."
+
+    dates = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+    return dates, values
+
+
+async def backfill_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/backfill FROM [TO] all|N=VALUE... — write the same values to a range of days at once."""
+    if not update.message:
+        return
+    tg_user = update.effective_user
+    if not tg_user:
+        return
+
+    user_row = await _lookup_user(context, tg_user.id)
+    if not user_row or user_row["household_id"] is None:
+        await update.message.reply_text("Please run /start first.")
+        return
+
+    user_id = int(user_row["id"])
+    household_id = int(user_row["household_id"])
+    tz_name = str(user_row["timezone"] or context.bot_data["timezone"])
+    today = timezones.today(tz_name)
+    storage = _storage(context)
+    habits = await storage.enabled_habits(household_id)
+
+    if not context.args:
+        listing = "\n".join(
+            f"{i}. {str(h['title']).strip()} ({h['kind']})" for i, h in enumerate(habits, start=1)
+        )
+        await update.message.reply_text(f"{BACKFILL_USAGE}\n\n{listing}")
+        await update.message.reply_text(
+            _build_day_picker_text(), reply_markup=_build_day_picker_keyboard(today, CHECKIN_PAGES[0])
+        )
+        return
+
+    parsed = _parse_backfill_args(list(context.args), habits, today)
+    if isinstance(parsed, str):
+        await update.message.reply_text(parsed)
+        return
+    dates, values = parsed
+
+    # Buffered taps for these days must land first, or they'd overwrite the backfill
+    for d in dates:
+        await _flush_pending_checkins(context, user_id, d)
+
+    try:
+        written = await storage.save_daily_values_for_dates(user_id, household_id, dates, values)
+    except Exception:
+        log.exception("Backfill failed for user_id=%s", user_id)
+        await update.message.reply_text("Error ❌ Nothing was changed.")
+        return
+
+    span = dates[0] if len(dates) == 1 else f"{dates[0]} … {dates[-1]}"
+    await update.message.reply_text(
+        f"✅ Backfilled {len(values)} habit(s) × {len(dates)} day(s) ({written} values): {span}"
+    )
+
+
+async def _rerender_checkin_message(
+    q, context, user_id: int, household_id: int, date_str: str, page: str, day: int = 0
+) -> None:
+    """Debounced edit after buffered taps were flushed (callback already answered)."""
+    storage = _storage(context)
+    habits = await storage.enabled_habits(household_id)
+    values = await storage.daily_values(user_id, household_id, date_str)
+
+    text = _build_checkin_text(date_str, habits, values, page, day)
+    markup = _build_checkin_keyboard(habits, values, page, day)
+
+    try:
+        await _edit_checkin_message(context, q, text, markup)
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            log.exception("Failed to edit check-in message")
+
+
 async def today_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     tg_user = update.effective_user
     if not tg_user or not update.message:
         return
 
-    conn = connect(context.bot_data["db_path"])
-
-    user_row = _get_user_row(conn, tg_user.id)
+    user_row = await _lookup_user(context, tg_user.id)
     if not user_row:
-        conn.close()
         await update.message.reply_text("Please run /start first.")
         return
 
@@ -717,23 +1140,26 @@ async def today_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     tz_name = str(user_row["timezone"] or context.bot_data["timezone"])
 
     date_str = _today_date_str(tz_name)
+    await _flush_pending_checkins(context, user_id, date_str)
 
-    entry = conn.execute(
-        "SELECT id FROM daily_entries WHERE user_id = ? AND date = ?",
-        (user_id, date_str),
-    ).fetchone()
-
-    habits = _get_enabled_habits(conn, household_id)
-
-    if not entry:
-        conn.close()
+    storage = _storage(context)
+    values = await storage.daily_values(user_id, household_id, date_str)
+    if not values:
         await update.message.reply_text("📭 No check-in yet today.\nUse /checkin to start.")
         return
 
-    values = _load_daily_values(conn, int(entry["id"]))
-    conn.close()
+    habits = await storage.enabled_habits(household_id)
+    week_start = _last_n_dates(tz_name, 7)[-1]
+    progress = (await storage.daily_progress(user_id, household_id, date_str, date_str)).get(date_str)
+    per_habit = await storage.habit_stats(user_id, household_id, week_start, date_str, window_days=7)
 
-    lines = [f"🗓️ Today — {date_str}", ""]
+    goals = sum(1 for h in habits if has_goal(str(h["kind"]), h["target"]))
+    attained = progress.attained if progress else 0
+    lines = [
+        f"🗓️ Today — {date_str}",
+        f"🎯 Goals: {attained}/{goals} ({_format_pct(attained, goals)})",
+        "",
+    ]
     for p in CHECKIN_PAGES:
         page_habits = _habits_for_page(habits, p)
         if not page_habits:
@@ -744,19 +1170,27 @@ async def today_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             title = str(h["title"]).strip()
             kind = str(h["kind"])
             val = values.get(hid, "")
-            lines.append(f"{_status_for_habit(kind, val)} {title}")
+            line = f"{_status_for_habit(kind, val)} {title}"
+            st = per_habit.get(hid)
+            if kind == "number" and st is not None and st.rolling_avg is not None:
+                if h["target"] and val:
+                    line += f" ({_format_pct(float(val), float(h['target']))} of {_format_number(str(h['target']))})"
+                line += f" · 7d avg {_format_number(str(round(st.rolling_avg, 1)))}"
+            lines.append(line)
         lines.append("")
 
     await update.message.reply_text("\n".join(lines))
 
 
 def _last_n_dates(tz_name: str, n: int) -> list[str]:
-    tz = ZoneInfo(tz_name)
-    today = datetime.now(tz).date()
-    return [(today - timedelta(days=i)).isoformat() for i in range(n)]
+    return timezones.last_n_dates(tz_name, n)
+
+
+SUMMARY_BEST_WORST_DAYS = 30
+STREAK_LOOKBACK_DAYS = 90
 
 
-def _format_pct(numer: int, denom: int) -> str:
+def _format_pct(numer: float, denom: float) -> str:
     if denom <= 0:
         return "0%"
     pct = int(round((numer / denom) * 100))
@@ -768,11 +1202,8 @@ async def summary_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     if not tg_user or not update.message:
         return
 
-    conn = connect(context.bot_data["db_path"])
-
-    user_row = _get_user_row(conn, tg_user.id)
+    user_row = await _lookup_user(context, tg_user.id)
     if not user_row:
-        conn.close()
         await update.message.reply_text("Please run /start first.")
         return
 
@@ -780,73 +1211,85 @@ async def summary_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     household_id = int(user_row["household_id"])
     tz_name = str(user_row["timezone"] or context.bot_data["timezone"])
 
-    habits = _get_enabled_habits(conn, household_id)
+    storage = _storage(context)
+    habits = await storage.enabled_habits(household_id)
     total_habits = len(habits)
-
-    habit_kind_by_id: dict[int, str] = {int(h["id"]): str(h["kind"]) for h in habits}
-    total_boolean_habits = sum(1 for k in habit_kind_by_id.values() if k == "boolean")
+    total_goal_habits = sum(1 for h in habits if has_goal(str(h["kind"]), h["target"]))
 
     dates = _last_n_dates(tz_name, 7)
-
-    placeholders = ",".join(["?"] * len(dates))
-    rows = conn.execute(
-        f"""
-        SELECT de.date AS date,
-               dv.habit_id AS habit_id,
-               dv.value AS value
-          FROM daily_entries de
-          LEFT JOIN daily_values dv ON dv.daily_entry_id = de.id
-         WHERE de.user_id = ?
-           AND de.date IN ({placeholders})
-        """,
-        (user_id, *dates),
-    ).fetchall()
-
-    conn.close()
-
-    tracked_by_date: dict[str, int] = {d: 0 for d in dates}
-    success_by_date: dict[str, int] = {d: 0 for d in dates}
-
-    for r in rows:
-        d = str(r["date"])
-        hid = r["habit_id"]
-        v = r["value"]
-
-        if v is None:
-            continue
-        v_str = str(v).strip()
-        if v_str == "":
-            continue
-
-        tracked_by_date[d] = tracked_by_date.get(d, 0) + 1
-
-        if hid is None:
-            continue
-        kind = habit_kind_by_id.get(int(hid))
-        if kind == "boolean" and v_str == "1":
-            success_by_date[d] = success_by_date.get(d, 0) + 1
+    progress = await storage.daily_progress(user_id, household_id, dates[-1], dates[0])
+    per_habit = await storage.habit_stats(user_id, household_id, dates[-1], dates[0], window_days=7)
+    best, worst = await storage.best_and_worst_days(
+        user_id, household_id, _last_n_dates(tz_name, SUMMARY_BEST_WORST_DAYS)[-1], dates[0]
+    )
 
     lines = ["📊 Summary — last 7 days", ""]
     for d in dates:
-        tracked = tracked_by_date.get(d, 0)
-        success = success_by_date.get(d, 0)
+        day = progress.get(d)
+        tracked = day.tracked if day else 0
+        success = day.attained if day else 0
         lines.append(
             f"{d}: tracked {tracked}/{total_habits} ({_format_pct(tracked, total_habits)}) | "
-            f"success {success}/{total_boolean_habits} ({_format_pct(success, total_boolean_habits)})"
+            f"goals {success}/{total_goal_habits} ({_format_pct(success, total_goal_habits)})"
         )
 
-    overall_tracked = sum(tracked_by_date.values())
+    overall_tracked = sum(p.tracked for p in progress.values())
     overall_tracked_total = total_habits * len(dates)
 
-    overall_success = sum(success_by_date.values())
-    overall_success_total = total_boolean_habits * len(dates)
+    overall_success = sum(p.attained for p in progress.values())
+    overall_success_total = total_goal_habits * len(dates)
 
     lines.append("")
     lines.append(
         f"Total: tracked {overall_tracked}/{overall_tracked_total} ({_format_pct(overall_tracked, overall_tracked_total)}) | "
-        f"success {overall_success}/{overall_success_total} ({_format_pct(overall_success, overall_success_total)})"
+        f"goals {overall_success}/{overall_success_total} ({_format_pct(overall_success, overall_success_total)})"
     )
 
+    number_lines = []
+    for h in habits:
+        if str(h["kind"]) != "number":
+            continue
+        st = per_habit.get(int(h["id"]))
+        if st is None or st.avg is None:
+            continue
+        line = f"• {str(h['title']).strip()}: avg {_format_number(str(round(st.avg, 1)))}"
+        if st.goal_days:
+            line += f" / {_format_number(str(h['target']))} — {st.attained}/{st.goal_days} day(s) on target"
+        line += f" | best {_format_number(str(st.best_value))} ({st.best_date})"
+        number_lines.append(line)
+    if number_lines:
+        lines += ["", "🔢 Numbers (7 days):", *number_lines]
+
+    # Yes/no habits: rates by popcount over the 30-day window, streaks by bit scan
+    today = date.fromisoformat(dates[0])
+    bits = await storage.habit_bits(
+        user_id, household_id, (today - timedelta(days=STREAK_LOOKBACK_DAYS)).isoformat()
+    )
+    first, last = bits.bit(today) - SUMMARY_BEST_WORST_DAYS + 1, bits.bit(today)
+    boolean_lines = []
+    for h in habits:
+        hid = int(h["id"])
+        if str(h["kind"]) != "boolean":
+            continue
+        tracked = bitmaps.count(bits.tracked.get(hid, 0), first, last)
+        if not tracked:
+            continue
+        done = bitmaps.count(bits.done.get(hid, 0), first, last)
+        line = f"• {str(h['title']).strip()}: {done}/{tracked} ({_format_pct(done, tracked)})"
+        streak = bitmaps.streak(bits.done.get(hid, 0), last)
+        if streak:
+            line += f" | 🔥 {streak}"
+        boolean_lines.append(line)
+    if boolean_lines:
+        lines += ["", f"✅ Yes/no habits ({SUMMARY_BEST_WORST_DAYS} days):", *boolean_lines]
+
+    if best and worst and best.date != worst.date:
+        lines += [
+            "",
+            f"🏆 Best day ({SUMMARY_BEST_WORST_DAYS}d): {best.date} — {best.attained}/{total_goal_habits} goals",
+            f"🪫 Worst day ({SUMMARY_BEST_WORST_DAYS}d): {worst.date} — {worst.attained}/{total_goal_habits} goals",
+        ]
+
     await update.message.reply_text("\n".join(lines))
 
 async def reminder_wizard_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -897,6 +1340,42 @@ def _parse_time_hhmm(text: str) -> str | None:
 
     return f"{hour:02d}:{minute:02d}"
 
+async def _reschedule_user_jobs(
+    context: ContextTypes.DEFAULT_TYPE, user_id: int, *, timezone_changed: bool = False
+) -> None:
+    """Update one user's stored reminders after they changed their settings.
+
+    `timezone_changed` also redoes the weekly coach reports, which run per timezone.
+    """
+    await schedule_daily_reminders(
+        storage=_storage(context),
+        timezone=context.bot_data["timezone"],
+        default_hour=context.bot_data.get("default_reminder_hour", 21),
+        default_minute=context.bot_data.get("default_reminder_minute", 0),
+        user_id=user_id,
+    )
+    await schedule_weekly_reminders(
+        storage=_storage(context),
+        timezone=context.bot_data["timezone"],
+        user_id=user_id,
+    )
+    if not timezone_changed:
+        return
+
+    forward = context.bot_data.get("reschedule")
+    if forward is not None:
+        # Multi-process mode: jobs only run in the leader worker (health_bot.workers)
+        forward()
+    elif context.bot_data.get("db_path"):
+        # Coach reports are SQLite-only (see health_bot.storage)
+        schedule_weekly_reports(
+            context.application,
+            db_path=context.bot_data["db_path"],
+            timezone=context.bot_data["timezone"],
+            max_workers=context.bot_data.get("coach_workers", 2),
+        )
+
+
 async def reminder_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle user input for reminder wizard."""
     if not update.message:
@@ -911,7 +1390,7 @@ async def reminder_input_handler(update: Update, context: ContextTypes.DEFAULT_T
         return
 
     text = (update.message.text or "").strip()
-    if text == "✖️ Cancel" or text.lower() in ("cancel", "/cancel"):
+    if text == BTN_CANCEL or text.lower() in ("cancel", "/cancel"):
         context.user_data.pop("reminder_step", None)
         await update.message.reply_text("✅ Reminder setup cancelled.", reply_markup=_menu_keyboard(MENU_REMINDERS))
         return
@@ -923,28 +1402,14 @@ async def reminder_input_handler(update: Update, context: ContextTypes.DEFAULT_T
         )
         return
 
-    conn = connect(context.bot_data["db_path"])
-    user_row = _get_user_row(conn, tg_user.id)
+    user_row = await _lookup_user(context, tg_user.id)
     if not user_row:
-        conn.close()
         await update.message.reply_text("Please run /start first.")
         return
 
-    conn.execute(
-        "UPDATE users SET reminder_time = ?, reminders_enabled = 1 WHERE id = ?",
-        (value, int(user_row["id"])),
-    )
-    conn.commit()
-    conn.close()
+    await _storage(context).set_reminder_time(int(user_row["id"]), value)
 
-    # Reschedule jobs (simple v1 approach: reschedule all users)
-    schedule_daily_reminders(
-        context.application,
-        db_path=context.bot_data["db_path"],
-        timezone=context.bot_data["timezone"],
-        default_hour=context.bot_data.get("default_reminder_hour", 21),
-        default_minute=context.bot_data.get("default_reminder_minute", 0),
-    )
+    await _reschedule_user_jobs(context, int(user_row["id"]))
 
     context.user_data.pop("reminder_step", None)
     await update.message.reply_text(f"✅ Reminder time set to {value}", reply_markup=_menu_keyboard(MENU_REMINDERS))
@@ -975,7 +1440,7 @@ async def join_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     text = (update.message.text or "").strip()
 
-    if text == "✖️ Cancel" or text.lower() in ("cancel", "/cancel"):
+    if text == BTN_CANCEL or text.lower() in ("cancel", "/cancel"):
         context.user_data.pop("join_step", None)
         await update.message.reply_text("✅ Join cancelled.", reply_markup=_menu_keyboard(MENU_SETUP))
         return
@@ -1015,32 +1480,56 @@ async def set_reminder_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         )
         return
 
-    conn = connect(context.bot_data["db_path"])
-    user_row = _get_user_row(conn, tg_user.id)
+    user_row = await _lookup_user(context, tg_user.id)
     if not user_row:
-        conn.close()
         await update.message.reply_text("Please run /start first.")
         return
 
-    conn.execute(
-        "UPDATE users SET reminder_time = ?, reminders_enabled = 1 WHERE id = ?",
-        (value, int(user_row["id"])),
-    )
-    conn.commit()
-    conn.close()
+    await _storage(context).set_reminder_time(int(user_row["id"]), value)
 
-    # Reschedule jobs (simple v1 approach: reschedule all users)
-    schedule_daily_reminders(
-        context.application,
-        db_path=context.bot_data["db_path"],
-        timezone=context.bot_data["timezone"],
-        default_hour=context.bot_data.get("default_reminder_hour", 21),
-        default_minute=context.bot_data.get("default_reminder_minute", 0),
-    )
+    await _reschedule_user_jobs(context, int(user_row["id"]))
 
     await update.message.reply_text(f"✅ Reminder time set to {value}")
 
 
+async def timezone_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/timezone [ZONE] — show or change the user's timezone (IANA name or UTC±H)."""
+    if not update.message:
+        return
+    tg_user = update.effective_user
+    if not tg_user:
+        return
+
+    user_row = await _lookup_user(context, tg_user.id)
+    if not user_row:
+        await update.message.reply_text("Please run /start first.")
+        return
+
+    current = str(user_row["timezone"] or context.bot_data["timezone"])
+    if not context.args:
+        await update.message.reply_text(
+            f"🌍 Your timezone: {current} (today is {_today_date_str(current)})\n\n"
+            "Change it with /timezone ZONE, e.g. /timezone Europe/Kyiv or /timezone UTC+2"
+        )
+        return
+
+    tz_name = timezones.resolve_timezone(" ".join(context.args))
+    if tz_name is None:
+        await update.message.reply_text(
+            "Unknown timezone. Use an IANA name like Europe/Kyiv, America/New_York, or UTC+2."
+        )
+        return
+
+    await _storage(context).set_timezone(int(user_row["id"]), tz_name)
+    _invalidate_user_session(context, tg_user.id)
+
+    # Reminders fire in the user's local time, and the new zone needs its midnight rollover
+    ensure_timezone_refresh(context.application, tz_name)
+    await _reschedule_user_jobs(context, int(user_row["id"]), timezone_changed=True)
+
+    await update.message.reply_text(f"✅ Timezone set to {tz_name} (today is {_today_date_str(tz_name)})")
+
+
 async def reminders_off_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if not update.message:
         return
@@ -1048,27 +1537,14 @@ async def reminders_off_handler(update: Update, context: ContextTypes.DEFAULT_TY
     if not tg_user:
         return
 
-    conn = connect(context.bot_data["db_path"])
-    user_row = _get_user_row(conn, tg_user.id)
+    user_row = await _lookup_user(context, tg_user.id)
     if not user_row:
-        conn.close()
         await update.message.reply_text("Please run /start first.")
         return
 
-    conn.execute(
-        "UPDATE users SET reminders_enabled = 0 WHERE id = ?",
-        (int(user_row["id"]),),
-    )
-    conn.commit()
-    conn.close()
+    await _storage(context).set_reminders_enabled(int(user_row["id"]), False)
 
-    schedule_daily_reminders(
-        context.application,
-        db_path=context.bot_data["db_path"],
-        timezone=context.bot_data["timezone"],
-        default_hour=context.bot_data.get("default_reminder_hour", 21),
-        default_minute=context.bot_data.get("default_reminder_minute", 0),
-    )
+    await _reschedule_user_jobs(context, int(user_row["id"]))
 
     await update.message.reply_text("🔕 Reminders disabled")
 
@@ -1080,27 +1556,14 @@ async def reminders_on_handler(update: Update, context: ContextTypes.DEFAULT_TYP
     if not tg_user:
         return
 
-    conn = connect(context.bot_data["db_path"])
-    user_row = _get_user_row(conn, tg_user.id)
+    user_row = await _lookup_user(context, tg_user.id)
     if not user_row:
-        conn.close()
         await update.message.reply_text("Please run /start first.")
         return
 
-    conn.execute(
-        "UPDATE users SET reminders_enabled = 1 WHERE id = ?",
-        (int(user_row["id"]),),
-    )
-    conn.commit()
-    conn.close()
+    await _storage(context).set_reminders_enabled(int(user_row["id"]), True)
 
-    schedule_daily_reminders(
-        context.application,
-        db_path=context.bot_data["db_path"],
-        timezone=context.bot_data["timezone"],
-        default_hour=context.bot_data.get("default_reminder_hour", 21),
-        default_minute=context.bot_data.get("default_reminder_minute", 0),
-    )
+    await _reschedule_user_jobs(context, int(user_row["id"]))
 
     await update.message.reply_text("🔔 Reminders enabled")
 
@@ -1112,10 +1575,8 @@ async def weekly_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     if not tg_user:
         return
 
-    conn = connect(context.bot_data["db_path"])
-    user_row = _get_user_row(conn, tg_user.id)
+    user_row = await _lookup_user(context, tg_user.id)
     if not user_row:
-        conn.close()
         await update.message.reply_text("Please run /start first.")
         return
 
@@ -1129,8 +1590,6 @@ async def weekly_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     context.user_data["weekly_rating"] = None
     context.user_data["weekly_note"] = None
 
-    conn.close()
-
     await update.message.reply_text(
         f"📅 Weekly check-in (week starting {week_start})\n\n"
         "1/3) Weight in kg? (example: 78.5)\n"
@@ -1210,30 +1669,12 @@ async def weekly_input_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         rating = context.user_data.get("weekly_rating")
         note = context.user_data.get("weekly_note")
 
-        conn = connect(context.bot_data["db_path"])
-        user_row = _get_user_row(conn, tg_user.id)
+        user_row = await _lookup_user(context, tg_user.id)
         if not user_row:
-            conn.close()
             await update.message.reply_text("Please run /start first.")
             return
 
-        user_id = int(user_row["id"])
-
-        conn.execute(
-            """
-            INSERT INTO weekly_entries (user_id, week_start_date, weight_kg, week_rating, note)
-            VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT(user_id, week_start_date)
-            DO UPDATE SET
-                weight_kg = excluded.weight_kg,
-                week_rating = excluded.week_rating,
-                note = excluded.note,
-                updated_at = datetime('now')
-            """,
-            (user_id, week_start, weight, rating, note),
-        )
-        conn.commit()
-        conn.close()
+        await _storage(context).save_weekly_entry(int(user_row["id"]), week_start, weight, rating, note)
 
         # clear state
         context.user_data.pop("weekly_step", None)
@@ -1251,6 +1692,17 @@ async def weekly_input_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         )
         return
 
+
+def _load_weekly_report(db_path: str, user_id: int, week_start: str) -> dict | None:
+    from health_bot.coach import load_latest_report
+
+    conn = connect(db_path)
+    try:
+        return load_latest_report(conn, user_id, week_start)
+    finally:
+        conn.close()
+
+
 async def weekly_show_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if not update.message:
         return
@@ -1259,10 +1711,8 @@ async def weekly_show_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     if not tg_user:
         return
 
-    conn = connect(context.bot_data["db_path"])
-    user_row = _get_user_row(conn, tg_user.id)
+    user_row = await _lookup_user(context, tg_user.id)
     if not user_row:
-        conn.close()
         await update.message.reply_text("Please run /start first.")
         return
 
@@ -1270,29 +1720,31 @@ async def weekly_show_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     tz_name = str(user_row["timezone"] or context.bot_data["timezone"])
     week_start = _current_week_start_for_user(tz_name)
 
-    row = conn.execute(
-        """
-        SELECT week_start_date, weight_kg, week_rating, note
-          FROM weekly_entries
-         WHERE user_id = ? AND week_start_date = ?
-        """,
-        (user_id, week_start),
-    ).fetchone()
-    conn.close()
-
-    if not row:
-        await update.message.reply_text(
-            f"📭 No weekly check-in saved for week starting {week_start}.\nUse /weekly"
+    row = await _storage(context).weekly_entry(user_id, week_start)
+
+    report = None
+    db_path = context.bot_data.get("db_path")
+    if db_path:
+        from health_bot.coach import render_report  # numpy: keep it out of startup
+
+        # Precomputed on Sunday morning (scheduler.schedule_weekly_reports); never computed here
+        report = await asyncio.to_thread(_load_weekly_report, db_path, user_id, week_start)
+
+    if row:
+        text = (
+            "📅 Weekly check-in:\n"
+            f"- Week start: {row['week_start_date']}\n"
+            f"- Weight: {row['weight_kg'] if row['weight_kg'] is not None else '—'}\n"
+            f"- Rating: {row['week_rating'] if row['week_rating'] is not None else '—'}\n"
+            f"- Note: {row['note'] if row['note'] else '—'}"
         )
-        return
+    else:
+        text = f"📭 No weekly check-in saved for week starting {week_start}.\nUse /weekly"
 
-    await update.message.reply_text(
-        "📅 Weekly check-in:\n"
-        f"- Week start: {row['week_start_date']}\n"
-        f"- Weight: {row['weight_kg'] if row['weight_kg'] is not None else '—'}\n"
-        f"- Rating: {row['week_rating'] if row['week_rating'] is not None else '—'}\n"
-        f"- Note: {row['note'] if row['note'] else '—'}"
-    )
+    if report:
+        text += "\n\n" + render_report(report)
+
+    await update.message.reply_text(text)
 
 async def family_summary_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if not update.message:
@@ -1302,86 +1754,76 @@ async def family_summary_handler(update: Update, context: ContextTypes.DEFAULT_T
     if not tg_user:
         return
 
-    conn = connect(context.bot_data["db_path"])
-    me = _get_user_row(conn, tg_user.id)
+    me = await _lookup_user(context, tg_user.id)
     if not me or me["household_id"] is None:
-        conn.close()
         await update.message.reply_text("Please run /start first.")
         return
 
     household_id = int(me["household_id"])
     tz_name = str(me["timezone"] or context.bot_data["timezone"])
 
-    users = conn.execute(
-        """
-        SELECT id, first_name, telegram_user_id
-          FROM users
-         WHERE household_id = ?
-         ORDER BY first_name ASC, id ASC
-        """,
-        (household_id,),
-    ).fetchall()
-
-    habits = _get_enabled_habits(conn, household_id)
+    storage = _storage(context)
+    habits = await storage.enabled_habits(household_id)
     total_habits = len(habits)
-    habit_kind_by_id: dict[int, str] = {int(h["id"]): str(h["kind"]) for h in habits}
-    total_boolean_habits = sum(1 for k in habit_kind_by_id.values() if k == "boolean")
+    total_boolean_habits = sum(1 for h in habits if str(h["kind"]) == "boolean")
 
     dates = _last_n_dates(tz_name, 7)
-    placeholders = ",".join(["?"] * len(dates))
+    members = await storage.family_summary(household_id, min(dates), max(dates))
 
     lines = ["👨‍👩‍👧 Family summary — last 7 days", ""]
 
-    for u in users:
-        uid = int(u["id"])
+    tracked_total = total_habits * len(dates)
+    success_total = total_boolean_habits * len(dates)
+    for u in members:
         name = u["first_name"] or str(u["telegram_user_id"])
-
-        rows = conn.execute(
-            f"""
-            SELECT dv.habit_id AS habit_id,
-                   dv.value AS value
-              FROM daily_entries de
-              LEFT JOIN daily_values dv ON dv.daily_entry_id = de.id
-             WHERE de.user_id = ?
-               AND de.date IN ({placeholders})
-            """,
-            (uid, *dates),
-        ).fetchall()
-
-        tracked = 0
-        success = 0
-
-        for r in rows:
-            v = r["value"]
-            if v is None:
-                continue
-            v_str = str(v).strip()
-            if not v_str:
-                continue
-            tracked += 1
-
-            hid = r["habit_id"]
-            if hid is not None and habit_kind_by_id.get(int(hid)) == "boolean" and v_str == "1":
-                success += 1
-
-        tracked_total = total_habits * len(dates)
-        success_total = total_boolean_habits * len(dates)
-
+        tracked, success = int(u["tracked"]), int(u["success"])
         lines.append(
             f"{name}: tracked {tracked}/{tracked_total} ({_format_pct(tracked, tracked_total)}) | "
             f"success {success}/{success_total} ({_format_pct(success, success_total)})"
         )
 
-    conn.close()
     await update.message.reply_text("\n".join(lines))
 
-def _is_day_perfect(values_by_habit_id: dict[int, str], habits) -> bool:
-    for h in habits:
-        if str(h["kind"]) != "boolean":
-            continue
-        if values_by_habit_id.get(int(h["id"])) != "1":
-            return False
-    return True
+
+def _load_insights(db_path: str, user_id: int, household_id: int, tz_name: str) -> dict:
+    from health_bot.insights import get_insights
+
+    conn = connect_for_household(db_path, household_id)
+    try:
+        return get_insights(conn, user_id, household_id, tz_name)
+    finally:
+        conn.close()
+
+
+async def insights_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if not update.message:
+        return
+
+    tg_user = update.effective_user
+    if not tg_user:
+        return
+
+    user_row = await _lookup_user(context, tg_user.id)
+    if not user_row or user_row["household_id"] is None:
+        await update.message.reply_text("Please run /start first.")
+        return
+
+    db_path = context.bot_data.get("db_path")
+    if not db_path:
+        # Insights read the SQLite files directly (see health_bot.storage)
+        await update.message.reply_text("💡 Insights are not available on this server yet.")
+        return
+
+    from health_bot.insights import render_insights  # numpy: keep it out of startup
+
+    tz_name = str(user_row["timezone"] or context.bot_data["timezone"])
+    # Cached until new values arrive (refreshed nightly in bulk, see scheduler); a
+    # stale cache means a recompute and a write, so keep it off the event loop
+    insights = await asyncio.to_thread(
+        _load_insights, db_path, int(user_row["id"]), int(user_row["household_id"]), tz_name
+    )
+
+    await update.message.reply_text(render_insights(insights))
 
 
 async def streaks_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -1392,10 +1834,8 @@ async def streaks_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     if not tg_user:
         return
 
-    conn = connect(context.bot_data["db_path"])
-    user_row = _get_user_row(conn, tg_user.id)
+    user_row = await _lookup_user(context, tg_user.id)
     if not user_row or user_row["household_id"] is None:
-        conn.close()
         await update.message.reply_text("Please run /start first.")
         return
 
@@ -1403,56 +1843,19 @@ async def streaks_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     household_id = int(user_row["household_id"])
     tz_name = str(user_row["timezone"] or context.bot_data["timezone"])
 
-    habits = _get_enabled_habits(conn, household_id)
-
-    tz = ZoneInfo(tz_name)
-    today = datetime.now(tz).date()
-
-    lookback_days = 90
-    start_date = (today - timedelta(days=lookback_days)).isoformat()
-
-    entries = conn.execute(
-        """
-        SELECT id, date
-          FROM daily_entries
-         WHERE user_id = ?
-           AND date >= ?
-         ORDER BY date DESC
-        """,
-        (user_id, start_date),
-    ).fetchall()
-
-    entry_by_date: dict[str, int] = {str(e["date"]): int(e["id"]) for e in entries}
-
-    def has_any_value(entry_id: int) -> bool:
-        c = conn.execute(
-            "SELECT COUNT(1) AS c FROM daily_values WHERE daily_entry_id = ?",
-            (entry_id,),
-        ).fetchone()["c"]
-        return int(c) > 0
-
-    def is_perfect(entry_id: int) -> bool:
-        vals = _load_daily_values(conn, entry_id)
-        return _is_day_perfect(vals, habits)
-
-    def calc_streak(check_fn) -> int:
-        streak = 0
-        d = today
-        for _ in range(lookback_days + 1):
-            ds = d.isoformat()
-            entry_id = entry_by_date.get(ds)
-            if not entry_id:
-                break
-            if not check_fn(entry_id):
-                break
-            streak += 1
-            d = d - timedelta(days=1)
-        return streak
-
-    checkin_streak = calc_streak(has_any_value)
-    perfect_streak = calc_streak(is_perfect)
-
-    conn.close()
+    storage = _storage(context)
+    habits = await storage.enabled_habits(household_id)
+
+    today = timezones.today(tz_name)
+
+    start_date = (today - timedelta(days=STREAK_LOOKBACK_DAYS)).isoformat()
+
+    # One bitset per habit for the whole window; a streak is a bit scan back from today
+    bits = await storage.habit_bits(user_id, household_id, start_date)
+    boolean_ids = [int(h["id"]) for h in habits if str(h["kind"]) == "boolean"]
+
+    checkin_streak = bitmaps.streak(bits.any_tracked(), bits.bit(today))
+    perfect_streak = bitmaps.streak(bits.all_done(boolean_ids), bits.bit(today))
 
     await update.message.reply_text(
         "🔥 Streaks:\n"
@@ -1464,133 +1867,97 @@ async def streaks_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 # --- MENU ROUTER HANDLER ---
 
-async def menu_router_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Route bottom-menu button presses.
-
-    Important: do NOT interfere with weekly wizard input.
-    """
-    if not update.message:
-        return
-
-    # If weekly wizard is active, route text to the wizard first
-    if context.user_data.get("weekly_step"):
-        await weekly_input_handler(update, context)
-        return
-
-    # If reminder wizard is active, route text to it
+async def _menu_cancel_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if context.user_data.get("reminder_step"):
-        await reminder_input_handler(update, context)
+        context.user_data.pop("reminder_step", None)
+        await update.message.reply_text("✅ Cancelled reminder setup.", reply_markup=_menu_keyboard(MENU_REMINDERS))
         return
 
     if context.user_data.get("join_step"):
-        await join_input_handler(update, context)
+        context.user_data.pop("join_step", None)
+        await update.message.reply_text("✅ Cancelled join.", reply_markup=_menu_keyboard(MENU_REMINDERS))
         return
 
-    text = _normalize_menu_text(update.message.text)
+    await update.message.reply_text("Nothing to cancel.", reply_markup=_menu_keyboard(MENU_REMINDERS))
 
-    # Global actions
-    if text in ("❓ Help",):
-        await help_handler(update, context)
-        return
 
-    if text == "🏠 Home":
-        _set_menu_state(context, MENU_MAIN)
-        await update.message.reply_text("🏠 Main", reply_markup=_menu_keyboard(MENU_MAIN))
-        return
-
-    # Back always returns to main
-    if text == "⬅️ Back":
-        _set_menu_state(context, MENU_MAIN)
-        await update.message.reply_text("🏠 Main", reply_markup=_menu_keyboard(MENU_MAIN))
-        return
+def _register_builtin_menu_routes() -> None:
+    # Global actions; Back always returns to main
+    register_menu_route(BTN_HELP, help_handler)
+    register_menu_route(BTN_HOME, menu=MENU_MAIN, reply="🏠 Main")
+    register_menu_route(BTN_BACK, menu=MENU_MAIN, reply="🏠 Main")
 
     # Navigate between menu pages
-    if text == "Daily ✅":
-        _set_menu_state(context, MENU_DAILY)
-        await update.message.reply_text("✅ Daily", reply_markup=_menu_keyboard(MENU_DAILY))
-        return
-
-    if text == "Weekly 📅":
-        _set_menu_state(context, MENU_WEEKLY)
-        await update.message.reply_text("📅 Weekly", reply_markup=_menu_keyboard(MENU_WEEKLY))
-        return
-
-    if text == "Family 👨‍👩‍👧":
-        _set_menu_state(context, MENU_FAMILY)
-        await update.message.reply_text("👨‍👩‍👧 Family", reply_markup=_menu_keyboard(MENU_FAMILY))
-        return
-
-    if text == "Reminders ⏰":
-        _set_menu_state(context, MENU_REMINDERS)
-        await update.message.reply_text("⏰ Reminders", reply_markup=_menu_keyboard(MENU_REMINDERS))
-        return
-
-    if text == "Setup ⚙️":
-        _set_menu_state(context, MENU_SETUP)
-        await update.message.reply_text("⚙️ Setup", reply_markup=_menu_keyboard(MENU_SETUP))
-        return
+    register_menu_route(BTN_MENU_DAILY, menu=MENU_DAILY, reply="✅ Daily")
+    register_menu_route(BTN_MENU_WEEKLY, menu=MENU_WEEKLY, reply="📅 Weekly")
+    register_menu_route(BTN_MENU_FAMILY, menu=MENU_FAMILY, reply="👨‍👩‍👧 Family")
+    register_menu_route(BTN_MENU_REMINDERS, menu=MENU_REMINDERS, reply="⏰ Reminders")
+    register_menu_route(BTN_MENU_SETUP, menu=MENU_SETUP, reply="⚙️ Setup")
 
     # Daily actions
-    if text == "📝 Check-in":
-        await checkin_handler(update, context)
-        return
-    if text == "📊 Today":
-        await today_handler(update, context)
-        return
-    if text == "📈 Summary":
-        await summary_handler(update, context)
-        return
-    if text == "🔥 Streaks":
-        await streaks_handler(update, context)
-        return
+    register_menu_route(BTN_CHECKIN, checkin_handler)
+    register_menu_route(BTN_TODAY, today_handler)
+    register_menu_route(BTN_SUMMARY, summary_handler)
+    register_menu_route(BTN_STREAKS, streaks_handler)
+    register_menu_route(BTN_INSIGHTS, insights_handler)
 
     # Weekly actions
-    if text == "📅 Weekly":
-        await weekly_handler(update, context)
-        return
-    if text == "📄 Weekly show":
-        await weekly_show_handler(update, context)
-        return
-    if text == "🛑 Weekly cancel":
-        await weekly_cancel_handler(update, context)
-        return
+    register_menu_route(BTN_WEEKLY, weekly_handler)
+    register_menu_route(BTN_WEEKLY_SHOW, weekly_show_handler)
+    register_menu_route(BTN_WEEKLY_CANCEL, weekly_cancel_handler)
 
     # Family actions
-    if text == "👨‍👩‍👧 Family summary":
-        await family_summary_handler(update, context)
-        return
+    register_menu_route(BTN_FAMILY_SUMMARY, family_summary_handler)
 
     # Reminders actions
-    if text == "🔔 Reminders on":
-        await reminders_on_handler(update, context)
-        return
-    if text == "🔕 Reminders off":
-        await reminders_off_handler(update, context)
+    register_menu_route(BTN_REMINDERS_ON, reminders_on_handler)
+    register_menu_route(BTN_REMINDERS_OFF, reminders_off_handler)
+    register_menu_route(BTN_CANCEL, _menu_cancel_handler)
+    register_menu_route(BTN_SET_REMINDER, reminder_wizard_start)
+
+    # Setup actions
+    register_menu_route(BTN_INVITE, invite_handler)
+    register_menu_route(BTN_JOIN, join_wizard_start)
+    register_menu_route(BTN_TIMEZONE, timezone_handler)
+
+
+_register_builtin_menu_routes()
+
+
+async def menu_router_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Route bottom-menu button presses (one dict lookup via MENU_ROUTES).
+
+    Important: do NOT interfere with weekly wizard input.
+    """
+    if not update.message:
         return
-    if text == "✖️ Cancel":
-        if context.user_data.get("reminder_step"):
-            context.user_data.pop("reminder_step", None)
-            await update.message.reply_text("✅ Cancelled reminder setup.", reply_markup=_menu_keyboard(MENU_REMINDERS))
-            return
 
-        if context.user_data.get("join_step"):
-            context.user_data.pop("join_step", None)
-            await update.message.reply_text("✅ Cancelled join.", reply_markup=_menu_keyboard(MENU_REMINDERS))
-            return
+    # If weekly wizard is active, route text to the wizard first
+    if context.user_data.get("weekly_step"):
+        await weekly_input_handler(update, context)
+        return
 
-        await update.message.reply_text("Nothing to cancel.", reply_markup=_menu_keyboard(MENU_REMINDERS))
+    # If reminder wizard is active, route text to it
+    if context.user_data.get("reminder_step"):
+        await reminder_input_handler(update, context)
         return
-    if text == "⏰ Set reminder":
-        await reminder_wizard_start(update, context)
+
+    if context.user_data.get("join_step"):
+        await join_input_handler(update, context)
         return
 
-    # Setup actions
-    if text == "➕ Invite":
-        await invite_handler(update, context)
+    if context.user_data.get("value_step"):
+        await value_input_handler(update, context)
         return
-    if text == "🔗 Join":
-        await join_wizard_start(update, context)
+
+    route = MENU_ROUTES.get(_normalize_menu_text(update.message.text))
+    if route is None:
+        # Unknown text: ignore
         return
 
-    # Unknown text: ignore
-    return
\ No newline at end of file
+    if route.menu is not None:
+        _set_menu_state(context, route.menu)
+        await update.message.reply_text(route.reply or route.menu, reply_markup=_menu_keyboard(route.menu))
+
+    if route.handler is not None:
+        await route.handler(update, context)
@@ -0,0 +1,375 @@
+"""Habit insights over a user's history, vectorized with NumPy.
+
+History is loaded as a dense days × habits matrix of daily_values.value_num
+(booleans 0/1, mood -1/0/1, numbers as-is, NaN = not tracked). From it:
+
+- same-day correlations between every pair of habits,
+- lagged effects: today's habit vs tomorrow's mood (e.g. "no phone before
+  bed" → next-day mood), with the mood lift on days after the goal was met,
+- the "next best habit to improve": a goal habit that is often missed but
+  goes together with better mood.
+
+Results are cached in `user_insights` under a data key that changes with
+every daily value write (`user_data_versions`, maintained by triggers) and
+every habit change in the household, so they are recomputed only when new
+data arrives. `refresh_insights` recomputes all stale users in a process pool.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+
+from health_bot import timezones
+from health_bot.db import ShardConnections, connect
+
+log = logging.getLogger("health_bot.insights")
+
+INSIGHTS_VERSION = 1
+HISTORY_DAYS = 120
+RATE_DAYS = 30              # "next best habit" looks at the recent goal rate
+MIN_PAIR_DAYS = 10
+MIN_ABS_CORRELATION = 0.3
+STORE_BATCH = 500
+
+
+# -------------------------
+# Matrix helpers (shared with coach.py)
+# -------------------------
+
+def load_history(conn: sqlite3.Connection, user_id: int, household_id: int, end: date, days: int) -> dict:
+    """A user's last `days` days up to `end`, as plain picklable data for dense_matrix."""
+    dates = [(end - timedelta(days=i)).isoformat() for i in range(days - 1, -1, -1)]
+    habits = conn.execute(
+        """
+        SELECT id, title, kind, target
+          FROM habits
+         WHERE household_id = ? AND enabled = 1 AND kind != 'text'
+         ORDER BY sort_order ASC, id ASC
+        """,
+        (household_id,),
+    ).fetchall()
+    rows = conn.execute(
+        """
+        SELECT de.date AS date, dv.habit_id AS habit_id, dv.value_num AS value_num
+          FROM daily_entries de
+          JOIN daily_values dv ON dv.daily_entry_id = de.id
+         WHERE de.user_id = ?
+           AND de.date BETWEEN ? AND ?
+           AND dv.value_num IS NOT NULL
+        """,
+        (user_id, dates[0], dates[-1]),
+    ).fetchall()
+    return {
+        "user_id": user_id,
+        "dates": dates,
+        "habits": [(int(h["id"]), str(h["title"]).strip(), str(h["kind"]), h["target"]) for h in habits],
+        "values": [(str(r["date"]), int(r["habit_id"]), float(r["value_num"])) for r in rows],
+    }
+
+
+def dense_matrix(payload: dict) -> np.ndarray:
+    """days × habits value_num matrix from load_history() output (NaN = missing)."""
+    day_idx = {d: i for i, d in enumerate(payload["dates"])}
+    col_idx = {hid: j for j, (hid, _, _, _) in enumerate(payload["habits"])}
+
+    x = np.full((len(day_idx), len(col_idx)), np.nan)
+    for d, hid, value in payload["values"]:
+        j = col_idx.get(hid)
+        if j is not None:
+            x[day_idx[d], j] = value
+    return x
+
+
+def goal_attainment(x: np.ndarray, habits: list[tuple]) -> np.ndarray:
+    """1 / 0 per cell (mirrors stats.ATTAINED_SQL); NaN when missing or the habit has no goal."""
+    goal = np.full(len(habits), np.nan)
+    for j, (_, _, kind, target) in enumerate(habits):
+        if kind == "boolean":
+            goal[j] = 1.0
+        elif kind == "number" and target not in (None, ""):
+            goal[j] = float(target)
+    with np.errstate(invalid="ignore"):
+        return np.where(np.isnan(x) | np.isnan(goal), np.nan, (x >= goal).astype(float))
+
+
+def pairwise_correlation(x: np.ndarray, min_days: int) -> tuple[np.ndarray, np.ndarray]:
+    """Pearson r for every column pair over the days both are present (NaN = missing).
+
+    Same as np.corrcoef on each pair's complete rows, but as a handful of
+    matrix products instead of a loop over pairs. Returns (r, n), both
+    columns × columns; r is NaN where undefined or n < min_days.
+    """
+    present = ~np.isnan(x)
+    m = present.astype(float)
+    xz = np.where(present, x, 0.0)
+
+    n = m.T @ m                       # shared days
+    sx = xz.T @ m                     # sx[i, j] = sum of x_i over days j is present too
+    sxx = (xz * xz).T @ m
+    sxy = xz.T @ xz
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sxy - sx * sx.T / n
+        var_i = sxx - sx * sx / n
+        var_j = sxx.T - sx.T * sx.T / n
+        r = cov / np.sqrt(var_i * var_j)
+    r[(n < min_days) | ~np.isfinite(r)] = np.nan
+    return r, n
+
+
+def run_in_pool(fn, payloads: list, max_workers: int, chunksize: int = 8) -> list:
+    """map(fn, payloads), in worker processes when it's worth it."""
+    if max_workers <= 1 or len(payloads) < 2:
+        return [fn(p) for p in payloads]
+    # spawn: the bot process runs threads (JobQueue, HTTP client), fork is not safe there
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(payloads)), mp_context=ctx) as pool:
+        return list(pool.map(fn, payloads, chunksize=chunksize))
+
+
+# -------------------------
+# Insights
+# -------------------------
+
+def _f(v, digits: int = 2) -> float | None:
+    return None if v is None or not np.isfinite(v) else round(float(v), digits)
+
+
+def compute_insights(payload: dict) -> tuple[int, str, dict]:
+    """Pure function, runs in a worker process. Returns (user_id, data_key, insights)."""
+    habits = payload["habits"]
+    titles = [h[1] for h in habits]
+    outcomes = [j for j, h in enumerate(habits) if h[2] == "choice"]
+    n_habits = len(habits)
+
+    x = dense_matrix(payload)
+    attained = goal_attainment(x, habits)
+    days_with_data = int((~np.isnan(x)).any(axis=1).sum()) if n_habits else 0
+
+    # Same day
+    r0, n0 = pairwise_correlation(x, MIN_PAIR_DAYS)
+
+    # Next day: columns [habits today | habits tomorrow], keep the cross block
+    r_lag, n_lag = pairwise_correlation(np.hstack([x[:-1], x[1:]]), MIN_PAIR_DAYS)
+    r1, n1 = r_lag[:n_habits, n_habits:], n_lag[:n_habits, n_habits:]
+
+    # Mean next-day value after a met goal minus after a missed one
+    done, missed = (attained[:-1] == 1).astype(float), (attained[:-1] == 0).astype(float)
+    has_next = ~np.isnan(x[1:])
+    nxt = np.where(has_next, x[1:], 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        lift = (done.T @ nxt) / (done.T @ has_next) - (missed.T @ nxt) / (missed.T @ has_next)
+
+    correlations = []
+    for i in range(n_habits):
+        for j in range(i + 1, n_habits):
+            if np.isnan(r0[i, j]) or abs(r0[i, j]) < MIN_ABS_CORRELATION:
+                continue
+            correlations.append(
+                {
+                    "a": titles[i],
+                    "b": titles[j],
+                    "r": _f(r0[i, j]),
+                    "n": int(n0[i, j]),
+                    "mood": i in outcomes or j in outcomes,
+                }
+            )
+    correlations.sort(key=lambda c: (not c["mood"], -abs(c["r"])))
+
+    lagged = []
+    for o in outcomes:
+        for i in range(n_habits):
+            if i in outcomes or np.isnan(r1[i, o]) or abs(r1[i, o]) < MIN_ABS_CORRELATION:
+                continue
+            lagged.append(
+                {
+                    "habit": titles[i],
+                    "outcome": titles[o],
+                    "r": _f(r1[i, o]),
+                    "n": int(n1[i, o]),
+                    "lift": _f(lift[i, o]),
+                }
+            )
+    lagged.sort(key=lambda e: -abs(e["r"]))
+
+    # Next best habit: often missed lately, and goes together with better mood
+    recent = attained[-RATE_DAYS:]
+    goal_days = (~np.isnan(recent)).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rate = np.nansum(recent, axis=0) / goal_days
+    if outcomes:
+        benefit = np.fmax(np.nanmax(r0[:, outcomes], axis=1, initial=-1.0),
+                          np.nanmax(r1[:, outcomes], axis=1, initial=-1.0))
+    else:
+        benefit = np.full(n_habits, np.nan)
+    benefit = np.clip(np.nan_to_num(benefit, nan=0.0), 0.0, None)
+    score = (1.0 - rate) * (0.25 + benefit)
+    score[(goal_days < 5) | (rate >= 0.9) | np.isin(np.arange(n_habits), outcomes)] = np.nan
+
+    next_best = None
+    if n_habits and not np.isnan(score).all():
+        j = int(np.nanargmax(score))
+        same = r0[j, outcomes] if outcomes else np.array([])
+        lag = r1[j, outcomes] if outcomes else np.array([])
+        best_same = np.nanmax(same, initial=-1.0) if same.size else -1.0
+        best_lag = np.nanmax(lag, initial=-1.0) if lag.size else -1.0
+        next_best = {
+            "title": titles[j],
+            "rate": _f(rate[j]),
+            "days": int(goal_days[j]),
+            "r": _f(max(best_same, best_lag)) if benefit[j] > 0 else None,
+            "next_day": bool(best_lag > best_same),
+        }
+
+    insights = {
+        "version": INSIGHTS_VERSION,
+        "from": payload["dates"][0],
+        "to": payload["dates"][-1],
+        "days_with_data": days_with_data,
+        "correlations": correlations[:6],
+        "lagged": lagged[:5],
+        "next_best": next_best,
+    }
+    return payload["user_id"], payload["data_key"], insights
+
+
+def _habits_signatures(conn: sqlite3.Connection, household_ids: list[int] | None = None) -> dict[int, str]:
+    sql = "SELECT household_id, id, enabled, kind, IFNULL(target, '') AS target, title FROM habits"
+    params: tuple = ()
+    if household_ids is not None:
+        sql += f" WHERE household_id IN ({','.join('?' * len(household_ids))})"
+        params = tuple(household_ids)
+    parts: dict[int, list[str]] = {}
+    for r in conn.execute(sql + " ORDER BY household_id, id", params):
+        parts.setdefault(int(r["household_id"]), []).append(
+            f"{r['id']}/{r['enabled']}/{r['kind']}/{r['target']}/{r['title']}"
+        )
+    return {hid: hashlib.sha1("|".join(p).encode("utf-8")).hexdigest()[:12] for hid, p in parts.items()}
+
+
+def _data_key(version: int, habits_signature: str) -> str:
+    return f"{INSIGHTS_VERSION}:{version}:{habits_signature}"
+
+
+def _data_version(conn: sqlite3.Connection, user_id: int) -> int:
+    """Bumped by triggers on every daily value write (lives in the user's shard)."""
+    row = conn.execute("SELECT version FROM user_data_versions WHERE user_id = ?", (user_id,)).fetchone()
+    return int(row["version"]) if row else 0
+
+
+def get_insights(conn: sqlite3.Connection, user_id: int, household_id: int, tz_name: str) -> dict:
+    """Cached insights for one user, recomputed inline (a few ms) when stale.
+
+    `conn` must be on the user's shard (see db.connect_for_household).
+    """
+    key = _data_key(_data_version(conn, user_id), _habits_signatures(conn, [household_id]).get(household_id, ""))
+    row = conn.execute("SELECT data_key, insights FROM user_insights WHERE user_id = ?", (user_id,)).fetchone()
+    if row and row["data_key"] == key:
+        return json.loads(row["insights"])
+
+    payload = load_history(conn, user_id, household_id, timezones.today(tz_name), HISTORY_DAYS)
+    payload["data_key"] = key
+    result = compute_insights(payload)
+    _store(conn, [result])
+    conn.commit()
+    return result[2]
+
+
+def _store(conn: sqlite3.Connection, results: list[tuple[int, str, dict]]) -> None:
+    conn.executemany(
+        """
+        INSERT INTO user_insights (user_id, data_key, insights)
+        VALUES (?, ?, ?)
+        ON CONFLICT(user_id)
+        DO UPDATE SET data_key = excluded.data_key,
+                      insights = excluded.insights,
+                      computed_at = datetime('now')
+        """,
+        [(uid, key, json.dumps(insights, ensure_ascii=False)) for uid, key, insights in results],
+    )
+
+
+def refresh_insights(
+    db_path: str,
+    *,
+    timezone: str,
+    max_workers: int = 2,
+    force: bool = False,
+) -> tuple[int, int]:
+    """Recompute insights for every user whose data changed. Returns (computed, up_to_date)."""
+    with ShardConnections(db_path) as shards:
+        directory = shards.shard(0)
+        signatures = _habits_signatures(directory)
+        users = directory.execute(
+            """
+            SELECT u.id, u.household_id, u.timezone, ui.data_key AS cached_key
+              FROM users u
+              LEFT JOIN user_insights ui ON ui.user_id = u.id
+             WHERE u.household_id IS NOT NULL
+            """
+        ).fetchall()
+
+        payloads = []
+        for u in users:
+            user_id, household_id = int(u["id"]), int(u["household_id"])
+            conn = shards.for_household(household_id)
+            key = _data_key(_data_version(conn, user_id), signatures.get(household_id, ""))
+            if not force and u["cached_key"] == key:
+                continue
+            tz_name = (u["timezone"] or timezone).strip() or timezone
+            payload = load_history(conn, user_id, household_id, timezones.today(tz_name), HISTORY_DAYS)
+            payload["data_key"] = key
+            payloads.append(payload)
+
+    results = run_in_pool(compute_insights, payloads, max_workers, chunksize=32)
+
+    conn = connect(db_path)
+    try:
+        for start in range(0, len(results), STORE_BATCH):
+            _store(conn, results[start:start + STORE_BATCH])
+            conn.commit()
+    finally:
+        conn.close()
+
+    log.info("Insights: %s recomputed, %s up to date", len(results), len(users) - len(results))
+    return len(results), len(users) - len(results)
+
+
+def render_insights(insights: dict) -> str:
+    lines = [f"💡 Insights ({insights['from']} → {insights['to']}, {insights['days_with_data']} days with data)", ""]
+
+    if insights["days_with_data"] < MIN_PAIR_DAYS:
+        lines.append(f"Not enough history yet: keep checking in for at least {MIN_PAIR_DAYS} days.")
+        return "\n".join(lines)
+
+    nb = insights["next_best"]
+    if nb:
+        why = f"done on {int(round(nb['rate'] * 100))}% of your last {nb['days']} tracked days"
+        if nb["r"] is not None:
+            when = "the next day" if nb["next_day"] else "on the same day"
+            why += f"; mood tends to be better {when} (r={nb['r']:+.2f})"
+        lines += [f"🎯 Next best habit to improve: {nb['title']}", f"   {why[0].upper()}{why[1:]}.", ""]
+
+    if insights["correlations"]:
+        lines.append("🔗 Same-day links:")
+        for c in insights["correlations"]:
+            sign = "↑↑" if c["r"] > 0 else "↑↓"
+            lines.append(f"• {c['a']} {sign} {c['b']} (r={c['r']:+.2f}, {c['n']} days)")
+        lines.append("")
+
+    if insights["lagged"]:
+        lines.append("⏭️ Next-day effects:")
+        for e in insights["lagged"]:
+            lift = f", {e['lift']:+.1f} {e['outcome']} after a done day" if e["lift"] is not None else ""
+            lines.append(f"• {e['habit']} → next-day {e['outcome']} (r={e['r']:+.2f}{lift}, {e['n']} days)")
+        lines.append("")
+
+    if not (nb or insights["correlations"] or insights["lagged"]):
+        lines.append("No clear patterns yet. Keep checking in!")
+
+    return "\n".join(lines).rstrip()
@@ -3,7 +3,7 @@ from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
 
-def setup_logging(level: str = "INFO") -> None:
+def setup_logging(level: str = "INFO", log_file: str = "logs/health_bot.log") -> None:
     Path("logs").mkdir(exist_ok=True)
 
     root = logging.getLogger()
@@ -18,7 +18,7 @@ def setup_logging(level: str = "INFO") -> None:
     console.setFormatter(fmt)
 
     file_handler = RotatingFileHandler(
-        "logs/health_bot.log",
+        log_file,
         maxBytes=5_000_000,
         backupCount=5,
         encoding="utf-8",
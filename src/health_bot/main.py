@@ -1,40 +1,132 @@
+import functools
 import logging
-from health_bot.config import load_settings
+from telegram.ext import Application
+from health_bot.config import Settings, load_settings
 from health_bot.logging_setup import setup_logging
 from health_bot.bot import build_application
-from health_bot.scheduler import schedule_daily_reminders, schedule_weekly_reminders
+from health_bot.db import check_shard_map, configure as configure_sqlite, configure_shards, init_archive, tuning_for
+from health_bot.scheduler import (
+    schedule_archival,
+    schedule_daily_reminders,
+    schedule_insights_refresh,
+    schedule_reminder_tick,
+    schedule_timezone_refresh,
+    schedule_wal_checkpoints,
+    schedule_weekly_reminders,
+    schedule_weekly_reports,
+)
 
 
-def main() -> None:
-    settings = load_settings()
-    setup_logging(settings.log_level)
-
-    log = logging.getLogger("health_bot")
-    log.info("Starting health_bot")
-
-    app = build_application(settings)
-
-    app.bot_data["db_path"] = settings.db_path
-    app.bot_data["timezone"] = settings.timezone
-    app.bot_data["default_reminder_hour"] = 21
-    app.bot_data["default_reminder_minute"] = 0
-
-    schedule_daily_reminders(
-        app,
-        db_path=settings.db_path,
+async def schedule_user_jobs(app: Application, settings: Settings) -> None:
+    """Jobs that depend on users' settings; rerun when a user changes their timezone."""
+    storage = app.bot_data["storage"]
+    await schedule_daily_reminders(
+        storage=storage,
         timezone=settings.timezone,
         default_hour=21,
         default_minute=0,
     )
-    schedule_weekly_reminders(
-        app,
-        db_path=settings.db_path,
+    await schedule_weekly_reminders(
+        storage=storage,
         timezone=settings.timezone,
         hour=12,
         minute=0,
     )
+    await schedule_timezone_refresh(app, storage=storage, timezone=settings.timezone)
+    if settings.storage_backend == "sqlite":
+        schedule_weekly_reports(
+            app,
+            db_path=settings.db_path,
+            timezone=settings.timezone,
+            max_workers=settings.coach_workers,
+        )
+
+
+async def schedule_jobs(app: Application, settings: Settings) -> None:
+    """Runs in the background after startup (see bot.build_application).
+
+    Fixed jobs first: the reminder tick sends what is already stored while
+    the per-user sync below is still going through the users in batches.
+    """
+    schedule_reminder_tick(
+        app,
+        interval_seconds=settings.reminder_tick_seconds,
+        misfire_grace_minutes=settings.reminder_misfire_grace_minutes,
+    )
+    if settings.storage_backend == "sqlite":
+        # Derived data and WAL upkeep work on the SQLite files directly
+        schedule_insights_refresh(
+            app,
+            db_path=settings.db_path,
+            timezone=settings.timezone,
+            max_workers=settings.coach_workers,
+        )
+        schedule_wal_checkpoints(
+            app,
+            db_path=settings.db_path,
+            timezone=settings.timezone,
+            interval_minutes=settings.checkpoint_interval_minutes,
+            quiet_hour=settings.checkpoint_quiet_hour,
+        )
+        if settings.retention_days > 0:
+            schedule_archival(
+                app,
+                db_path=settings.db_path,
+                timezone=settings.timezone,
+                keep_days=settings.retention_days,
+            )
+
+    await schedule_user_jobs(app, settings)
+
+
+def create_application(settings: Settings, *, leader: bool = True) -> Application:
+    """Configured bot application; only the leader schedules jobs (see health_bot.workers)."""
+    configure_sqlite(
+        tuning_for(
+            settings.sqlite_profile,
+            cache_size_kib=settings.sqlite_cache_size_kib,
+            mmap_size=settings.sqlite_mmap_size,
+            busy_timeout_ms=settings.sqlite_busy_timeout_ms,
+            wal_autocheckpoint=settings.sqlite_wal_autocheckpoint,
+        )
+    )
+
+    configure_shards(settings.sqlite_shards)  # shard files are created by scripts/init_db.py
+    if settings.storage_backend == "sqlite":
+        check_shard_map(settings.db_path)  # SQLITE_SHARDS lowered since households were placed
+        if settings.retention_days > 0:
+            init_archive(settings.db_path)  # before any connection opens, so they all attach it
+
+    app = build_application(
+        settings,
+        on_started=functools.partial(schedule_jobs, settings=settings) if leader else None,
+    )
+
+    if settings.storage_backend == "sqlite":
+        app.bot_data["db_path"] = settings.db_path
+    app.bot_data["timezone"] = settings.timezone
+    app.bot_data["default_reminder_hour"] = 21
+    app.bot_data["default_reminder_minute"] = 0
+    app.bot_data["coach_workers"] = settings.coach_workers
+    app.bot_data["fields_path"] = settings.fields_path
+    return app
+
+
+def main() -> None:
+    settings = load_settings()
+    setup_logging(settings.log_level)
+
+    log = logging.getLogger("health_bot")
+    log.info("Starting health_bot")
+
+    if settings.workers > 0:
+        from health_bot.workers import run_ingress
+
+        run_ingress(settings)
+        return
 
+    app = create_application(settings)
     app.run_polling()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,197 +1,490 @@
+import asyncio
 import logging
+import os
+import socket
+import time
 from datetime import datetime, timedelta
 from datetime import time as dtime
-from zoneinfo import ZoneInfo
 
-from health_bot.db import connect
+from health_bot import timezones
+from health_bot.db import archive_path, checkpoint, connect, shard_count, shard_path
+from health_bot.storage import Storage
 
 log = logging.getLogger("health_bot.scheduler")
 
-def _week_start_date_str(tz_name: str) -> str:
-    tz = ZoneInfo(tz_name)
-    today = datetime.now(tz).date()
-    monday = today - timedelta(days=today.weekday())  # Monday = 0
-    return monday.isoformat()
+DAILY = "daily"
+WEEKLY = "weekly"
 
-def schedule_daily_reminders(
-    app,
+REMINDER_TICK = "reminder_tick"
+SYNC_BATCH = 1000  # users per reminder_jobs write when syncing settings
+SEND_CHUNK = 25  # reminders sent concurrently, then a 1 s pause (Telegram allows ~30 messages/s)
+
+# One process runs the scheduled jobs even when several share the database
+LEASE = "scheduler"
+LEASE_TTL_SECONDS = 120
+_HOLDER = f"{socket.gethostname()}:{os.getpid()}"
+
+_REMINDER_TEXT = {
+    DAILY: "⏰ Time for your daily check-in 💪\n\nUse /checkin",
+    WEEKLY: "📅 Weekly check-in time ✍️\n\nUse /weekly\nYour coach report is in /weekly_show",
+}
+
+
+def reminder_spec(days: str, hour: int, minute: int, tz_name: str) -> str:
+    """"days|HH:MM|timezone"; days is "*" or comma-separated weekdays (Mon=0)."""
+    return f"{days}|{hour:02d}:{minute:02d}|{tz_name}"
+
+
+def next_run_at(spec: str, after: float) -> float:
+    """First time strictly after `after` (unix time) that `spec` fires."""
+    days, hhmm, tz_name = spec.split("|")
+    hour, minute = (int(p) for p in hhmm.split(":"))
+    tz = timezones.get_zone(tz_name)
+    weekdays = None if days == "*" else {int(d) for d in days.split(",")}
+
+    # Local wall-clock time per date, so DST changes keep the reminder at HH:MM
+    start = datetime.fromtimestamp(after, tz).date()
+    for i in range(8):
+        day = start + timedelta(days=i)
+        if weekdays is not None and day.weekday() not in weekdays:
+            continue
+        at = datetime(day.year, day.month, day.day, hour, minute, tzinfo=tz).timestamp()
+        if at > after:
+            return at
+    raise ValueError(f"reminder spec {spec!r} never fires")
+
+
+async def _sync_reminders(storage: Storage, kind: str, user_id: int | None, spec_for) -> None:
+    """Bring reminder_jobs in line with the users' settings.
+
+    An unchanged spec keeps its stored next_run_at, so a reminder that came
+    due while the bot was down is still sent by the next tick. Changes are
+    written SYNC_BATCH users at a time, yielding to the event loop in
+    between, so a startup sync of many users does not stall updates.
+    """
+    users = await storage.reminder_users(user_id)
+    stored = await storage.reminder_jobs(kind, user_id)
+    now = time.time()
+
+    changed = removed = 0
+    for i in range(0, len(users), SYNC_BATCH):
+        upsert: list[tuple[int, str, float]] = []
+        delete: list[int] = []
+        for u in users[i : i + SYNC_BATCH]:
+            uid = int(u["id"])
+            try:
+                spec = spec_for(u)
+                if spec is None:
+                    if uid in stored:
+                        delete.append(uid)
+                elif uid not in stored or stored[uid][0] != spec:
+                    upsert.append((uid, spec, next_run_at(spec, now)))
+            except Exception:
+                log.exception("Failed to schedule %s reminder for user_id=%s", kind, uid)
+
+        if upsert or delete:
+            await storage.save_reminder_jobs(kind, upsert, delete)
+        changed += len(upsert)
+        removed += len(delete)
+        await asyncio.sleep(0)
+    log.info("%s reminders: %s (re)scheduled, %s removed", kind.capitalize(), changed, removed)
+
+
+def _user_zone(u, timezone: str) -> str:
+    tz_name = (u["timezone"] or timezone).strip() or timezone
+    timezones.get_zone(tz_name)  # unknown zone: raise here, not in every tick
+    return tz_name
+
+
+async def schedule_daily_reminders(
     *,
-    db_path: str,
+    storage: Storage,
     timezone: str,
     default_hour: int = 21,
     default_minute: int = 0,
+    user_id: int | None = None,
 ) -> None:
-    """Per-user daily reminders using python-telegram-bot JobQueue.
+    """Per-user daily reminders, stored in reminder_jobs (sent by the reminder tick).
 
     - Each user can set reminder_time (HH:MM) in their timezone.
     - reminders_enabled disables reminders per user.
-    - Smart behavior: if user already saved at least one value today, skip.
+    - Smart behavior: if user already saved at least one value that day, skip.
+    - `user_id` limits the update to one user (after they changed a setting).
+    """
+
+    def spec_for(u) -> str | None:
+        if int(u["reminders_enabled"]) == 0:
+            return None
+        hour, minute = default_hour, default_minute
+        rt = (u["reminder_time"] or "").strip()
+        if rt:
+            parts = rt.split(":")
+            if len(parts) == 2:
+                hour = int(parts[0])
+                minute = int(parts[1])
+        return reminder_spec("*", hour, minute, _user_zone(u, timezone))
+
+    await _sync_reminders(storage, DAILY, user_id, spec_for)
+
+
+async def schedule_weekly_reminders(
+    *,
+    storage: Storage,
+    timezone: str,
+    hour: int = 12,
+    minute: int = 0,
+    user_id: int | None = None,
+) -> None:
+    """Weekly reminder (Sunday), stored in reminder_jobs like the daily one.
+
+    Smart behavior: skip if weekly entry already exists for that week.
+    """
+
+    def spec_for(u) -> str | None:
+        # Reuse reminders_enabled for now (simple v1 switch)
+        if int(u["reminders_enabled"]) == 0:
+            return None
+        return reminder_spec("6", hour, minute, _user_zone(u, timezone))  # Sunday = 6 (Mon=0)
+
+    await _sync_reminders(storage, WEEKLY, user_id, spec_for)
+
+
+def schedule_reminder_tick(
+    app,
+    *,
+    interval_seconds: int = 30,
+    misfire_grace_minutes: int = 180,
+    batch_size: int = 500,
+) -> None:
+    """One repeating job sends every due reminder in reminder_jobs.
+
+    The first tick runs right after startup and catches up on reminders that
+    came due while the bot was down, if they are at most
+    `misfire_grace_minutes` late. Later ones are skipped, not sent late.
     """
+    for job in app.job_queue.get_jobs_by_name(REMINDER_TICK):
+        job.schedule_removal()
+
+    app.job_queue.run_repeating(
+        callback=_reminder_tick,
+        interval=interval_seconds,
+        first=1,
+        name=REMINDER_TICK,
+        data={
+            "lease_ttl": max(LEASE_TTL_SECONDS, 3 * interval_seconds),
+            "grace_seconds": misfire_grace_minutes * 60,
+            "batch_size": batch_size,
+        },
+    )
+
+
+async def _holds_lease(context, ttl: float = LEASE_TTL_SECONDS) -> bool:
+    """Take or renew the scheduler lease; False if another process holds it."""
+    if await context.bot_data["storage"].acquire_lease(LEASE, _HOLDER, ttl):
+        return True
+    log.debug("Scheduler lease held by another process, skipping %s", context.job.name)
+    return False
+
+
+async def _reminder_tick(context) -> None:
+    data = context.job.data
+    storage: Storage = context.bot_data["storage"]
+    batch_size = int(data["batch_size"])
+    now = time.time()
+
+    # Renewed per batch: a long catch-up must not let the lease run out
+    while await _holds_lease(context, data["lease_ttl"]):
+        due = await storage.due_reminder_jobs(now, batch_size)
+        if due:
+            await _send_due_reminders(context.bot, storage, due, now, float(data["grace_seconds"]))
+        if len(due) < batch_size:
+            break
+
+
+async def _send_due_reminders(bot, storage: Storage, due: list, now: float, grace_seconds: float) -> None:
+    """Send one batch of due reminders and move each job to its next run."""
+    to_send = []
+    skipped: list[tuple[int, str, float]] = []
+    daily_checks: list[tuple[int, int | None, str]] = []
+    weekly_checks: list[tuple[int, str]] = []
+    missed = 0
+
+    for r in due:
+        uid, kind, spec = int(r["user_id"]), str(r["kind"]), str(r["spec"])
+        # Runs missed while down collapse into one: the next run is after now
+        job = (uid, kind, next_run_at(spec, now))
+        if now - float(r["next_run_at"]) > grace_seconds:
+            missed += 1
+            skipped.append(job)
+            continue
+
+        # The day the reminder was for, even if it is sent after midnight
+        day = datetime.fromtimestamp(float(r["next_run_at"]), timezones.get_zone(spec.rsplit("|", 1)[1])).date()
+        if kind == DAILY:
+            household_id = r["household_id"]
+            daily_checks.append((uid, None if household_id is None else int(household_id), day.isoformat()))
+        else:
+            weekly_checks.append((uid, (day - timedelta(days=day.weekday())).isoformat()))
+        to_send.append((r, job))
+
+    # Smart skip, batched: who already checked in for that day / week
+    done = {(DAILY, uid) for uid in await storage.checked_in_users(daily_checks)}
+    done |= {(WEEKLY, uid) for uid in await storage.weekly_done_users(weekly_checks)}
+    skipped += [job for r, job in to_send if (job[1], job[0]) in done]
+    to_send = [(r, job) for r, job in to_send if (job[1], job[0]) not in done]
+    await storage.advance_reminder_jobs(skipped)
+
+    failed = 0
+    for i in range(0, len(to_send), SEND_CHUNK):
+        if i:
+            await asyncio.sleep(1)
+        chunk = to_send[i : i + SEND_CHUNK]
+        results = await asyncio.gather(
+            *(bot.send_message(chat_id=int(r["chat_id"]), text=_REMINDER_TEXT[job[1]]) for r, job in chunk),
+            return_exceptions=True,
+        )
+        for (r, job), result in zip(chunk, results):
+            if isinstance(result, Exception):
+                failed += 1
+                log.warning("Failed to send %s reminder to user_id=%s: %s", job[1], job[0], result)
+        # Per chunk: a crash re-sends at most one chunk
+        await storage.advance_reminder_jobs([job for _, job in chunk])
+
+    log.info(
+        "Reminders: %s due, %s sent, %s already done, %s missed, %s failed",
+        len(due),
+        len(to_send) - failed,
+        len(due) - len(to_send) - missed,
+        missed,
+        failed,
+    )
+
+def schedule_weekly_reports(
+    app,
+    *,
+    db_path: str,
+    timezone: str,
+    hour: int = 11,
+    minute: int = 30,
+    max_workers: int = 2,
+) -> None:
+    """Precompute coach reports on Sunday, before the 12:00 weekly reminder.
 
-    # Remove previously scheduled per-user jobs
+    One job per timezone in use (not per user): each run computes the reports
+    of every user in that zone in a process pool and stores them in
+    weekly_reports, so /weekly_show only has to read them.
+    """
     for job in app.job_queue.jobs():
-        if getattr(job, "name", "") and str(job.name).startswith("daily_checkin:"):
+        if getattr(job, "name", "") and str(job.name).startswith("weekly_report:"):
             job.schedule_removal()
 
     conn = connect(db_path)
-    users = conn.execute(
-        """
-        SELECT id, telegram_user_id, chat_id, timezone, reminders_enabled, reminder_time
-          FROM users
-        """
-    ).fetchall()
+    rows = conn.execute("SELECT DISTINCT timezone FROM users WHERE household_id IS NOT NULL").fetchall()
     conn.close()
 
-    for u in users:
+    zones = {(str(r["timezone"] or "").strip() or timezone) for r in rows}
+    for tz_name in sorted(zones):
         try:
-            if int(u["reminders_enabled"]) == 0:
-                continue
-
-            tz_name = (u["timezone"] or timezone).strip() or timezone
-            tz = ZoneInfo(tz_name)
-
-            hour, minute = default_hour, default_minute
-            rt = (u["reminder_time"] or "").strip()
-            if rt:
-                parts = rt.split(":")
-                if len(parts) == 2:
-                    hour = int(parts[0])
-                    minute = int(parts[1])
-
-            when = dtime(hour=hour, minute=minute, tzinfo=tz)
-
-            app.job_queue.run_daily(
-                callback=_send_daily_reminder_one,
-                time=when,
-                name=f"daily_checkin:{int(u['id'])}",
-                data={
-                    "db_path": db_path,
-                    "user_id": int(u["id"]),
-                    "telegram_user_id": int(u["telegram_user_id"]),
-                    "chat_id": int(u["chat_id"]),
-                    "timezone": tz_name,
-                },
-            )
-
-            log.info(
-                "Daily reminder scheduled for user_id=%s at %02d:%02d (%s)",
-                int(u["id"]),
-                hour,
-                minute,
-                tz_name,
-            )
+            tz = timezones.get_zone(tz_name)
         except Exception:
-            log.exception("Failed to schedule reminder for user_id=%s", u.get("id"))
-
+            log.warning("Unknown timezone %r, not scheduling weekly reports", tz_name)
+            continue
+
+        app.job_queue.run_daily(
+            callback=_generate_weekly_reports,
+            time=dtime(hour=hour, minute=minute, tzinfo=tz),
+            days=(0,),  # Sunday: PTB run_daily counts 0 = Sunday, unlike reminder specs (Mon=0)
+            name=f"weekly_report:{tz_name}",
+            data={
+                "db_path": db_path,
+                "default_timezone": timezone,
+                "timezone": tz_name,
+                "max_workers": max_workers,
+            },
+        )
+
+
+async def _generate_weekly_reports(context) -> None:
+    if not await _holds_lease(context):
+        return
+    from health_bot import coach  # numpy: imported by the first run, not at startup
 
-async def _send_daily_reminder_one(context) -> None:
     data = context.job.data
-    db_path = data["db_path"]
-    user_id = int(data["user_id"])
-    chat_id = int(data["chat_id"])
-    tz_name = (data.get("timezone") or "Europe/Kiev").strip()
+    # Blocking (SQLite + process pool): keep it off the event loop
+    await asyncio.to_thread(
+        coach.generate_weekly_reports,
+        data["db_path"],
+        timezone=data["default_timezone"],
+        only_timezone=data["timezone"],
+        max_workers=int(data["max_workers"]),
+    )
 
-    today = datetime.now(ZoneInfo(tz_name)).date().isoformat()
 
-    conn = connect(db_path)
-    entry = conn.execute(
-        "SELECT id FROM daily_entries WHERE user_id = ? AND date = ?",
-        (user_id, today),
-    ).fetchone()
-
-    if entry:
-        value_count = conn.execute(
-            "SELECT COUNT(1) AS c FROM daily_values WHERE daily_entry_id = ?",
-            (entry["id"],),
-        ).fetchone()["c"]
-
-        # If user has at least one value saved today → skip reminder
-        if int(value_count) > 0:
-            conn.close()
-            return
+def schedule_insights_refresh(
+    app,
+    *,
+    db_path: str,
+    timezone: str,
+    hour: int = 3,
+    minute: int = 30,
+    max_workers: int = 2,
+) -> None:
+    """Nightly bulk recompute of stale insights, so /insights is a cache hit."""
+    for job in app.job_queue.jobs():
+        if getattr(job, "name", "") == "insights_refresh":
+            job.schedule_removal()
+
+    app.job_queue.run_daily(
+        callback=_refresh_insights,
+        time=dtime(hour=hour, minute=minute, tzinfo=timezones.get_zone(timezone)),
+        name="insights_refresh",
+        data={"db_path": db_path, "timezone": timezone, "max_workers": max_workers},
+    )
 
-    conn.close()
 
-    await context.bot.send_message(
-        chat_id=chat_id,
-        text="⏰ Time for your daily check-in 💪\n\nUse /checkin",
+async def _refresh_insights(context) -> None:
+    if not await _holds_lease(context):
+        return
+    from health_bot import insights  # numpy: imported by the first run, not at startup
+
+    data = context.job.data
+    await asyncio.to_thread(
+        insights.refresh_insights,
+        data["db_path"],
+        timezone=data["timezone"],
+        max_workers=int(data["max_workers"]),
     )
 
-def schedule_weekly_reminders(
+
+def schedule_wal_checkpoints(
     app,
     *,
     db_path: str,
     timezone: str,
-    hour: int = 12,
-    minute: int = 0,
+    interval_minutes: int = 15,
+    quiet_hour: int = 4,
 ) -> None:
-    """Weekly reminder (Sunday) using JobQueue.
+    """Keep the WAL bounded.
 
-    Smart behavior: skip if weekly entry already exists for the current week.
+    - PASSIVE checkpoint every `interval_minutes` (never blocks writers).
+    - TRUNCATE checkpoint daily at `quiet_hour` (resets the -wal file size).
     """
-
-    # Remove previously scheduled weekly jobs
     for job in app.job_queue.jobs():
-        if getattr(job, "name", "") and str(job.name).startswith("weekly_checkin:"):
+        if getattr(job, "name", "") and str(job.name).startswith("wal_checkpoint:"):
             job.schedule_removal()
 
-    conn = connect(db_path)
-    users = conn.execute(
-        """
-        SELECT id, telegram_user_id, chat_id, timezone, reminders_enabled
-          FROM users
-        """
-    ).fetchall()
-    conn.close()
+    data = {"db_path": db_path}
+
+    if interval_minutes > 0:
+        app.job_queue.run_repeating(
+            callback=_wal_checkpoint_passive,
+            interval=interval_minutes * 60,
+            first=interval_minutes * 60,
+            name="wal_checkpoint:passive",
+            data=data,
+        )
+
+    app.job_queue.run_daily(
+        callback=_wal_checkpoint_truncate,
+        time=dtime(hour=quiet_hour, minute=0, tzinfo=timezones.get_zone(timezone)),
+        name="wal_checkpoint:truncate",
+        data=data,
+    )
 
-    for u in users:
+
+def _run_checkpoint(db_path: str, mode: str) -> None:
+    # Called via asyncio.to_thread: TRUNCATE waits out readers (busy_timeout),
+    # which would stall every handler on the event loop.
+    # Every shard file has its own WAL, and so does the archive
+    paths = [shard_path(db_path, shard) for shard in range(shard_count())]
+    if os.path.exists(archive_path(db_path)):
+        paths.append(archive_path(db_path))
+    for path in paths:
+        conn = connect(path)
         try:
-            # Reuse reminders_enabled for now (simple v1 switch)
-            if int(u["reminders_enabled"]) == 0:
-                continue
-
-            tz_name = (u["timezone"] or timezone).strip() or timezone
-            tz = ZoneInfo(tz_name)
-            when = dtime(hour=hour, minute=minute, tzinfo=tz)
-
-            # Sunday = 6 (Mon=0)
-            app.job_queue.run_daily(
-                callback=_send_weekly_reminder_one,
-                time=when,
-                days=(6,),
-                name=f"weekly_checkin:{int(u['id'])}",
-                data={
-                    "db_path": db_path,
-                    "user_id": int(u["id"]),
-                    "telegram_user_id": int(u["telegram_user_id"]),
-                    "chat_id": int(u["chat_id"]),
-                    "timezone": tz_name,
-                },
-            )
-        except Exception:
-            log.exception("Failed to schedule weekly reminder for user_id=%s", u.get("id"))
+            busy, wal_frames, done = checkpoint(conn, mode)
+        finally:
+            conn.close()
+
+        if busy:
+            log.info("WAL checkpoint %s busy on %s (%s/%s frames)", mode, path, done, wal_frames)
+        else:
+            log.debug("WAL checkpoint %s done on %s (%s/%s frames)", mode, path, done, wal_frames)
+
+
+async def _wal_checkpoint_passive(context) -> None:
+    await asyncio.to_thread(_run_checkpoint, context.job.data["db_path"], "PASSIVE")
+
+
+async def _wal_checkpoint_truncate(context) -> None:
+    await asyncio.to_thread(_run_checkpoint, context.job.data["db_path"], "TRUNCATE")
+
+
+def schedule_archival(
+    app,
+    *,
+    db_path: str,
+    timezone: str,
+    keep_days: int,
+    hour: int = 3,
+    minute: int = 0,
+) -> None:
+    """Nightly retention run: old boolean/mood values move to the archive DB."""
+    for job in app.job_queue.jobs():
+        if getattr(job, "name", "") == "archival":
+            job.schedule_removal()
+
+    app.job_queue.run_daily(
+        callback=_archive_history,
+        time=dtime(hour=hour, minute=minute, tzinfo=timezones.get_zone(timezone)),
+        name="archival",
+        data={"db_path": db_path, "timezone": timezone, "keep_days": keep_days},
+    )
+
+
+async def _archive_history(context) -> None:
+    if not await _holds_lease(context):
+        return
+    from health_bot import archive
 
-async def _send_weekly_reminder_one(context) -> None:
     data = context.job.data
-    db_path = data["db_path"]
-    user_id = int(data["user_id"])
-    chat_id = int(data["chat_id"])
-    tz_name = (data.get("timezone") or "Europe/Kiev").strip()
+    # Short per-batch transactions, but many of them: keep them off the event loop
+    await asyncio.to_thread(
+        archive.archive_history,
+        data["db_path"],
+        keep_days=int(data["keep_days"]),
+        today=timezones.today(data["timezone"]),
+    )
 
-    week_start = _week_start_date_str(tz_name)
 
-    conn = connect(db_path)
-    row = conn.execute(
-        "SELECT 1 FROM weekly_entries WHERE user_id = ? AND week_start_date = ?",
-        (user_id, week_start),
-    ).fetchone()
-    conn.close()
+async def schedule_timezone_refresh(app, *, storage: Storage, timezone: str) -> None:
+    """Roll every used timezone's cached "today" over at its local midnight."""
+    used = await storage.user_timezones()
+    zones = {timezone, *(tz.strip() for tz in used if tz.strip())}
+    for tz_name in sorted(zones):
+        ensure_timezone_refresh(app, tz_name)
+
 
-    # Already done for this week → skip
-    if row:
+def ensure_timezone_refresh(app, tz_name: str) -> None:
+    """Add the midnight refresh job for one zone (no-op if it exists)."""
+    name = f"tz_refresh:{tz_name}"
+    if app.job_queue.get_jobs_by_name(name):
+        return
+    try:
+        tz = timezones.get_zone(tz_name)
+    except Exception:
+        log.warning("Unknown timezone %r, not scheduling refresh", tz_name)
         return
 
-    await context.bot.send_message(
-        chat_id=chat_id,
-        text="📅 Weekly check-in time ✍️\n\nUse /weekly",
-    )
\ No newline at end of file
+    timezones.refresh(tz_name)
+    app.job_queue.run_daily(
+        callback=_refresh_timezone,
+        time=dtime(hour=0, minute=0, second=1, tzinfo=tz),
+        name=name,
+        data={"timezone": tz_name},
+    )
+
+
+async def _refresh_timezone(context) -> None:
+    tz_name = context.job.data["timezone"]
+    log.debug("Timezone %s rolled over to %s", tz_name, timezones.refresh(tz_name))
@@ -1,5 +1,9 @@
+import functools
 import sqlite3
 from pathlib import Path
+from typing import NamedTuple
+
+from health_bot.db import assign_shard
 
 
 def normalize_title(title: str) -> str:
@@ -12,15 +16,18 @@ def normalize_title(title: str) -> str:
 
 
 def ensure_household(conn: sqlite3.Connection, name: str = "Family") -> int:
+    """Id of the household with this name, created if missing. Caller commits."""
     row = conn.execute("SELECT id FROM households WHERE name = ?", (name,)).fetchone()
     if row:
         return int(row["id"])
 
     cur = conn.execute("INSERT INTO households (name) VALUES (?)", (name,))
-    conn.commit()
     return int(cur.lastrowid)
 
 
+HABIT_KINDS = ("boolean", "number", "choice", "text")
+
+
 def infer_kind(title: str) -> str:
     """Infer habit kind from the title.
 
@@ -34,69 +41,244 @@ def infer_kind(title: str) -> str:
     return "boolean"
 
 
-def read_fields(fields_path: str) -> list[str]:
+class FieldSpec(NamedTuple):
+    title: str
+    kind: str
+    target: str | None = None
+
+
+def parse_field(line: str) -> FieldSpec:
+    """Parse one fields.txt line.
+
+    An explicit kind and target can follow pipes: `Кроки 👣 | number | 10000`,
+    `Нотатка | text`. Without a kind it is inferred from the title. The target
+    is only kept for number habits and must itself be a number.
+    """
+    title, _, rest = line.partition("|")
+    kind, _, target = rest.partition("|")
+    title = normalize_title(title)
+    kind = kind.strip().lower()
+    if kind not in HABIT_KINDS:
+        kind = infer_kind(title)
+
+    target = target.strip().replace(",", ".")
+    try:
+        float(target)
+    except ValueError:
+        target = ""
+    return FieldSpec(title, kind, target if kind == "number" and target else None)
+
+
+def read_field_specs(fields_path: str) -> list[FieldSpec]:
+    """Habits in file order. A title listed twice (any case) counts once, at its first line."""
     p = Path(fields_path)
-    lines = []
+    specs = []
+    seen: set[str] = set()
     for raw in p.read_text(encoding="utf-8").splitlines():
         s = normalize_title(raw)
         if not s or s.startswith("#"):
             continue
-        lines.append(s)
-    return lines
+        spec = parse_field(s)
+        if spec.title.lower() in seen:
+            continue
+        seen.add(spec.title.lower())
+        specs.append(spec)
+    return specs
 
 
-def seed_habits_from_fields(
+@functools.lru_cache(maxsize=8)
+def _cached_field_specs(fields_path: str, mtime_ns: int) -> tuple[FieldSpec, ...]:
+    return tuple(read_field_specs(fields_path))
+
+
+def habit_template(fields_path: str) -> tuple[FieldSpec, ...]:
+    """fields.txt specs, parsed once per file version (new households copy these)."""
+    return _cached_field_specs(fields_path, Path(fields_path).stat().st_mtime_ns)
+
+
+def create_household(
     conn: sqlite3.Connection,
     *,
-    household_id: int,
+    owner_telegram_user_id: int,
+    name: str,
     fields_path: str,
 ) -> int:
-    titles = read_fields(fields_path)
+    """The household owned by this Telegram user, created with habits from fields.txt.
 
-    existing_rows = conn.execute(
-        "SELECT id, title FROM habits WHERE household_id = ?",
-        (household_id,),
-    ).fetchall()
+    Idempotent (unique index on owner_telegram_user_id). The habits are copied
+    in one executemany. Does not commit, so the caller can add the user row
+    in the same transaction.
+    """
+    cur = conn.execute(
+        """
+        INSERT INTO households (name, owner_telegram_user_id)
+        VALUES (?, ?)
+        ON CONFLICT(owner_telegram_user_id) DO NOTHING
+        """,
+        (name, owner_telegram_user_id),
+    )
+    if cur.rowcount == 0:
+        row = conn.execute(
+            "SELECT id FROM households WHERE owner_telegram_user_id = ?",
+            (owner_telegram_user_id,),
+        ).fetchone()
+        return int(row["id"])
 
-    # Map normalized title -> (id, stored_title)
-    existing_by_title: dict[str, tuple[int, str]] = {
-        normalize_title(r["title"]).lower(): (int(r["id"]), str(r["title"]))
-        for r in existing_rows
-    }
+    household_id = int(cur.lastrowid)
+    assign_shard(conn, household_id)
+    conn.executemany(
+        """
+        INSERT INTO habits (household_id, title, kind, target, enabled, sort_order)
+        VALUES (?, ?, ?, ?, 1, ?)
+        """,
+        [(household_id, title, kind, target, idx) for idx, (title, kind, target) in enumerate(habit_template(fields_path))],
+    )
+    return household_id
 
-    inserted = 0
-    updated = 0
 
-    for idx, raw_title in enumerate(titles):
-        title = normalize_title(raw_title)
-        kind = infer_kind(title)
-        key = title.lower()
-
-        if key in existing_by_title:
-            habit_id, stored_title = existing_by_title[key]
-
-            # Update kind/order/enabled; also clean up previously stored titles with stray quotes
-            conn.execute(
-                """
-                UPDATE habits
-                   SET title = ?,
-                       kind = ?,
-                       enabled = 1,
-                       sort_order = ?
-                 WHERE id = ?
-                """,
-                (title, kind, idx, habit_id),
-            )
-            updated += 1
+def read_fields(fields_path: str) -> list[str]:
+    return [spec.title for spec in read_field_specs(fields_path)]
+
+
+class HabitChange(NamedTuple):
+    habit_id: int | None  # None: new habit
+    sort_order: int
+    spec: FieldSpec
+    before: sqlite3.Row | None  # stored row (title, kind, target, enabled, sort_order)
+
+
+class HabitDiff(NamedTuple):
+    """What seeding fields.txt changes in one household."""
+
+    household_id: int
+    upserts: list[HabitChange]  # new, or stored with different fields
+    disabled: list[sqlite3.Row]  # enabled habits no longer in fields.txt (id, title)
+    unchanged: int
+
+    def __bool__(self) -> bool:
+        return bool(self.upserts or self.disabled)
+
+
+def diff_habits(household_id: int, stored: list[sqlite3.Row], specs: list[FieldSpec]) -> HabitDiff:
+    """Compare a household's stored habits with fields.txt.
+
+    Titles match after normalize_title, case-insensitively; a stored row with
+    the exact title wins over near-duplicates, which are disabled.
+    """
+    by_key: dict[str, list[sqlite3.Row]] = {}
+    for row in sorted(stored, key=lambda r: int(r["id"])):
+        by_key.setdefault(normalize_title(str(row["title"])).lower(), []).append(row)
+
+    upserts = []
+    unchanged = 0
+    matched: set[int] = set()
+    for order, spec in enumerate(specs):
+        candidates = by_key.get(spec.title.lower())
+        if not candidates:
+            upserts.append(HabitChange(None, order, spec, None))
+            continue
+        row = next((r for r in candidates if r["title"] == spec.title), candidates[0])
+        matched.add(int(row["id"]))
+        if (row["title"], row["kind"], row["target"], int(row["enabled"]), int(row["sort_order"])) == (
+            spec.title,
+            spec.kind,
+            spec.target,
+            1,
+            order,
+        ):
+            unchanged += 1
         else:
-            conn.execute(
-                """
-                INSERT INTO habits (household_id, title, kind, target, enabled, sort_order)
-                VALUES (?, ?, ?, NULL, 1, ?)
-                """,
-                (household_id, title, kind, idx),
-            )
-            inserted += 1
+            upserts.append(HabitChange(int(row["id"]), order, spec, row))
+
+    disabled = [r for r in stored if int(r["id"]) not in matched and int(r["enabled"])]
+    return HabitDiff(household_id, upserts, disabled, unchanged)
+
+
+def plan_seed(
+    conn: sqlite3.Connection, specs: list[FieldSpec], household_ids: list[int] | None = None
+) -> list[HabitDiff]:
+    """One diff per household (every household if `household_ids` is None), from one query."""
+    sql = "SELECT id, household_id, title, kind, target, enabled, sort_order FROM habits"
+    if household_ids is None:
+        household_ids = [int(r["id"]) for r in conn.execute("SELECT id FROM households ORDER BY id")]
+        rows = conn.execute(sql).fetchall()
+    else:
+        rows = conn.execute(
+            f"{sql} WHERE household_id IN ({', '.join('?' * len(household_ids))})", household_ids
+        ).fetchall()
+
+    stored: dict[int, list[sqlite3.Row]] = {hid: [] for hid in household_ids}
+    for row in rows:
+        stored.setdefault(int(row["household_id"]), []).append(row)
+    return [diff_habits(hid, stored[hid], specs) for hid in household_ids]
 
+
+def apply_seed(conn: sqlite3.Connection, diffs: list[HabitDiff]) -> None:
+    """Write the diffs with three executemany calls. Caller commits (one transaction for all)."""
+    # Stored titles that only matched after normalizing (quotes, case) take the fields.txt title first
+    conn.executemany(
+        "UPDATE habits SET title = ? WHERE id = ?",
+        [
+            (c.spec.title, c.habit_id)
+            for d in diffs
+            for c in d.upserts
+            if c.before is not None and c.before["title"] != c.spec.title
+        ],
+    )
+    conn.executemany(
+        """
+        INSERT INTO habits (household_id, title, kind, target, enabled, sort_order)
+        VALUES (?, ?, ?, ?, 1, ?)
+        ON CONFLICT(household_id, title)
+        DO UPDATE SET kind = excluded.kind,
+                      target = excluded.target,
+                      enabled = 1,
+                      sort_order = excluded.sort_order
+        """,
+        [(d.household_id, c.spec.title, c.spec.kind, c.spec.target, c.sort_order) for d in diffs for c in d.upserts],
+    )
+    conn.executemany(
+        "UPDATE habits SET enabled = 0 WHERE id = ?",
+        [(int(r["id"]),) for d in diffs for r in d.disabled],
+    )
+
+
+def format_diff(diff: HabitDiff, name: str | None = None) -> list[str]:
+    """Human-readable lines for a dry run."""
+    label = f"household {diff.household_id}" + (f" ({name})" if name else "")
+    added = sum(c.before is None for c in diff.upserts)
+    lines = [f"{label}: +{added} ~{len(diff.upserts) - added} -{len(diff.disabled)} ={diff.unchanged}"]
+    for c in diff.upserts:
+        spec = c.spec
+        if c.before is None:
+            target = f", target {spec.target}" if spec.target else ""
+            lines.append(f"  + {spec.title} [{spec.kind}{target}]")
+            continue
+        changes = []
+        for field, old, new in (
+            ("title", c.before["title"], spec.title),
+            ("kind", c.before["kind"], spec.kind),
+            ("target", c.before["target"], spec.target),
+            ("order", int(c.before["sort_order"]), c.sort_order),
+        ):
+            if old != new:
+                changes.append(f"{field} {old} → {new}")
+        if not int(c.before["enabled"]):
+            changes.append("re-enabled")
+        lines.append(f"  ~ {spec.title}: {'; '.join(changes)}")
+    for r in diff.disabled:
+        lines.append(f"  - {r['title']} (disabled)")
+    return lines
+
+
+def seed_habits_from_fields(
+    conn: sqlite3.Connection,
+    *,
+    household_id: int,
+    fields_path: str,
+) -> int:
+    """Make one household's habits match fields.txt and commit. Returns habits written."""
+    diffs = plan_seed(conn, read_field_specs(fields_path), [household_id])
+    apply_seed(conn, diffs)
     conn.commit()
-    return inserted + updated
\ No newline at end of file
+    return sum(len(d.upserts) + len(d.disabled) for d in diffs)
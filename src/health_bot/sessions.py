@@ -0,0 +1,60 @@
+import time
+from collections import OrderedDict
+
+
+class UserSessionCache:
+    """LRU + TTL cache of the users row (id, household_id, timezone) by telegram_user_id.
+
+    Lets handlers resolve "who is this" without a query. Entries are filled
+    on /start, /join and on first miss, and must be invalidated whenever a
+    user's household or timezone changes. The TTL bounds staleness for
+    changes made outside this process (scripts, other workers).
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: float = 600) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._items: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, telegram_user_id: int) -> dict | None:
+        key = int(telegram_user_id)
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        expires_at, session = item
+        if time.monotonic() >= expires_at:
+            del self._items[key]
+            self.misses += 1
+            return None
+
+        self._items.move_to_end(key)
+        self.hits += 1
+        return session
+
+    def put(self, telegram_user_id: int, session: dict) -> None:
+        key = int(telegram_user_id)
+        self._items[key] = (time.monotonic() + self.ttl_seconds, session)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, telegram_user_id: int) -> None:
+        self._items.pop(int(telegram_user_id), None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._items),
+        }
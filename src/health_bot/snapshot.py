@@ -0,0 +1,114 @@
+import sqlite3
+import time
+from pathlib import Path
+
+from health_bot.db import archive_path, existing_shards, shard_path
+
+DEFAULT_SNAPSHOT_PATH = "db/snapshots/health_bot_snapshot.sqlite3"
+
+
+def make_snapshot(db_path: str, snapshot_path: str = DEFAULT_SNAPSHOT_PATH) -> Path:
+    """Materialize a consistent copy of the live DB for read-only analytics.
+
+    Uses the online backup API (one short read transaction on the live DB),
+    writes to a temp file and atomically swaps it in.
+    """
+    out = Path(snapshot_path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(".tmp")
+    tmp.unlink(missing_ok=True)
+
+    src = sqlite3.connect(db_path)
+    dst = sqlite3.connect(tmp)
+    try:
+        src.backup(dst)
+        # Snapshot is never written again: drop WAL so it can be opened immutable
+        dst.execute("PRAGMA journal_mode = DELETE;")
+    finally:
+        dst.close()
+        src.close()
+
+    tmp.replace(out)
+    return out
+
+
+def ensure_snapshot(
+    db_path: str,
+    snapshot_path: str = DEFAULT_SNAPSHOT_PATH,
+    max_age_seconds: int = 300,
+) -> Path:
+    """Reuse an existing snapshot if it is fresh enough, otherwise rebuild it."""
+    p = Path(snapshot_path)
+    if p.exists() and time.time() - p.stat().st_mtime <= max_age_seconds:
+        return p
+    return make_snapshot(db_path, snapshot_path)
+
+
+def _readonly_uri(db_path: str, *, immutable: bool = False) -> str:
+    uri = f"file:{Path(db_path).resolve()}?mode=ro"
+    if immutable:
+        uri += "&immutable=1"
+    return uri
+
+
+def connect_readonly(db_path: str, *, immutable: bool = False) -> sqlite3.Connection:
+    conn = sqlite3.connect(_readonly_uri(db_path, immutable=immutable), uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def connect_analytics(
+    db_path: str,
+    *,
+    live: bool = False,
+    snapshot_path: str = DEFAULT_SNAPSHOT_PATH,
+    max_age_seconds: int = 300,
+) -> sqlite3.Connection:
+    """Connection for heavy read-only scripts.
+
+    Default: an immutable snapshot (no locks, never touches the bot's WAL).
+    live=True: read-only connection to the live DB (fresh data, shares its WAL).
+    """
+    if live:
+        return connect_readonly(db_path)
+
+    snap = ensure_snapshot(db_path, snapshot_path, max_age_seconds)
+    return connect_readonly(str(snap), immutable=True)
+
+
+def connect_analytics_shards(
+    db_path: str,
+    *,
+    live: bool = False,
+    snapshot_path: str = DEFAULT_SNAPSHOT_PATH,
+    max_age_seconds: int = 300,
+) -> list[sqlite3.Connection]:
+    """connect_analytics() for every shard file (index = shard number).
+
+    Shard 0 is the directory DB; the others get it (or its snapshot) ATTACHed
+    as `dir`, so queries joining users/habits run unchanged on each of them.
+    The archive DB, when there is one, is ATTACHed to all of them as `archive`
+    (read both tiers with archive.values_sql). Fan out a query over the list
+    and merge the results.
+    """
+    conns = [connect_analytics(db_path, live=live, snapshot_path=snapshot_path, max_age_seconds=max_age_seconds)]
+    directory = db_path if live else snapshot_path
+    for shard in existing_shards(db_path)[1:]:
+        conn = connect_analytics(
+            shard_path(db_path, shard),
+            live=live,
+            snapshot_path=shard_path(snapshot_path, shard),
+            max_age_seconds=max_age_seconds,
+        )
+        conn.execute("ATTACH DATABASE ? AS dir", (_readonly_uri(directory, immutable=not live),))
+        conns.append(conn)
+
+    archive = archive_path(db_path)
+    if Path(archive).exists():
+        if not live:
+            # Taken after the shard snapshots: archival commits the archive before
+            # deleting from the shards, so a value is never missing from both
+            archive = str(make_snapshot(archive, archive_path(snapshot_path)))
+        for conn in conns:
+            conn.execute("ATTACH DATABASE ? AS archive", (_readonly_uri(archive, immutable=not live),))
+    return conns
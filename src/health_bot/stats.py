@@ -0,0 +1,181 @@
+"""Habit progress aggregates, computed in SQL over daily_values.value_num.
+
+Each helper runs plain GROUP BY aggregates (plus a window function over the
+per-day rows for ranking) on daily_entries(user_id, date) and the covering
+daily_values index. Nothing loads raw rows or parses strings in Python.
+With the archive attached, the same aggregates also cover the archived
+months (health_bot.archive.values_sql).
+"""
+import sqlite3
+from datetime import date, timedelta
+from typing import NamedTuple
+
+from health_bot.archive import HOT_VALUES_SQL, TIERED_VALUES_SQL, values_sql
+
+# 1 = goal met, 0 = missed, NULL = no goal (mood, text, number without target)
+ATTAINED_SQL = """
+    CASE
+        WHEN {kind} = 'boolean' THEN {value_num} >= 1
+        WHEN {kind} = 'number' AND {target} IS NOT NULL THEN {value_num} >= CAST({target} AS REAL)
+    END
+"""
+
+_ATTAINED = ATTAINED_SQL.format(kind="h.kind", value_num="v.value_num", target="h.target")
+
+
+def has_goal(kind: str, target) -> bool:
+    """Whether a habit counts towards attainment (mirrors ATTAINED_SQL)."""
+    return kind == "boolean" or (kind == "number" and target not in (None, ""))
+
+
+class DayProgress(NamedTuple):
+    date: str
+    tracked: int
+    attained: int
+
+
+class HabitStats(NamedTuple):
+    habit_id: int
+    days: int                   # days with a numeric value
+    avg: float | None
+    attained: int
+    goal_days: int              # days where attainment could be judged
+    rolling_avg: float | None   # average over the last `window_days` of the range
+    best_date: str | None
+    best_value: float | None
+    worst_date: str | None
+    worst_value: float | None
+
+    @property
+    def attainment_pct(self) -> float | None:
+        return None if not self.goal_days else 100.0 * self.attained / self.goal_days
+
+
+_DAILY_PROGRESS = f"""
+    SELECT v.date AS date,
+           COUNT(*) AS tracked,  -- cleared values are deleted, never stored as ''
+
+           COALESCE(SUM({_ATTAINED}), 0) AS attained
+      FROM ({{values}}) v
+      JOIN habits h ON h.id = v.habit_id AND h.enabled = 1
+     GROUP BY v.date
+"""
+
+# Built once per source; values_sql(conn) picks the hot-only or the tiered one per call
+_DAILY_PROGRESS_SQL = {src: _DAILY_PROGRESS.format(values=src) for src in (HOT_VALUES_SQL, TIERED_VALUES_SQL)}
+
+
+def daily_progress(conn: sqlite3.Connection, user_id: int, start: str, end: str) -> dict[str, DayProgress]:
+    """Tracked values and goals met per date in [start, end] (dates without entries are absent)."""
+    rows = conn.execute(
+        _DAILY_PROGRESS_SQL[values_sql(conn)] + " ORDER BY date",
+        {"user_id": user_id, "start": start, "end": end},
+    ).fetchall()
+    return {str(r["date"]): DayProgress(str(r["date"]), int(r["tracked"]), int(r["attained"])) for r in rows}
+
+
+def best_and_worst_days(
+    conn: sqlite3.Connection, user_id: int, start: str, end: str
+) -> tuple[DayProgress | None, DayProgress | None]:
+    """Days with the most / fewest goals met (ties: more tracked wins, then the latest)."""
+    rows = conn.execute(
+        f"""
+        WITH days AS ({_DAILY_PROGRESS_SQL[values_sql(conn)]}),
+        ranked AS (
+            SELECT date, tracked, attained,
+                   ROW_NUMBER() OVER (ORDER BY attained DESC, tracked DESC, date DESC) AS best_rank,
+                   ROW_NUMBER() OVER (ORDER BY attained ASC, tracked ASC, date DESC) AS worst_rank
+              FROM days
+        )
+        SELECT date, tracked, attained, best_rank, worst_rank
+          FROM ranked
+         WHERE best_rank = 1 OR worst_rank = 1
+        """,
+        {"user_id": user_id, "start": start, "end": end},
+    ).fetchall()
+
+    best = worst = None
+    for r in rows:
+        day = DayProgress(str(r["date"]), int(r["tracked"]), int(r["attained"]))
+        if int(r["best_rank"]) == 1:
+            best = day
+        if int(r["worst_rank"]) == 1:
+            worst = day
+    return best, worst
+
+
+_HABIT_VALUES = f"""
+    SELECT v.habit_id AS habit_id,
+           v.date AS date,
+           v.value_num AS value_num,
+           {_ATTAINED} AS attained
+      FROM ({{values}}) v
+      JOIN habits h ON h.id = v.habit_id
+     WHERE v.value_num IS NOT NULL
+"""
+
+_HABIT_VALUES_SQL = {src: _HABIT_VALUES.format(values=src) for src in (HOT_VALUES_SQL, TIERED_VALUES_SQL)}
+
+
+def habit_stats(
+    conn: sqlite3.Connection,
+    user_id: int,
+    start: str,
+    end: str,
+    *,
+    window_days: int = 7,
+) -> dict[int, HabitStats]:
+    """Per-habit average, attainment, rolling average and best/worst day.
+
+    The rolling average covers the last `window_days` days of the range.
+    Best/worst days use SQLite's bare-column rule for MIN()/MAX(), which is
+    one index pass each instead of a per-row window sort.
+    """
+    params = {
+        "user_id": user_id,
+        "start": start,
+        "end": end,
+        "window_start": (date.fromisoformat(end) - timedelta(days=max(1, int(window_days)) - 1)).isoformat(),
+    }
+    habit_values = _HABIT_VALUES_SQL[values_sql(conn)]
+    rows = conn.execute(
+        f"""
+        SELECT habit_id,
+               COUNT(*) AS days,
+               AVG(value_num) AS avg_value,
+               COALESCE(SUM(attained), 0) AS attained,
+               COUNT(attained) AS goal_days,
+               AVG(CASE WHEN date >= :window_start THEN value_num END) AS rolling_avg
+          FROM ({habit_values})
+         GROUP BY habit_id
+        """,
+        params,
+    ).fetchall()
+    extremes = conn.execute(
+        f"""
+        SELECT 'best' AS side, habit_id, MAX(value_num) AS value, date FROM ({habit_values}) GROUP BY habit_id
+        UNION ALL
+        SELECT 'worst' AS side, habit_id, MIN(value_num) AS value, date FROM ({habit_values}) GROUP BY habit_id
+        """,
+        params,
+    ).fetchall()
+    best_worst = {(str(r["side"]), int(r["habit_id"])): (r["date"], r["value"]) for r in extremes}
+
+    out = {}
+    for r in rows:
+        hid = int(r["habit_id"])
+        best_date, best_value = best_worst.get(("best", hid), (None, None))
+        worst_date, worst_value = best_worst.get(("worst", hid), (None, None))
+        out[hid] = HabitStats(
+            hid,
+            int(r["days"]),
+            r["avg_value"],
+            int(r["attained"]),
+            int(r["goal_days"]),
+            r["rolling_avg"],
+            best_date,
+            best_value,
+            worst_date,
+            worst_value,
+        )
+    return out
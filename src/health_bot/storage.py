@@ -0,0 +1,650 @@
+"""Where the bot keeps its state: a repository interface and its backends.
+
+Handlers, reminder jobs and the check-in write buffer only talk to a
+`Storage`. Its methods are async so a networked database never blocks the
+event loop.
+
+- `SqliteStorage` (default) wraps the helpers in health_bot.db, sharding included.
+- `PostgresStorage` (health_bot.storage_pg, needs asyncpg) lets several bot
+  workers share one database.
+
+Pick the backend with STORAGE_BACKEND. Derived data and offline tools
+(insights, coach reports, backups, dashboard, export) read the SQLite files
+directly and are SQLite-only.
+"""
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import date
+from typing import Any, Iterable, Iterator, Mapping, Protocol
+
+from health_bot import bitmaps, stats
+from health_bot.archive import values_sql
+from health_bot.config import Settings
+from health_bot.db import (
+    ShardConnections,
+    get_or_create_daily_entry_id,
+    move_user_data,
+    shard_for_household,
+    upsert_daily_value_rows,
+    upsert_daily_values,
+)
+from health_bot.seed import create_household
+
+Row = Mapping[str, Any]
+
+# (user_id, date, habit_id, value)
+ValueRow = tuple[int, str, int, str]
+
+
+class Storage(Protocol):
+    async def open(self) -> None: ...
+    async def close(self) -> None: ...
+
+    # Users and households
+    async def get_user(self, telegram_user_id: int) -> Row | None:
+        """id, household_id, timezone."""
+
+    async def register_user(
+        self,
+        *,
+        telegram_user_id: int,
+        chat_id: int,
+        first_name: str | None,
+        username: str | None,
+        timezone: str,
+        household_name: str,
+        fields_path: str,
+    ) -> bool:
+        """Make sure the user exists and has a household (their own, from
+        fields.txt). True if the user row was created."""
+
+    async def create_invite(self, household_id: int, code: str) -> None: ...
+
+    async def redeem_invite(
+        self,
+        code: str,
+        *,
+        telegram_user_id: int,
+        chat_id: int,
+        first_name: str | None,
+        username: str | None,
+        timezone: str,
+    ) -> int | None:
+        """Move (or register) the user into the invite's household. Returns the
+        user id, or None if the code is unknown or already used."""
+
+    async def set_timezone(self, user_id: int, tz_name: str) -> None: ...
+    async def set_reminder_time(self, user_id: int, hhmm: str) -> None: ...
+    async def set_reminders_enabled(self, user_id: int, enabled: bool) -> None: ...
+
+    async def reminder_users(self, user_id: int | None = None) -> list[Row]:
+        """id, telegram_user_id, chat_id, household_id, timezone, reminders_enabled, reminder_time
+        of every user, or of just `user_id`."""
+
+    async def user_timezones(self) -> list[str]: ...
+
+    # Reminder schedule (see health_bot.scheduler)
+    async def reminder_jobs(self, kind: str, user_id: int | None = None) -> dict[int, tuple[str, float]]:
+        """user_id -> (spec, next_run_at) of the stored `kind` reminders."""
+
+    async def save_reminder_jobs(
+        self, kind: str, upsert: list[tuple[int, str, float]], delete: list[int]
+    ) -> None:
+        """Store (user_id, spec, next_run_at) rows and drop the `delete` users' rows, in one transaction."""
+
+    async def due_reminder_jobs(self, now: float, limit: int) -> list[Row]:
+        """user_id, kind, spec, next_run_at, chat_id, household_id of the
+        reminders due at `now`, oldest first."""
+
+    async def advance_reminder_jobs(self, rows: list[tuple[int, str, float]]) -> None:
+        """Set next_run_at of (user_id, kind, next_run_at) rows that still exist."""
+
+    async def checked_in_users(self, rows: list[tuple[int, int | None, str]]) -> set[int]:
+        """Of the (user_id, household_id, date) rows, the users with a saved value on that date."""
+
+    async def weekly_done_users(self, rows: list[tuple[int, str]]) -> set[int]:
+        """Of the (user_id, week_start) rows, the users with a weekly entry for that week."""
+
+    async def acquire_lease(self, name: str, holder: str, ttl_seconds: float) -> bool:
+        """Take or renew the named lease for `holder`. False while another holder's lease is live."""
+
+    # Habits
+    async def enabled_habits(self, household_id: int) -> list[Row]:
+        """id, title, kind, target in display order."""
+
+    # Daily check-ins (household_id routes the call; see health_bot.db sharding)
+    async def daily_values(self, user_id: int, household_id: int | None, date_str: str) -> dict[int, str]: ...
+    async def daily_values_since(self, user_id: int, household_id: int, start: str) -> dict[str, dict[int, str]]: ...
+    async def habit_bits(self, user_id: int, household_id: int, start: str) -> bitmaps.HabitBits:
+        """Per-habit day bitsets from `start` on (see health_bot.bitmaps)."""
+    async def save_daily_values(
+        self, user_id: int, household_id: int | None, date_str: str, values: dict[int, str]
+    ) -> None: ...
+    async def clear_daily_value(self, user_id: int, household_id: int, date_str: str, habit_id: int) -> None: ...
+    async def save_daily_values_for_dates(
+        self, user_id: int, household_id: int, dates: list[str], values: dict[int, str]
+    ) -> int: ...
+    async def import_daily_values(self, rows: Iterable[ValueRow]) -> int:
+        """Bulk upsert (user_id, date, habit_id, value) rows; returns values written."""
+
+    # Aggregates (see health_bot.stats)
+    async def daily_progress(
+        self, user_id: int, household_id: int, start: str, end: str
+    ) -> dict[str, stats.DayProgress]: ...
+    async def best_and_worst_days(
+        self, user_id: int, household_id: int, start: str, end: str
+    ) -> tuple[stats.DayProgress | None, stats.DayProgress | None]: ...
+    async def habit_stats(
+        self, user_id: int, household_id: int, start: str, end: str, *, window_days: int = 7
+    ) -> dict[int, stats.HabitStats]: ...
+    async def family_summary(self, household_id: int, start: str, end: str) -> list[Row]:
+        """Per member: id, first_name, telegram_user_id, tracked, success."""
+
+    # Weekly check-ins
+    async def weekly_entry(self, user_id: int, week_start: str) -> Row | None: ...
+    async def save_weekly_entry(
+        self,
+        user_id: int,
+        week_start: str,
+        weight_kg: float | None,
+        week_rating: int | None,
+        note: str | None,
+    ) -> None: ...
+
+
+class SqliteStorage:
+    """Default backend: the SQLite directory DB plus its shard files.
+
+    Calls run on the event loop thread, as the handlers' queries always did.
+    Each call is a few indexed statements on a connection that stays open per
+    shard, and each call is its own transaction.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._conns = ShardConnections(db_path)
+
+    async def open(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        self._conns.close()
+
+    @contextmanager
+    def _transaction(self, household_id: int | None = None) -> Iterator[sqlite3.Connection]:
+        if household_id is None:
+            conn = self._conns.shard(0)
+        else:
+            conn = self._conns.for_household(int(household_id))
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    # --- users and households ---
+
+    async def get_user(self, telegram_user_id: int) -> Row | None:
+        with self._transaction() as conn:
+            return conn.execute(
+                "SELECT id, household_id, timezone FROM users WHERE telegram_user_id = ?",
+                (telegram_user_id,),
+            ).fetchone()
+
+    async def register_user(
+        self,
+        *,
+        telegram_user_id: int,
+        chat_id: int,
+        first_name: str | None,
+        username: str | None,
+        timezone: str,
+        household_name: str,
+        fields_path: str,
+    ) -> bool:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id, household_id FROM users WHERE telegram_user_id = ?",
+                (telegram_user_id,),
+            ).fetchone()
+            if row and row["household_id"] is not None:
+                return False
+
+            household_id = create_household(
+                conn,
+                owner_telegram_user_id=telegram_user_id,
+                name=household_name,
+                fields_path=fields_path,
+            )
+            if row:
+                conn.execute("UPDATE users SET household_id = ? WHERE id = ?", (household_id, int(row["id"])))
+                return False
+
+            conn.execute(
+                """
+                INSERT INTO users (telegram_user_id, chat_id, household_id, timezone, first_name, username)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (telegram_user_id, chat_id, household_id, timezone, first_name, username),
+            )
+            return True
+
+    async def create_invite(self, household_id: int, code: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO household_invites (household_id, code) VALUES (?, ?)",
+                (household_id, code),
+            )
+
+    async def redeem_invite(
+        self,
+        code: str,
+        *,
+        telegram_user_id: int,
+        chat_id: int,
+        first_name: str | None,
+        username: str | None,
+        timezone: str,
+    ) -> int | None:
+        with self._transaction() as conn:
+            # Claim the code first, so two redemptions can't both succeed
+            claimed = conn.execute(
+                """
+                UPDATE household_invites
+                   SET used_at = datetime('now')
+                 WHERE code = ? AND used_at IS NULL
+                RETURNING id, household_id
+                """,
+                (code,),
+            ).fetchall()
+            if not claimed:
+                return None
+            invite = claimed[0]
+            household_id = int(invite["household_id"])
+
+            row = conn.execute(
+                "SELECT id, household_id FROM users WHERE telegram_user_id = ?",
+                (telegram_user_id,),
+            ).fetchone()
+            old_household_id = row["household_id"] if row else None
+            if row:
+                user_id = int(row["id"])
+                conn.execute(
+                    """
+                    UPDATE users
+                       SET chat_id = ?, household_id = ?, first_name = ?, username = ?
+                     WHERE id = ?
+                    """,
+                    (chat_id, household_id, first_name, username, user_id),
+                )
+            else:
+                cur = conn.execute(
+                    """
+                    INSERT INTO users (telegram_user_id, chat_id, household_id, timezone, first_name, username)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (telegram_user_id, chat_id, household_id, timezone, first_name, username),
+                )
+                user_id = int(cur.lastrowid)
+
+            conn.execute(
+                "UPDATE household_invites SET used_by_user_id = ? WHERE id = ?",
+                (user_id, int(invite["id"])),
+            )
+
+        if old_household_id is not None:
+            # Keep the user's history with them if the new household lives on another shard
+            src = shard_for_household(self.db_path, int(old_household_id))
+            dst = shard_for_household(self.db_path, household_id)
+            if src != dst:
+                move_user_data(self.db_path, [user_id], src, dst)
+        return user_id
+
+    async def set_timezone(self, user_id: int, tz_name: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("UPDATE users SET timezone = ? WHERE id = ?", (tz_name, user_id))
+
+    async def set_reminder_time(self, user_id: int, hhmm: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE users SET reminder_time = ?, reminders_enabled = 1 WHERE id = ?",
+                (hhmm, user_id),
+            )
+
+    async def set_reminders_enabled(self, user_id: int, enabled: bool) -> None:
+        with self._transaction() as conn:
+            conn.execute("UPDATE users SET reminders_enabled = ? WHERE id = ?", (int(enabled), user_id))
+
+    async def reminder_users(self, user_id: int | None = None) -> list[Row]:
+        sql = "SELECT id, telegram_user_id, chat_id, household_id, timezone, reminders_enabled, reminder_time FROM users"
+        with self._transaction() as conn:
+            if user_id is None:
+                return conn.execute(sql).fetchall()
+            return conn.execute(sql + " WHERE id = ?", (user_id,)).fetchall()
+
+    async def user_timezones(self) -> list[str]:
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT DISTINCT timezone FROM users WHERE timezone IS NOT NULL").fetchall()
+        return [str(r["timezone"]) for r in rows]
+
+    # --- reminder schedule ---
+
+    async def reminder_jobs(self, kind: str, user_id: int | None = None) -> dict[int, tuple[str, float]]:
+        sql = "SELECT user_id, spec, next_run_at FROM reminder_jobs WHERE kind = ?"
+        params: tuple = (kind,)
+        if user_id is not None:
+            sql += " AND user_id = ?"
+            params += (user_id,)
+        with self._transaction() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return {int(r["user_id"]): (str(r["spec"]), float(r["next_run_at"])) for r in rows}
+
+    async def save_reminder_jobs(
+        self, kind: str, upsert: list[tuple[int, str, float]], delete: list[int]
+    ) -> None:
+        with self._transaction() as conn:
+            conn.executemany(
+                """
+                INSERT INTO reminder_jobs (user_id, kind, spec, next_run_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id, kind)
+                DO UPDATE SET spec = excluded.spec, next_run_at = excluded.next_run_at
+                """,
+                [(user_id, kind, spec, next_run_at) for user_id, spec, next_run_at in upsert],
+            )
+            conn.executemany(
+                "DELETE FROM reminder_jobs WHERE user_id = ? AND kind = ?",
+                [(user_id, kind) for user_id in delete],
+            )
+
+    async def due_reminder_jobs(self, now: float, limit: int) -> list[Row]:
+        with self._transaction() as conn:
+            return conn.execute(
+                """
+                SELECT rj.user_id AS user_id, rj.kind AS kind, rj.spec AS spec, rj.next_run_at AS next_run_at,
+                       u.chat_id AS chat_id, u.household_id AS household_id
+                  FROM reminder_jobs rj
+                  JOIN users u ON u.id = rj.user_id
+                 WHERE rj.next_run_at <= ?
+                 ORDER BY rj.next_run_at ASC
+                 LIMIT ?
+                """,
+                (now, limit),
+            ).fetchall()
+
+    async def advance_reminder_jobs(self, rows: list[tuple[int, str, float]]) -> None:
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE reminder_jobs SET next_run_at = ? WHERE user_id = ? AND kind = ?",
+                [(next_run_at, user_id, kind) for user_id, kind, next_run_at in rows],
+            )
+
+    async def checked_in_users(self, rows: list[tuple[int, int | None, str]]) -> set[int]:
+        # One query per shard (and per 400 users, under SQLite's variable limit)
+        by_shard: dict[int, list[tuple[int, str]]] = {}
+        for user_id, household_id, date_str in rows:
+            shard = 0 if household_id is None else shard_for_household(self.db_path, int(household_id))
+            by_shard.setdefault(shard, []).append((int(user_id), date_str))
+
+        done: set[int] = set()
+        for shard, pairs in sorted(by_shard.items()):
+            conn = self._conns.shard(shard)
+            for i in range(0, len(pairs), 400):
+                chunk = pairs[i : i + 400]
+                found = conn.execute(
+                    f"""
+                    SELECT DISTINCT de.user_id AS user_id
+                      FROM main.daily_entries de
+                     WHERE (de.user_id, de.date) IN (VALUES {", ".join(["(?, ?)"] * len(chunk))})
+                       AND EXISTS (SELECT 1 FROM main.daily_values dv WHERE dv.daily_entry_id = de.id)
+                    """,
+                    [v for pair in chunk for v in pair],
+                ).fetchall()
+                done.update(int(r["user_id"]) for r in found)
+            conn.commit()
+        return done
+
+    async def weekly_done_users(self, rows: list[tuple[int, str]]) -> set[int]:
+        done: set[int] = set()
+        with self._transaction() as conn:
+            for i in range(0, len(rows), 400):
+                chunk = rows[i : i + 400]
+                found = conn.execute(
+                    f"""
+                    SELECT user_id
+                      FROM weekly_entries
+                     WHERE (user_id, week_start_date) IN (VALUES {", ".join(["(?, ?)"] * len(chunk))})
+                    """,
+                    [v for pair in chunk for v in pair],
+                ).fetchall()
+                done.update(int(r["user_id"]) for r in found)
+        return done
+
+    async def acquire_lease(self, name: str, holder: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO scheduler_leases (name, holder, expires_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE
+                   SET holder = excluded.holder, expires_at = excluded.expires_at
+                 WHERE scheduler_leases.holder = excluded.holder OR scheduler_leases.expires_at < ?
+                """,
+                (name, holder, now + ttl_seconds, now),
+            )
+            row = conn.execute("SELECT holder FROM scheduler_leases WHERE name = ?", (name,)).fetchone()
+        return row is not None and row["holder"] == holder
+
+    # --- habits ---
+
+    async def enabled_habits(self, household_id: int) -> list[Row]:
+        with self._transaction() as conn:
+            return conn.execute(
+                """
+                SELECT id, title, kind, target
+                  FROM habits
+                 WHERE household_id = ? AND enabled = 1
+                 ORDER BY sort_order ASC, id ASC
+                """,
+                (household_id,),
+            ).fetchall()
+
+    # --- daily check-ins ---
+
+    async def daily_values(self, user_id: int, household_id: int | None, date_str: str) -> dict[int, str]:
+        with self._transaction(household_id) as conn:
+            rows = conn.execute(
+                """
+                SELECT dv.habit_id AS habit_id, dv.value AS value
+                  FROM main.daily_entries de
+                  JOIN main.daily_values dv ON dv.daily_entry_id = de.id
+                 WHERE de.user_id = ? AND de.date = ?
+                """,
+                (user_id, date_str),
+            ).fetchall()
+        return {int(r["habit_id"]): ("" if r["value"] is None else str(r["value"])) for r in rows}
+
+    async def daily_values_since(self, user_id: int, household_id: int, start: str) -> dict[str, dict[int, str]]:
+        with self._transaction(household_id) as conn:
+            rows = conn.execute(
+                values_sql(conn),  # archived months included (health_bot.archive)
+                {"user_id": user_id, "start": start, "end": "9999-12-31"},
+            ).fetchall()
+        out: dict[str, dict[int, str]] = {}
+        for r in rows:
+            out.setdefault(str(r["date"]), {})[int(r["habit_id"])] = "" if r["value"] is None else str(r["value"])
+        return out
+
+    async def habit_bits(self, user_id: int, household_id: int, start: str) -> bitmaps.HabitBits:
+        with self._transaction(household_id) as conn:
+            bits = bitmaps.load(conn, user_id, date.fromisoformat(start))
+        if bits is None:  # HABIT_BITMAPS off: build them from the rows
+            values = await self.daily_values_since(user_id, household_id, start)
+            bits = bitmaps.from_values(date.fromisoformat(start), values)
+        return bits
+
+    async def save_daily_values(
+        self, user_id: int, household_id: int | None, date_str: str, values: dict[int, str]
+    ) -> None:
+        with self._transaction(household_id) as conn:
+            daily_entry_id = get_or_create_daily_entry_id(conn, user_id, date_str)
+            upsert_daily_values(conn, daily_entry_id, values)
+
+    async def clear_daily_value(self, user_id: int, household_id: int, date_str: str, habit_id: int) -> None:
+        with self._transaction(household_id) as conn:
+            conn.execute(
+                """
+                DELETE FROM main.daily_values
+                 WHERE habit_id = ?
+                   AND daily_entry_id = (SELECT id FROM main.daily_entries WHERE user_id = ? AND date = ?)
+                """,
+                (habit_id, user_id, date_str),
+            )
+
+    async def save_daily_values_for_dates(
+        self, user_id: int, household_id: int, dates: list[str], values: dict[int, str]
+    ) -> int:
+        with self._transaction(household_id) as conn:
+            return upsert_daily_value_rows(
+                conn, [(user_id, d, hid, value) for d in dates for hid, value in values.items()]
+            )
+
+    async def import_daily_values(self, rows: Iterable[ValueRow]) -> int:
+        rows = list(rows)
+        with self._transaction() as conn:
+            households = {
+                int(r["id"]): r["household_id"]
+                for r in conn.execute("SELECT id, household_id FROM users").fetchall()
+            }
+        by_shard: dict[int, list[ValueRow]] = {}
+        for row in rows:
+            household_id = households.get(int(row[0]))
+            shard = 0 if household_id is None else shard_for_household(self.db_path, int(household_id))
+            by_shard.setdefault(shard, []).append(row)
+
+        written = 0
+        for shard, shard_rows in sorted(by_shard.items()):
+            conn = self._conns.shard(shard)
+            try:
+                written += upsert_daily_value_rows(conn, shard_rows)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return written
+
+    # --- aggregates ---
+
+    async def daily_progress(
+        self, user_id: int, household_id: int, start: str, end: str
+    ) -> dict[str, stats.DayProgress]:
+        with self._transaction(household_id) as conn:
+            return stats.daily_progress(conn, user_id, start, end)
+
+    async def best_and_worst_days(
+        self, user_id: int, household_id: int, start: str, end: str
+    ) -> tuple[stats.DayProgress | None, stats.DayProgress | None]:
+        with self._transaction(household_id) as conn:
+            return stats.best_and_worst_days(conn, user_id, start, end)
+
+    async def habit_stats(
+        self, user_id: int, household_id: int, start: str, end: str, *, window_days: int = 7
+    ) -> dict[int, stats.HabitStats]:
+        with self._transaction(household_id) as conn:
+            return stats.habit_stats(conn, user_id, start, end, window_days=window_days)
+
+    async def family_summary(self, household_id: int, start: str, end: str) -> list[Row]:
+        # Per member over both tiers (health_bot.archive), so archived ✅/❌ still count
+        with self._transaction(household_id) as conn:
+            members = conn.execute(
+                """
+                SELECT id, first_name, telegram_user_id
+                  FROM users
+                 WHERE household_id = ?
+                 ORDER BY first_name ASC, id ASC
+                """,
+                (household_id,),
+            ).fetchall()
+            sql = values_sql(conn)
+            values = {
+                int(m["id"]): conn.execute(sql, {"user_id": int(m["id"]), "start": start, "end": end}).fetchall()
+                for m in members
+            }
+            habit_ids = sorted({int(r["habit_id"]) for rows in values.values() for r in rows})
+            booleans = {
+                int(r["id"])
+                for r in conn.execute(
+                    f"""
+                    SELECT id FROM habits
+                     WHERE id IN ({",".join("?" * len(habit_ids))}) AND enabled = 1 AND kind = 'boolean'
+                    """,
+                    habit_ids,
+                )
+            } if habit_ids else set()
+        return [
+            {
+                "id": int(m["id"]),
+                "first_name": m["first_name"],
+                "telegram_user_id": m["telegram_user_id"],
+                "tracked": len(values[int(m["id"])]),
+                "success": sum(1 for r in values[int(m["id"])] if int(r["habit_id"]) in booleans and r["value"] == "1"),
+            }
+            for m in members
+        ]
+
+    # --- weekly check-ins ---
+
+    async def weekly_entry(self, user_id: int, week_start: str) -> Row | None:
+        with self._transaction() as conn:
+            return conn.execute(
+                """
+                SELECT week_start_date, weight_kg, week_rating, note
+                  FROM weekly_entries
+                 WHERE user_id = ? AND week_start_date = ?
+                """,
+                (user_id, week_start),
+            ).fetchone()
+
+    async def save_weekly_entry(
+        self,
+        user_id: int,
+        week_start: str,
+        weight_kg: float | None,
+        week_rating: int | None,
+        note: str | None,
+    ) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO weekly_entries (user_id, week_start_date, weight_kg, week_rating, note)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(user_id, week_start_date)
+                DO UPDATE SET
+                    weight_kg = excluded.weight_kg,
+                    week_rating = excluded.week_rating,
+                    note = excluded.note,
+                    updated_at = datetime('now')
+                """,
+                (user_id, week_start, weight_kg, week_rating, note),
+            )
+
+
+STORAGE_BACKENDS = ("sqlite", "postgres")
+
+
+def open_storage(settings: Settings) -> Storage:
+    """The configured backend, not yet opened (`await storage.open()` on startup)."""
+    if settings.storage_backend == "sqlite":
+        return SqliteStorage(settings.db_path)
+    if settings.storage_backend == "postgres":
+        from health_bot.storage_pg import PostgresStorage
+
+        return PostgresStorage(
+            settings.database_url,
+            min_size=settings.pg_pool_min_size,
+            max_size=settings.pg_pool_max_size,
+        )
+    raise RuntimeError(f"Unknown STORAGE_BACKEND {settings.storage_backend!r}, expected one of {STORAGE_BACKENDS}")
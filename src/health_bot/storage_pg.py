@@ -0,0 +1,611 @@
+"""PostgreSQL storage backend (asyncpg), so several bot workers can share one database.
+
+Schema: db/schema_pg.sql. Every query is a module-level constant, so asyncpg's
+per-connection statement cache prepares each one once per pooled connection
+and then reuses it (no re-parse or re-plan per tap). Bulk imports COPY into a
+temp table and upsert from it in one statement.
+
+Dates are DATE columns here; the interface keeps passing 'YYYY-MM-DD' strings.
+"""
+import time
+from datetime import date, timedelta
+from typing import Iterable
+
+from health_bot import bitmaps, stats
+from health_bot.seed import habit_template
+from health_bot.storage import Row, ValueRow
+
+try:
+    import asyncpg
+except ImportError:  # optional: only needed with STORAGE_BACKEND=postgres
+    asyncpg = None
+
+
+def _d(date_str: str) -> date:
+    return date.fromisoformat(date_str)
+
+
+_ATTAINED = stats.ATTAINED_SQL.format(
+    kind="h.kind", value_num="dv.value_num", target="h.target"
+).replace("AS REAL", "AS DOUBLE PRECISION")
+
+# --- users and households ---
+
+_GET_USER = "SELECT id, household_id, timezone FROM users WHERE telegram_user_id = $1"
+
+_GET_USER_FOR_UPDATE = "SELECT id, household_id FROM users WHERE telegram_user_id = $1 FOR UPDATE"
+
+_INSERT_HOUSEHOLD = """
+    INSERT INTO households (name, owner_telegram_user_id)
+    VALUES ($1, $2)
+    ON CONFLICT (owner_telegram_user_id) DO NOTHING
+    RETURNING id
+"""
+
+_OWNED_HOUSEHOLD = "SELECT id FROM households WHERE owner_telegram_user_id = $1"
+
+_INSERT_HABIT = """
+    INSERT INTO habits (household_id, title, kind, target, enabled, sort_order)
+    VALUES ($1, $2, $3, $4, TRUE, $5)
+"""
+
+_SET_HOUSEHOLD = "UPDATE users SET household_id = $1 WHERE id = $2"
+
+_INSERT_USER = """
+    INSERT INTO users (telegram_user_id, chat_id, household_id, timezone, first_name, username)
+    VALUES ($1, $2, $3, $4, $5, $6)
+    ON CONFLICT (telegram_user_id) DO NOTHING
+    RETURNING id
+"""
+
+_INSERT_INVITE = "INSERT INTO household_invites (household_id, code) VALUES ($1, $2)"
+
+_CLAIM_INVITE = """
+    UPDATE household_invites
+       SET used_at = now()
+     WHERE code = $1 AND used_at IS NULL
+    RETURNING id, household_id
+"""
+
+_JOIN_USER = """
+    INSERT INTO users (telegram_user_id, chat_id, household_id, timezone, first_name, username)
+    VALUES ($1, $2, $3, $4, $5, $6)
+    ON CONFLICT (telegram_user_id) DO UPDATE
+       SET chat_id = excluded.chat_id,
+           household_id = excluded.household_id,
+           first_name = excluded.first_name,
+           username = excluded.username
+    RETURNING id
+"""
+
+_INVITE_USED_BY = "UPDATE household_invites SET used_by_user_id = $1 WHERE id = $2"
+
+_SET_TIMEZONE = "UPDATE users SET timezone = $2 WHERE id = $1"
+
+_SET_REMINDER_TIME = "UPDATE users SET reminder_time = $2, reminders_enabled = TRUE WHERE id = $1"
+
+_SET_REMINDERS_ENABLED = "UPDATE users SET reminders_enabled = $2 WHERE id = $1"
+
+_REMINDER_USERS = """
+    SELECT id, telegram_user_id, chat_id, household_id, timezone, reminders_enabled, reminder_time
+      FROM users
+"""
+
+_REMINDER_USER = _REMINDER_USERS + " WHERE id = $1"
+
+_USER_TIMEZONES = "SELECT DISTINCT timezone FROM users WHERE timezone IS NOT NULL"
+
+# --- reminder schedule ---
+
+_REMINDER_JOBS = "SELECT user_id, spec, next_run_at FROM reminder_jobs WHERE kind = $1"
+
+_REMINDER_JOBS_FOR_USER = _REMINDER_JOBS + " AND user_id = $2"
+
+_UPSERT_REMINDER_JOB = """
+    INSERT INTO reminder_jobs (user_id, kind, spec, next_run_at)
+    VALUES ($1, $2, $3, $4)
+    ON CONFLICT (user_id, kind)
+    DO UPDATE SET spec = EXCLUDED.spec, next_run_at = EXCLUDED.next_run_at
+"""
+
+_DELETE_REMINDER_JOBS = "DELETE FROM reminder_jobs WHERE kind = $1 AND user_id = ANY($2::bigint[])"
+
+_DUE_REMINDER_JOBS = """
+    SELECT rj.user_id, rj.kind, rj.spec, rj.next_run_at, u.chat_id, u.household_id
+      FROM reminder_jobs rj
+      JOIN users u ON u.id = rj.user_id
+     WHERE rj.next_run_at <= $1
+     ORDER BY rj.next_run_at ASC
+     LIMIT $2
+"""
+
+_ADVANCE_REMINDER_JOB = "UPDATE reminder_jobs SET next_run_at = $3 WHERE user_id = $1 AND kind = $2"
+
+_CHECKED_IN_USERS = """
+    SELECT DISTINCT de.user_id
+      FROM unnest($1::bigint[], $2::date[]) AS t(user_id, date)
+      JOIN daily_entries de ON de.user_id = t.user_id AND de.date = t.date
+     WHERE EXISTS (SELECT 1 FROM daily_values dv WHERE dv.daily_entry_id = de.id)
+"""
+
+_WEEKLY_DONE_USERS = """
+    SELECT w.user_id
+      FROM unnest($1::bigint[], $2::date[]) AS t(user_id, week_start_date)
+      JOIN weekly_entries w ON w.user_id = t.user_id AND w.week_start_date = t.week_start_date
+"""
+
+# The row is only taken over once the other holder's lease has expired
+_ACQUIRE_LEASE = """
+    INSERT INTO scheduler_leases AS l (name, holder, expires_at)
+    VALUES ($1, $2, $4)
+    ON CONFLICT (name) DO UPDATE
+       SET holder = EXCLUDED.holder, expires_at = EXCLUDED.expires_at
+     WHERE l.holder = EXCLUDED.holder OR l.expires_at < $3
+    RETURNING holder
+"""
+
+# --- habits ---
+
+_ENABLED_HABITS = """
+    SELECT id, title, kind, target
+      FROM habits
+     WHERE household_id = $1 AND enabled
+     ORDER BY sort_order ASC, id ASC
+"""
+
+# --- daily check-ins ---
+
+_DAILY_VALUES = """
+    SELECT dv.habit_id, dv.value
+      FROM daily_entries de
+      JOIN daily_values dv ON dv.daily_entry_id = de.id
+     WHERE de.user_id = $1 AND de.date = $2
+"""
+
+_DAILY_VALUES_SINCE = """
+    SELECT de.date, dv.habit_id, dv.value
+      FROM daily_entries de
+      JOIN daily_values dv ON dv.daily_entry_id = de.id
+     WHERE de.user_id = $1 AND de.date >= $2
+"""
+
+_DAILY_ENTRY = """
+    INSERT INTO daily_entries (user_id, date) VALUES ($1, $2)
+    ON CONFLICT (user_id, date) DO UPDATE SET updated_at = now()
+    RETURNING id
+"""
+
+# value_num() is defined in schema_pg.sql (same projection as db.VALUE_NUM_SQL)
+_UPSERT_VALUE = """
+    INSERT INTO daily_values (daily_entry_id, habit_id, value, value_num)
+    SELECT $1, h.id, $3, value_num(h.kind, $3)
+      FROM habits h
+     WHERE h.id = $2
+    ON CONFLICT (daily_entry_id, habit_id)
+    DO UPDATE SET value = excluded.value,
+                  value_num = excluded.value_num,
+                  updated_at = now()
+"""
+
+_CLEAR_VALUE = """
+    DELETE FROM daily_values dv
+     USING daily_entries de
+     WHERE dv.daily_entry_id = de.id
+       AND de.user_id = $1 AND de.date = $2 AND dv.habit_id = $3
+"""
+
+_CREATE_IMPORT_TABLE = """
+    CREATE TEMP TABLE import_values (
+        seq BIGSERIAL,
+        user_id BIGINT NOT NULL,
+        date DATE NOT NULL,
+        habit_id BIGINT NOT NULL,
+        value TEXT
+    ) ON COMMIT DROP
+"""
+
+_IMPORT_ENTRIES = """
+    INSERT INTO daily_entries (user_id, date)
+    SELECT DISTINCT user_id, date FROM import_values
+    ON CONFLICT (user_id, date) DO NOTHING
+"""
+
+# Last row wins when the import repeats a (user, date, habit)
+_IMPORT_VALUES = """
+    INSERT INTO daily_values (daily_entry_id, habit_id, value, value_num)
+    SELECT DISTINCT ON (de.id, h.id) de.id, h.id, i.value, value_num(h.kind, i.value)
+      FROM import_values i
+      JOIN daily_entries de ON de.user_id = i.user_id AND de.date = i.date
+      JOIN habits h ON h.id = i.habit_id
+     ORDER BY de.id, h.id, i.seq DESC
+    ON CONFLICT (daily_entry_id, habit_id)
+    DO UPDATE SET value = excluded.value,
+                  value_num = excluded.value_num,
+                  updated_at = now()
+"""
+
+# --- aggregates (mirror health_bot.stats) ---
+
+_DAILY_PROGRESS = f"""
+    SELECT de.date AS date,
+           COUNT(*) AS tracked,
+           COUNT(*) FILTER (WHERE {_ATTAINED}) AS attained
+      FROM daily_entries de
+      JOIN daily_values dv ON dv.daily_entry_id = de.id
+      JOIN habits h ON h.id = dv.habit_id AND h.enabled
+     WHERE de.user_id = $1
+       AND de.date BETWEEN $2 AND $3
+     GROUP BY de.date
+"""
+
+_DAILY_PROGRESS_BY_DATE = _DAILY_PROGRESS + " ORDER BY de.date"
+
+_BEST_AND_WORST = f"""
+    WITH days AS ({_DAILY_PROGRESS}),
+    ranked AS (
+        SELECT date, tracked, attained,
+               ROW_NUMBER() OVER (ORDER BY attained DESC, tracked DESC, date DESC) AS best_rank,
+               ROW_NUMBER() OVER (ORDER BY attained ASC, tracked ASC, date DESC) AS worst_rank
+          FROM days
+    )
+    SELECT date, tracked, attained, best_rank, worst_rank
+      FROM ranked
+     WHERE best_rank = 1 OR worst_rank = 1
+"""
+
+_HABIT_VALUES = f"""
+    SELECT dv.habit_id AS habit_id,
+           de.date AS date,
+           dv.value_num AS value_num,
+           ({_ATTAINED})::int AS attained
+      FROM daily_entries de
+      JOIN daily_values dv ON dv.daily_entry_id = de.id
+      JOIN habits h ON h.id = dv.habit_id
+     WHERE de.user_id = $1
+       AND de.date BETWEEN $2 AND $3
+       AND dv.value_num IS NOT NULL
+"""
+
+_HABIT_STATS = f"""
+    SELECT habit_id,
+           COUNT(*) AS days,
+           AVG(value_num) AS avg_value,
+           COALESCE(SUM(attained), 0) AS attained,
+           COUNT(attained) AS goal_days,
+           AVG(value_num) FILTER (WHERE date >= $4) AS rolling_avg
+      FROM ({_HABIT_VALUES}) v
+     GROUP BY habit_id
+"""
+
+_HABIT_EXTREMES = f"""
+    WITH v AS ({_HABIT_VALUES})
+    SELECT * FROM (
+        SELECT DISTINCT ON (habit_id) 'best' AS side, habit_id, value_num AS value, date
+          FROM v ORDER BY habit_id, value_num DESC, date DESC
+    ) best
+    UNION ALL
+    SELECT * FROM (
+        SELECT DISTINCT ON (habit_id) 'worst' AS side, habit_id, value_num AS value, date
+          FROM v ORDER BY habit_id, value_num ASC, date DESC
+    ) worst
+"""
+
+_FAMILY_SUMMARY = """
+    SELECT u.id AS id,
+           u.first_name AS first_name,
+           u.telegram_user_id AS telegram_user_id,
+           COUNT(dv.id) AS tracked,
+           COUNT(*) FILTER (WHERE h.kind = 'boolean' AND dv.value = '1') AS success
+      FROM users u
+      LEFT JOIN daily_entries de ON de.user_id = u.id AND de.date BETWEEN $1 AND $2
+      LEFT JOIN daily_values dv ON dv.daily_entry_id = de.id
+      LEFT JOIN habits h ON h.id = dv.habit_id AND h.enabled
+     WHERE u.household_id = $3
+     GROUP BY u.id
+     ORDER BY u.first_name ASC, u.id ASC
+"""
+
+# --- weekly check-ins ---
+
+_WEEKLY_ENTRY = """
+    SELECT week_start_date, weight_kg, week_rating, note
+      FROM weekly_entries
+     WHERE user_id = $1 AND week_start_date = $2
+"""
+
+_SAVE_WEEKLY_ENTRY = """
+    INSERT INTO weekly_entries (user_id, week_start_date, weight_kg, week_rating, note)
+    VALUES ($1, $2, $3, $4, $5)
+    ON CONFLICT (user_id, week_start_date)
+    DO UPDATE SET
+        weight_kg = excluded.weight_kg,
+        week_rating = excluded.week_rating,
+        note = excluded.note,
+        updated_at = now()
+"""
+
+
+def _values(rows) -> dict[int, str]:
+    return {int(r["habit_id"]): ("" if r["value"] is None else str(r["value"])) for r in rows}
+
+
+def _day(r) -> stats.DayProgress:
+    return stats.DayProgress(r["date"].isoformat(), int(r["tracked"]), int(r["attained"]))
+
+
+class PostgresStorage:
+    """Storage on PostgreSQL through an asyncpg connection pool.
+
+    Sharding (SQLITE_SHARDS) doesn't apply: household_id arguments are
+    accepted for interface compatibility and ignored.
+    """
+
+    def __init__(self, dsn: str, *, min_size: int = 1, max_size: int = 10) -> None:
+        if asyncpg is None:
+            raise RuntimeError("STORAGE_BACKEND=postgres needs asyncpg: pip install asyncpg")
+        if not dsn:
+            raise RuntimeError("STORAGE_BACKEND=postgres needs DATABASE_URL")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self._pool = None
+
+    async def open(self) -> None:
+        if self._pool is None:
+            self._pool = await asyncpg.create_pool(self.dsn, min_size=self.min_size, max_size=self.max_size)
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    # --- users and households ---
+
+    async def get_user(self, telegram_user_id: int) -> Row | None:
+        return await self._pool.fetchrow(_GET_USER, telegram_user_id)
+
+    async def register_user(
+        self,
+        *,
+        telegram_user_id: int,
+        chat_id: int,
+        first_name: str | None,
+        username: str | None,
+        timezone: str,
+        household_name: str,
+        fields_path: str,
+    ) -> bool:
+        async with self._pool.acquire() as conn, conn.transaction():
+            row = await conn.fetchrow(_GET_USER_FOR_UPDATE, telegram_user_id)
+            if row and row["household_id"] is not None:
+                return False
+
+            household_id = await conn.fetchval(_INSERT_HOUSEHOLD, household_name, telegram_user_id)
+            if household_id is None:
+                household_id = await conn.fetchval(_OWNED_HOUSEHOLD, telegram_user_id)
+            else:
+                await conn.executemany(
+                    _INSERT_HABIT,
+                    [
+                        (household_id, title, kind, target, idx)
+                        for idx, (title, kind, target) in enumerate(habit_template(fields_path))
+                    ],
+                )
+
+            if row:
+                await conn.execute(_SET_HOUSEHOLD, household_id, row["id"])
+                return False
+            user_id = await conn.fetchval(
+                _INSERT_USER, telegram_user_id, chat_id, household_id, timezone, first_name, username
+            )
+            return user_id is not None
+
+    async def create_invite(self, household_id: int, code: str) -> None:
+        await self._pool.execute(_INSERT_INVITE, household_id, code)
+
+    async def redeem_invite(
+        self,
+        code: str,
+        *,
+        telegram_user_id: int,
+        chat_id: int,
+        first_name: str | None,
+        username: str | None,
+        timezone: str,
+    ) -> int | None:
+        async with self._pool.acquire() as conn, conn.transaction():
+            invite = await conn.fetchrow(_CLAIM_INVITE, code)
+            if invite is None:
+                return None
+            user_id = await conn.fetchval(
+                _JOIN_USER, telegram_user_id, chat_id, invite["household_id"], timezone, first_name, username
+            )
+            await conn.execute(_INVITE_USED_BY, user_id, invite["id"])
+            return int(user_id)
+
+    async def set_timezone(self, user_id: int, tz_name: str) -> None:
+        await self._pool.execute(_SET_TIMEZONE, user_id, tz_name)
+
+    async def set_reminder_time(self, user_id: int, hhmm: str) -> None:
+        await self._pool.execute(_SET_REMINDER_TIME, user_id, hhmm)
+
+    async def set_reminders_enabled(self, user_id: int, enabled: bool) -> None:
+        await self._pool.execute(_SET_REMINDERS_ENABLED, user_id, bool(enabled))
+
+    async def reminder_users(self, user_id: int | None = None) -> list[Row]:
+        if user_id is None:
+            return await self._pool.fetch(_REMINDER_USERS)
+        return await self._pool.fetch(_REMINDER_USER, user_id)
+
+    async def user_timezones(self) -> list[str]:
+        return [str(r["timezone"]) for r in await self._pool.fetch(_USER_TIMEZONES)]
+
+    # --- reminder schedule ---
+
+    async def reminder_jobs(self, kind: str, user_id: int | None = None) -> dict[int, tuple[str, float]]:
+        if user_id is None:
+            rows = await self._pool.fetch(_REMINDER_JOBS, kind)
+        else:
+            rows = await self._pool.fetch(_REMINDER_JOBS_FOR_USER, kind, user_id)
+        return {int(r["user_id"]): (str(r["spec"]), float(r["next_run_at"])) for r in rows}
+
+    async def save_reminder_jobs(
+        self, kind: str, upsert: list[tuple[int, str, float]], delete: list[int]
+    ) -> None:
+        async with self._pool.acquire() as conn, conn.transaction():
+            if upsert:
+                await conn.executemany(
+                    _UPSERT_REMINDER_JOB,
+                    [(user_id, kind, spec, next_run_at) for user_id, spec, next_run_at in upsert],
+                )
+            if delete:
+                await conn.execute(_DELETE_REMINDER_JOBS, kind, delete)
+
+    async def due_reminder_jobs(self, now: float, limit: int) -> list[Row]:
+        return await self._pool.fetch(_DUE_REMINDER_JOBS, now, limit)
+
+    async def advance_reminder_jobs(self, rows: list[tuple[int, str, float]]) -> None:
+        if rows:
+            await self._pool.executemany(_ADVANCE_REMINDER_JOB, rows)
+
+    async def checked_in_users(self, rows: list[tuple[int, int | None, str]]) -> set[int]:
+        if not rows:
+            return set()
+        found = await self._pool.fetch(
+            _CHECKED_IN_USERS, [r[0] for r in rows], [_d(r[2]) for r in rows]
+        )
+        return {int(r["user_id"]) for r in found}
+
+    async def weekly_done_users(self, rows: list[tuple[int, str]]) -> set[int]:
+        if not rows:
+            return set()
+        found = await self._pool.fetch(
+            _WEEKLY_DONE_USERS, [r[0] for r in rows], [_d(r[1]) for r in rows]
+        )
+        return {int(r["user_id"]) for r in found}
+
+    async def acquire_lease(self, name: str, holder: str, ttl_seconds: float) -> bool:
+        # No row back means the UPDATE was skipped: someone else holds a live lease
+        now = time.time()  # expiry added here: Postgres has no operator for untyped $3 + $4
+        return await self._pool.fetchval(_ACQUIRE_LEASE, name, holder, now, now + float(ttl_seconds)) == holder
+
+    # --- habits ---
+
+    async def enabled_habits(self, household_id: int) -> list[Row]:
+        return await self._pool.fetch(_ENABLED_HABITS, household_id)
+
+    # --- daily check-ins ---
+
+    async def daily_values(self, user_id: int, household_id: int | None, date_str: str) -> dict[int, str]:
+        return _values(await self._pool.fetch(_DAILY_VALUES, user_id, _d(date_str)))
+
+    async def daily_values_since(self, user_id: int, household_id: int, start: str) -> dict[str, dict[int, str]]:
+        out: dict[str, dict[int, str]] = {}
+        for r in await self._pool.fetch(_DAILY_VALUES_SINCE, user_id, _d(start)):
+            out.setdefault(r["date"].isoformat(), {})[int(r["habit_id"])] = "" if r["value"] is None else str(r["value"])
+        return out
+
+    async def habit_bits(self, user_id: int, household_id: int, start: str) -> bitmaps.HabitBits:
+        # No bitmap table here: a user's window of rows is small next to a round trip
+        values = await self.daily_values_since(user_id, household_id, start)
+        return bitmaps.from_values(date.fromisoformat(start), values)
+
+    async def save_daily_values(
+        self, user_id: int, household_id: int | None, date_str: str, values: dict[int, str]
+    ) -> None:
+        async with self._pool.acquire() as conn, conn.transaction():
+            daily_entry_id = await conn.fetchval(_DAILY_ENTRY, user_id, _d(date_str))
+            await conn.executemany(
+                _UPSERT_VALUE, [(daily_entry_id, int(hid), value) for hid, value in values.items()]
+            )
+
+    async def clear_daily_value(self, user_id: int, household_id: int, date_str: str, habit_id: int) -> None:
+        await self._pool.execute(_CLEAR_VALUE, user_id, _d(date_str), habit_id)
+
+    async def save_daily_values_for_dates(
+        self, user_id: int, household_id: int, dates: list[str], values: dict[int, str]
+    ) -> int:
+        return await self.import_daily_values(
+            (user_id, d, hid, value) for d in dates for hid, value in values.items()
+        )
+
+    async def import_daily_values(self, rows: Iterable[ValueRow]) -> int:
+        records = [(int(u), _d(d), int(h), v) for u, d, h, v in rows]
+        if not records:
+            return 0
+        async with self._pool.acquire() as conn, conn.transaction():
+            await conn.execute(_CREATE_IMPORT_TABLE)
+            await conn.copy_records_to_table(
+                "import_values", records=records, columns=("user_id", "date", "habit_id", "value")
+            )
+            await conn.execute(_IMPORT_ENTRIES)
+            status = await conn.execute(_IMPORT_VALUES)
+        return int(status.split()[-1])
+
+    # --- aggregates ---
+
+    async def daily_progress(
+        self, user_id: int, household_id: int, start: str, end: str
+    ) -> dict[str, stats.DayProgress]:
+        rows = await self._pool.fetch(_DAILY_PROGRESS_BY_DATE, user_id, _d(start), _d(end))
+        return {day.date: day for day in map(_day, rows)}
+
+    async def best_and_worst_days(
+        self, user_id: int, household_id: int, start: str, end: str
+    ) -> tuple[stats.DayProgress | None, stats.DayProgress | None]:
+        best = worst = None
+        for r in await self._pool.fetch(_BEST_AND_WORST, user_id, _d(start), _d(end)):
+            if int(r["best_rank"]) == 1:
+                best = _day(r)
+            if int(r["worst_rank"]) == 1:
+                worst = _day(r)
+        return best, worst
+
+    async def habit_stats(
+        self, user_id: int, household_id: int, start: str, end: str, *, window_days: int = 7
+    ) -> dict[int, stats.HabitStats]:
+        window_start = _d(end) - timedelta(days=max(1, int(window_days)) - 1)
+        async with self._pool.acquire() as conn:
+            rows = await conn.fetch(_HABIT_STATS, user_id, _d(start), _d(end), window_start)
+            extremes = await conn.fetch(_HABIT_EXTREMES, user_id, _d(start), _d(end))
+        best_worst = {(r["side"], int(r["habit_id"])): (r["date"].isoformat(), r["value"]) for r in extremes}
+
+        out = {}
+        for r in rows:
+            hid = int(r["habit_id"])
+            best_date, best_value = best_worst.get(("best", hid), (None, None))
+            worst_date, worst_value = best_worst.get(("worst", hid), (None, None))
+            out[hid] = stats.HabitStats(
+                hid,
+                int(r["days"]),
+                r["avg_value"],
+                int(r["attained"]),
+                int(r["goal_days"]),
+                r["rolling_avg"],
+                best_date,
+                best_value,
+                worst_date,
+                worst_value,
+            )
+        return out
+
+    async def family_summary(self, household_id: int, start: str, end: str) -> list[Row]:
+        return await self._pool.fetch(_FAMILY_SUMMARY, _d(start), _d(end), household_id)
+
+    # --- weekly check-ins ---
+
+    async def weekly_entry(self, user_id: int, week_start: str) -> Row | None:
+        row = await self._pool.fetchrow(_WEEKLY_ENTRY, user_id, _d(week_start))
+        if row is None:
+            return None
+        return {**dict(row), "week_start_date": row["week_start_date"].isoformat()}
+
+    async def save_weekly_entry(
+        self,
+        user_id: int,
+        week_start: str,
+        weight_kg: float | None,
+        week_rating: int | None,
+        note: str | None,
+    ) -> None:
+        await self._pool.execute(_SAVE_WEEKLY_ENTRY, user_id, _d(week_start), weight_kg, week_rating, note)
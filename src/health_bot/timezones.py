@@ -0,0 +1,113 @@
+"""Cached timezone resolution.
+
+ZoneInfo objects are memoized, and each zone's current date (plus derived
+strings such as the week start) is computed once per local day. On hot
+paths "what is today for this user" is a dict lookup and one float compare;
+`refresh()` is also run by a JobQueue timer at each zone's local midnight
+(see scheduler.schedule_timezone_refresh) so the first request of the day does
+not pay for it.
+"""
+import functools
+import re
+import time
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+
+
+@functools.lru_cache(maxsize=None)
+def get_zone(tz_name: str) -> ZoneInfo:
+    return ZoneInfo(tz_name)
+
+
+class _ZoneDay:
+    __slots__ = ("today", "today_str", "week_start_str", "expires_at", "last_n")
+
+    def __init__(self, tz_name: str, now: float) -> None:
+        tz = get_zone(tz_name)
+        self.today = datetime.fromtimestamp(now, tz).date()
+        self.today_str = self.today.isoformat()
+        self.week_start_str = (self.today - timedelta(days=self.today.weekday())).isoformat()  # Monday = 0
+        tomorrow = self.today + timedelta(days=1)
+        self.expires_at = datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=tz).timestamp()
+        self.last_n: dict[int, list[str]] = {}
+
+
+_days: dict[str, _ZoneDay] = {}
+
+
+def _zone_day(tz_name: str) -> _ZoneDay:
+    entry = _days.get(tz_name)
+    now = time.time()
+    if entry is None or now >= entry.expires_at:
+        entry = _days[tz_name] = _ZoneDay(tz_name, now)
+    return entry
+
+
+def today(tz_name: str) -> date:
+    return _zone_day(tz_name).today
+
+
+def today_str(tz_name: str) -> str:
+    return _zone_day(tz_name).today_str
+
+
+def week_start_str(tz_name: str) -> str:
+    return _zone_day(tz_name).week_start_str
+
+
+def last_n_dates(tz_name: str, n: int) -> list[str]:
+    """Today and the n-1 days before it, newest first (do not mutate the result)."""
+    entry = _zone_day(tz_name)
+    dates = entry.last_n.get(n)
+    if dates is None:
+        dates = entry.last_n[n] = [(entry.today - timedelta(days=i)).isoformat() for i in range(n)]
+    return dates
+
+
+def refresh(tz_name: str) -> date:
+    """Recompute a zone's day now (midnight timer)."""
+    _days[tz_name] = _ZoneDay(tz_name, time.time())
+    return _days[tz_name].today
+
+
+def known_zones() -> list[str]:
+    return list(_days)
+
+
+@functools.lru_cache(maxsize=1)
+def _zones_by_lower() -> dict[str, str]:
+    return {name.lower(): name for name in available_timezones()}
+
+
+_OFFSET_RE = re.compile(r"^(?:utc|gmt)?\s*([+-])\s*(\d{1,2})$")
+
+
+def resolve_timezone(text: str) -> str | None:
+    """Map user input to an IANA zone name, or None.
+
+    Accepts IANA names in any case ("europe/kyiv") and whole-hour offsets
+    ("UTC+3", "-5"), which map to the fixed Etc/GMT zones (note the
+    inverted sign there).
+    """
+    t = (text or "").strip()
+    if not t:
+        return None
+    if t.upper() in ("UTC", "GMT", "Z"):
+        return "UTC"
+
+    m = _OFFSET_RE.match(t.lower())
+    if m:
+        hours = int(m.group(2))
+        if hours == 0:
+            return "UTC"
+        sign = "-" if m.group(1) == "+" else "+"
+        t = f"Etc/GMT{sign}{hours}"
+
+    name = _zones_by_lower().get(t.lower().replace(" ", "_"))
+    if name is None:
+        return None
+    try:
+        get_zone(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+    return name
@@ -0,0 +1,299 @@
+"""Multi-process deployment: one webhook ingress, N bot worker processes.
+
+With WORKERS=N (N >= 1) `main` runs `run_ingress` instead of polling:
+
+- The ingress process accepts Telegram webhook POSTs and puts each raw update
+  on the queue of worker `user_id % N`. Every update of a user goes to the
+  same worker.
+- Each worker is a full bot Application (handlers.py) fed from its queue.
+  PTB handles one update at a time per Application, so the updates of a
+  user are handled in the order Telegram sent them.
+- Worker 0 is the leader: it alone runs the JobQueue jobs (reminder tick,
+  coach reports, checkpoints). Reminders live in the database, so any worker
+  updates them; only a timezone change is forwarded to the leader, whose
+  coach report jobs run per timezone.
+
+Workers share the database (SQLite WAL or Postgres, see health_bot.storage),
+so anything not pinned to a user must live there, not in process memory.
+Benchmark locally with scripts/replay_updates.py.
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+
+from health_bot.config import Settings
+from health_bot.logging_setup import setup_logging
+
+log = logging.getLogger("health_bot.workers")
+
+LEADER = 0
+RESCHEDULE = "reschedule"  # control message on the leader's queue; updates are bytes, None stops
+
+_REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+def update_user_id(update: dict) -> int | None:
+    """The user an update belongs to (sender, else chat), or None."""
+    for key, value in update.items():
+        if key == "update_id" or not isinstance(value, dict):
+            continue
+        sender = value.get("from") or value.get("user")
+        if isinstance(sender, dict) and "id" in sender:
+            return int(sender["id"])
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return int(chat["id"])
+    return None
+
+
+def worker_for(user_id: int | None, workers: int) -> int:
+    return LEADER if user_id is None else user_id % workers
+
+
+# --- minimal HTTP/1.1 (also used by scripts/replay_updates.py) ---
+
+async def read_request(reader: asyncio.StreamReader) -> tuple[str, str, dict[str, str], bytes] | None:
+    """(method, path, headers, body) of the next request, None on EOF."""
+    try:
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        method, path, _ = line.decode("latin-1").split(" ", 2)
+        headers: dict[str, str] = {}
+        while True:
+            raw = await reader.readline()
+            if raw in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = raw.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length") or 0)
+        body = await reader.readexactly(length) if length else b""
+    except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+        return None
+    return method, path, headers, body
+
+
+def write_response(writer: asyncio.StreamWriter, status: int, body: bytes = b"") -> None:
+    writer.write(
+        f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1")
+        + body
+    )
+
+
+async def serve_http(handle, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Keep-alive loop: `handle(method, path, headers, body)` returns (status, body)."""
+    try:
+        while True:
+            request = await read_request(reader)
+            if request is None:
+                break
+            status, body = handle(*request)
+            write_response(writer, status, body)
+            await writer.drain()
+            if request[2].get("connection", "").lower() == "close":
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+# --- ingress (parent process) ---
+
+class Ingress:
+    def __init__(self, settings: Settings, inboxes: list) -> None:
+        self.settings = settings
+        self.inboxes = inboxes
+        self.received = [0] * len(inboxes)
+        self.started_at = time.monotonic()
+        self._record = open(settings.ingress_record_path, "ab") if settings.ingress_record_path else None
+
+    def handle(self, method: str, path: str, headers: dict[str, str], body: bytes) -> tuple[int, bytes]:
+        if method == "GET" and path.startswith("/stats"):
+            return 200, json.dumps(self.stats()).encode("utf-8")
+        if method != "POST":
+            return 405, b""
+        secret = self.settings.webhook_secret
+        if secret and headers.get("x-telegram-bot-api-secret-token") != secret:
+            return 403, b""
+        try:
+            update = json.loads(body)
+        except ValueError:
+            return 400, b""
+        if not isinstance(update, dict):
+            return 400, b""
+
+        worker = worker_for(update_user_id(update), len(self.inboxes))
+        self.inboxes[worker].put(body)  # unbounded queue: never blocks the loop
+        self.received[worker] += 1
+        if self._record is not None:
+            self._record.write(body.strip() + b"\n")
+        return 200, b""
+
+    def stats(self) -> dict:
+        return {
+            "received": sum(self.received),
+            "per_worker": list(self.received),
+            "uptime_s": round(time.monotonic() - self.started_at, 1),
+        }
+
+    def close(self) -> None:
+        if self._record is not None:
+            self._record.close()
+
+
+def run_ingress(settings: Settings) -> None:
+    asyncio.run(_serve_ingress(settings))
+
+
+async def _serve_ingress(settings: Settings) -> None:
+    # spawn: workers must not inherit the parent's event loop or HTTP client threads
+    ctx = multiprocessing.get_context("spawn")
+    inboxes = [ctx.Queue() for _ in range(settings.workers)]
+
+    def start_worker(index: int):
+        proc = ctx.Process(
+            target=run_worker,
+            args=(settings, index, inboxes[index], inboxes[LEADER]),
+            name=f"health_bot-worker{index}",
+        )  # not a daemon: the leader runs process pools (coach reports, insights)
+        proc.start()
+        return proc
+
+    procs = [start_worker(i) for i in range(settings.workers)]
+    ingress = Ingress(settings, inboxes)
+    server = await asyncio.start_server(
+        lambda r, w: serve_http(ingress.handle, r, w),
+        settings.webhook_listen,
+        settings.webhook_port,
+    )
+    log.info(
+        "Ingress on %s:%s, %s worker(s), leader is worker %s",
+        settings.webhook_listen,
+        settings.webhook_port,
+        settings.workers,
+        LEADER,
+    )
+    if settings.webhook_url:
+        await _set_webhook(settings)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    # A crashed worker is restarted on the same queue, so its users' updates wait rather than get lost
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=2)
+        except asyncio.TimeoutError:
+            pass
+        for i, proc in enumerate(procs):
+            if not proc.is_alive() and not stop.is_set():
+                log.error("Worker %s exited with code %s, restarting", i, proc.exitcode)
+                procs[i] = start_worker(i)
+
+    log.info("Stopping: %s", ingress.stats())
+    server.close()
+    try:
+        await asyncio.wait_for(server.wait_closed(), timeout=5)  # idle keep-alive clients
+    except asyncio.TimeoutError:
+        pass
+    ingress.close()
+    for inbox in inboxes:
+        inbox.put(None)  # after the updates already queued: workers drain first
+    for i, proc in enumerate(procs):
+        await asyncio.to_thread(proc.join, 30)
+        if proc.is_alive():
+            log.warning("Worker %s did not stop in time, terminating", i)
+            proc.terminate()
+
+
+async def _set_webhook(settings: Settings) -> None:
+    from telegram import Bot, Update
+
+    kwargs = {"base_url": settings.bot_api_url} if settings.bot_api_url else {}
+    async with Bot(settings.telegram_bot_token, **kwargs) as bot:
+        await bot.set_webhook(
+            settings.webhook_url,
+            secret_token=settings.webhook_secret or None,
+            allowed_updates=Update.ALL_TYPES,
+        )
+    log.info("Webhook registered at %s", settings.webhook_url)
+
+
+# --- worker (child process) ---
+
+def run_worker(settings: Settings, index: int, inbox, leader_inbox) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the ingress stops us through the queue
+    setup_logging(settings.log_level, log_file=f"logs/health_bot.worker{index}.log")
+    asyncio.run(_serve_worker(settings, index, inbox, leader_inbox))
+
+
+async def _serve_worker(settings: Settings, index: int, inbox, leader_inbox) -> None:
+    from telegram import Update
+
+    from health_bot.main import create_application, schedule_user_jobs
+
+    leader = index == LEADER
+    app = create_application(settings, leader=leader)
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    reschedule = asyncio.Event()
+
+    if leader:
+        app.bot_data["reschedule"] = reschedule.set
+    else:
+        app.bot_data["reschedule"] = lambda: leader_inbox.put(RESCHEDULE)
+
+    async def reschedule_loop() -> None:
+        # One run at a time, and a burst of requests collapses into one run
+        while True:
+            await reschedule.wait()
+            reschedule.clear()
+            try:
+                await schedule_user_jobs(app, settings)
+            except Exception:
+                log.exception("Rescheduling user jobs failed")
+
+    def enqueue(body: bytes) -> None:
+        try:
+            update = Update.de_json(json.loads(body), app.bot)
+        except Exception:
+            log.exception("Dropping malformed update")
+            return
+        app.update_queue.put_nowait(update)
+
+    def pump() -> None:
+        # Blocking queue reads stay off the event loop
+        while True:
+            item = inbox.get()
+            if item is None:
+                break
+            if item == RESCHEDULE:
+                loop.call_soon_threadsafe(reschedule.set)
+            else:
+                loop.call_soon_threadsafe(enqueue, item)
+        loop.call_soon_threadsafe(stopped.set)
+
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+    rescheduler = asyncio.create_task(reschedule_loop()) if leader else None
+    threading.Thread(target=pump, name="inbox", daemon=True).start()
+    log.info("Worker %s ready%s", index, " (leader)" if leader else "")
+
+    await stopped.wait()
+    if rescheduler is not None:
+        rescheduler.cancel()
+    await app.stop()  # handles the updates still in update_queue first
+    if app.post_stop:
+        await app.post_stop(app)
+    await app.shutdown()
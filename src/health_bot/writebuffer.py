@@ -0,0 +1,153 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from health_bot.storage import Storage
+
+log = logging.getLogger("health_bot.writebuffer")
+
+FlushCallback = Callable[[], Awaitable[None]]
+
+RETRY_SECONDS = 5.0  # a failed write is retried on its own after this long
+
+
+class CheckinWriteBuffer:
+    """Per-user write-behind buffer for check-in taps.
+
+    Taps for the same (user_id, date) arriving within `window_seconds` are
+    coalesced (last write wins per habit) and written in ONE transaction.
+    After the write, only the most recent `on_flushed` callback runs, which
+    debounces the Telegram message edit to one per window. Writes of one key
+    never overlap, and a failed one keeps its taps and retries on its own.
+    """
+
+    def __init__(self, storage: Storage, window_seconds: float = 0.4) -> None:
+        self.storage = storage
+        self.window_seconds = window_seconds
+        self._pending: dict[tuple[int, str], dict[int, str]] = {}
+        self._callbacks: dict[tuple[int, str], FlushCallback] = {}
+        self._households: dict[int, int] = {}  # user_id -> household_id, picks the shard
+        self._timers: dict[tuple[int, str], asyncio.Task] = {}
+        self._writing: dict[tuple[int, str], asyncio.Event] = {}  # writes awaiting the storage
+        self._closing = False  # flush_all started: no more retry timers
+
+        self.taps = 0
+        self.transactions = 0
+
+    def put(
+        self,
+        user_id: int,
+        date_str: str,
+        habit_id: int,
+        value: str,
+        household_id: int | None = None,
+        on_flushed: FlushCallback | None = None,
+    ) -> None:
+        key = (int(user_id), date_str)
+        self._pending.setdefault(key, {})[int(habit_id)] = value
+        if household_id is not None:
+            self._households[key[0]] = int(household_id)
+        if on_flushed is not None:
+            self._callbacks[key] = on_flushed
+        self.taps += 1
+
+        if key not in self._timers:
+            self._timers[key] = asyncio.create_task(self._flush_later(key))
+
+    def pending_for(self, user_id: int, date_str: str) -> dict[int, str]:
+        return dict(self._pending.get((int(user_id), date_str), {}))
+
+    async def flush(self, user_id: int, date_str: str, *, run_callback: bool = False) -> None:
+        """Write pending taps for one user/date right now (e.g. before navigation)."""
+        key = (int(user_id), date_str)
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        callback = await self._take(key)  # waits for a deferred flush that already took the taps
+        if run_callback and callback is not None:
+            await callback()
+
+    async def flush_all(self, attempts: int = 3) -> int:
+        """Write everything pending now (shutdown path). Returns keys flushed.
+
+        Failed writes are retried `attempts` times in all; whatever still
+        fails is logged as lost, since the storage closes right after. Returns
+        only once no write is in flight.
+        """
+        self._closing = True
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        # A deferred flush that already took its taps: a failure puts them back in _pending
+        await self._wait_writes()
+
+        flushed = 0
+        for attempt in range(attempts):
+            for key in list(self._pending):
+                try:
+                    await self._take(key)
+                    flushed += 1
+                except Exception:
+                    pass  # logged by _write; the taps are back in _pending for the next attempt
+            if not self._pending:
+                break
+            if attempt + 1 < attempts:
+                await asyncio.sleep(self.window_seconds)
+
+        for (user_id, date_str), values in self._pending.items():
+            log.error("Check-in taps lost on shutdown for user_id=%s date=%s: %s", user_id, date_str, values)
+        self._pending.clear()
+        self._callbacks.clear()
+        await self._wait_writes()
+        return flushed
+
+    async def _wait_writes(self) -> None:
+        while self._writing:
+            await asyncio.gather(*(event.wait() for event in list(self._writing.values())))
+
+    async def _flush_later(self, key: tuple[int, str], delay: float | None = None) -> None:
+        await asyncio.sleep(self.window_seconds if delay is None else delay)
+        # From here on flush() must not cancel us: the edit below is the debounced render
+        self._timers.pop(key, None)
+        try:
+            callback = await self._take(key)
+            if callback is not None:
+                await callback()
+        except Exception:
+            log.exception("Deferred check-in flush failed for user_id=%s", key[0])
+
+    async def _take(self, key: tuple[int, str]) -> FlushCallback | None:
+        # One write per key at a time, in tap order: with an awaitable backend an
+        # older write still in flight could otherwise land after this one
+        while (writing := self._writing.get(key)) is not None:
+            await writing.wait()
+        values = self._pending.pop(key, None)
+        callback = self._callbacks.pop(key, None)
+        if values:
+            writing = self._writing[key] = asyncio.Event()
+            try:
+                await self._write(key, values)
+            except Exception:
+                # Keep the taps for the next flush; newer taps still win
+                merged = self._pending.setdefault(key, {})
+                for hid, value in values.items():
+                    merged.setdefault(hid, value)
+                if callback is not None:
+                    self._callbacks.setdefault(key, callback)
+                if not self._closing and key not in self._timers:
+                    self._timers[key] = asyncio.create_task(self._flush_later(key, RETRY_SECONDS))
+                raise
+            finally:
+                writing.set()
+                if self._writing.get(key) is writing:
+                    del self._writing[key]
+        return callback
+
+    async def _write(self, key: tuple[int, str], values: dict[int, str]) -> None:
+        user_id, date_str = key
+        try:
+            await self.storage.save_daily_values(user_id, self._households.get(user_id), date_str, values)
+            self.transactions += 1
+        except Exception:
+            log.exception("Failed to flush %s check-in value(s) for user_id=%s", len(values), user_id)
+            raise
@@ -0,0 +1,82 @@
+"""Readers see the same history before and after archive_history."""
+import asyncio
+import importlib.util
+import json
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from health_bot.archive import archive_history
+from health_bot.db import connect, init_archive, init_db
+from health_bot.snapshot import connect_analytics_shards
+from health_bot.storage import SqliteStorage
+
+ROOT = Path(__file__).resolve().parent.parent
+TODAY = date(2026, 6, 15)
+
+_spec = importlib.util.spec_from_file_location("export_json", ROOT / "scripts" / "export_json.py")
+export_json = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(export_json)
+
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    path = str(tmp_path / "health_bot.sqlite3")
+    conn = connect(path)
+    init_db(conn, str(ROOT / "db" / "schema.sql"))
+    conn.close()
+    init_archive(path, str(ROOT / "db" / "archive_schema.sql"))  # before connections open, as the bot does
+    return path
+
+
+async def _seed(storage: SqliteStorage) -> int:
+    for telegram_user_id in (1, 2):
+        await storage.register_user(
+            telegram_user_id=telegram_user_id, chat_id=telegram_user_id, first_name=f"u{telegram_user_id}",
+            username=None, timezone="UTC", household_name="Home", fields_path=str(ROOT / "fields.txt"),
+        )
+    user = await storage.get_user(1)
+    user_id, household_id = int(user["id"]), int(user["household_id"])
+    habits = await storage.enabled_habits(household_id)
+    a, b = [int(h["id"]) for h in habits if h["kind"] == "boolean"][:2]
+    mood = next(int(h["id"]) for h in habits if h["kind"] == "choice")
+    for day in range(1, 29):
+        await storage.save_daily_values(
+            user_id, household_id, f"2025-02-{day:02d}", {a: str(day % 2), b: "1", mood: "😊😐😞"[day % 3]}
+        )
+    await storage.save_daily_values(user_id, household_id, "2026-06-01", {a: "1"})
+    return household_id
+
+
+def _export(db_path: str, tmp_path: Path, live: bool) -> list[dict]:
+    conns = connect_analytics_shards(db_path, live=live, snapshot_path=str(tmp_path / "snap" / "snapshot.sqlite3"), max_age_seconds=0)
+    out = tmp_path / "export.ndjson"
+    try:
+        export_json.write_ndjson(conns, out, {})
+    finally:
+        for conn in conns:
+            conn.close()
+    return [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()[1:]]
+
+
+def test_family_summary_and_export_read_archived_months(db_path, tmp_path):
+    async def main():
+        storage = SqliteStorage(db_path)
+        try:
+            household_id = await _seed(storage)
+            summary = lambda: storage.family_summary(household_id, "2025-02-01", "2026-06-30")  # noqa: E731
+            before = [dict(m) for m in await summary()]
+            exported = _export(db_path, tmp_path, live=True)
+
+            result = archive_history(db_path, keep_days=365, today=TODAY)
+            assert result.values == 28 * 3
+
+            assert [dict(m) for m in await summary()] == before
+            assert before[0]["tracked"] == 28 * 3 + 1 and before[0]["success"] == 14 + 28 + 1
+            for live in (True, False):
+                assert _export(db_path, tmp_path, live) == exported
+        finally:
+            await storage.close()
+
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+"""scripts/backup_db.py: full + incremental backups and point-in-time restore."""
+import importlib.util
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+from health_bot.db import archive_path, connect, init_archive, init_db
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_spec = importlib.util.spec_from_file_location("backup_db", ROOT / "scripts" / "backup_db.py")
+backup_db = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(backup_db)
+
+
+@pytest.fixture
+def db_path(tmp_path) -> Path:
+    path = tmp_path / "db" / "health_bot.sqlite3"
+    conn = connect(str(path))
+    init_db(conn, str(ROOT / "db" / "schema.sql"))
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def stamps(monkeypatch):
+    """Base stamps handed out in order, so bases taken within a second stay apart."""
+    queue = []
+    monkeypatch.setattr(backup_db, "_utc_stamp", lambda: queue.pop(0))
+    return queue
+
+
+def _add_household(db_path: Path, name: str) -> None:
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO households (name) VALUES (?)", (name,))
+    conn.commit()
+    conn.close()
+
+
+def _households(path: Path) -> list[str]:
+    conn = sqlite3.connect(path)
+    try:
+        return [r[0] for r in conn.execute("SELECT name FROM households ORDER BY id")]
+    finally:
+        conn.close()
+
+
+def test_restore_between_full_backups_keeps_changes(db_path, tmp_path, stamps):
+    backup_dir = tmp_path / "backups"
+    stamps += ["20000101_000000", "20990101_000000"]
+    backup_db.full_backup(db_path, backup_dir)
+    _add_household(db_path, "A")
+    # Not shipped by an incremental: the next full backup must not drop it
+    backup_db.full_backup(db_path, backup_dir)
+
+    out = tmp_path / "restored.sqlite3"
+    backup_db.restore(backup_dir, out, at="2098-01-01T00:00:00")
+    assert _households(out) == ["A"]
+
+
+def test_incremental_then_restore_latest(db_path, tmp_path, stamps):
+    backup_dir = tmp_path / "backups"
+    stamps += ["20000101_000000"]
+    backup_db.full_backup(db_path, backup_dir)
+    _add_household(db_path, "A")
+    assert backup_db.incremental_backup(db_path, backup_dir) is not None
+    _add_household(db_path, "B")
+    backup_db.incremental_backup(db_path, backup_dir)
+
+    out = tmp_path / "restored.sqlite3"
+    assert backup_db.restore(backup_dir, out) == 2
+    assert _households(out) == ["A", "B"]
+
+
+def test_files_sharing_a_backup_dir_stay_apart(db_path, tmp_path, stamps):
+    backup_dir = tmp_path / "backups"
+    other = db_path.with_name("health_bot.shard1.sqlite3")
+    conn = connect(str(other))
+    init_db(conn, str(ROOT / "db" / "schema.sql"))
+    conn.close()
+
+    stamps += ["20000101_000000"] * 2  # same second
+    backup_db.full_backup(db_path, backup_dir)
+    backup_db.full_backup(other, backup_dir)
+    _add_household(db_path, "A")
+    _add_household(other, "B")
+    _add_household(other, "C")
+    backup_db.incremental_backup(db_path, backup_dir)
+    backup_db.incremental_backup(other, backup_dir)
+
+    for path, names in ((db_path, ["A"]), (other, ["B", "C"])):
+        out = tmp_path / f"restored_{path.stem}.sqlite3"
+        backup_db.restore(backup_dir, out, stem=path.stem)
+        assert _households(out) == names
+
+
+def test_archive_file_gets_plain_full_backups(db_path, tmp_path, stamps, monkeypatch):
+    # The README command: the archive has no change_log, so no sqlite_sequence either
+    archive = Path(archive_path(str(db_path)))
+    init_archive(str(db_path), str(ROOT / "db" / "archive_schema.sql"))
+    conn = sqlite3.connect(archive)
+    conn.execute("INSERT INTO archive_months (user_id, month, habit_id, tracked, done) VALUES (1, '2025-01', 2, 7, 5)")
+    conn.commit()
+    conn.close()
+
+    backup_dir = tmp_path / "backups"
+    stamps += ["20000101_000000", "20000101_000001"]
+    for argv in (
+        ["full", "--db", str(archive), "--dir", str(backup_dir)],
+        ["--db", str(db_path), "--dir", str(backup_dir), "full"],
+        ["restore", "--db", str(archive), "--dir", str(backup_dir), "--out", str(tmp_path / "restored.sqlite3")],
+    ):
+        monkeypatch.setattr(sys, "argv", ["backup_db.py", *argv])
+        backup_db.main()
+
+    conn = sqlite3.connect(tmp_path / "restored.sqlite3")
+    assert conn.execute("SELECT user_id, month, tracked, done FROM archive_months").fetchall() == [(1, "2025-01", 7, 5)]
+    conn.close()
+    with pytest.raises(SystemExit):
+        backup_db.incremental_backup(archive, backup_dir)
@@ -0,0 +1,82 @@
+"""scripts/import_history.py: resuming and restarting a load."""
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+from health_bot.db import configure_shards, connect, connect_shard, init_db, init_shards, shard_path
+from health_bot.seed import create_household
+
+ROOT = Path(__file__).resolve().parent.parent
+INDEXES = {"idx_daily_values_entry_num", "idx_daily_values_habit"}
+
+_spec = importlib.util.spec_from_file_location("import_history", ROOT / "scripts" / "import_history.py")
+import_history = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(import_history)
+
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    path = str(tmp_path / "health_bot.sqlite3")
+    conn = connect(path)
+    init_db(conn, str(ROOT / "db" / "schema.sql"))
+    configure_shards(2)
+    init_shards(path, str(ROOT / "db" / "shard_schema.sql"))
+    for telegram_user_id in (1, 2):  # households 1 and 2: one per shard
+        household_id = create_household(
+            conn, owner_telegram_user_id=telegram_user_id, name="Home", fields_path=str(ROOT / "fields.txt")
+        )
+        conn.execute(
+            "INSERT INTO users (telegram_user_id, chat_id, household_id, timezone) VALUES (?, ?, ?, 'UTC')",
+            (telegram_user_id, telegram_user_id, household_id),
+        )
+    conn.commit()
+    conn.close()
+    yield path
+    configure_shards(1)
+
+
+def _indexes(db_path: str, shard: int) -> set[str]:
+    conn = connect(shard_path(db_path, shard))
+    try:
+        return {
+            r["name"]
+            for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'daily_values'")
+        }
+    finally:
+        conn.close()
+
+
+def _import(monkeypatch, *args: str) -> None:
+    monkeypatch.setattr(sys, "argv", ["import_history.py", *args])
+    assert import_history.main() == 0
+
+
+def test_restart_after_crash_rebuilds_indexes(db_path, tmp_path, monkeypatch):
+    title = (ROOT / "fields.txt").read_text(encoding="utf-8").splitlines()[0]
+    source = tmp_path / "history.ndjson"
+    source.write_text(
+        "\n".join(
+            json.dumps({"type": "daily_value", "telegram_user_id": u, "date": "2026-01-10", "habit": title, "value": "1"})
+            for u in (1, 2)
+        ),
+        encoding="utf-8",
+    )
+
+    # A crashed run: indexes dropped, their definitions only in the checkpoint
+    importer = import_history.Importer(db_path)
+    state = {"source": {}, "records": 0, "indexes": {}}
+    import_history._drop_indexes(importer.conns, state)
+    importer.conns.close()
+    for shard in (0, 1):
+        assert not INDEXES & _indexes(db_path, shard)
+
+    _import(monkeypatch, str(source), "--db", db_path, "--restart")
+
+    for shard in (0, 1):
+        assert INDEXES <= _indexes(db_path, shard)
+        conn = connect_shard(db_path, shard)
+        assert conn.execute("SELECT COUNT(*) FROM main.daily_values").fetchone()[0] == 1
+        conn.close()
@@ -0,0 +1,245 @@
+"""The Storage contract, run against every backend.
+
+SQLite always runs (a temporary file). PostgreSQL runs when DATABASE_URL
+points at a server and asyncpg is installed; each test gets its own schema
+(db/schema_pg.sql), dropped afterwards.
+"""
+import asyncio
+import os
+import secrets
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit, urlunsplit
+
+import pytest
+
+from health_bot.db import connect, init_db
+from health_bot.storage import SqliteStorage
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+ROOT = Path(__file__).resolve().parent.parent
+FIELDS_PATH = str(ROOT / "fields.txt")
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+
+BACKENDS = [
+    "sqlite",
+    pytest.param(
+        "postgres",
+        marks=pytest.mark.skipif(
+            not DATABASE_URL or asyncpg is None, reason="needs DATABASE_URL and asyncpg"
+        ),
+    ),
+]
+
+
+def _with_search_path(dsn: str, schema: str) -> str:
+    # asyncpg passes unknown DSN query parameters on as server settings
+    parts = urlsplit(dsn)
+    query = "&".join(q for q in (parts.query, urlencode({"search_path": schema})) if q)
+    return urlunsplit(parts._replace(query=query))
+
+
+async def _run(backend: str, tmp_path: Path, scenario) -> None:
+    if backend == "sqlite":
+        db_path = str(tmp_path / "bot.sqlite3")
+        conn = connect(db_path)
+        init_db(conn, str(ROOT / "db" / "schema.sql"))
+        conn.close()
+        storage = SqliteStorage(db_path)
+        await storage.open()
+        try:
+            await scenario(storage)
+        finally:
+            await storage.close()
+        return
+
+    from health_bot.storage_pg import PostgresStorage
+
+    schema = f"storage_test_{secrets.token_hex(4)}"
+    admin = await asyncpg.connect(DATABASE_URL)
+    try:
+        await admin.execute(f"CREATE SCHEMA {schema}")
+        await admin.execute(f"SET search_path TO {schema}")
+        await admin.execute((ROOT / "db" / "schema_pg.sql").read_text(encoding="utf-8"))
+        storage = PostgresStorage(_with_search_path(DATABASE_URL, schema), max_size=2)
+        await storage.open()
+        try:
+            await scenario(storage)
+        finally:
+            await storage.close()
+    finally:
+        await admin.execute(f"DROP SCHEMA {schema} CASCADE")
+        await admin.close()
+
+
+@pytest.fixture(params=BACKENDS)
+def run(request, tmp_path):
+    return lambda scenario: asyncio.run(_run(request.param, tmp_path, scenario))
+
+
+async def _register(storage, telegram_user_id: int = 100, first_name: str = "Olena") -> tuple[int, int]:
+    await storage.register_user(
+        telegram_user_id=telegram_user_id,
+        chat_id=telegram_user_id,
+        first_name=first_name,
+        username=None,
+        timezone="Europe/Kyiv",
+        household_name="Home",
+        fields_path=FIELDS_PATH,
+    )
+    user = await storage.get_user(telegram_user_id)
+    return int(user["id"]), int(user["household_id"])
+
+
+async def _habit_ids(storage, household_id: int) -> tuple[list[int], int]:
+    """(boolean habit ids, mood habit id) in display order."""
+    habits = await storage.enabled_habits(household_id)
+    booleans = [int(h["id"]) for h in habits if h["kind"] == "boolean"]
+    mood = next(int(h["id"]) for h in habits if h["kind"] == "choice")
+    return booleans, mood
+
+
+def test_register_user(run):
+    async def scenario(storage):
+        args = dict(
+            telegram_user_id=100, chat_id=100, first_name="Olena", username="olena",
+            timezone="Europe/Kyiv", household_name="Home", fields_path=FIELDS_PATH,
+        )
+        assert await storage.register_user(**args) is True
+        assert await storage.register_user(**args) is False
+        user = await storage.get_user(100)
+        assert user["timezone"] == "Europe/Kyiv"
+        assert await storage.get_user(999) is None
+
+        habits = await storage.enabled_habits(int(user["household_id"]))
+        lines = (ROOT / "fields.txt").read_text(encoding="utf-8").splitlines()
+        assert len(habits) == len([line for line in lines if line.strip()])
+        assert [h["kind"] for h in habits].count("choice") == 1
+
+        await storage.set_timezone(int(user["id"]), "UTC")
+        await storage.set_reminder_time(int(user["id"]), "21:30")
+        [row] = await storage.reminder_users(int(user["id"]))
+        assert (row["timezone"], row["reminder_time"], bool(row["reminders_enabled"])) == ("UTC", "21:30", True)
+        assert await storage.user_timezones() == ["UTC"]
+
+    run(scenario)
+
+
+def test_invites(run):
+    async def scenario(storage):
+        owner_id, household_id = await _register(storage)
+        await storage.create_invite(household_id, "JOIN42")
+        user_id = await storage.redeem_invite(
+            "JOIN42", telegram_user_id=200, chat_id=200, first_name="Taras", username=None, timezone="UTC"
+        )
+        assert user_id is not None and user_id != owner_id
+        assert int((await storage.get_user(200))["household_id"]) == household_id
+        assert await storage.redeem_invite(
+            "JOIN42", telegram_user_id=300, chat_id=300, first_name=None, username=None, timezone="UTC"
+        ) is None
+
+    run(scenario)
+
+
+def test_daily_values(run):
+    async def scenario(storage):
+        user_id, household_id = await _register(storage)
+        booleans, mood = await _habit_ids(storage, household_id)
+        a, b = booleans[:2]
+
+        await storage.save_daily_values(user_id, household_id, "2026-01-10", {a: "1", b: "0", mood: "😊"})
+        await storage.save_daily_values(user_id, household_id, "2026-01-10", {b: "1"})
+        assert await storage.daily_values(user_id, household_id, "2026-01-10") == {a: "1", b: "1", mood: "😊"}
+
+        await storage.clear_daily_value(user_id, household_id, "2026-01-10", mood)
+        assert await storage.daily_values(user_id, household_id, "2026-01-10") == {a: "1", b: "1"}
+
+        dates = ["2026-01-11", "2026-01-12"]
+        assert await storage.save_daily_values_for_dates(user_id, household_id, dates, {a: "0"}) == 2
+        assert await storage.import_daily_values([(user_id, "2026-01-12", b, "1"), (user_id, "2026-01-13", a, "1")]) == 2
+        assert await storage.daily_values_since(user_id, household_id, "2026-01-11") == {
+            "2026-01-11": {a: "0"},
+            "2026-01-12": {a: "0", b: "1"},
+            "2026-01-13": {a: "1"},
+        }
+
+        assert await storage.checked_in_users(
+            [(user_id, household_id, "2026-01-13"), (user_id, household_id, "2026-01-20")]
+        ) == {user_id}
+        assert await storage.checked_in_users([(user_id, household_id, "2026-01-20")]) == set()
+
+        bits = await storage.habit_bits(user_id, household_id, "2026-01-10")
+        assert bits.tracked[a] == 0b1111 and bits.done[a] == 0b1001
+        assert bits.tracked[b] == 0b101 and bits.done[b] == 0b101
+
+    run(scenario)
+
+
+def test_aggregates(run):
+    async def scenario(storage):
+        user_id, household_id = await _register(storage)
+        booleans, mood = await _habit_ids(storage, household_id)
+        a, b = booleans[:2]
+        await storage.save_daily_values(user_id, household_id, "2026-01-10", {a: "1", b: "1", mood: "😊"})
+        await storage.save_daily_values(user_id, household_id, "2026-01-11", {a: "0"})
+
+        progress = await storage.daily_progress(user_id, household_id, "2026-01-10", "2026-01-12")
+        assert {d: (p.tracked, p.attained) for d, p in progress.items()} == {
+            "2026-01-10": (3, 2),
+            "2026-01-11": (1, 0),
+        }
+        best, worst = await storage.best_and_worst_days(user_id, household_id, "2026-01-10", "2026-01-12")
+        assert (best.date, worst.date) == ("2026-01-10", "2026-01-11")
+
+        per_habit = await storage.habit_stats(user_id, household_id, "2026-01-10", "2026-01-11")
+        assert (per_habit[a].days, per_habit[a].attained, per_habit[a].goal_days) == (2, 1, 2)
+
+        [member] = await storage.family_summary(household_id, "2026-01-10", "2026-01-11")
+        assert (int(member["id"]), int(member["tracked"]), int(member["success"])) == (user_id, 4, 2)
+
+    run(scenario)
+
+
+def test_weekly_entries(run):
+    async def scenario(storage):
+        user_id, _ = await _register(storage)
+        assert await storage.weekly_entry(user_id, "2026-01-05") is None
+        await storage.save_weekly_entry(user_id, "2026-01-05", 70.5, 4, "ok")
+        await storage.save_weekly_entry(user_id, "2026-01-05", 70.0, 5, None)
+        row = await storage.weekly_entry(user_id, "2026-01-05")
+        assert (row["week_start_date"], row["weight_kg"], row["week_rating"], row["note"]) == ("2026-01-05", 70.0, 5, None)
+        assert await storage.weekly_done_users([(user_id, "2026-01-05"), (user_id, "2026-01-12")]) == {user_id}
+
+    run(scenario)
+
+
+def test_reminder_jobs(run):
+    async def scenario(storage):
+        user_id, household_id = await _register(storage)
+        other_id, _ = await _register(storage, 200, "Taras")
+        await storage.save_reminder_jobs("daily", [(user_id, "*|21:00|UTC", 100.0), (other_id, "*|08:00|UTC", 200.0)], [])
+        assert await storage.reminder_jobs("daily") == {user_id: ("*|21:00|UTC", 100.0), other_id: ("*|08:00|UTC", 200.0)}
+
+        [due] = await storage.due_reminder_jobs(150.0, 10)
+        assert (int(due["user_id"]), due["kind"], int(due["household_id"])) == (user_id, "daily", household_id)
+
+        await storage.advance_reminder_jobs([(user_id, "daily", 300.0)])
+        await storage.save_reminder_jobs("daily", [], [other_id])
+        assert await storage.reminder_jobs("daily", user_id) == {user_id: ("*|21:00|UTC", 300.0)}
+        assert await storage.reminder_jobs("daily", other_id) == {}
+
+    run(scenario)
+
+
+def test_acquire_lease(run):
+    async def scenario(storage):
+        assert await storage.acquire_lease("scheduler", "a", 60) is True
+        assert await storage.acquire_lease("scheduler", "b", 60) is False
+        assert await storage.acquire_lease("scheduler", "a", 60) is True  # renew
+        assert await storage.acquire_lease("scheduler", "a", -1) is True  # now expired
+        assert await storage.acquire_lease("scheduler", "b", 60) is True
+
+    run(scenario)
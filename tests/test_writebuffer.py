@@ -0,0 +1,185 @@
+"""CheckinWriteBuffer against a real SqliteStorage on a temporary database."""
+import asyncio
+import logging
+from pathlib import Path
+
+from health_bot import writebuffer
+from health_bot.db import connect, init_db
+from health_bot.storage import SqliteStorage
+from health_bot.writebuffer import CheckinWriteBuffer
+
+ROOT = Path(__file__).resolve().parent.parent
+DATE = "2026-01-15"
+
+
+class SlowStorage(SqliteStorage):
+    """Writes yield to the loop first, so flushes overlap with in-flight writes."""
+
+    delay = 0.05
+
+    async def save_daily_values(self, user_id, household_id, date_str, values):
+        await asyncio.sleep(self.delay)
+        await super().save_daily_values(user_id, household_id, date_str, values)
+
+
+class SlowFirstStorage(SqliteStorage):
+    """Only the first write is slow, so a later one would land before it."""
+
+    writes = 0
+
+    async def save_daily_values(self, user_id, household_id, date_str, values):
+        self.writes += 1
+        if self.writes == 1:
+            await asyncio.sleep(0.1)
+        await super().save_daily_values(user_id, household_id, date_str, values)
+
+
+class FailingStorage(SqliteStorage):
+    async def save_daily_values(self, user_id, household_id, date_str, values):
+        raise RuntimeError("disk I/O error")
+
+
+class FailOnceStorage(SqliteStorage):
+    failed = False
+
+    async def save_daily_values(self, user_id, household_id, date_str, values):
+        if not self.failed:
+            self.failed = True
+            raise RuntimeError("database is locked")
+        await super().save_daily_values(user_id, household_id, date_str, values)
+
+
+async def _open(storage: SqliteStorage) -> tuple[int, int, list[int]]:
+    conn = connect(storage.db_path)
+    init_db(conn, str(ROOT / "db" / "schema.sql"))
+    conn.close()
+    await storage.open()
+    await storage.register_user(
+        telegram_user_id=1,
+        chat_id=1,
+        first_name="Test",
+        username=None,
+        timezone="UTC",
+        household_name="Test",
+        fields_path=str(ROOT / "fields.txt"),
+    )
+    user = await storage.get_user(1)
+    habits = await storage.enabled_habits(int(user["household_id"]))
+    return int(user["id"]), int(user["household_id"]), [int(h["id"]) for h in habits]
+
+
+def _run(storage_cls, tmp_path, scenario):
+    async def main():
+        storage = storage_cls(str(tmp_path / "bot.sqlite3"))
+        try:
+            user_id, household_id, habit_ids = await _open(storage)
+            buffer = CheckinWriteBuffer(storage, window_seconds=0.02)
+            expected = await scenario(buffer, user_id, household_id, habit_ids)
+            stored = await storage.daily_values(user_id, household_id, DATE)
+            return expected, stored
+        finally:
+            await storage.close()
+
+    return asyncio.run(main())
+
+
+def _tap_all(buffer, user_id, household_id, habit_ids, taps) -> dict[int, str]:
+    """`taps` alternating taps on every habit; returns the last value per habit."""
+    last = {}
+    for i in range(taps):
+        for hid in habit_ids:
+            last[hid] = "1" if (i + hid) % 2 else "0"
+            buffer.put(user_id, DATE, hid, last[hid], household_id)
+    return last
+
+
+def test_rapid_taps_coalesce_to_last_value(tmp_path):
+    async def scenario(buffer, user_id, household_id, habit_ids):
+        last = _tap_all(buffer, user_id, household_id, habit_ids, taps=5)
+        await asyncio.sleep(buffer.window_seconds * 5)
+        assert buffer.transactions == 1
+        return last
+
+    expected, stored = _run(SqliteStorage, tmp_path, scenario)
+    assert stored == expected
+
+
+def test_flush_racing_deferred_flush(tmp_path):
+    async def scenario(buffer, user_id, household_id, habit_ids):
+        last = _tap_all(buffer, user_id, household_id, habit_ids, taps=3)
+        # The deferred flush has taken the taps and its write is in flight
+        await asyncio.sleep(buffer.window_seconds + SlowStorage.delay / 2)
+        assert buffer.pending_for(user_id, DATE) == {}
+        last.update(_tap_all(buffer, user_id, household_id, habit_ids[:2], taps=2))
+        await buffer.flush(user_id, DATE)
+        assert buffer.pending_for(user_id, DATE) == {}
+        return last
+
+    expected, stored = _run(SlowStorage, tmp_path, scenario)
+    assert stored == expected
+
+
+def test_deferred_flushes_write_in_tap_order(tmp_path):
+    async def scenario(buffer, user_id, household_id, habit_ids):
+        buffer.put(user_id, DATE, habit_ids[0], "0", household_id)
+        await asyncio.sleep(buffer.window_seconds * 2)  # first write in flight (slow)
+        buffer.put(user_id, DATE, habit_ids[0], "1", household_id)
+        await asyncio.sleep(0.2)  # second timer fired; both writes done
+        assert buffer.transactions == 2
+        return {habit_ids[0]: "1"}
+
+    expected, stored = _run(SlowFirstStorage, tmp_path, scenario)
+    assert stored == expected
+
+
+def test_failed_write_is_retried_without_a_new_tap(tmp_path, monkeypatch):
+    monkeypatch.setattr(writebuffer, "RETRY_SECONDS", 0.05)
+
+    async def scenario(buffer, user_id, household_id, habit_ids):
+        flushed = []
+
+        async def on_flushed():
+            flushed.append(True)
+
+        buffer.put(user_id, DATE, habit_ids[0], "1", household_id, on_flushed=on_flushed)
+        await asyncio.sleep(buffer.window_seconds + 0.1)
+        assert buffer.pending_for(user_id, DATE) == {}
+        assert flushed == [True]  # the render still runs after the retry
+        return {habit_ids[0]: "1"}
+
+    expected, stored = _run(FailOnceStorage, tmp_path, scenario)
+    assert stored == expected
+
+
+def test_flush_all_waits_for_writes_in_flight(tmp_path):
+    async def scenario(buffer, user_id, household_id, habit_ids):
+        last = _tap_all(buffer, user_id, household_id, habit_ids, taps=3)
+        await asyncio.sleep(buffer.window_seconds + SlowStorage.delay / 2)
+        # Nothing pending, but the deferred write is still in flight
+        assert buffer.pending_for(user_id, DATE) == {}
+        await buffer.flush_all()
+        assert buffer._writing == {}
+
+        # Taps still waiting on their timer
+        last.update(_tap_all(buffer, user_id, household_id, habit_ids[1:], taps=4))
+        assert await buffer.flush_all() == 1
+        assert buffer.pending_for(user_id, DATE) == {}
+        return last
+
+    expected, stored = _run(SlowStorage, tmp_path, scenario)
+    assert stored == expected
+
+
+def test_flush_all_logs_lost_taps(tmp_path, caplog):
+    async def scenario(buffer, user_id, household_id, habit_ids):
+        buffer.put(user_id, DATE, habit_ids[0], "1", household_id)
+        with caplog.at_level(logging.ERROR, logger="health_bot.writebuffer"):
+            assert await buffer.flush_all() == 0
+        assert buffer.pending_for(user_id, DATE) == {}
+        return {}
+
+    expected, stored = _run(FailingStorage, tmp_path, scenario)
+    assert stored == expected
+    lost = [r for r in caplog.records if "lost on shutdown" in r.getMessage()]
+    assert len(lost) == 1 and DATE in lost[0].getMessage() and "'1'" in lost[0].getMessage()
+